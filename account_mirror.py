@@ -0,0 +1,305 @@
+"""
+账户镜像
+监听合约用户数据流（ACCOUNT_UPDATE / ORDER_TRADE_UPDATE），在内存中维护持仓、余额和挂单，
+只在慢速定时器或账户变动后用 REST 校准。读取方直接拿本地快照，无需每次 REST 往返
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import websockets
+
+
+# 挂单进入这些状态后从本地挂单表中移除
+FINAL_ORDER_STATUSES = {'FILLED', 'CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED'}
+
+
+class AccountMirror:
+    """合约账户的本地镜像，运行在 BinanceClient 的后台事件循环中"""
+
+    BASE_URL = 'wss://fstream.binance.com/ws'
+    TESTNET_URL = 'wss://fstream.binancefuture.com/ws'
+    KEEPALIVE_SECONDS = 30 * 60     # listenKey 有效期60分钟，每30分钟续期一次
+    RECONNECT_DELAY_MAX = 60        # 断线重连最大等待（秒）
+    EVENT_RECONCILE_DELAY = 0.5     # 账户变动后延迟多久做一次 REST 校准（合并连续事件）
+
+    def __init__(self, binance_client, testnet: bool = False, proxy: str = None,
+                 reconcile_seconds: int = 60, mark_price_source: Callable[[str], Optional[Dict]] = None,
+                 url: str = None):
+        """
+        初始化账户镜像
+
+        Args:
+            binance_client: BinanceClient 实例（共用其事件循环和连接池）
+            testnet: 是否使用测试网
+            proxy: 代理地址
+            reconcile_seconds: 定时 REST 校准间隔（秒）
+            mark_price_source: 标记价格来源 symbol -> {'markPrice': ...}，用于实时计算未实现盈亏
+            url: 自定义用户数据流地址
+        """
+        self.binance = binance_client
+        self.client = binance_client.async_client
+        self.url = url or (self.TESTNET_URL if testnet else self.BASE_URL)
+        self.proxy = proxy
+        self.reconcile_seconds = reconcile_seconds
+        self.mark_price_source = mark_price_source
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._account: Dict = {}
+        self._positions: Dict[tuple, Dict] = {}
+        self._open_orders: Dict[int, Dict] = {}
+
+        self.listen_key: Optional[str] = None
+        self.connected = False
+        self.synced_at = 0.0
+        self.event_count = 0
+        self.reconcile_count = 0
+
+        # 本地写操作（下单/撤单/调杠杆）之后，直到校准完成前读取方回退到 REST
+        self._write_seq = 0
+        self._stale = True
+        self._reconcile_scheduled = False
+        self._tasks: List[asyncio.Task] = []
+
+    # ========== 生命周期 ==========
+
+    def start(self):
+        """在 BinanceClient 的事件循环中启动镜像，并挂接到客户端"""
+        self.binance._call(self._start())
+        self.client.account_mirror = self
+
+    async def _start(self):
+        await self.reconcile()
+        self._tasks = [
+            asyncio.create_task(self._stream_loop()),
+            asyncio.create_task(self._keepalive_loop()),
+            asyncio.create_task(self._reconcile_loop()),
+        ]
+
+    def stop(self):
+        """停止镜像，读取方恢复 REST"""
+        self.client.account_mirror = None
+        self.binance._call(self._stop())
+
+    async def _stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # 同一 API Key 的 listenKey 由机器人和仪表盘共用，这里不主动关闭，交给服务器过期
+        self.connected = False
+
+    def is_ready(self) -> bool:
+        """用户数据流在线、已完成校准且没有未确认的本地写操作"""
+        return (self.connected and not self._stale
+                and time.time() - self.synced_at < self.reconcile_seconds * 2)
+
+    def mark_stale(self):
+        """
+        本地写操作发出前和完成后各调用一次：立即安排校准，校准完成前读取方回退到 REST
+
+        发出前已开始的校准可能在订单生效前就返回旧状态，完成后再调用一次使其结果作废，
+        只有写操作完成之后开始的校准才能解除过期状态
+        """
+        self._write_seq += 1
+        self._stale = True
+        self._schedule_reconcile(0)
+
+    # ========== REST 校准 ==========
+
+    async def reconcile(self):
+        """用 REST 拉取账户、持仓和挂单，整体替换本地状态"""
+        seq = self._write_seq
+        account, positions, open_orders = await asyncio.gather(
+            self.client._call('futures_account'),
+            self.client._call('futures_position_information'),
+            self.client._call('futures_get_open_orders')
+        )
+        with self._lock:
+            self._account = account
+            self._positions = {(p['symbol'], p.get('positionSide', 'BOTH')): p for p in positions}
+            self._open_orders = {o['orderId']: o for o in open_orders}
+            self.synced_at = time.time()
+            self.reconcile_count += 1
+            # 校准期间又有新的写操作时保持过期状态，等待下一次校准
+            if seq == self._write_seq:
+                self._stale = False
+
+    def _schedule_reconcile(self, delay: float):
+        """合并短时间内的多次校准请求"""
+        if self._reconcile_scheduled:
+            return
+        self._reconcile_scheduled = True
+        asyncio.get_running_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self._reconcile_once()))
+
+    async def _reconcile_once(self):
+        self._reconcile_scheduled = False
+        try:
+            await self.reconcile()
+        except Exception as e:
+            self.logger.warning(f"[MIRROR] 账户校准失败: {e}")
+        if self._stale:
+            self._schedule_reconcile(1)
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            await self._reconcile_once()
+
+    # ========== 用户数据流 ==========
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.KEEPALIVE_SECONDS)
+            if not self.listen_key:
+                continue
+            try:
+                await self.client.keepalive_listen_key(self.listen_key)
+            except Exception as e:
+                self.logger.warning(f"[MIRROR] listenKey 续期失败: {e}")
+
+    async def _stream_loop(self):
+        delay = 1
+        while True:
+            try:
+                self.listen_key = await self.client.create_listen_key()
+                async with websockets.connect(f"{self.url}/{self.listen_key}",
+                                              proxy=self.proxy or None) as ws:
+                    # 连接建立前的变动可能已错过，先校准一次
+                    await self._reconcile_once()
+                    self.connected = True
+                    delay = 1
+                    self.logger.info("[MIRROR] 用户数据流已连接")
+                    async for raw in ws:
+                        if self._handle_event(json.loads(raw)):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"[MIRROR] 用户数据流断开: {e}，{delay} 秒后重连")
+
+            self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+
+    def _handle_event(self, data: Dict) -> bool:
+        """
+        处理一条用户数据流事件
+
+        Returns:
+            True 表示需要重新建立连接（listenKey 过期）
+        """
+        self.event_count += 1
+        event = data.get('e')
+        if event == 'ACCOUNT_UPDATE':
+            self._on_account_update(data['a'])
+            # 可用余额、强平价等字段不在推送中，账户变动后补一次校准
+            self._schedule_reconcile(self.EVENT_RECONCILE_DELAY)
+        elif event == 'ORDER_TRADE_UPDATE':
+            self._on_order_update(data['o'])
+        elif event == 'listenKeyExpired':
+            self.logger.warning("[MIRROR] listenKey 已过期，重新连接")
+            return True
+        return False
+
+    def _on_account_update(self, update: Dict):
+        with self._lock:
+            for b in update.get('B', []):
+                for asset in self._account.get('assets', []):
+                    if asset.get('asset') != b['a']:
+                        continue
+                    if b['a'] == 'USDT':
+                        delta = float(b['wb']) - float(asset.get('walletBalance', 0))
+                        total = float(self._account.get('totalWalletBalance', 0)) + delta
+                        self._account['totalWalletBalance'] = f"{total:.8f}"
+                    asset['walletBalance'] = b['wb']
+                    asset['crossWalletBalance'] = b['cw']
+
+            for p in update.get('P', []):
+                key = (p['s'], p.get('ps', 'BOTH'))
+                position = self._positions.get(key)
+                if position is None:
+                    # 未知持仓（例如手动开仓），先建立最小记录，等校准补全杠杆等字段
+                    position = self._positions[key] = {
+                        'symbol': p['s'], 'positionSide': p.get('ps', 'BOTH'),
+                        'markPrice': p['ep'], 'leverage': '1', 'liquidationPrice': '0'
+                    }
+                position['positionAmt'] = p['pa']
+                position['entryPrice'] = p['ep']
+                position['breakEvenPrice'] = p.get('bep', p['ep'])
+                position['unRealizedProfit'] = p['up']
+                position['marginType'] = p.get('mt', position.get('marginType'))
+                position['isolatedWallet'] = p.get('iw', position.get('isolatedWallet'))
+
+    def _on_order_update(self, o: Dict):
+        with self._lock:
+            if o['X'] in FINAL_ORDER_STATUSES:
+                self._open_orders.pop(o['i'], None)
+                return
+            # 转换为与 REST 挂单接口相同的字段
+            self._open_orders[o['i']] = {
+                'symbol': o['s'],
+                'orderId': o['i'],
+                'clientOrderId': o['c'],
+                'side': o['S'],
+                'type': o['o'],
+                'origType': o.get('ot', o['o']),
+                'timeInForce': o['f'],
+                'origQty': o['q'],
+                'price': o['p'],
+                'avgPrice': o['ap'],
+                'stopPrice': o['sp'],
+                'status': o['X'],
+                'executedQty': o['z'],
+                'positionSide': o.get('ps', 'BOTH'),
+                'reduceOnly': o.get('R', False),
+                'closePosition': o.get('cp', False),
+                'updateTime': o.get('T')
+            }
+
+    # ========== 读取接口（本地快照）==========
+
+    def _position_snapshot(self, position: Dict) -> Dict:
+        """复制持仓记录，有标记价格来源时实时重算未实现盈亏"""
+        snapshot = dict(position)
+        mark = self.mark_price_source(snapshot['symbol']) if self.mark_price_source else None
+        if mark:
+            amount = float(snapshot.get('positionAmt', 0))
+            entry_price = float(snapshot.get('entryPrice', 0))
+            snapshot['markPrice'] = str(mark['markPrice'])
+            snapshot['unRealizedProfit'] = str(amount * (mark['markPrice'] - entry_price))
+        return snapshot
+
+    def get_positions(self) -> List[Dict]:
+        """全部持仓记录（REST positionRisk 格式）"""
+        with self._lock:
+            positions = list(self._positions.values())
+        return [self._position_snapshot(p) for p in positions]
+
+    def get_active_positions(self) -> List[Dict]:
+        """持仓数量不为 0 的持仓"""
+        return [p for p in self.get_positions() if float(p.get('positionAmt', 0)) != 0]
+
+    def get_open_orders(self, symbol: str = None) -> List[Dict]:
+        """当前挂单"""
+        with self._lock:
+            orders = [dict(o) for o in self._open_orders.values()]
+        if symbol:
+            orders = [o for o in orders if o['symbol'] == symbol]
+        return orders
+
+    def get_account_info(self) -> Dict:
+        """合约账户信息（REST account 格式），未实现盈亏和保证金余额按最新标记价格重算"""
+        with self._lock:
+            account = copy.deepcopy(self._account)
+        total_unrealized = sum(float(p.get('unRealizedProfit', 0)) for p in self.get_active_positions())
+        wallet = float(account.get('totalWalletBalance', 0))
+        account['totalUnrealizedProfit'] = f"{total_unrealized:.8f}"
+        account['totalMarginBalance'] = f"{wallet + total_unrealized:.8f}"
+        return account
@@ -19,21 +19,25 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from binance_client import BinanceClient
 from market_analyzer import MarketAnalyzer
+from symbol_filter_cache import SymbolFilterCache
 
 
 class AdvancedPositionManager:
     """高级仓位管理器 - 实现专业级交易策略"""
 
-    def __init__(self, binance_client: BinanceClient, market_analyzer: MarketAnalyzer):
+    def __init__(self, binance_client: BinanceClient, market_analyzer: MarketAnalyzer,
+                 symbol_filters: SymbolFilterCache = None):
         """
         初始化高级仓位管理器
 
         Args:
             binance_client: Binance API客户端
             market_analyzer: 市场分析器（用于获取ATR等指标）
+            symbol_filters: 交易对过滤器缓存（用于数量取整，为空时自动创建）
         """
         self.client = binance_client
         self.analyzer = market_analyzer
+        self.filters = symbol_filters or SymbolFilterCache(binance_client)
         self.logger = logging.getLogger(__name__)
 
     # ==================== 1. 滚仓策略 ====================
@@ -158,7 +162,7 @@ class AdvancedPositionManager:
 
             # 计算滚仓数量：usable_pnl * leverage / price
             quantity = (usable_pnl * leverage) / current_price
-            quantity = round(quantity, 3)  # 精度控制
+            quantity = self.filters.quantize_quantity(symbol, quantity)  # 按交易对数量步长取整
 
             # 设置杠杆
             self.client.set_leverage(symbol, leverage)
@@ -232,7 +236,7 @@ class AdvancedPositionManager:
 
             # 计算数量
             quantity = current_size / price
-            quantity = round(quantity, 3)
+            quantity = self.filters.quantize_quantity(symbol, quantity)
 
             # 执行加仓
             result = self.client.create_futures_order(
@@ -286,7 +290,8 @@ class AdvancedPositionManager:
             止盈订单结果列表
         """
         try:
-            results = []
+            levels = []
+            orders = []
             remaining_qty = total_quantity
 
             # 确定止盈方向
@@ -301,32 +306,36 @@ class AdvancedPositionManager:
                     tp_price = entry_price * (1 + profit_pct / 100)
                 else:
                     tp_price = entry_price * (1 - profit_pct / 100)
+                tp_price = self.filters.quantize_price(symbol, tp_price)
 
                 # 计算本级止盈数量
                 qty = remaining_qty * (close_pct / 100)
-                qty = round(qty, 3)
-
-                # 创建止盈订单
-                order = self.client.create_take_profit_order(
-                    symbol=symbol,
-                    side=tp_side,
-                    quantity=qty,
-                    stop_price=tp_price,
-                    reduce_only=True
-                )
+                qty = self.filters.quantize_quantity(symbol, qty)
+
+                levels.append({'profit_pct': profit_pct, 'close_pct': close_pct,
+                               'price': tp_price, 'quantity': qty})
+                orders.append(self._take_profit_order(symbol, tp_side, qty, tp_price))
+
+                remaining_qty -= qty
+
+            # 所有止盈单一次批量提交
+            results = []
+            for level, order in zip(levels, self.client.create_futures_batch_orders(orders)):
+                error = self._batch_order_error(order)
+                if error:
+                    self.logger.error(f"设置止盈 Level {len(results) + 1} 失败: {error}")
+                    continue
 
                 results.append({
-                    'profit_pct': profit_pct,
-                    'price': tp_price,
-                    'quantity': qty,
+                    'profit_pct': level['profit_pct'],
+                    'price': level['price'],
+                    'quantity': level['quantity'],
                     'order': order
                 })
 
-                remaining_qty -= qty
-
                 self.logger.info(
                     f"📈 设置止盈 Level {len(results)}: "
-                    f"盈利{profit_pct}%时平{close_pct}%仓位 @ ${tp_price:.2f}"
+                    f"盈利{level['profit_pct']}%时平{level['close_pct']}%仓位 @ ${level['price']:.2f}"
                 )
 
             return results
@@ -589,7 +598,7 @@ class AdvancedPositionManager:
 
             # 计算对冲数量和方向
             hedge_quantity = abs(position_amt) * hedge_ratio
-            hedge_quantity = round(hedge_quantity, 3)
+            hedge_quantity = self.filters.quantize_quantity(symbol, hedge_quantity)
 
             hedge_side = 'SELL' if position_amt > 0 else 'BUY'
 
@@ -668,7 +677,7 @@ class AdvancedPositionManager:
                 side = 'SELL' if position_amt > 0 else 'BUY'
                 quantity = abs(diff_usdt / mark_price)
 
-            quantity = round(quantity, 3)
+            quantity = self.filters.quantize_quantity(symbol, quantity)
 
             # 执行调整
             order = self.client.create_futures_order(
@@ -740,7 +749,7 @@ class AdvancedPositionManager:
         """
         设置分批止盈挂单 (V2.0 核心功能)
 
-        在多个盈利点位设置条件止盈挂单，分批锁定利润
+        在多个盈利点位设置条件止盈挂单，分批锁定利润（所有挂单一次批量提交）
 
         Args:
             symbol: 交易对
@@ -766,96 +775,117 @@ class AdvancedPositionManager:
             if not targets or len(targets) == 0:
                 return {'success': False, 'error': '未提供止盈目标'}
 
-            # 确保position_amt为正数
-            total_quantity = abs(position_amt)
+            self.logger.info(f"\n💰 [分批止盈] 开始设置 {symbol} 止盈计划:")
 
-            # 计算订单方向（止盈是反向平仓）
-            close_side = 'SELL' if side == 'LONG' else 'BUY'
+            plan = self._plan_scale_out_take_profits(symbol, entry_price, position_amt, side, targets)
+            if not plan:
+                return {'success': False, 'error': '未能创建任何止盈订单'}
 
-            orders_created = []
-            target_prices = []
-            remaining_pct = 100.0  # 剩余仓位百分比
+            results = self.client.create_futures_batch_orders([p['order'] for p in plan])
+            return self._collect_scale_out_results(plan, results)
 
-            self.logger.info(f"\n💰 [分批止盈] 开始设置 {symbol} 止盈计划:")
+        except Exception as e:
+            self.logger.error(f"设置分批止盈失败: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
-            for i, target in enumerate(targets, 1):
-                profit_pct = target.get('profit_pct', 0)
-                close_pct = target.get('close_pct', 0)
+    def _plan_scale_out_take_profits(self, symbol: str, entry_price: float,
+                                     position_amt: float, side: str,
+                                     targets: List[Dict]) -> List[Dict]:
+        """计算分批止盈的价格和数量，返回待提交的订单参数（不下单）"""
+        # 确保position_amt为正数
+        total_quantity = abs(position_amt)
+
+        # 计算订单方向（止盈是反向平仓）
+        close_side = 'SELL' if side == 'LONG' else 'BUY'
+
+        plan = []
+        remaining_pct = 100.0  # 剩余仓位百分比
+
+        for i, target in enumerate(targets, 1):
+            profit_pct = target.get('profit_pct', 0)
+            close_pct = target.get('close_pct', 0)
+
+            if profit_pct <= 0 or close_pct <= 0:
+                self.logger.warning(f"  ⚠️  跳过无效目标: profit_pct={profit_pct}, close_pct={close_pct}")
+                continue
+
+            # 计算目标价格（按交易对价格步长取整）
+            if side == 'LONG':
+                target_price = entry_price * (1 + profit_pct / 100)
+            else:  # SHORT
+                target_price = entry_price * (1 - profit_pct / 100)
+            target_price = self.filters.quantize_price(symbol, target_price)
+
+            # 计算平仓数量（基于剩余仓位百分比）
+            if i == len(targets):
+                # 最后一个目标：平所有剩余仓位
+                close_quantity = total_quantity * (remaining_pct / 100)
+            else:
+                # 中间目标：平指定百分比
+                close_quantity = total_quantity * (close_pct / 100)
 
-                if profit_pct <= 0 or close_pct <= 0:
-                    self.logger.warning(f"  ⚠️  跳过无效目标: profit_pct={profit_pct}, close_pct={close_pct}")
-                    continue
+            # 按交易对数量步长取整
+            close_quantity = self.filters.quantize_quantity(symbol, close_quantity)
 
-                # 计算目标价格
-                if side == 'LONG':
-                    target_price = entry_price * (1 + profit_pct / 100)
-                else:  # SHORT
-                    target_price = entry_price * (1 - profit_pct / 100)
+            # 低于交易所最小下单量（minQty/MIN_NOTIONAL）的订单必然被拒绝，不放进批量请求
+            min_quantity = self.filters.min_order_quantity(symbol, target_price)
+            if close_quantity < min_quantity:
+                self.logger.warning(f"  ⚠️  跳过数量过小的订单: {close_quantity} < 最小下单量 {min_quantity}")
+                continue
 
-                # 计算平仓数量（基于剩余仓位百分比）
-                if i == len(targets):
-                    # 最后一个目标：平所有剩余仓位
-                    close_quantity = total_quantity * (remaining_pct / 100)
-                else:
-                    # 中间目标：平指定百分比
-                    close_quantity = total_quantity * (close_pct / 100)
+            plan.append({
+                'index': i,
+                'profit_pct': profit_pct,
+                'close_pct': close_pct,
+                'price': target_price,
+                'quantity': close_quantity,
+                'order': self._take_profit_order(symbol, close_side, close_quantity, target_price)
+            })
 
-                # 确保数量精度（Binance要求至少3位小数）
-                close_quantity = round(close_quantity, 3)
+            # 更新剩余仓位
+            remaining_pct -= close_pct
 
-                if close_quantity < 0.001:
-                    self.logger.warning(f"  ⚠️  跳过数量过小的订单: {close_quantity}")
-                    continue
+        return plan
 
-                # 创建止盈限价单（TAKE_PROFIT_MARKET类型）
-                try:
-                    order = self.client.create_take_profit_order(
-                        symbol=symbol,
-                        side=close_side,
-                        quantity=close_quantity,
-                        stop_price=target_price,
-                        reduce_only=True
-                    )
-
-                    orders_created.append(order)
-                    target_prices.append(target_price)
-
-                    self.logger.info(
-                        f"  ✅ 目标{i}: 盈利{profit_pct}%时 @ ${target_price:.2f} "
-                        f"平仓{close_pct}% ({close_quantity:.3f}个)"
-                    )
-
-                    # 更新剩余仓位
-                    remaining_pct -= close_pct
-
-                except Exception as e:
-                    self.logger.error(f"  ❌ 创建止盈订单{i}失败: {e}")
-                    continue
+    def _collect_scale_out_results(self, plan: List[Dict], results: List[Dict]) -> Dict:
+        """把批量下单结果逐笔对应回分批止盈计划"""
+        orders_created = []
+        target_prices = []
 
-            if len(orders_created) == 0:
-                return {
-                    'success': False,
-                    'error': '未能创建任何止盈订单'
-                }
+        for target, order in zip(plan, results):
+            error = self._batch_order_error(order)
+            if error:
+                self.logger.error(f"  ❌ 创建止盈订单{target['index']}失败: {error}")
+                continue
+
+            orders_created.append(order)
+            target_prices.append(target['price'])
 
             self.logger.info(
-                f"🎯 [分批止盈] 完成！共设置{len(orders_created)}个止盈目标\n"
+                f"  ✅ 目标{target['index']}: 盈利{target['profit_pct']}%时 @ ${target['price']:.2f} "
+                f"平仓{target['close_pct']}% ({target['quantity']:.3f}个)"
             )
 
-            return {
-                'success': True,
-                'orders': orders_created,
-                'targets': target_prices,
-                'count': len(orders_created)
-            }
-
-        except Exception as e:
-            self.logger.error(f"设置分批止盈失败: {e}")
+        if len(orders_created) == 0:
             return {
                 'success': False,
-                'error': str(e)
+                'error': '未能创建任何止盈订单'
             }
 
+        self.logger.info(
+            f"🎯 [分批止盈] 完成！共设置{len(orders_created)}个止盈目标\n"
+        )
+
+        return {
+            'success': True,
+            'orders': orders_created,
+            'targets': target_prices,
+            'count': len(orders_created)
+        }
+
     # ==================== 11. 追踪止损 (V2.0新增) ====================
 
     def setup_trailing_stop(self, symbol: str, position_amt: float,
@@ -895,38 +925,13 @@ class AdvancedPositionManager:
                     'error': f'回撤率{callback_rate_pct}%超出范围（0.1-5.0%）'
                 }
 
-            # 确保position_amt为正数
-            quantity = abs(position_amt)
-
-            # 计算订单方向（止损是反向平仓）
-            close_side = 'SELL' if side == 'LONG' else 'BUY'
-
-            self.logger.info(
-                f"\n🔄 [追踪止损] 设置 {symbol}:"
-                f"\n  方向: {side} → 止损方向: {close_side}"
-                f"\n  数量: {quantity:.3f}"
-                f"\n  回撤率: {callback_rate_pct}%"
-                f"\n  激活价: {activation_price if activation_price else '立即激活'}"
-            )
+            order_params = self._trailing_stop_order(symbol, position_amt, side,
+                                                     callback_rate_pct, activation_price)
 
             # 创建追踪止损订单
-            order = self.client.create_trailing_stop_order(
-                symbol=symbol,
-                side=close_side,
-                quantity=quantity,
-                callback_rate=callback_rate_pct,
-                activation_price=activation_price,
-                reduce_only=True
-            )
+            order = self.client.create_futures_order(**order_params)
 
-            self.logger.info(f"✅ [追踪止损] 设置成功！订单ID: {order.get('orderId')}\n")
-
-            return {
-                'success': True,
-                'order': order,
-                'callback_rate': callback_rate_pct,
-                'activation_price': activation_price
-            }
+            return self._collect_trailing_stop_result(order, callback_rate_pct, activation_price)
 
         except Exception as e:
             self.logger.error(f"设置追踪止损失败: {e}")
@@ -935,6 +940,84 @@ class AdvancedPositionManager:
                 'error': str(e)
             }
 
+    def _trailing_stop_order(self, symbol: str, position_amt: float, side: str,
+                             callback_rate_pct: float,
+                             activation_price: Optional[float] = None) -> Dict:
+        """构造追踪止损订单参数（不下单）"""
+        # 确保position_amt为正数
+        quantity = abs(position_amt)
+
+        # 计算订单方向（止损是反向平仓）
+        close_side = 'SELL' if side == 'LONG' else 'BUY'
+
+        self.logger.info(
+            f"\n🔄 [追踪止损] 设置 {symbol}:"
+            f"\n  方向: {side} → 止损方向: {close_side}"
+            f"\n  数量: {quantity:.3f}"
+            f"\n  回撤率: {callback_rate_pct}%"
+            f"\n  激活价: {activation_price if activation_price else '立即激活'}"
+        )
+
+        order = {
+            'symbol': symbol,
+            'side': close_side,
+            'order_type': 'TRAILING_STOP_MARKET',
+            'quantity': quantity,
+            'position_side': self._closing_position_side(close_side),
+            'callbackRate': callback_rate_pct
+        }
+        if activation_price:
+            order['activationPrice'] = self.filters.quantize_price(symbol, activation_price)
+        return order
+
+    def _collect_trailing_stop_result(self, order: Dict, callback_rate_pct: float,
+                                      activation_price: Optional[float]) -> Dict:
+        error = self._batch_order_error(order)
+        if error:
+            self.logger.error(f"设置追踪止损失败: {error}")
+            return {'success': False, 'error': error}
+
+        self.logger.info(f"✅ [追踪止损] 设置成功！订单ID: {order.get('orderId')}\n")
+
+        return {
+            'success': True,
+            'order': order,
+            'callback_rate': callback_rate_pct,
+            'activation_price': activation_price
+        }
+
+    # ==================== 批量下单辅助 ====================
+
+    @staticmethod
+    def _closing_position_side(close_side: str) -> str:
+        """
+        平仓单对应的持仓方向（双向持仓模式，与开仓时的 LONG/SHORT 一致）
+
+        双向持仓下由 positionSide 保证只减仓，交易所不接受 reduceOnly 参数
+        """
+        return 'LONG' if close_side == 'SELL' else 'SHORT'
+
+    @classmethod
+    def _take_profit_order(cls, symbol: str, side: str, quantity: float, stop_price: float) -> Dict:
+        """构造止盈条件单参数（TAKE_PROFIT_MARKET，平 side 反方向的持仓）"""
+        return {
+            'symbol': symbol,
+            'side': side,
+            'order_type': 'TAKE_PROFIT_MARKET',
+            'quantity': quantity,
+            'position_side': cls._closing_position_side(side),
+            'stopPrice': stop_price
+        }
+
+    @staticmethod
+    def _batch_order_error(order: Dict) -> Optional[str]:
+        """批量下单的单笔结果：成功返回 None，失败返回错误信息"""
+        if isinstance(order, dict) and order.get('orderId'):
+            return None
+        if isinstance(order, dict):
+            return f"{order.get('code')} - {order.get('msg')}"
+        return str(order)
+
     # ==================== 12. 订单清理 (V2.0新增 - Critical!) ====================
 
     def cancel_all_pending_orders_for_symbol(self, symbol: str) -> Dict:
@@ -1049,25 +1132,50 @@ class AdvancedPositionManager:
             f"\n  仓位: {side} {abs(position_amt):.3f}"
         )
 
-        # 1. 设置分批止盈
+        # 1. 计算分批止盈和追踪止损挂单，合并为一次批量下单
+        orders = []
+        tp_plan = []
         if take_profit_targets:
-            tp_result = self.setup_scale_out_take_profits(
+            tp_plan = self._plan_scale_out_take_profits(
                 symbol, entry_price, position_amt, side, take_profit_targets
             )
+            orders.extend(p['order'] for p in tp_plan)
+
+        if trailing_stop_config:
+            callback_rate_pct = trailing_stop_config.get('callback_rate_pct', 1.5)
+            activation_price = trailing_stop_config.get('activation_price')
+            if 0.1 <= callback_rate_pct <= 5.0:
+                orders.append(self._trailing_stop_order(symbol, position_amt, side,
+                                                        callback_rate_pct, activation_price))
+            else:
+                result['trailing_stop_result'] = {
+                    'success': False,
+                    'error': f'回撤率{callback_rate_pct}%超出范围（0.1-5.0%）'
+                }
+
+        try:
+            batch_results = self.client.create_futures_batch_orders(orders) if orders else []
+        except Exception as e:
+            self.logger.error(f"批量提交止盈止损挂单失败: {e}")
+            batch_results = [{'code': -1, 'msg': str(e)} for _ in orders]
+
+        # 2. 按顺序拆分结果：前面是分批止盈，最后一笔是追踪止损
+        if take_profit_targets:
+            if tp_plan:
+                tp_result = self._collect_scale_out_results(tp_plan, batch_results[:len(tp_plan)])
+            else:
+                tp_result = {'success': False, 'error': '未能创建任何止盈订单'}
             result['take_profit_result'] = tp_result
             if not tp_result.get('success'):
                 self.logger.warning(f"⚠️  分批止盈设置失败")
                 result['success'] = False
 
-        # 2. 设置追踪止损
         if trailing_stop_config:
-            ts_result = self.setup_trailing_stop(
-                symbol, position_amt, side,
-                callback_rate_pct=trailing_stop_config.get('callback_rate_pct', 1.5),
-                activation_price=trailing_stop_config.get('activation_price')
-            )
-            result['trailing_stop_result'] = ts_result
-            if not ts_result.get('success'):
+            if result['trailing_stop_result'] is None:
+                result['trailing_stop_result'] = self._collect_trailing_stop_result(
+                    batch_results[len(tp_plan)], callback_rate_pct, activation_price
+                )
+            if not result['trailing_stop_result'].get('success'):
                 self.logger.warning(f"⚠️  追踪止损设置失败")
                 result['success'] = False
 
@@ -3,13 +3,15 @@ AI 驱动的交易引擎
 集成 Ollama API 进行智能交易决策
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 import time
-import math
+import numpy as np
 import pandas as pd
 import config
+import indicators_np
+import price_levels
 
 from ollama_client import OllamaClient
 from binance_client import BinanceClient
@@ -17,6 +19,7 @@ from market_analyzer import MarketAnalyzer
 from risk_manager import RiskManager
 from advanced_position_manager import AdvancedPositionManager
 from trailing_stop_manager import TrailingStopManager
+from symbol_filter_cache import SymbolFilterCache
 
 # 增强功能：运行状态和增强决策引擎
 try:
@@ -36,7 +39,9 @@ class AITradingEngine:
                  enable_enhanced_features: bool = True,
                  ollama_max_tokens: int = config.Ollama.MAX_TOKENS, ollama_temperature=config.Ollama.TEMPERATURE,
                  ollama_api_timeout: int = config.Ollama.API_TIMEOUT, ollama_api_port: int = config.Ollama.API_PORT,
-                 ollama_model_name: str = ''):
+                 ollama_model_name: str = '', symbol_filters: SymbolFilterCache = None,
+                 ollama_parallel_slots: int = config.Ollama.PARALLEL_SLOTS,
+                 ollama_stream: bool = config.Ollama.STREAM):
         """
         初始化 AI 交易引擎
 
@@ -48,9 +53,13 @@ class AITradingEngine:
             performance_tracker: 性能追踪器（用于保存交易到文件）
             roll_tracker: ROLL状态追踪器
             enable_enhanced_features: 是否启用增强功能（运行状态追踪、丰富市场数据）
+            symbol_filters: 交易对过滤器缓存（为空时自动创建）
+            ollama_parallel_slots: Ollama 服务端并行槽位数
+            ollama_stream: 流式生成，得到完整决策 JSON 后立即停止
         """
         self.ollama_client = OllamaClient(ollama_api_key, ollama_max_tokens, ollama_temperature,
-                                          ollama_api_timeout, ollama_api_port, ollama_model_name)
+                                          ollama_api_timeout, ollama_api_port, ollama_model_name,
+                                          parallel_slots=ollama_parallel_slots, stream=ollama_stream)
         self.binance = binance_client
         self.market_analyzer = market_analyzer
         self.risk_manager = risk_manager
@@ -60,8 +69,12 @@ class AITradingEngine:
         self.logger = logging.getLogger(__name__)
         self.trade_history = []
 
+        # 交易对过滤器（精度、最小下单量、杠杆分层）
+        self.symbol_filters = symbol_filters or SymbolFilterCache(binance_client)
+
         # 高级仓位管理器
-        self.adv_position_manager = AdvancedPositionManager(binance_client, market_analyzer)
+        self.adv_position_manager = AdvancedPositionManager(binance_client, market_analyzer,
+                                                            symbol_filters=self.symbol_filters)
 
         # [NEW] ATR动态追踪止损管理器
         self.trailing_stop_manager = TrailingStopManager(atr_multiplier=config.Risk.ATR_MULTIPLIER)
@@ -155,7 +168,9 @@ class AITradingEngine:
                 self.logger.info(f"[{symbol}] [AI-THINK] 推理过程: {reasoning_content[:300]}...")
 
             # 4. 执行交易并处理结果
-            trade_result = self._execute_trade(symbol, decision, max_position_pct)
+            # 并行处理时等待模型期间会释放周期锁，其他交易对可能已开平仓，按重新读取的余额和持仓下单
+            account_info = self._get_account_info()
+            trade_result = self._execute_trade(symbol, decision, max_position_pct, account_info)
             self._handle_trade_result(symbol, decision, trade_result)
 
             return {
@@ -236,19 +251,19 @@ class AITradingEngine:
             current_price = self.market_analyzer.get_current_price(symbol)
 
             # 获取 K 线数据计算技术指标（使用 MarketAnalyzer）
-            df = self.market_analyzer.get_kline_data(symbol, '1h', limit=100)
+            candles = self.market_analyzer.get_candles(symbol, '1h', limit=100)
 
             # 计算技术指标
-            rsi = self.market_analyzer.calculate_rsi(df, period=14)
-            macd_line, signal_line, histogram = self.market_analyzer.calculate_macd(df)
-            upper_band, middle_band, lower_band = self.market_analyzer.calculate_bollinger_bands(df, period=20)
+            rsi = self.market_analyzer.calculate_rsi(candles, period=14)
+            macd_line, signal_line, histogram = self.market_analyzer.calculate_macd(candles)
+            upper_band, middle_band, lower_band = self.market_analyzer.calculate_bollinger_bands(candles, period=20)
 
             # 计算移动平均线
-            sma_20 = self.market_analyzer.calculate_sma(df, 20)
-            sma_50 = self.market_analyzer.calculate_sma(df, 50)
+            sma_20 = self.market_analyzer.calculate_sma(candles, 20)
+            sma_50 = self.market_analyzer.calculate_sma(candles, 50)
 
             # 提取收盘价列表（用于其他计算）
-            closes = df['close'].tolist()
+            closes = candles.close.tolist()
 
             # 提取价格信息
             price_info = overview.get('price_info', {})
@@ -276,7 +291,7 @@ class AITradingEngine:
                 'trend': self._determine_trend(current_price, sma_20.iloc[-1] if len(sma_20) > 0 else current_price, sma_50.iloc[-1] if len(sma_50) > 0 else current_price),
                 'support_levels': self._find_support_levels(closes),
                 'resistance_levels': self._find_resistance_levels(closes),
-                'atr': self._calculate_atr(df)
+                'atr': self._calculate_atr(candles)
             }
 
         except Exception as e:
@@ -320,7 +335,8 @@ class AITradingEngine:
             self.logger.error(f"获取账户信息失败: {e}")
             raise
 
-    def _execute_trade(self, symbol: str, decision: Dict, max_position_pct: float) -> Dict:
+    def _execute_trade(self, symbol: str, decision: Dict, max_position_pct: float,
+                       account_info: Dict = None) -> Dict:
         """
         执行交易决策
 
@@ -328,6 +344,7 @@ class AITradingEngine:
             symbol: 交易对
             decision: AI 决策
             max_position_pct: 最大仓位百分比
+            account_info: 下单前读取的账户信息（余额和持仓），不传时重新获取
 
         Returns:
             交易结果
@@ -360,11 +377,31 @@ class AITradingEngine:
         take_profit_pct = decision.get('take_profit_pct',
                                        config.Risk.DEFAULT_AI_TAKE_PROFIT_PCT)  # AI未返回时最保守2%止盈
 
-        # 获取账户余额
-        balance = self.binance.get_futures_usdt_balance()
+        # 获取账户余额和持仓
+        if account_info is None:
+            account_info = self._get_account_info()
+        balance = account_info['balance']
+        positions = account_info['positions']
         # 使用Ollama Model决定的仓位大小
         trade_amount = balance * (position_size_pct / 100)
 
+        # 与现有高相关持仓的合计敞口超限时拒绝或缩减开仓
+        if action in ['BUY', 'OPEN_LONG', 'SELL', 'OPEN_SHORT']:
+            # AI 是按无持仓做的决策，该交易对此时已有持仓则不再开仓
+            if any(p['symbol'] == symbol and float(p.get('positionAmt', 0)) != 0 for p in positions):
+                reason = "该交易对已有持仓"
+                self.logger.warning(f"[RISK] [{symbol}] {reason}，跳过开仓")
+                return {'success': False, 'action': action, 'error': reason}
+            direction = 1 if action in ['BUY', 'OPEN_LONG'] else -1
+            scale, reason = self._correlated_exposure_scale(symbol, direction * trade_amount * leverage,
+                                                            balance, positions)
+            if scale <= 0:
+                self.logger.warning(f"[RISK] [{symbol}] {reason}，跳过开仓")
+                return {'success': False, 'action': action, 'error': reason}
+            if scale < 1:
+                self.logger.info(f"[RISK] [{symbol}] {reason}（保证金 {trade_amount:.2f} → {trade_amount * scale:.2f}）")
+                trade_amount *= scale
+
         try:
             # 统一处理开多动作 (BUY 或 OPEN_LONG)
             if action in ['BUY', 'OPEN_LONG']:
@@ -442,28 +479,87 @@ class AITradingEngine:
             self.logger.error(f"执行交易失败: {e}")
             return {'success': False, 'error': str(e)}
 
-    def _get_default_precision(self, symbol: str) -> tuple:
+    def _correlated_exposure_scale(self, symbol: str, notional: float, balance: float,
+                                   positions: List[Dict]) -> Tuple[float, str]:
+        """把相关性矩阵推进到最新收盘 K线，返回 RiskManager.check_correlated_exposure 的结果"""
+        correlation = self.risk_manager.correlation
+        if correlation is None:
+            return 1.0, "未启用相关性检查"
+        try:
+            frames = {s: self.market_analyzer.get_candles(s, correlation.interval, correlation.window + 1).columns
+                      for s in correlation.symbols}
+            correlation.sync(frames, now_ms=int(time.time() * 1000))
+        except Exception as e:
+            self.logger.warning(f"[WARNING] [{symbol}] 相关性检查失败，按原仓位执行: {e}")
+            return 1.0, str(e)
+        return self.risk_manager.check_correlated_exposure(symbol, notional, positions, balance)
+
+    @staticmethod
+    def _order_error(result) -> str:
+        """下单结果的错误说明，成功（有 orderId）时返回空字符串"""
+        if isinstance(result, dict) and result.get('orderId'):
+            return ''
+        if isinstance(result, dict):
+            return f"{result.get('code')} - {result.get('msg')}"
+        return str(result)
+
+    def _place_bracket(self, symbol: str, position_side: str, quantity: float,
+                       stop_loss: float, take_profit: float) -> Dict:
         """
-        获取交易对的默认精度和最小数量
-        
-        Args:
-            symbol: 交易对符号（如 BTCUSDT）
-            
+        为刚成交的仓位挂止损和止盈（一次批量提交）
+
+        止损挂单失败时单独重试一次；仍然失败则撤掉止盈并市价平掉这笔仓位，
+        不留下没有止损的杠杆仓位。止盈失败只报告，不影响仓位
+
         Returns:
-            tuple: (precision, min_qty) 精度和最小数量
+            {'protected': 仓位是否有止损, 'error': 止损失败原因, 'take_profit_error': 止盈失败原因,
+             'flattened': 是否已平仓}
         """
-        if 'BTC' in symbol:
-            return 3, 0.001  # BTC: 0.001
-        elif 'ETH' in symbol:
-            return 3, 0.001  # ETH: 0.001
-        elif 'BNB' in symbol:
-            return 1, 0.1    # BNB: 0.1
-        elif 'SOL' in symbol:
-            return 1, 0.1    # SOL: 0.1
-        elif 'DOGE' in symbol:
-            return 0, 1.0    # DOGE: 整数
-        else:
-            return 1, 0.1    # 默认: 0.1
+        close_side = 'SELL' if position_side == 'LONG' else 'BUY'
+        # 双向持仓下 positionSide 已保证只减仓，交易所不接受 reduceOnly
+        stop_order = {'symbol': symbol, 'side': close_side, 'order_type': 'STOP_MARKET',
+                      'quantity': quantity, 'position_side': position_side, 'stopPrice': stop_loss}
+        tp_order = {'symbol': symbol, 'side': close_side, 'order_type': 'TAKE_PROFIT_MARKET',
+                    'quantity': quantity, 'position_side': position_side, 'stopPrice': take_profit}
+        results = list(self.binance.create_futures_batch_orders([stop_order, tp_order]))
+        results += [{'code': -1, 'msg': '批量下单未返回结果'}] * (2 - len(results))
+        stop_result, tp_result = results[:2]
+
+        outcome = {'protected': True, 'error': '', 'take_profit_error': self._order_error(tp_result),
+                   'flattened': False}
+        if outcome['take_profit_error']:
+            self.logger.error(f"[ERROR] [{symbol}] 止盈挂单失败: {outcome['take_profit_error']}")
+
+        stop_error = self._order_error(stop_result)
+        if not stop_error:
+            return outcome
+
+        self.logger.error(f"[ERROR] [{symbol}] 止损挂单失败: {stop_error}，重试一次")
+        try:
+            stop_error = self._order_error(self.binance.create_futures_order(**stop_order))
+        except Exception as e:
+            stop_error = str(e)
+        if not stop_error:
+            self.logger.info(f"[OK] [{symbol}] 止损重试成功: {stop_loss}")
+            return outcome
+
+        # 没有止损的仓位不能保留：撤掉已挂的止盈，市价平掉刚开的仓位
+        outcome.update(protected=False, error=f'止损挂单失败: {stop_error}')
+        self.logger.error(f"[ERROR] [{symbol}] 止损重试仍失败: {stop_error}，撤单并平仓")
+        if not outcome['take_profit_error']:
+            try:
+                self.binance.cancel_futures_order(symbol, order_id=tp_result['orderId'])
+            except Exception as e:
+                self.logger.error(f"[ERROR] [{symbol}] 撤销止盈挂单失败: {e}")
+        try:
+            close = self.binance.create_futures_order(symbol=symbol, side=close_side, order_type='MARKET',
+                                                      quantity=quantity, position_side=position_side)
+            outcome['flattened'] = not self._order_error(close)
+        except Exception as e:
+            self.logger.error(f"[ERROR] [{symbol}] 平掉无止损仓位失败: {e}")
+        if not outcome['flattened']:
+            outcome['error'] += '，平仓失败，仓位没有止损保护'
+        return outcome
 
     def _open_long_position(self, symbol: str, amount: float, leverage: int,
                            stop_loss_pct: float, take_profit_pct: float) -> Dict:
@@ -473,24 +569,8 @@ class AITradingEngine:
             current_price = self.market_analyzer.get_current_price(symbol)
 
             # [CONFIG] 智能杠杆调整：同时满足币安名义价值和精度要求
-            # 从Binance API获取交易对的实际精度信息
-            try:
-                exchange_info = self.binance.get_futures_exchange_info(symbol=symbol)
-                if exchange_info and 'filters' in exchange_info:
-                    # 查找最小数量过滤器
-                    lot_size_filter = next((f for f in exchange_info['filters'] if f['filterType'] == 'LOT_SIZE'), None)
-                    if lot_size_filter:
-                        min_qty = float(lot_size_filter['minQty'])
-                        # 计算精度：小数点后的位数
-                        step_size = float(lot_size_filter['stepSize'])
-                        precision = abs(int(round(math.log10(step_size)))) if step_size != 0 else 1
-                    else:
-                        # 默认精度规则
-                        precision, min_qty = self._get_default_precision(symbol)
-            except Exception as e:
-                self.logger.warning(f"获取交易对精度信息失败，使用默认规则: {e}")
-                # 使用默认精度规则
-                precision, min_qty = self._get_default_precision(symbol)
+            # 最小下单量（LOT_SIZE + MIN_NOTIONAL）来自本地过滤器缓存，不再每次请求 exchangeInfo
+            min_qty = self.symbol_filters.min_order_quantity(symbol, current_price)
 
             # 计算满足精度要求所需的最小名义价值
             min_notional_for_precision = min_qty * current_price
@@ -506,14 +586,17 @@ class AITradingEngine:
                                f"(名义价值 ${amount*original_leverage:.2f} → ${amount*leverage:.2f}, "
                                f"精度要求: ≥{min_qty} {symbol.replace('USDT', '')})")
 
-            # 设置杠杆
-            self.binance.set_leverage(symbol, leverage)
+            # 杠杆不能超过该名义价值所在分层的上限
+            bracket_leverage = self.symbol_filters.max_leverage(symbol, amount * leverage)
+            if bracket_leverage and leverage > bracket_leverage:
+                self.logger.info(f"[IDEA] [{symbol}] 杠杆分层限制: {leverage}x → {bracket_leverage}x")
+                leverage = bracket_leverage
 
             # 计算数量并按交易对调整精度
             raw_quantity = (amount * leverage) / current_price
 
-            # 使用动态获取的精度调整仓位大小
-            quantity = round(raw_quantity, precision)
+            # 按交易对数量步长向下取整
+            quantity = self.symbol_filters.quantize_quantity(symbol, raw_quantity)
 
             # 确保不为0（小账户可能出现）
             if quantity == 0:
@@ -525,9 +608,18 @@ class AITradingEngine:
                 self.logger.info(f"{symbol} 计算数量 {quantity:.6f} 小于最小数量要求 {min_qty:.6f}，调整至最小数量")
                 quantity = min_qty
 
-            # 计算止损止盈价格（四舍五入到2位小数，USDT精度要求）
-            stop_loss = round(current_price * (1 - stop_loss_pct), 2)
-            take_profit = round(current_price * (1 + take_profit_pct), 2)
+            # 下单前按交易所过滤器校验，必然被拒绝的订单不再发出
+            valid, reason = self.symbol_filters.validate_order(symbol, quantity, current_price, leverage)
+            if not valid:
+                self.logger.warning(f"[WARNING] [{symbol}] 订单未通过交易所过滤器校验: {reason}")
+                return {'success': False, 'error': f'订单校验失败: {reason}'}
+
+            # 设置杠杆
+            self.binance.set_leverage(symbol, leverage)
+
+            # 计算止损止盈价格（按交易对价格步长取整）
+            stop_loss = self.symbol_filters.quantize_price(symbol, current_price * (1 - stop_loss_pct))
+            take_profit = self.symbol_filters.quantize_price(symbol, current_price * (1 + take_profit_pct))
 
             # 开多单
             order = self.binance.create_futures_order(
@@ -538,25 +630,11 @@ class AITradingEngine:
                 position_side='LONG'
             )
 
-            # 设置止损（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='SELL',
-                order_type='STOP_MARKET',
-                quantity=quantity,
-                position_side='LONG',
-                stopPrice=stop_loss
-            )
-
-            # 设置止盈（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='SELL',
-                order_type='TAKE_PROFIT_MARKET',
-                quantity=quantity,
-                position_side='LONG',
-                stopPrice=take_profit
-            )
+            # 止损和止盈一次批量提交；止损挂不上时已平仓，返回失败
+            bracket = self._place_bracket(symbol, 'LONG', quantity, stop_loss, take_profit)
+            if not bracket['protected']:
+                return {'success': False, 'action': 'OPEN_LONG', 'symbol': symbol, 'quantity': quantity,
+                        'error': bracket['error'], 'flattened': bracket['flattened'], 'order': order}
 
             self.logger.info(f"[OK] 开多单成功: {symbol}, 数量: {quantity}, 杠杆: {leverage}x, 止损: {stop_loss}, 止盈: {take_profit}")
 
@@ -569,6 +647,7 @@ class AITradingEngine:
                 'entry_price': current_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
+                'take_profit_error': bracket['take_profit_error'],
                 'order': order
             }
 
@@ -584,24 +663,8 @@ class AITradingEngine:
             current_price = self.market_analyzer.get_current_price(symbol)
 
             # [CONFIG] 智能杠杆调整：同时满足币安名义价值和精度要求
-            # 从Binance API获取交易对的实际精度信息
-            try:
-                exchange_info = self.binance.get_futures_exchange_info(symbol=symbol)
-                if exchange_info and 'filters' in exchange_info:
-                    # 查找最小数量过滤器
-                    lot_size_filter = next((f for f in exchange_info['filters'] if f['filterType'] == 'LOT_SIZE'), None)
-                    if lot_size_filter:
-                        min_qty = float(lot_size_filter['minQty'])
-                        # 计算精度：小数点后的位数
-                        step_size = float(lot_size_filter['stepSize'])
-                        precision = abs(int(round(math.log10(step_size)))) if step_size != 0 else 1
-                    else:
-                        # 默认精度规则
-                        precision, min_qty = self._get_default_precision(symbol)
-            except Exception as e:
-                self.logger.warning(f"获取交易对精度信息失败，使用默认规则: {e}")
-                # 使用默认精度规则
-                precision, min_qty = self._get_default_precision(symbol)
+            # 最小下单量（LOT_SIZE + MIN_NOTIONAL）来自本地过滤器缓存，不再每次请求 exchangeInfo
+            min_qty = self.symbol_filters.min_order_quantity(symbol, current_price)
 
             # 计算满足精度要求所需的最小名义价值
             min_notional_for_precision = min_qty * current_price
@@ -617,14 +680,17 @@ class AITradingEngine:
                                f"(名义价值 ${amount*original_leverage:.2f} → ${amount*leverage:.2f}, "
                                f"精度要求: ≥{min_qty} {symbol.replace('USDT', '')})")
 
-            # 设置杠杆
-            self.binance.set_leverage(symbol, leverage)
+            # 杠杆不能超过该名义价值所在分层的上限
+            bracket_leverage = self.symbol_filters.max_leverage(symbol, amount * leverage)
+            if bracket_leverage and leverage > bracket_leverage:
+                self.logger.info(f"[IDEA] [{symbol}] 杠杆分层限制: {leverage}x → {bracket_leverage}x")
+                leverage = bracket_leverage
 
             # 计算数量并按交易对调整精度
             raw_quantity = (amount * leverage) / current_price
 
-            # 使用动态获取的精度调整仓位大小
-            quantity = round(raw_quantity, precision)
+            # 按交易对数量步长向下取整
+            quantity = self.symbol_filters.quantize_quantity(symbol, raw_quantity)
 
             # 确保不为0（小账户可能出现）
             if quantity == 0:
@@ -636,9 +702,18 @@ class AITradingEngine:
                 self.logger.info(f"{symbol} 计算数量 {quantity:.6f} 小于最小数量要求 {min_qty:.6f}，调整至最小数量")
                 quantity = min_qty
 
-            # 计算止损止盈价格（四舍五入到2位小数，USDT精度要求）
-            stop_loss = round(current_price * (1 + stop_loss_pct), 2)
-            take_profit = round(current_price * (1 - take_profit_pct), 2)
+            # 下单前按交易所过滤器校验，必然被拒绝的订单不再发出
+            valid, reason = self.symbol_filters.validate_order(symbol, quantity, current_price, leverage)
+            if not valid:
+                self.logger.warning(f"[WARNING] [{symbol}] 订单未通过交易所过滤器校验: {reason}")
+                return {'success': False, 'error': f'订单校验失败: {reason}'}
+
+            # 设置杠杆
+            self.binance.set_leverage(symbol, leverage)
+
+            # 计算止损止盈价格（按交易对价格步长取整）
+            stop_loss = self.symbol_filters.quantize_price(symbol, current_price * (1 + stop_loss_pct))
+            take_profit = self.symbol_filters.quantize_price(symbol, current_price * (1 - take_profit_pct))
 
             # 开空单
             order = self.binance.create_futures_order(
@@ -649,25 +724,11 @@ class AITradingEngine:
                 position_side='SHORT'
             )
 
-            # 设置止损（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='BUY',
-                order_type='STOP_MARKET',
-                quantity=quantity,
-                position_side='SHORT',
-                stopPrice=stop_loss
-            )
-
-            # 设置止盈（positionSide已足够，无需reduce_only）
-            self.binance.create_futures_order(
-                symbol=symbol,
-                side='BUY',
-                order_type='TAKE_PROFIT_MARKET',
-                quantity=quantity,
-                position_side='SHORT',
-                stopPrice=take_profit
-            )
+            # 止损和止盈一次批量提交；止损挂不上时已平仓，返回失败
+            bracket = self._place_bracket(symbol, 'SHORT', quantity, stop_loss, take_profit)
+            if not bracket['protected']:
+                return {'success': False, 'action': 'OPEN_SHORT', 'symbol': symbol, 'quantity': quantity,
+                        'error': bracket['error'], 'flattened': bracket['flattened'], 'order': order}
 
             self.logger.info(f"[OK] 开空单成功: {symbol}, 数量: {quantity}, 杠杆: {leverage}x, 止损: {stop_loss}, 止盈: {take_profit}")
 
@@ -680,6 +741,7 @@ class AITradingEngine:
                 'entry_price': current_price,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
+                'take_profit_error': bracket['take_profit_error'],
                 'order': order
             }
 
@@ -736,21 +798,24 @@ class AITradingEngine:
         else:
             return "震荡"
 
+    @staticmethod
+    def _window_extremes(closes: List[float], sliding, before: int = 10) -> List[float]:
+        """等于 closes[i-before:i+before] 窗口极值的收盘价（滑动窗口极值，O(n)）"""
+        closes = np.asarray(closes, dtype=float)
+        n = len(closes)
+        if n <= 2 * before:
+            return []
+        candidates = closes[before:n - before]
+        extremes = sliding(closes, 2 * before)[:n - 2 * before]
+        return candidates[candidates == extremes].tolist()
+
     def _find_support_levels(self, closes: List[float]) -> List[float]:
         """寻找支撑位"""
-        recent_lows = []
-        for i in range(10, len(closes) - 10):
-            if closes[i] == min(closes[i-10:i+10]):
-                recent_lows.append(closes[i])
-        return sorted(recent_lows)[-3:] if recent_lows else []
+        return sorted(self._window_extremes(closes, price_levels.sliding_min))[-3:]
 
     def _find_resistance_levels(self, closes: List[float]) -> List[float]:
         """寻找阻力位"""
-        recent_highs = []
-        for i in range(10, len(closes) - 10):
-            if closes[i] == max(closes[i-10:i+10]):
-                recent_highs.append(closes[i])
-        return sorted(recent_highs)[-3:] if recent_highs else []
+        return sorted(self._window_extremes(closes, price_levels.sliding_max))[-3:]
 
     def _check_win_rate(self, symbol: str):
         """
@@ -796,18 +861,14 @@ class AITradingEngine:
 
         return wins / len(recent_trades)
 
-    def _calculate_atr(self, df) -> float:
-        """计算 ATR（接受 DataFrame）"""
+    def _calculate_atr(self, df, period: int = 14) -> float:
+        """计算 ATR（接受 DataFrame 或 Candles，取最近 period 根K线的真实波幅均值）"""
         try:
-            import pandas as pd
-            tr_list = []
-            for i in range(1, min(15, len(df))):
-                high = df['high'].iloc[i]
-                low = df['low'].iloc[i]
-                prev_close = df['close'].iloc[i-1]
-                tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-                tr_list.append(tr)
-            return round(sum(tr_list) / len(tr_list), 2) if tr_list else 0
+            if len(df) < 2:
+                return 0
+            tr = indicators_np.true_range(np.asarray(df['high'], dtype=float), np.asarray(df['low'], dtype=float),
+                                          np.asarray(df['close'], dtype=float))[1:]
+            return round(float(tr[-period:].mean()), 2)
         except Exception:
             return 0
 
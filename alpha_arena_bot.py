@@ -11,12 +11,22 @@ import logging
 from datetime import datetime
 from typing import List, Dict
 import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入模块
 import config
 from binance_client import BinanceClient
 from market_analyzer import MarketAnalyzer
+from market_snapshot import CycleMarketSnapshot
+from market_data_stream import MarketDataStream
+from kline_history import KlineHistory
+from account_mirror import AccountMirror
+from symbol_filter_cache import SymbolFilterCache
+from simulated_exchange import SimulatedExchange
+from api_metrics import api_caller, set_default_caller, registry as api_metrics
 from risk_manager import RiskManager
+from correlation_matrix import RollingCorrelation
 from ai_trading_engine import AITradingEngine
 from performance_tracker import PerformanceTracker
 from pro_log_formatter import ProTradingFormatter
@@ -42,6 +52,9 @@ class AlphaArenaBot:
         # 运行标志
         self.running = True
 
+        # 并行处理交易对时，除等待模型生成外的处理由该锁串行
+        self._cycle_lock = threading.Lock()
+
         # 账户信息显示时间控制
         self.last_account_display_time = 0
         self.account_display_interval = config.Trading.ACCOUNT_DISPLAY_INTERVAL_SECONDS
@@ -103,6 +116,8 @@ class AlphaArenaBot:
         self.ollama_api_timeout = config.Ollama.API_TIMEOUT
         self.ollama_api_port = config.Ollama.API_PORT
         self.ollama_model_name = config.Ollama.MODEL_NAME
+        self.ollama_parallel_slots = config.Ollama.PARALLEL_SLOTS
+        self.ollama_stream = config.Ollama.STREAM
 
         # 交易配置
         self.initial_capital = config.Trading.INITIAL_CAPITAL
@@ -117,14 +132,22 @@ class AlphaArenaBot:
 
     def _init_components(self):
         """初始化所有组件"""
-        # Binance 客户端
-        self.binance = BinanceClient(
-            api_key=self.binance_api_key,
-            api_secret=self.binance_api_secret,
-            testnet=self.testnet,
-            using_v2ray=self.using_v2ray,
-            v2ray_port=self.v2ray_port
-        )
+        # 未显式标记调用方的 Binance 请求都记到主循环名下
+        set_default_caller('bot')
+
+        # Binance 客户端（模拟模式下使用本地模拟交易所，接口完全相同）
+        self.simulated = config.Simulation.ENABLED
+        if self.simulated:
+            self.binance = SimulatedExchange.from_config(self.trading_symbols, config.Simulation)
+            self.logger.info(f"[SIM] 使用本地模拟交易所（{config.Simulation.SPEED:g}倍速）")
+        else:
+            self.binance = BinanceClient(
+                api_key=self.binance_api_key,
+                api_secret=self.binance_api_secret,
+                testnet=self.testnet,
+                using_v2ray=self.using_v2ray,
+                v2ray_port=self.v2ray_port
+            )
 
         # [NEW] 从Binance API获取实际账户余额，替代配置文件中的初始资金
         try:
@@ -137,8 +160,53 @@ class AlphaArenaBot:
             # 回退到配置文件值
             pass
 
+        # WebSocket 行情数据流（K线/标记价格/24h行情常驻内存，不可用时分析器自动回退到 REST）
+        self.market_stream = None
+        if config.MarketStream.ENABLED and not self.simulated:
+            self.market_stream = MarketDataStream(
+                symbols=self.trading_symbols,
+                intervals=config.MarketStream.INTERVALS,
+                client=self.binance,
+                testnet=self.testnet,
+                proxy=f"http://127.0.0.1:{self.v2ray_port}" if int(self.using_v2ray) == 1 else None,
+                kline_buffer=config.MarketStream.KLINE_BUFFER,
+                depth=config.MarketStream.DEPTH_ENABLED
+            )
+            self.market_stream.start()
+            if self.market_stream.wait_ready(config.MarketStream.READY_TIMEOUT_SECONDS):
+                self.logger.info("[OK] 行情数据流已就绪")
+            else:
+                self.logger.warning("[WARNING] 行情数据流未就绪，暂时使用 REST 行情")
+
+        # 用户数据流账户镜像（持仓/余额/挂单常驻内存，未就绪时客户端自动回退到 REST）
+        self.account_mirror = None
+        if config.AccountMirror.ENABLED and not self.simulated:
+            try:
+                self.account_mirror = AccountMirror(
+                    self.binance,
+                    testnet=self.testnet,
+                    proxy=f"http://127.0.0.1:{self.v2ray_port}" if int(self.using_v2ray) == 1 else None,
+                    reconcile_seconds=config.AccountMirror.RECONCILE_SECONDS,
+                    mark_price_source=self.market_stream.get_mark_price if self.market_stream else None
+                )
+                self.account_mirror.start()
+                self.logger.info("[OK] 账户镜像已启动")
+            except Exception as e:
+                self.account_mirror = None
+                self.logger.warning(f"[WARNING] 账户镜像启动失败，使用 REST 查询账户: {e}")
+
+        # K线历史落盘存储（重启时从磁盘恢复 K线窗口，只补拉停机期间的部分）
+        self.kline_history = None
+        if config.KlineHistory.ENABLED and not self.simulated:
+            self.kline_history = KlineHistory(config.KlineHistory.DIRECTORY)
+
         # 市场分析器
-        self.market_analyzer = MarketAnalyzer(self.binance)
+        self.market_analyzer = MarketAnalyzer(self.binance, market_stream=self.market_stream,
+                                              kline_history=self.kline_history)
+
+        # 交易对过滤器缓存（精度、最小下单量、杠杆分层，落盘缓存24小时）
+        self.symbol_filters = SymbolFilterCache(
+            self.binance, cache_file='symbol_filters_sim.json' if self.simulated else 'symbol_filters.json')
 
         # 风险管理器
         risk_config = {
@@ -152,7 +220,10 @@ class AlphaArenaBot:
             'max_open_positions': config.Risk.MAX_POSITIONS,
             'max_daily_trades': config.Risk.MAX_DAILY_TRADES
         }
-        self.risk_manager = RiskManager(risk_config)
+        # 交易对收益率滚动相关性（开仓前限制高相关持仓的合计敞口）
+        correlation = RollingCorrelation(self.trading_symbols, interval=config.Risk.CORRELATION_INTERVAL,
+                                         window=config.Risk.CORRELATION_WINDOW)
+        self.risk_manager = RiskManager(risk_config, correlation=correlation)
 
         # 性能追踪器（使用实际余额） - 必须在AI引擎之前初始化
         self.performance = PerformanceTracker(
@@ -184,13 +255,17 @@ class AlphaArenaBot:
             ollama_temperature=self.ollama_temperature,
             ollama_api_timeout=self.ollama_api_timeout,
             ollama_api_port=self.ollama_api_port,
-            ollama_model_name=self.ollama_model_name
+            ollama_model_name=self.ollama_model_name,
+            symbol_filters=self.symbol_filters,
+            ollama_parallel_slots=self.ollama_parallel_slots,
+            ollama_stream=self.ollama_stream
         )
 
         # [NEW V2.0] 高级仓位管理器
         self.position_manager = AdvancedPositionManager(
             binance_client=self.binance,
-            market_analyzer=self.market_analyzer
+            market_analyzer=self.market_analyzer,
+            symbol_filters=self.symbol_filters
         )
 
     def _signal_handler(self, signum, frame):
@@ -218,20 +293,23 @@ class AlphaArenaBot:
                 self.logger.info(f"[TIME] 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 self.logger.info(f"{'='*60}")
 
+                # 0. 汇总上一轮各组件的 API 调用
+                self._log_api_cycle(api_metrics.start_cycle())
+
                 # 1. 更新账户状态
                 self._update_account_status()
 
-                # 2. 对每个交易对进行分析和交易
-                for symbol in self.trading_symbols:
-                    self._process_symbol(symbol)
+                # 2. 本轮行情快照（优先读数据流，缺失时全市场24h行情和溢价指数各一次请求）
+                snapshot = self._take_market_snapshot()
+                self.market_analyzer.set_cycle_snapshot(snapshot)
 
-                    # 短暂延迟避免 API 限流
-                    time.sleep(2)
+                # 3. 对每个交易对进行分析和交易
+                self._process_symbols(snapshot)
 
-                # 3. 显示性能摘要 (已禁用 - 用户要求去掉)
+                # 4. 显示性能摘要 (已禁用 - 用户要求去掉)
                 # self._display_performance()
 
-                # 4. 等待下一轮
+                # 5. 等待下一轮
                 self.logger.info(f"\n[WAIT] 等待 {self.trading_interval} 秒后开始下一轮...")
                 time.sleep(self.trading_interval)
 
@@ -246,21 +324,39 @@ class AlphaArenaBot:
 
         self._shutdown()
 
+    def _take_market_snapshot(self) -> CycleMarketSnapshot:
+        """本轮循环的行情快照：数据流覆盖全部交易对时不发请求，否则批量拉取全市场数据"""
+        tickers = self.market_stream.get_tickers(self.trading_symbols) if self.market_stream else {}
+        if len(tickers) == len(self.trading_symbols):
+            return CycleMarketSnapshot(tickers=tickers)
+        try:
+            snapshot = CycleMarketSnapshot.fetch(self.binance)
+        except Exception as e:
+            self.logger.warning(f"获取全市场行情快照失败，各交易对单独请求: {e}")
+            snapshot = CycleMarketSnapshot()
+        # 数据流中已有的交易对比快照更新
+        snapshot.tickers.update(tickers)
+        return snapshot
+
+    def _log_api_cycle(self, cycle: Dict):
+        """输出上一轮循环按调用方统计的 Binance 调用次数和权重"""
+        if not cycle['calls']:
+            return
+        by_caller = ', '.join(
+            f"{caller}: {stats['calls']}次/权重{stats['weight']}"
+            for caller, stats in sorted(cycle['callers'].items(), key=lambda kv: -kv[1]['weight'])
+        )
+        self.logger.info(f"[API] 上一轮 {cycle['calls']} 次调用，权重 {cycle['weight']}，"
+                         f"耗时 {cycle['duration_s']:.1f}s | {by_caller}")
+
     def _update_account_status(self):
         """更新账户状态"""
         try:
-            # 测量API延迟
-            import time as time_module
-            start_time = time_module.time()
-
-            # 获取余额
-            balance = self.binance.get_futures_usdt_balance()
-
-            # 获取持仓
-            positions = self.binance.get_active_positions()
-
-            # 计算API延迟
-            api_latency_ms = int((time_module.time() - start_time) * 1000)
+            # 并发获取余额和持仓（接口延迟由 api_metrics 按接口统计）
+            balance, positions = self.binance.gather(
+                self.binance.async_client.get_futures_usdt_balance(),
+                self.binance.async_client.get_active_positions()
+            )
 
             # 计算总价值
             unrealized_pnl = sum(float(pos.get('unRealizedProfit', 0)) for pos in positions)
@@ -343,12 +439,33 @@ class AlphaArenaBot:
         except Exception as e:
             self.logger.error(f"更新账户状态失败: {e}")
 
-    def _process_symbol(self, symbol: str):
+    def _process_symbols(self, snapshot: CycleMarketSnapshot):
+        """
+        处理本轮全部交易对
+
+        模型服务有多个并行槽位时每个交易对一个线程：取数、下单、记录仍由 _cycle_lock 串行，
+        只在等待模型生成时让出锁，各交易对的推理互相重叠（调度器让持仓评估先于开仓分析）
+        """
+        scheduler = self.ai_engine.ollama_client.scheduler
+        if scheduler.max_concurrency <= 1 or len(self.trading_symbols) <= 1:
+            for symbol in self.trading_symbols:
+                self._process_symbol(symbol, ticker=snapshot.ticker(symbol))
+            return
+
+        def run(symbol):
+            with self._cycle_lock, scheduler.yielding(self._cycle_lock):
+                self._process_symbol(symbol, ticker=snapshot.ticker(symbol))
+
+        with ThreadPoolExecutor(max_workers=len(self.trading_symbols), thread_name_prefix='symbol') as pool:
+            list(pool.map(run, self.trading_symbols))
+
+    def _process_symbol(self, symbol: str, ticker: Dict = None):
         """
         处理单个交易对
 
         Args:
             symbol: 交易对
+            ticker: 本轮预取的24h行情（为空时单独请求）
         """
         try:
             # 获取实时市场数据
@@ -357,7 +474,8 @@ class AlphaArenaBot:
 
             # 获取当前价格和24h数据
             try:
-                ticker = self.binance.get_24h_ticker(symbol=symbol)
+                if ticker is None:
+                    ticker = self.binance.get_24h_ticker(symbol=symbol)
                 current_price = float(ticker.get('lastPrice', 0))
                 price_change_24h = float(ticker.get('priceChangePercent', 0))
                 volume_24h = float(ticker.get('volume', 0))
@@ -398,11 +516,12 @@ class AlphaArenaBot:
                 # [NEW] 获取运行统计并传递给AI引擎
                 runtime_stats = self.get_runtime_stats()
 
-                result = self.ai_engine.analyze_position_for_closing(
-                    symbol=symbol,
-                    position=existing_position,
-                    runtime_stats=runtime_stats
-                )
+                with api_caller('engine'):
+                    result = self.ai_engine.analyze_position_for_closing(
+                        symbol=symbol,
+                        position=existing_position,
+                        runtime_stats=runtime_stats
+                    )
 
                 # [NEW] 递增AI调用计数
                 self.total_invocations += 1
@@ -414,6 +533,15 @@ class AlphaArenaBot:
                     # 保存AI的持仓评估决策
                     self._save_ai_decision(symbol, ai_decision, result)
 
+                    # 并行处理时等待模型期间会释放周期锁，平仓或滚仓前重新读取该持仓
+                    if action != 'HOLD':
+                        existing_position = next(
+                            (pos for pos in self.binance.get_active_positions()
+                             if pos['symbol'] == symbol and float(pos.get('positionAmt', 0)) != 0), None)
+                        if existing_position is None:
+                            self.logger.info(f"  [INFO] {symbol} 持仓已不存在（可能已触发止损/止盈），跳过 {action}")
+                            return
+
                     # [OK] 完全信任AI决策，不设置信心阈值
                     if action in ['CLOSE', 'CLOSE_LONG', 'CLOSE_SHORT']:
                         self.logger.info(f"  ✂️  AI决定平仓 {symbol}")
@@ -483,11 +611,12 @@ class AlphaArenaBot:
             # [NEW] 获取运行统计并传递给AI引擎
             runtime_stats = self.get_runtime_stats()
 
-            result = self.ai_engine.analyze_and_trade(
-                symbol=symbol,
-                max_position_pct=self.max_position_pct,
-                runtime_stats=runtime_stats
-            )
+            with api_caller('engine'):
+                result = self.ai_engine.analyze_and_trade(
+                    symbol=symbol,
+                    max_position_pct=self.max_position_pct,
+                    runtime_stats=runtime_stats
+                )
 
             # [NEW] 递增AI调用计数
             self.total_invocations += 1
@@ -549,10 +678,7 @@ class AlphaArenaBot:
                 positions = []
 
             # 获取交易时段信息
-            from ollama_client import OllamaClient
-            temp_client = OllamaClient(self.ollama_api_key, self.ollama_max_tokens, self.ollama_temperature,
-                                       self.ollama_api_timeout, self.ollama_api_port, self.ollama_model_name)
-            session_info = temp_client.get_trading_session()
+            session_info = self.ai_engine.ollama_client.get_trading_session()
 
             # 构建增强的决策记录
             decision_record = {
@@ -723,31 +849,26 @@ class AlphaArenaBot:
             # 获取当前价格
             current_price = self.market_analyzer.get_current_price(symbol)
 
-            # 获取交易对的实际精度信息
-            min_qty = 0.001  # 默认值
-            precision = 3    # 默认精度
-            try:
-                exchange_info = self.binance.get_futures_exchange_info(symbol=symbol)
-                if exchange_info and 'filters' in exchange_info:
-                    lot_size_filter = next((f for f in exchange_info['filters'] if f['filterType'] == 'LOT_SIZE'), None)
-                    if lot_size_filter:
-                        min_qty = float(lot_size_filter['minQty'])
-                        step_size = float(lot_size_filter['stepSize'])
-                        precision = abs(int(round(math.log10(step_size)))) if step_size != 0 else 1
-            except Exception as e:
-                self.logger.warning(f"  [WARNING] 获取交易对精度信息失败，使用默认值: {e}")
+            # 交易对最小下单量（LOT_SIZE + MIN_NOTIONAL，来自本地过滤器缓存）
+            min_qty = self.symbol_filters.min_order_quantity(symbol, current_price)
 
             # 计算开仓数量（考虑杠杆）
             position_quantity = (reinvest_amount * new_leverage) / current_price
 
-            # 使用动态获取的精度调整仓位大小
-            position_quantity = round(position_quantity, precision)
+            # 按交易对数量步长向下取整
+            position_quantity = self.symbol_filters.quantize_quantity(symbol, position_quantity)
 
             # 币安最小开仓量检查
             if position_quantity < min_qty:
                 self.logger.warning(f"  [WARNING] 开仓数量{position_quantity:.6f}小于最小量{min_qty}，调整至最小量")
                 position_quantity = min_qty
 
+            # 下单前按交易所过滤器校验，必然被拒绝的订单不再发出
+            valid, reason = self.symbol_filters.validate_order(symbol, position_quantity, current_price, new_leverage)
+            if not valid:
+                self.logger.warning(f"  [WARNING] 滚仓订单未通过交易所过滤器校验: {reason}")
+                return {'success': False, 'reason': f'订单校验失败: {reason}'}
+
             self.logger.info(f"  [STEP 3] 用浮盈开新仓位（原仓位保持）...")
             self.logger.info(f"  [DATA] 新仓杠杆: {new_leverage}x")
             self.logger.info(f"  [DATA] 新仓数量: {position_quantity:.6f}")
@@ -793,12 +914,13 @@ class AlphaArenaBot:
                 self.logger.info(f"  [STEP 4] 自动移动止损保护利润...")
                 original_entry = self.roll_tracker.get_original_entry_price(symbol)
                 if original_entry:
-                    move_result = self.position_manager.move_stop_to_breakeven(
-                        symbol=symbol,
-                        entry_price=original_entry,
-                        profit_trigger_pct=0.0,  # 立即执行，不检查盈利触发
-                        breakeven_offset_pct=0.2  # 成本价+0.2%（含手续费）
-                    )
+                    with api_caller('position_manager'):
+                        move_result = self.position_manager.move_stop_to_breakeven(
+                            symbol=symbol,
+                            entry_price=original_entry,
+                            profit_trigger_pct=0.0,  # 立即执行，不检查盈利触发
+                            breakeven_offset_pct=0.2  # 成本价+0.2%（含手续费）
+                        )
                     if move_result.get('success'):
                         self.logger.info(f"  ✅ [STOP] 止损已移至盈亏平衡点: ${move_result.get('new_stop_price'):.2f}")
                     else:
@@ -855,6 +977,12 @@ class AlphaArenaBot:
             # 保存数据
             self.logger.info("💾 保存数据...")
 
+            # 关闭行情数据流和账户镜像
+            if self.market_stream:
+                self.market_stream.stop()
+            if self.account_mirror:
+                self.account_mirror.stop()
+
             self.logger.info("[OK] 关闭完成")
 
         except Exception as e:
@@ -0,0 +1,212 @@
+"""
+Binance 接口调用指标
+按接口名记录 HDR 风格的延迟直方图、错误次数和请求权重，并按调用方（机器人主循环、AI引擎、
+仓位管理器、仪表盘）统计每轮循环的调用次数。进程内注册表供日志和 /metrics 接口读取，
+用来定位哪个组件在消耗 API 权重预算、循环时间花在哪里
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+# 当前调用方标签：在调用线程中设置，随 run_coroutine_threadsafe 复制到后台事件循环的任务里
+_current_caller: ContextVar[Optional[str]] = ContextVar('api_caller', default=None)
+_default_caller = 'unknown'
+
+
+def set_default_caller(name: str):
+    """设置本进程未显式标记时的调用方（例如 'bot'、'dashboard'）"""
+    global _default_caller
+    _default_caller = name
+
+
+def current_caller() -> str:
+    return _current_caller.get() or _default_caller
+
+
+@contextmanager
+def api_caller(name: str):
+    """在 with 块内发出的 Binance 请求都记到 name 名下"""
+    token = _current_caller.set(name)
+    try:
+        yield
+    finally:
+        _current_caller.reset(token)
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的对数-线性直方图（微秒精度，相对误差约 1.6%）
+
+    小于 128us 的值每微秒一个桶；更大的值按二进制数量级分段，每段 64 个线性子桶，
+    桶数只随数量级增长，记录和分位数查询都与样本数量无关
+    """
+
+    SUB_BUCKET_BITS = 6
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS      # 每个数量级的子桶数
+    LINEAR_LIMIT = SUB_BUCKETS * 2          # 低于此值（微秒）逐个计数
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, value_us: int) -> int:
+        if value_us < cls.LINEAR_LIMIT:
+            return value_us
+        shift = value_us.bit_length() - cls.SUB_BUCKET_BITS - 1
+        return cls.LINEAR_LIMIT + (shift - 1) * cls.SUB_BUCKETS + ((value_us >> shift) - cls.SUB_BUCKETS)
+
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """桶的中点值（微秒）"""
+        if index < cls.LINEAR_LIMIT:
+            return float(index)
+        shift = (index - cls.LINEAR_LIMIT) // cls.SUB_BUCKETS + 1
+        sub = (index - cls.LINEAR_LIMIT) % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return ((sub << shift) + (1 << shift) / 2)
+
+    def record(self, latency_ms: float):
+        value_us = max(0, int(latency_ms * 1000))
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile(self, pct: float) -> float:
+        """分位数（毫秒）"""
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(round(self.count * pct / 100)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            'min_ms': round((self.min_us or 0) / 1000, 3),
+            'p50_ms': round(self.percentile(50), 3),
+            'p90_ms': round(self.percentile(90), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max_us / 1000, 3),
+        }
+
+
+class ApiMetrics:
+    """进程内的接口调用指标注册表（后台事件循环写入，其他线程读取）"""
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+        self._callers: Dict[str, Dict[str, int]] = {}
+        self._cycle: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._cycle_started = time.time()
+        self.last_cycle: Optional[Dict] = None
+
+    def record(self, endpoint: str, latency_ms: float, weight: int = 0,
+               error: bool = False, caller: str = None):
+        """记录一次上游请求"""
+        caller = caller or current_caller()
+        with self._lock:
+            self._latency.setdefault(endpoint, LatencyHistogram()).record(latency_ms)
+            stats = self._endpoints.setdefault(endpoint, {'calls': 0, 'errors': 0, 'weight': 0})
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['weight'] += weight
+
+            totals = self._callers.setdefault(caller, {'calls': 0, 'errors': 0, 'weight': 0})
+            totals['calls'] += 1
+            totals['errors'] += int(error)
+            totals['weight'] += weight
+
+            cycle = self._cycle.setdefault(caller, {}).setdefault(endpoint, {'calls': 0, 'weight': 0})
+            cycle['calls'] += 1
+            cycle['weight'] += weight
+
+    def start_cycle(self) -> Dict:
+        """结束当前统计周期并开始新周期，返回刚结束周期按调用方汇总的调用次数和权重"""
+        with self._lock:
+            now = time.time()
+            callers = {
+                caller: {
+                    'calls': sum(e['calls'] for e in endpoints.values()),
+                    'weight': sum(e['weight'] for e in endpoints.values()),
+                    'endpoints': {name: dict(e) for name, e in endpoints.items()},
+                }
+                for caller, endpoints in self._cycle.items()
+            }
+            self.last_cycle = {
+                'duration_s': round(now - self._cycle_started, 3),
+                'calls': sum(c['calls'] for c in callers.values()),
+                'weight': sum(c['weight'] for c in callers.values()),
+                'callers': callers,
+            }
+            self._cycle = {}
+            self._cycle_started = now
+            return self.last_cycle
+
+    def snapshot(self) -> Dict:
+        """累计指标：按接口的延迟分布/错误/权重，按调用方的总量，以及上一轮循环的明细"""
+        with self._lock:
+            endpoints = {
+                name: dict(stats, latency=self._latency[name].summary())
+                for name, stats in self._endpoints.items()
+            }
+            return {
+                'endpoints': endpoints,
+                'callers': {name: dict(stats) for name, stats in self._callers.items()},
+                'last_cycle': self.last_cycle,
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines: List[str] = [
+            '# HELP binance_api_latency_ms Upstream Binance request latency in milliseconds.',
+            '# TYPE binance_api_latency_ms summary',
+        ]
+        with self._lock:
+            for name in sorted(self._latency):
+                hist = self._latency[name]
+                for q in self.QUANTILES:
+                    lines.append(f'binance_api_latency_ms{{endpoint="{name}",quantile="{q}"}} '
+                                 f'{hist.percentile(q * 100):.3f}')
+                lines.append(f'binance_api_latency_ms_sum{{endpoint="{name}"}} {hist.total_us / 1000:.3f}')
+                lines.append(f'binance_api_latency_ms_count{{endpoint="{name}"}} {hist.count}')
+
+            for metric, field, help_text in (
+                    ('binance_api_errors_total', 'errors', 'Failed Binance requests.'),
+                    ('binance_api_weight_total', 'weight', 'Request weight spent.')):
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} counter')
+                for name in sorted(self._endpoints):
+                    lines.append(f'{metric}{{endpoint="{name}"}} {self._endpoints[name][field]}')
+
+            lines.append('# HELP binance_api_caller_calls_total Binance requests by caller.')
+            lines.append('# TYPE binance_api_caller_calls_total counter')
+            for caller in sorted(self._callers):
+                lines.append(f'binance_api_caller_calls_total{{caller="{caller}"}} {self._callers[caller]["calls"]}')
+            lines.append('# HELP binance_api_caller_weight_total Request weight spent by caller.')
+            lines.append('# TYPE binance_api_caller_weight_total counter')
+            for caller in sorted(self._callers):
+                lines.append(f'binance_api_caller_weight_total{{caller="{caller}"}} {self._callers[caller]["weight"]}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的注册表
+registry = ApiMetrics()
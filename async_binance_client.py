@@ -0,0 +1,473 @@
+"""
+异步 Binance 客户端
+基于 python-binance AsyncClient，所有请求共用一个 keep-alive 连接池，
+相互独立的请求可以用 asyncio.gather 并发执行
+"""
+
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Dict, List, Optional, Any
+
+import aiohttp
+from binance import AsyncClient
+from binance.exceptions import BinanceAPIException
+
+import api_metrics
+from clock_sync import ClockSync
+from rate_limiter import RateLimiter, request_weight
+from response_cache import ResponseCache, ACCOUNT_ENDPOINTS
+
+
+# 会改变账户状态的接口，调用后通知账户镜像重新校准
+ACCOUNT_WRITE_METHODS = {
+    'futures_create_order', 'futures_place_batch_order', 'futures_cancel_order',
+    'futures_cancel_all_open_orders', 'futures_change_leverage', 'futures_change_margin_type',
+    'futures_change_position_mode'
+}
+
+# 本次请求的 HTTP 响应。AsyncClient.response 是所有并发请求共用的属性，await 返回时可能已被
+# 其他请求覆盖；_handle_response 在发起请求的协程（同一上下文）中执行，在这里记录才能对应到本次请求
+_current_response: ContextVar = ContextVar('binance_response', default=None)
+
+
+class AsyncBinanceClient:
+    """BinanceClient 的异步实现，方法与同步客户端一一对应"""
+
+    # 连接池配置：一个 session 复用所有 TCP/TLS 连接
+    POOL_SIZE = 20              # 最大并发连接数
+    KEEPALIVE_TIMEOUT = 60      # 空闲连接保活时间（秒）
+    REQUEST_TIMEOUT = 60        # 单次请求超时（秒）
+    RECV_WINDOW = 5000          # 签名请求的 recvWindow（毫秒），时间戳已按服务器时钟校正
+    BATCH_ORDER_SIZE = 5        # batchOrders 接口单次最多5笔
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = False, using_v2ray: int = 0,
+                 v2ray_port: int = 10808):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.logger = logging.getLogger(__name__)
+
+        # 代理（aiohttp 只支持 http 代理地址）
+        self.https_proxy = f"http://127.0.0.1:{v2ray_port}" if int(using_v2ray) == 1 else None
+
+        # AsyncClient 需要在事件循环内创建，见 connect()
+        self.client: Optional[AsyncClient] = None
+
+        # 请求权重限流（与其他进程共享预算）
+        self.rate_limiter = RateLimiter()
+
+        # 只读接口按 TTL 缓存，同时发出的相同请求合并为一次
+        self.response_cache = ResponseCache()
+
+        # 按接口统计延迟、错误和权重，按调用方统计调用次数
+        self.metrics = api_metrics.registry
+
+        # 服务器时钟同步（connect() 时首次同步并启动定时任务）
+        self.clock_sync = ClockSync(lambda: self.client.futures_time())
+
+        # 账户镜像（AccountMirror.start() 时挂接），就绪时账户类查询直接读本地快照
+        self.account_mirror = None
+
+    # ========== 连接管理 ==========
+
+    async def connect(self) -> AsyncClient:
+        """创建共享连接池并同步服务器时间（重复调用直接返回已有连接）"""
+        if self.client is not None:
+            return self.client
+
+        connector = aiohttp.TCPConnector(
+            limit=self.POOL_SIZE,
+            keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        client = AsyncClient(
+            self.api_key, self.api_secret,
+            testnet=self.testnet,
+            loop=asyncio.get_running_loop(),
+            session_params={'connector': connector},
+            https_proxy=self.https_proxy
+        )
+        client.REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=self.REQUEST_TIMEOUT)
+        client.REQUEST_RECVWINDOW = self.RECV_WINDOW
+        self._capture_responses(client)
+        self.client = client
+
+        # 同步服务器时间，签名请求使用校正后的时间戳，避免 -1021
+        try:
+            await self.clock_sync.sync()
+            self.logger.info(f"Binance 时间同步成功，本地时钟偏移 {self.clock_sync.offset_ms()}ms")
+        except Exception as e:
+            self.logger.warning(f"时间同步失败: {e}，稍后后台重试")
+        self.clock_sync.start()
+
+        return client
+
+    @staticmethod
+    def _capture_responses(client):
+        """包装 AsyncClient._handle_response，把每次请求的响应记录到当前上下文"""
+        handle_response = client._handle_response
+
+        async def capture(response):
+            _current_response.set(response)
+            return await handle_response(response)
+
+        client._handle_response = capture
+
+    async def close(self):
+        """关闭连接池"""
+        await self.clock_sync.stop()
+        if self.client is not None:
+            await self.client.close_connection()
+            self.client = None
+
+    # ========== 基础请求封装 ==========
+
+    async def _call(self, name: str, *args, **kwargs):
+        """统一调用：可缓存的只读接口先查响应缓存，其余直接请求"""
+        if self.response_cache.is_cacheable(name):
+            return await self.response_cache.get(
+                name, args, kwargs, lambda: self._request(name, *args, **kwargs))
+        return await self._request(name, *args, **kwargs)
+
+    async def _request(self, name: str, *args, **kwargs):
+        """按权重限流后调用 AsyncClient 方法，用响应头校准限流器，记录调用指标，捕获异常"""
+        client = await self.connect()
+        bucket, weight, orders = request_weight(name, kwargs)
+        await self.rate_limiter.acquire(bucket, weight, orders)
+        if name in ACCOUNT_WRITE_METHODS:
+            self.response_cache.invalidate(ACCOUNT_ENDPOINTS)
+            if self.account_mirror is not None:
+                self.account_mirror.mark_stale()
+        if self.clock_sync.synced:
+            # 每次请求前按偏移+漂移刷新，签名时间戳 = 本地时间 + timestamp_offset
+            client.timestamp_offset = self.clock_sync.offset_ms()
+        started = time.perf_counter()
+        error = False
+        try:
+            _current_response.set(None)
+            result = await getattr(client, name)(*args, **kwargs)
+            await self.rate_limiter.record_response(_current_response.get())
+            return result
+        except BinanceAPIException as e:
+            error = True
+            await self.rate_limiter.record_response(e.response, e.status_code)
+            if e.code == -1021:
+                self.clock_sync.request_resync()
+            raise Exception(f"API错误: {e.code} - {e.message}")
+        except Exception as e:
+            error = True
+            self.logger.error(f"未知错误: {e}")
+            raise
+        finally:
+            self.metrics.record(name, (time.perf_counter() - started) * 1000, weight, error)
+            if name in ACCOUNT_WRITE_METHODS:
+                # 写操作期间返回的账户查询/镜像校准可能是旧状态，完成后再失效一次
+                self.response_cache.invalidate(ACCOUNT_ENDPOINTS)
+                if self.account_mirror is not None:
+                    self.account_mirror.mark_stale()
+
+    def _mirror_ready(self) -> bool:
+        return self.account_mirror is not None and self.account_mirror.is_ready()
+
+    # ========== 账户信息 ==========
+
+    async def get_account_info(self) -> Dict:
+        return await self._call('get_account')
+
+    async def get_account_balance(self) -> List[Dict]:
+        account = await self.get_account_info()
+        return account.get('balances', [])
+
+    async def get_asset_balance(self, asset: str) -> Dict:
+        balances = await self.get_account_balance()
+        for b in balances:
+            if b['asset'] == asset:
+                return b
+        return {'asset': asset, 'free': '0', 'locked': '0'}
+
+    async def get_futures_account_info(self) -> Dict:
+        if self._mirror_ready():
+            return self.account_mirror.get_account_info()
+        return await self._call('futures_account')
+
+    async def get_futures_balance(self) -> List[Dict]:
+        account = await self.get_futures_account_info()
+        return account.get('assets', [])
+
+    async def get_futures_positions(self) -> List[Dict]:
+        if self._mirror_ready():
+            return self.account_mirror.get_positions()
+        return await self._call('futures_position_information')
+
+    async def get_active_positions(self) -> List[Dict]:
+        positions = await self.get_futures_positions()
+        return [p for p in positions if float(p.get('positionAmt', 0)) != 0]
+
+    # ========== 市场数据 ==========
+
+    async def get_ticker_price(self, symbol: str = None) -> Dict:
+        return await self._call('get_symbol_ticker', symbol=symbol)
+
+    async def get_24h_ticker(self, symbol: str) -> Dict:
+        return await self._call('get_ticker', symbol=symbol)
+
+    async def get_24h_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """并发获取多个交易对的24h行情，单个失败不影响其他交易对"""
+        results = await asyncio.gather(*(self.get_24h_ticker(s) for s in symbols),
+                                       return_exceptions=True)
+        tickers = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"获取 {symbol} 24h行情失败: {result}")
+                continue
+            tickers[symbol] = result
+        return tickers
+
+    async def get_all_24h_tickers(self) -> List[Dict]:
+        """全部合约交易对的24h行情（一次请求）"""
+        return await self._call('futures_ticker')
+
+    async def get_premium_index(self, symbol: str = None):
+        """溢价指数（标记价格、指数价格、当期资金费率），不传交易对时返回全部交易对"""
+        return await self._call('futures_mark_price', symbol=symbol)
+
+    async def get_klines(self, symbol: str, interval: str, limit: int = 100,
+                         start_time: int = None, endTime: int = None) -> List:
+        return await self._call('get_klines', symbol=symbol, interval=interval,
+                                limit=limit, startTime=start_time, endTime=endTime)
+
+    async def get_futures_klines(self, symbol: str, interval: str, limit: int = 100,
+                                 start_time: int = None, endTime: int = None) -> List:
+        return await self._call('futures_klines', symbol=symbol, interval=interval,
+                                limit=limit, startTime=start_time, endTime=endTime)
+
+    async def get_order_book(self, symbol: str, limit: int = 100) -> Dict:
+        return await self._call('get_order_book', symbol=symbol, limit=limit)
+
+    async def get_futures_order_book(self, symbol: str, limit: int = 1000) -> Dict:
+        return await self._call('futures_order_book', symbol=symbol, limit=limit)
+
+    # ========== 现货交易 ==========
+
+    async def create_spot_order(self, symbol: str, side: str, order_type: str,
+                                quantity: float = None, price: float = None,
+                                quote_order_qty: float = None,
+                                time_in_force: str = 'GTC', **kwargs) -> Dict:
+        return await self._call('create_order',
+                                symbol=symbol, side=side, type=order_type,
+                                quantity=quantity, price=price,
+                                quoteOrderQty=quote_order_qty,
+                                timeInForce=time_in_force, **kwargs)
+
+    async def cancel_spot_order(self, symbol: str, order_id: int = None,
+                                orig_client_order_id: str = None) -> Dict:
+        return await self._call('cancel_order',
+                                symbol=symbol, orderId=order_id,
+                                origClientOrderId=orig_client_order_id)
+
+    async def cancel_all_spot_orders(self, symbol: str) -> List[Dict]:
+        return await self._call('_request_api', 'delete', 'openOrders', True,
+                                data={'symbol': symbol})
+
+    async def get_spot_order(self, symbol: str, order_id: int) -> Dict:
+        return await self._call('get_order', symbol=symbol, orderId=order_id)
+
+    async def get_open_orders(self, symbol: str = None) -> List[Dict]:
+        return await self._call('get_open_orders', symbol=symbol)
+
+    # ========== 合约交易 ==========
+
+    async def set_leverage(self, symbol: str, leverage: int) -> Dict:
+        return await self._call('futures_change_leverage',
+                                symbol=symbol, leverage=leverage)
+
+    async def set_margin_type(self, symbol: str, margin_type: str) -> Dict:
+        return await self._call('futures_change_margin_type',
+                                symbol=symbol, marginType=margin_type)
+
+    @staticmethod
+    def build_futures_order_params(symbol: str, side: str, order_type: str,
+                                   quantity: float = None, price: float = None,
+                                   position_side: str = 'BOTH',
+                                   reduce_only: bool = False,
+                                   time_in_force: str = 'GTC', **kwargs) -> Dict:
+        """把下单参数转换为接口字段（单笔下单和批量下单共用）"""
+        if side == 'BUY':
+            params = {
+                'symbol': symbol,
+                'side': side,
+                'type': order_type,
+                'positionSide': position_side,
+                'quantity': quantity,
+                'price': price,
+                'timeInForce': time_in_force if order_type == 'LIMIT' else None
+            }
+        else:
+            params = {
+                'symbol': symbol,
+                'side': side,
+                'type': order_type,
+                'positionSide': position_side,
+                'reduceOnly': str(reduce_only).lower(),
+                'quantity': quantity,
+                'price': price,
+                'timeInForce': time_in_force if order_type == 'LIMIT' else None
+            }
+        params = {k: v for k, v in params.items() if v is not None}
+        params.update(kwargs)
+        return params
+
+    async def create_futures_order(self, symbol: str, side: str, order_type: str,
+                                   quantity: float = None, price: float = None,
+                                   position_side: str = 'BOTH',
+                                   reduce_only: bool = False,
+                                   time_in_force: str = 'GTC', **kwargs) -> Dict:
+        params = self.build_futures_order_params(
+            symbol, side, order_type, quantity=quantity, price=price,
+            position_side=position_side, reduce_only=reduce_only,
+            time_in_force=time_in_force, **kwargs)
+        return await self._call('futures_create_order', **params)
+
+    async def create_futures_batch_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        批量下单（batchOrders 接口每次最多5笔，超过时分组并发发送）
+
+        Args:
+            orders: 订单列表，每个元素是 create_futures_order 的关键字参数
+
+        Returns:
+            与 orders 一一对应的结果列表：成功为订单信息，失败为 {'code': ..., 'msg': ...}
+        """
+        batch = []
+        for order in orders:
+            params = self.build_futures_order_params(**order)
+            # batchOrders 以 JSON 字符串提交，所有字段统一转为字符串
+            batch.append({k: self._format_param(v) for k, v in params.items()})
+
+        chunks = [batch[i:i + self.BATCH_ORDER_SIZE] for i in range(0, len(batch), self.BATCH_ORDER_SIZE)]
+        responses = await asyncio.gather(
+            *(self._call('futures_place_batch_order', batchOrders=chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        results = []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, Exception):
+                # 整组请求失败时，组内每笔订单都记为失败
+                results.extend({'code': -1, 'msg': str(response)} for _ in chunk)
+            else:
+                results.extend(response)
+        return results
+
+    @staticmethod
+    def _format_param(value) -> str:
+        if isinstance(value, bool):
+            return str(value).lower()
+        if isinstance(value, float):
+            # 避免科学计数法（例如 1e-05）
+            return format(Decimal(repr(value)), 'f')
+        return str(value)
+
+    async def cancel_futures_order(self, symbol: str, order_id: int = None,
+                                   orig_client_order_id: str = None) -> Dict:
+        return await self._call('futures_cancel_order',
+                                symbol=symbol, orderId=order_id,
+                                origClientOrderId=orig_client_order_id)
+
+    async def cancel_all_futures_orders(self, symbol: str) -> Dict:
+        return await self._call('futures_cancel_all_open_orders', symbol=symbol)
+
+    async def get_futures_order(self, symbol: str, order_id: int) -> Dict:
+        return await self._call('futures_get_order', symbol=symbol, orderId=order_id)
+
+    async def get_futures_open_orders(self, symbol: str = None) -> List[Dict]:
+        if self._mirror_ready():
+            return self.account_mirror.get_open_orders(symbol)
+        return await self._call('futures_get_open_orders', symbol=symbol)
+
+    # ========== 平仓便捷方法 ==========
+
+    async def close_position(self, symbol: str, position_side: str = 'BOTH') -> Dict:
+        positions = await self.get_futures_positions()
+        for pos in positions:
+            if pos['symbol'] != symbol or float(pos['positionAmt']) == 0:
+                continue
+            if position_side != 'BOTH' and pos.get('positionSide') != position_side:
+                continue
+            qty = abs(float(pos['positionAmt']))
+            side = 'SELL' if float(pos['positionAmt']) > 0 else 'BUY'
+            return await self.create_futures_order(
+                symbol=symbol, side=side, order_type='MARKET',
+                quantity=qty, position_side=pos.get('positionSide', 'BOTH')
+            )
+        return {'msg': 'No position to close'}
+
+    async def close_all_positions(self, symbol: str = None) -> List[Dict]:
+        positions = await self.get_active_positions()
+        results = []
+        for pos in positions:
+            if symbol and pos['symbol'] != symbol:
+                continue
+            try:
+                await self.cancel_all_futures_orders(pos['symbol'])
+                close = await self.close_position(pos['symbol'], pos.get('positionSide'))
+                results.append({'symbol': pos['symbol'], 'result': close})
+            except Exception as e:
+                results.append({'symbol': pos['symbol'], 'error': str(e)})
+        return results
+
+    # ========== 余额 ==========
+
+    async def get_usdt_balance(self) -> float:
+        bal = await self.get_asset_balance('USDT')
+        return float(bal.get('free', 0))
+
+    async def get_futures_usdt_balance(self) -> float:
+        info = await self.get_futures_account_info()
+        return float(info.get('totalWalletBalance', 0))
+
+    async def get_futures_available_balance(self) -> float:
+        info = await self.get_futures_account_info()
+        return float(info.get('availableBalance', 0))
+
+    # ========== 用户数据流 ==========
+
+    async def create_listen_key(self) -> str:
+        return await self._call('futures_stream_get_listen_key')
+
+    async def keepalive_listen_key(self, listen_key: str) -> Dict:
+        return await self._call('futures_stream_keepalive', listenKey=listen_key)
+
+    async def close_listen_key(self, listen_key: str) -> Dict:
+        return await self._call('futures_stream_close', listenKey=listen_key)
+
+    # ========== 高级功能 ==========
+
+    async def get_position_mode(self) -> Dict:
+        return await self._call('futures_get_position_mode')
+
+    async def set_position_mode(self, dual_side: bool) -> Dict:
+        return await self._call('futures_change_position_mode',
+                                dualSidePosition=str(dual_side).lower())
+
+    async def get_current_funding_rate(self, symbol: str) -> Dict:
+        rates = await self._call('futures_funding_rate', symbol=symbol, limit=1)
+        return rates[0] if rates else {}
+
+    async def get_open_interest(self, symbol: str) -> Dict:
+        return await self._call('futures_open_interest', symbol=symbol)
+
+    async def get_open_interest_statistics(self, symbol: str, period: str = '5m', limit: int = 30) -> List[Dict]:
+        return await self._call('futures_open_interest_hist', symbol=symbol, period=period, limit=limit)
+
+    async def get_futures_exchange_info(self, symbol: str = None) -> Dict:
+        info = await self._call('futures_exchange_info')
+        if symbol:
+            return next((s for s in info['symbols'] if s['symbol'] == symbol), {})
+        return info
+
+    async def get_leverage_brackets(self, symbol: str = None) -> List[Dict]:
+        return await self._call('futures_leverage_bracket', symbol=symbol)
@@ -1,93 +1,120 @@
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
+import asyncio
+import threading
 import logging
 from typing import Dict, List, Optional, Any
 
+from async_binance_client import AsyncBinanceClient
+
+
 class BinanceClient:
-    """基于官方 python-binance SDK 的增强客户端"""
+    """基于官方 python-binance SDK 的增强客户端（AsyncBinanceClient 的同步封装）"""
 
     def __init__(self, api_key: str, api_secret: str, testnet: bool = False, using_v2ray: int = 0,
-                 v2ray_port: int = 10808):
-        self.client = Client(api_key, api_secret, testnet=testnet)
+                 v2ray_port: int = 10808, async_client: AsyncBinanceClient = None):
         self.logger = logging.getLogger(__name__)
 
-        # 自动设置 recvWindow 避免 -1021
-        self.client.recv_window = 60000  # 60秒宽容窗口
+        # 所有请求在同一个后台事件循环里执行，共用一个 keep-alive 连接池
+        # （传入 async_client 时直接使用，例如模拟交易所）
+        self.async_client = async_client or AsyncBinanceClient(api_key, api_secret, testnet=testnet,
+                                                               using_v2ray=using_v2ray, v2ray_port=v2ray_port)
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                             name='binance-io', daemon=True)
+        self._loop_thread.start()
 
-        if using_v2ray == 1:
-            # 如果你有代理（强烈推荐！）
-            self.client.proxies = {
-                'http': f"http://127.0.0.1:{v2ray_port}",  # 你的代理端口
-                'https': f"https://127.0.0.1:{v2ray_port}"
-            }
+        # 建立连接池并同步服务器时间
+        self._call(self.async_client.connect())
 
-        # 强制同步服务器时间，避免因时间差导致的API调用失败 (错误码 -1021)
-        try:
-            self.client.futures_time()
-            self.logger.info("Binance 时间同步成功")
-        except Exception as e:
-            self.logger.warning(f"时间同步失败: {e}，但 recv_window 已放宽")
+    # ========== 基础请求封装（自动处理 202、重试）==========
 
-        # 在 Client 初始化后添加
-        self.client.timeout = 60  # 增加到 60 秒
+    def _call(self, coro):
+        """统一调用：在后台事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
 
-    # ========== 基础请求封装（自动处理 202、重试）==========
+    def gather(self, *coros, return_exceptions: bool = False) -> List[Any]:
+        """并发执行多个 AsyncBinanceClient 协程，按顺序返回结果列表"""
+        async def _gather():
+            return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+        return self._call(_gather())
+
+    def cache_stats(self) -> Dict:
+        """响应缓存命中统计（命中、未命中、合并的并发请求）"""
+        return self._call(self._cache_stats())
 
-    def _call(self, func, *args, **kwargs):
-        """统一调用，捕获异常"""
-        try:
-            return func(*args, **kwargs)
-        except BinanceAPIException as e:
-            raise Exception(f"API错误: {e.code} - {e.message}")
-        except Exception as e:
-            self.logger.error(f"未知错误: {e}")
-            raise
+    async def _cache_stats(self) -> Dict:
+        return self.async_client.response_cache.stats()
+
+    def clock_status(self) -> Dict:
+        """服务器时钟同步状态（偏移、漂移、往返延迟）"""
+        return self._call(self._clock_status())
+
+    async def _clock_status(self) -> Dict:
+        return self.async_client.clock_sync.status()
+
+    def close(self):
+        """关闭连接池和后台事件循环"""
+        self._call(self.async_client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        # 显式关闭事件循环，不留给垃圾回收（回收顺序不定时会先关掉循环内部的 socket）
+        self._loop_thread.join(timeout=5)
+        if not self._loop.is_running():
+            self._loop.close()
 
     # ========== 账户信息 ==========
 
     def get_account_info(self) -> Dict:
-        return self._call(self.client.get_account)
+        return self._call(self.async_client.get_account_info())
 
     def get_account_balance(self) -> List[Dict]:
-        account = self.get_account_info()
-        return account.get('balances', [])
+        return self._call(self.async_client.get_account_balance())
 
     def get_asset_balance(self, asset: str) -> Dict:
-        balances = self.get_account_balance()
-        for b in balances:
-            if b['asset'] == asset:
-                return b
-        return {'asset': asset, 'free': '0', 'locked': '0'}
+        return self._call(self.async_client.get_asset_balance(asset))
 
     def get_futures_account_info(self) -> Dict:
-        return self._call(self.client.futures_account)
+        return self._call(self.async_client.get_futures_account_info())
 
     def get_futures_balance(self) -> List[Dict]:
-        account = self.get_futures_account_info()
-        return account.get('assets', [])
+        return self._call(self.async_client.get_futures_balance())
 
     def get_futures_positions(self) -> List[Dict]:
-        return self._call(self.client.futures_position_information)
+        return self._call(self.async_client.get_futures_positions())
 
     def get_active_positions(self) -> List[Dict]:
-        positions = self.get_futures_positions()
-        return [p for p in positions if float(p.get('positionAmt', 0)) != 0]
+        return self._call(self.async_client.get_active_positions())
 
     # ========== 市场数据 ==========
 
     def get_ticker_price(self, symbol: str = None) -> Dict:
-        return self._call(self.client.get_symbol_ticker, symbol=symbol)
+        return self._call(self.async_client.get_ticker_price(symbol))
 
     def get_24h_ticker(self, symbol: str) -> Dict:
-        return self._call(self.client.get_ticker, symbol=symbol)
+        return self._call(self.async_client.get_24h_ticker(symbol))
+
+    def get_24h_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        return self._call(self.async_client.get_24h_tickers(symbols))
+
+    def get_all_24h_tickers(self) -> List[Dict]:
+        return self._call(self.async_client.get_all_24h_tickers())
+
+    def get_premium_index(self, symbol: str = None):
+        return self._call(self.async_client.get_premium_index(symbol))
 
     def get_klines(self, symbol: str, interval: str, limit: int = 100,
                    start_time: int = None, endTime: int = None) -> List:
-        return self._call(self.client.get_klines, symbol=symbol, interval=interval,
-                          limit=limit, startTime=start_time, end_time=endTime)
+        return self._call(self.async_client.get_klines(symbol, interval, limit,
+                                                       start_time=start_time, endTime=endTime))
+
+    def get_futures_klines(self, symbol: str, interval: str, limit: int = 100,
+                           start_time: int = None, endTime: int = None) -> List:
+        return self._call(self.async_client.get_futures_klines(symbol, interval, limit,
+                                                               start_time=start_time, endTime=endTime))
 
     def get_order_book(self, symbol: str, limit: int = 100) -> Dict:
-        return self._call(self.client.get_order_book, symbol=symbol, limit=limit)
+        return self._call(self.async_client.get_order_book(symbol, limit))
+
+    def get_futures_order_book(self, symbol: str, limit: int = 1000) -> Dict:
+        return self._call(self.async_client.get_futures_order_book(symbol, limit))
 
     # ========== 现货交易 ==========
 
@@ -95,142 +122,97 @@ class BinanceClient:
                          quantity: float = None, price: float = None,
                          quote_order_qty: float = None,
                          time_in_force: str = 'GTC', **kwargs) -> Dict:
-        return self._call(self.client.create_order,
-                          symbol=symbol, side=side, type=order_type,
-                          quantity=quantity, price=price,
-                          quoteOrderQty=quote_order_qty,
-                          timeInForce=time_in_force, **kwargs)
+        return self._call(self.async_client.create_spot_order(
+            symbol, side, order_type, quantity=quantity, price=price,
+            quote_order_qty=quote_order_qty, time_in_force=time_in_force, **kwargs))
 
     def cancel_spot_order(self, symbol: str, order_id: int = None,
                          orig_client_order_id: str = None) -> Dict:
-        return self._call(self.client.cancel_order,
-                          symbol=symbol, orderId=order_id,
-                          origClientOrderId=orig_client_order_id)
+        return self._call(self.async_client.cancel_spot_order(
+            symbol, order_id=order_id, orig_client_order_id=orig_client_order_id))
 
     def cancel_all_spot_orders(self, symbol: str) -> List[Dict]:
-        return self._call(self.client.cancel_open_orders, symbol=symbol)
+        return self._call(self.async_client.cancel_all_spot_orders(symbol))
 
     def get_spot_order(self, symbol: str, order_id: int) -> Dict:
-        return self._call(self.client.get_order, symbol=symbol, orderId=order_id)
+        return self._call(self.async_client.get_spot_order(symbol, order_id))
 
     def get_open_orders(self, symbol: str = None) -> List[Dict]:
-        return self._call(self.client.get_open_orders, symbol=symbol)
+        return self._call(self.async_client.get_open_orders(symbol))
 
     # ========== 合约交易 ==========
 
     def set_leverage(self, symbol: str, leverage: int) -> Dict:
-        return self._call(self.client.futures_change_leverage,
-                          symbol=symbol, leverage=leverage)
+        return self._call(self.async_client.set_leverage(symbol, leverage))
 
     def set_margin_type(self, symbol: str, margin_type: str) -> Dict:
-        return self._call(self.client.futures_change_margin_type,
-                          symbol=symbol, marginType=margin_type)
+        return self._call(self.async_client.set_margin_type(symbol, margin_type))
 
     def create_futures_order(self, symbol: str, side: str, order_type: str,
                             quantity: float = None, price: float = None,
                             position_side: str = 'BOTH',
                             reduce_only: bool = False,
                             time_in_force: str = 'GTC', **kwargs) -> Dict:
-        if side == 'BUY':
-            params = {
-                'symbol': symbol,
-                'side': side,
-                'type': order_type,
-                'positionSide': position_side,
-                'quantity': quantity,
-                'price': price,
-                'timeInForce': time_in_force if order_type == 'LIMIT' else None
-            }
-        else:
-            params = {
-                'symbol': symbol,
-                'side': side,
-                'type': order_type,
-                'positionSide': position_side,
-                'reduceOnly': str(reduce_only).lower(),
-                'quantity': quantity,
-                'price': price,
-                'timeInForce': time_in_force if order_type == 'LIMIT' else None
-            }
-        params = {k: v for k, v in params.items() if v is not None}
-        params.update(kwargs)
-        return self._call(self.client.futures_create_order, **params)
+        return self._call(self.async_client.create_futures_order(
+            symbol, side, order_type, quantity=quantity, price=price,
+            position_side=position_side, reduce_only=reduce_only,
+            time_in_force=time_in_force, **kwargs))
+
+    def create_futures_batch_orders(self, orders: List[Dict]) -> List[Dict]:
+        return self._call(self.async_client.create_futures_batch_orders(orders))
 
     def cancel_futures_order(self, symbol: str, order_id: int = None,
                             orig_client_order_id: str = None) -> Dict:
-        return self._call(self.client.futures_cancel_order,
-                          symbol=symbol, orderId=order_id,
-                          origClientOrderId=orig_client_order_id)
+        return self._call(self.async_client.cancel_futures_order(
+            symbol, order_id=order_id, orig_client_order_id=orig_client_order_id))
 
     def cancel_all_futures_orders(self, symbol: str) -> Dict:
-        return self._call(self.client.futures_cancel_all_open_orders, symbol=symbol)
+        return self._call(self.async_client.cancel_all_futures_orders(symbol))
 
     def get_futures_order(self, symbol: str, order_id: int) -> Dict:
-        return self._call(self.client.futures_get_order, symbol=symbol, orderId=order_id)
+        return self._call(self.async_client.get_futures_order(symbol, order_id))
 
     def get_futures_open_orders(self, symbol: str = None) -> List[Dict]:
-        return self._call(self.client.futures_get_open_orders, symbol=symbol)
+        return self._call(self.async_client.get_futures_open_orders(symbol))
 
     # ========== 平仓便捷方法 ==========
 
     def close_position(self, symbol: str, position_side: str = 'BOTH') -> Dict:
-        positions = self.get_futures_positions()
-        for pos in positions:
-            if pos['symbol'] != symbol or float(pos['positionAmt']) == 0:
-                continue
-            if position_side != 'BOTH' and pos.get('positionSide') != position_side:
-                continue
-            qty = abs(float(pos['positionAmt']))
-            side = 'SELL' if float(pos['positionAmt']) > 0 else 'BUY'
-            return self.create_futures_order(
-                symbol=symbol, side=side, order_type='MARKET',
-                quantity=qty, position_side=pos.get('positionSide', 'BOTH')
-            )
-        return {'msg': 'No position to close'}
+        return self._call(self.async_client.close_position(symbol, position_side))
 
     def close_all_positions(self, symbol: str = None) -> List[Dict]:
-        positions = self.get_active_positions()
-        results = []
-        for pos in positions:
-            if symbol and pos['symbol'] != symbol:
-                continue
-            try:
-                self.cancel_all_futures_orders(pos['symbol'])
-                close = self.close_position(pos['symbol'], pos.get('positionSide'))
-                results.append({'symbol': pos['symbol'], 'result': close})
-            except Exception as e:
-                results.append({'symbol': pos['symbol'], 'error': str(e)})
-        return results
+        return self._call(self.async_client.close_all_positions(symbol))
 
     # ========== 余额 ==========
 
     def get_usdt_balance(self) -> float:
-        bal = self.get_asset_balance('USDT')
-        return float(bal.get('free', 0))
+        return self._call(self.async_client.get_usdt_balance())
 
     def get_futures_usdt_balance(self) -> float:
-        info = self.get_futures_account_info()
-        return float(info.get('totalWalletBalance', 0))
+        return self._call(self.async_client.get_futures_usdt_balance())
 
     def get_futures_available_balance(self) -> float:
-        info = self.get_futures_account_info()
-        return float(info.get('availableBalance', 0))
+        return self._call(self.async_client.get_futures_available_balance())
 
     # ========== 高级功能 ==========
 
     def get_position_mode(self) -> Dict:
-        return self._call(self.client.futures_position_side_dual)
+        return self._call(self.async_client.get_position_mode())
 
     def set_position_mode(self, dual_side: bool) -> Dict:
-        return self._call(self.client.futures_change_position_side_dual,
-                          dualSidePosition=dual_side)
+        return self._call(self.async_client.set_position_mode(dual_side))
 
     def get_current_funding_rate(self, symbol: str) -> Dict:
-        rates = self._call(self.client.futures_funding_rate, symbol=symbol, limit=1)
-        return rates[0] if rates else {}
+        return self._call(self.async_client.get_current_funding_rate(symbol))
+
+    def get_open_interest(self, symbol: str) -> Dict:
+        return self._call(self.async_client.get_open_interest(symbol))
+
+    def get_open_interest_statistics(self, symbol: str, period: str = '5m', limit: int = 30) -> List[Dict]:
+        return self._call(self.async_client.get_open_interest_statistics(symbol, period, limit))
 
     def get_futures_exchange_info(self, symbol: str = None) -> Dict:
-        info = self._call(self.client.futures_exchange_info)
-        if symbol:
-            return next((s for s in info['symbols'] if s['symbol'] == symbol), {})
-        return info
\ No newline at end of file
+        return self._call(self.async_client.get_futures_exchange_info(symbol))
+
+    def get_leverage_brackets(self, symbol: str = None) -> List[Dict]:
+        return self._call(self.async_client.get_leverage_brackets(symbol))
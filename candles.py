@@ -0,0 +1,66 @@
+"""
+紧凑 K线序列
+K线以 NumPy 列保存：价格和成交量为 float64，开盘/收盘时间保持 int64 毫秒，
+直接取自 K线存储的列矩阵快照或由 REST 行一次解析得到。
+只有调用方需要时才转换为 pandas DataFrame，热路径上不再为每次读取构造 12 列字符串表格
+"""
+
+import numpy as np
+import pandas as pd
+
+from kline_store import COLUMNS, parse_klines
+
+
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+
+class Candles:
+    """一段按开盘时间升序的 K线"""
+
+    PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, columns: np.ndarray):
+        """
+        初始化 K线序列
+
+        Args:
+            columns: (len(COLUMNS), n) 的 float64 列矩阵（kline_store.COLUMNS 顺序），不做拷贝
+        """
+        self.columns = columns
+        self.open_time = columns[_COL['open_time']].astype(np.int64)
+        self.close_time = columns[_COL['close_time']].astype(np.int64)
+        self.open = columns[_COL['open']]
+        self.high = columns[_COL['high']]
+        self.low = columns[_COL['low']]
+        self.close = columns[_COL['close']]
+        self.volume = columns[_COL['volume']]
+        self.quote_volume = columns[_COL['quote_volume']]
+
+    @classmethod
+    def from_klines(cls, rows) -> 'Candles':
+        """由 REST K线行（字符串字段）一次解析"""
+        return cls(parse_klines(rows))
+
+    def __len__(self) -> int:
+        return self.columns.shape[1]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """按列名读取（'timestamp' 为开盘时间毫秒），便于与 DataFrame 互换使用"""
+        return self.open_time if name == 'timestamp' else getattr(self, name)
+
+    @property
+    def index(self) -> pd.RangeIndex:
+        """与 to_frame() 相同的行索引"""
+        return pd.RangeIndex(len(self))
+
+    def timestamps(self) -> list:
+        """开盘时间（UTC）格式化为 'YYYY-MM-DD HH:MM:SS' 列表"""
+        text = np.datetime_as_string(self.open_time.astype('datetime64[ms]'), unit='s')
+        return [s.replace('T', ' ') for s in text]
+
+    def to_frame(self) -> pd.DataFrame:
+        """转换为 DataFrame（timestamp/open/high/low/close/volume），调用方可以自由增加列"""
+        frame = pd.DataFrame({'timestamp': pd.to_datetime(self.open_time, unit='ms')})
+        for name in self.PRICE_FIELDS:
+            frame[name] = getattr(self, name)
+        return frame
@@ -0,0 +1,164 @@
+"""
+服务器时钟同步
+定时采样 Binance 服务器时间，按往返延迟补偿估计本地时钟的偏移和漂移，
+签名请求使用校正后的时间戳，recvWindow 因此可以收紧到几秒（避免 -1021，也避免过期订单被延迟接受）
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class ClockSync:
+    """本地时钟相对交易所服务器时钟的偏移/漂移估计器，运行在 AsyncBinanceClient 的事件循环中"""
+
+    INTERVAL_SECONDS = 300          # 定时同步间隔（秒）
+    BURST_SAMPLES = 3               # 每次同步连续采样次数，取往返延迟最小的一次
+    MAX_HISTORY = 24                # 参与漂移拟合的历史同步次数
+    MIN_DRIFT_SPAN_SECONDS = 600    # 历史样本跨度超过该值才估计漂移
+    MAX_DRIFT_PPM = 500             # 漂移上限（百万分之一），超过视为异常样本
+
+    def __init__(self, fetch_server_time: Callable[[], Awaitable[Dict]],
+                 interval_seconds: int = None, local_time: Callable[[], float] = time.time):
+        """
+        初始化时钟同步
+
+        Args:
+            fetch_server_time: 返回 {'serverTime': 毫秒} 的协程工厂（合约 /fapi/v1/time）
+            interval_seconds: 定时同步间隔（秒）
+            local_time: 本地时钟（秒），测试时可替换
+        """
+        self._fetch = fetch_server_time
+        self.interval_seconds = interval_seconds or self.INTERVAL_SECONDS
+        self._local_time = local_time
+        self.logger = logging.getLogger(__name__)
+
+        # (本地时间ms, 偏移ms, 往返延迟ms)
+        self._samples: deque = deque(maxlen=self.MAX_HISTORY)
+        self._ref_local_ms = 0.0
+        self._offset_ms = 0.0
+        self._drift = 0.0               # 每本地毫秒的偏移变化量
+        self.synced_at = 0.0
+        self.sync_count = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._resync: Optional[asyncio.Event] = None
+
+    # ========== 采样与估计 ==========
+
+    @property
+    def synced(self) -> bool:
+        return bool(self._samples)
+
+    async def _sample(self) -> Tuple[float, float, float]:
+        """连续采样，返回往返延迟最小的一次 (本地中点时间, 偏移, 往返延迟)"""
+        best = None
+        for _ in range(self.BURST_SAMPLES):
+            sent = self._local_time() * 1000
+            result = await self._fetch()
+            received = self._local_time() * 1000
+            rtt = received - sent
+            midpoint = sent + rtt / 2
+            # 服务器时间取在请求往返的中点
+            sample = (midpoint, float(result['serverTime']) - midpoint, rtt)
+            if best is None or sample[2] < best[2]:
+                best = sample
+        return best
+
+    async def sync(self):
+        """采样一次服务器时间并更新偏移/漂移估计"""
+        sample = await self._sample()
+        self._samples.append(sample)
+        self._estimate()
+        self.synced_at = time.time()
+        self.sync_count += 1
+
+    def _estimate(self):
+        """
+        偏移 = 最近样本（往返延迟异常大的样本除外）的线性拟合，
+        漂移 = 偏移对本地时间的最小二乘斜率（样本跨度足够长时才估计）
+        """
+        rtts = sorted(s[2] for s in self._samples)
+        limit = rtts[len(rtts) // 2] * 2 + 1
+        samples = [s for s in self._samples if s[2] <= limit]
+
+        latest = samples[-1]
+        drift = 0.0
+        span = samples[-1][0] - samples[0][0]
+        if len(samples) >= 3 and span >= self.MIN_DRIFT_SPAN_SECONDS * 1000:
+            n = len(samples)
+            mean_t = sum(s[0] for s in samples) / n
+            mean_o = sum(s[1] for s in samples) / n
+            var = sum((s[0] - mean_t) ** 2 for s in samples)
+            cov = sum((s[0] - mean_t) * (s[1] - mean_o) for s in samples)
+            slope = cov / var if var else 0.0
+            if abs(slope) * 1e6 <= self.MAX_DRIFT_PPM:
+                drift = slope
+                # 用拟合直线在最新样本处的值，平滑单次采样的抖动
+                self._ref_local_ms = latest[0]
+                self._offset_ms = mean_o + slope * (latest[0] - mean_t)
+                self._drift = drift
+                return
+
+        self._ref_local_ms = latest[0]
+        self._offset_ms = latest[1]
+        self._drift = drift
+
+    def offset_ms(self, local_ms: float = None) -> int:
+        """当前（或指定本地时间）的服务器时间偏移（毫秒）"""
+        if local_ms is None:
+            local_ms = self._local_time() * 1000
+        return int(round(self._offset_ms + self._drift * (local_ms - self._ref_local_ms)))
+
+    def server_time_ms(self) -> int:
+        """估计的当前服务器时间（毫秒）"""
+        local_ms = self._local_time() * 1000
+        return int(local_ms + self.offset_ms(local_ms))
+
+    # ========== 后台同步 ==========
+
+    def start(self):
+        """启动定时同步任务（须在事件循环中调用）"""
+        if self._task is None:
+            self._resync = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_resync(self):
+        """收到 -1021 等时间戳错误时立即重新同步"""
+        if self._resync is not None:
+            self._resync.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._resync.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._resync.clear()
+            try:
+                await self.sync()
+            except Exception as e:
+                self.logger.warning(f"服务器时间同步失败，沿用上次估计: {e}")
+
+    def status(self) -> Dict:
+        latest = self._samples[-1] if self._samples else None
+        return {
+            'synced': self.synced,
+            'offset_ms': self.offset_ms() if self.synced else 0,
+            'drift_ppm': round(self._drift * 1e6, 3),
+            'rtt_ms': round(latest[2], 3) if latest else None,
+            'samples': len(self._samples),
+            'sync_count': self.sync_count,
+            'synced_at': self.synced_at,
+        }
@@ -4,6 +4,7 @@ Alpha Arena 配置文件
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -35,7 +36,43 @@ class Config:
         TESTNET = os.getenv('BINANCE_TESTNET', 'false').lower() == 'true'
         USING_V2RAY = os.getenv('USING_V2RAY_PROXY', 1)
         V2RAY_PORT = os.getenv('V2RAY_PORT', 10808)
+
+    class RateLimit:
+        """Binance 请求权重限流配置（机器人和仪表盘进程共享同一份预算）"""
+        STATE_FILE = os.getenv('RATE_LIMIT_STATE_FILE',
+                               os.path.join(tempfile.gettempdir(), 'alpha_arena_rate_limit.json'))
+        SAFETY_RATIO = 0.9                  # 只使用官方限额的90%，给手动操作留余量
+        FUTURES_WEIGHT_PER_MINUTE = 2400    # 合约 IP 权重上限（每分钟）
+        FUTURES_ORDERS_PER_MINUTE = 1200    # 合约下单次数上限（每分钟）
+        SPOT_WEIGHT_PER_MINUTE = 6000       # 现货 IP 权重上限（每分钟）
+        SPOT_ORDERS_PER_MINUTE = 600        # 现货下单次数上限（折算为每分钟）
         
+    class MarketStream:
+        """WebSocket 行情数据流配置"""
+        ENABLED = os.getenv('MARKET_STREAM_ENABLED', 'true').lower() == 'true'
+        INTERVALS = ['1m']                      # 订阅的K线周期（3m/1h/4h 由1分钟K线本地聚合）
+        KLINE_BUFFER = 200                      # 每个周期在内存中保留的K线数量
+        DEPTH_ENABLED = os.getenv('MARKET_STREAM_DEPTH', 'true').lower() == 'true'  # 增量深度流维护本地订单簿
+        READY_TIMEOUT_SECONDS = 10              # 启动时等待首批行情的时间
+
+    class KlineHistory:
+        """K线历史落盘存储"""
+        ENABLED = os.getenv('KLINE_HISTORY_ENABLED', 'true').lower() == 'true'
+        DIRECTORY = os.getenv('KLINE_HISTORY_DIR', 'kline_history')  # 每个交易对/周期一个目录
+
+    class AccountMirror:
+        """用户数据流账户镜像配置"""
+        ENABLED = os.getenv('ACCOUNT_MIRROR_ENABLED', 'true').lower() == 'true'
+        RECONCILE_SECONDS = 60          # 定时用 REST 校准账户的间隔（秒）
+
+    class Simulation:
+        """本地模拟交易所配置（离线模拟盘、回归测试、压测）"""
+        ENABLED = os.getenv('SIMULATION_MODE', 'false').lower() == 'true'
+        KLINES_FILE = os.getenv('SIMULATION_KLINES_FILE', '')     # 录制的1分钟K线，为空时使用合成行情
+        SPEED = float(os.getenv('SIMULATION_SPEED', '60'))        # 模拟时间倍速
+        INITIAL_BALANCE = float(os.getenv('SIMULATION_INITIAL_BALANCE', '10000'))
+        SYNTHETIC_CANDLES = 7 * 24 * 60                           # 合成行情长度（1分钟K线数量）
+
     class Ollama:
         """Ollama API 配置"""
         API_KEY = os.getenv('OLLAMA_API_KEY')
@@ -44,6 +81,8 @@ class Config:
         API_TIMEOUT = int(os.getenv('OLLAMA_API_TIMEOUT', '150'))   # API超时时间（秒）
         API_PORT = int(os.getenv('OLLAMA_API_PORT', '11434'))       # API端口
         MODEL_NAME = os.getenv('OLLAMA_MODEL_NAME', 'qwen2.5:14b-instruct-q8_0')
+        PARALLEL_SLOTS = int(os.getenv('OLLAMA_NUM_PARALLEL', '1'))  # 服务端并行槽位数（同时发出的模型请求数，大于 1 需服务端同样配置）
+        STREAM = os.getenv('OLLAMA_STREAM', 'true').lower() == 'true'  # 流式生成，得到完整决策 JSON 后立即停止
         
     class Risk:
         """风险管理配置"""
@@ -57,9 +96,14 @@ class Config:
         ATR_MULTIPLIER = 2.0            # ATR倍数
         DEFAULT_STOP_LOSS_PCT = 0.015   # 默认止损百分比（1.5%）
         DEFAULT_TAKE_PROFIT_PCT = 0.05  # 默认止盈百分比（5%）
+        DEFAULT_AI_STOP_LOSS_PCT = 0.01     # AI未返回止损时使用的止损百分比（1%）
+        DEFAULT_AI_TAKE_PROFIT_PCT = 0.02   # AI未返回止盈时使用的止盈百分比（2%）
         TRAILING_STOP_PCT = 0.01        # 移动止损百分比（1%）
         MARGIN_CALL_THRESHOLD = 0.8     # 保证金率警戒阈值（80%）
         MAX_CORRELATION = 0.7           # 最大相关性阈值（0.7）
+        MAX_CORRELATED_EXPOSURE = float(os.getenv('MAX_CORRELATED_EXPOSURE', '3'))  # 高相关持仓合计名义价值上限（余额倍数）
+        CORRELATION_INTERVAL = '15m'    # 计算收益率相关性的K线周期
+        CORRELATION_WINDOW = 96         # 相关性滚动窗口（K线数量，15分钟×96 = 1天）
         
     class Rolling:
         """滚仓策略配置"""
@@ -72,6 +116,11 @@ class Config:
 AI = Config.AI
 Trading = Config.Trading
 Binance = Config.Binance
+RateLimit = Config.RateLimit
+MarketStream = Config.MarketStream
+KlineHistory = Config.KlineHistory
+AccountMirror = Config.AccountMirror
+Simulation = Config.Simulation
 Ollama = Config.Ollama
 Risk = Config.Risk
 Rolling = Config.Rolling
@@ -0,0 +1,139 @@
+"""
+跨交易对滚动相关性矩阵
+保存所有交易对最近 window 根 K线的对数收益率（环形缓冲区），并维护收益率之和与两两乘积之和。
+每根新 K线只需加上新收益率、减去移出窗口的收益率，更新为 O(k²)，不必每次从头计算协方差；
+定期用窗口内的数据重算一次累计和，消除浮点累积误差
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from kline_store import COLUMNS
+
+
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+
+class RollingCorrelation:
+    """按 K线推进的交易对收益率相关性矩阵"""
+
+    MIN_OBSERVATIONS = 20       # 样本少于该数量时不给出相关性
+
+    def __init__(self, symbols: List[str], interval: str = '15m', window: int = 96):
+        """
+        初始化相关性矩阵
+
+        Args:
+            symbols: 交易对列表（矩阵行列顺序）
+            interval: 计算收益率的 K线周期
+            window: 滚动窗口（收益率数量）
+        """
+        self.symbols = [s.upper() for s in symbols]
+        self.interval = interval
+        self.window = window
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+        k = len(self.symbols)
+        self._lock = threading.Lock()
+        self._returns = np.zeros((window, k))
+        self._sum = np.zeros(k)
+        self._cross = np.zeros((k, k))
+        self._count = 0                 # 累计推入的收益率数量（不受窗口限制）
+        self._last_close: Optional[np.ndarray] = None
+        self.last_time: Optional[int] = None
+
+    def __len__(self) -> int:
+        return min(self._count, self.window)
+
+    def push(self, closes, open_time: int = None):
+        """
+        推入新一根 K线各交易对的收盘价（按 symbols 顺序）
+
+        第一次推入只记录收盘价，之后每次产生一组收益率
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        with self._lock:
+            if self._last_close is not None:
+                r = np.log(closes / self._last_close)
+                pos = self._count % self.window
+                if self._count >= self.window:
+                    old = self._returns[pos]
+                    self._sum -= old
+                    self._cross -= np.outer(old, old)
+                self._returns[pos] = r
+                self._sum += r
+                self._cross += np.outer(r, r)
+                self._count += 1
+                if self._count % self.window == 0:
+                    self._rebase()
+            self._last_close = closes
+            self.last_time = open_time
+
+    def _rebase(self):
+        """用窗口内的收益率重算累计和"""
+        data = self._returns[:len(self)]
+        self._sum = data.sum(axis=0)
+        self._cross = data.T @ data
+
+    def sync(self, frames: Dict[str, np.ndarray], now_ms: int) -> int:
+        """
+        用各交易对的 K线列矩阵推进到最新的已收盘 K线
+
+        只使用所有交易对都有的开盘时间；首次调用取最近 window + 1 根，之后只推入比上次更新的 K线
+
+        Args:
+            frames: {交易对: (len(COLUMNS), n) 列矩阵}，需包含全部 symbols
+            now_ms: 当前时间（毫秒），收盘时间不早于它的 K线视为未收盘
+
+        Returns:
+            推入的 K线数量
+        """
+        closed = {}
+        for symbol in self.symbols:
+            columns = frames[symbol]
+            mask = columns[_COL['close_time']] < now_ms
+            closed[symbol] = (columns[_COL['open_time'], mask].astype(np.int64), columns[_COL['close'], mask])
+        times = closed[self.symbols[0]][0]
+        for symbol in self.symbols[1:]:
+            times = np.intersect1d(times, closed[symbol][0], assume_unique=True)
+        if self.last_time is not None:
+            times = times[times > self.last_time]
+        else:
+            times = times[-(self.window + 1):]
+        if not len(times):
+            return 0
+
+        closes = np.empty((len(times), len(self.symbols)))
+        for j, symbol in enumerate(self.symbols):
+            open_time, close = closed[symbol]
+            closes[:, j] = close[np.searchsorted(open_time, times)]
+        for t, row in zip(times, closes):
+            self.push(row, int(t))
+        return len(times)
+
+    def matrix(self) -> Optional[np.ndarray]:
+        """
+        当前相关性矩阵（k×k），样本不足时返回 None
+
+        收益率为常数的交易对与其他交易对的相关性记为 0
+        """
+        with self._lock:
+            n = len(self)
+            if n < self.MIN_OBSERVATIONS:
+                return None
+            mean = self._sum / n
+            cov = self._cross / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        scale = np.outer(std, std)
+        corr = np.divide(cov, scale, out=np.zeros_like(cov), where=scale > 0)
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+    def correlations(self, symbol: str) -> Optional[Dict[str, float]]:
+        """symbol 与各交易对的相关性 {交易对: 相关系数}，未跟踪或样本不足时返回 None"""
+        i = self._index.get(symbol.upper())
+        corr = self.matrix()
+        if i is None or corr is None:
+            return None
+        return {s: float(corr[i, j]) for j, s in enumerate(self.symbols)}
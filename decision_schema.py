@@ -0,0 +1,189 @@
+"""
+AI 交易决策的结构化输出
+DECISION_SCHEMA 作为 Ollama 请求的 format 参数，约束模型只能生成符合该 JSON Schema 的对象；
+parse_decision 按 Schema 严格解析为 Decision，只有严格解析失败时才用 repair_decision
+从带说明文字/代码块/多余字段的回复中提取并规范化。解析结果计入 DecisionParseMetrics
+"""
+
+import json
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+from llm_stream import JsonObjectScanner
+
+
+ACTIONS = ('OPEN_LONG', 'OPEN_SHORT', 'CLOSE', 'CLOSE_LONG', 'CLOSE_SHORT', 'ROLL', 'HOLD')
+
+# 常见的非标准写法 -> 标准操作
+ACTION_ALIASES = {
+    'LONG': 'OPEN_LONG', 'BUY': 'OPEN_LONG', 'OPENLONG': 'OPEN_LONG',
+    'SHORT': 'OPEN_SHORT', 'SELL': 'OPEN_SHORT', 'OPENSHORT': 'OPEN_SHORT',
+    'CLOSE_ALL': 'CLOSE', 'EXIT': 'CLOSE',
+    'WAIT': 'HOLD', 'NONE': 'HOLD',
+}
+
+DECISION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'action': {'type': 'string', 'enum': list(ACTIONS)},
+        'confidence': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+        'reasoning': {'type': 'string'},
+        'leverage': {'type': 'integer', 'minimum': 1, 'maximum': 125},
+        'position_size': {'type': 'number', 'minimum': 0, 'maximum': 100},
+        'stop_loss_pct': {'type': 'number', 'minimum': 0},
+        'take_profit_pct': {'type': 'number', 'minimum': 0},
+        'close_percentage': {'type': 'number', 'minimum': 0, 'maximum': 100},
+    },
+    'required': ['action', 'confidence', 'reasoning', 'leverage', 'position_size'],
+}
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+class DecisionParseError(ValueError):
+    """回复不是符合 Schema 的决策"""
+
+
+@dataclass
+class Decision:
+    """AI 交易决策"""
+    action: str
+    confidence: int
+    reasoning: str
+    leverage: int = 10
+    position_size: float = 30           # 仓位（余额百分比）
+    stop_loss_pct: float = 3
+    take_profit_pct: float = 8
+    close_percentage: float = 100       # 平仓比例（百分比）
+    narrative: str = ''
+
+    def to_dict(self) -> Dict:
+        """交易引擎使用的决策字典"""
+        data = asdict(self)
+        data['narrative'] = self.narrative or self.reasoning
+        return data
+
+
+def _check(name: str, value, expected):
+    """按 Schema 检查数值字段的类型和范围"""
+    spec = DECISION_SCHEMA['properties'][name]
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise DecisionParseError(f"{name} 类型应为 {spec['type']}: {value!r}")
+    low, high = spec.get('minimum'), spec.get('maximum')
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise DecisionParseError(f"{name} 超出范围 [{low}, {high}]: {value!r}")
+    return value
+
+
+def validate_decision(data) -> Decision:
+    """按 DECISION_SCHEMA 校验字典并构造 Decision（不做任何类型转换）"""
+    if not isinstance(data, dict):
+        raise DecisionParseError(f"决策应为 JSON 对象: {type(data).__name__}")
+    missing = [name for name in DECISION_SCHEMA['required'] if name not in data]
+    if missing:
+        raise DecisionParseError(f"缺少字段: {', '.join(missing)}")
+    if data['action'] not in ACTIONS:
+        raise DecisionParseError(f"未知操作: {data['action']!r}")
+    if not isinstance(data['reasoning'], str):
+        raise DecisionParseError(f"reasoning 类型应为 string: {data['reasoning']!r}")
+
+    fields = {'action': data['action'], 'reasoning': data['reasoning'],
+              'confidence': _check('confidence', data['confidence'], int),
+              'leverage': _check('leverage', data['leverage'], int),
+              'position_size': _check('position_size', data['position_size'], (int, float))}
+    for name in ('stop_loss_pct', 'take_profit_pct', 'close_percentage'):
+        if data.get(name) is not None:
+            fields[name] = _check(name, data[name], (int, float))
+    if isinstance(data.get('narrative'), str):
+        fields['narrative'] = data['narrative']
+    return Decision(**fields)
+
+
+def parse_decision(text: str) -> Decision:
+    """严格解析：整段回复必须是一个符合 Schema 的 JSON 对象"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise DecisionParseError(f"不是合法的 JSON: {e}") from e
+    return validate_decision(data)
+
+
+def _number(value, integer: bool = False):
+    """'85'、'85%'、'20x'、85.0 -> 数值；无法转换时返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        value = float(match.group()) if match else None
+    if not isinstance(value, (int, float)):
+        return None
+    return int(round(value)) if integer else float(value)
+
+
+def repair_decision(text: str) -> Decision:
+    """
+    修复解析：提取回复中的第一个完整 JSON 对象（可嵌套，可被说明文字或代码块包围），
+    规范化字段名、操作名和数值，缺失的可选字段取默认值、越界的数值截断到 Schema 范围
+
+    Raises:
+        DecisionParseError: 回复中没有 JSON 对象或无法识别操作
+    """
+    scanner = JsonObjectScanner()
+    if scanner.feed(text or '') is None:
+        raise DecisionParseError("回复中没有完整的 JSON 对象")
+    data = {str(k).strip().lower(): v for k, v in scanner.value.items()}
+
+    action = str(data.get('action', '')).strip().upper().replace(' ', '_').replace('-', '_')
+    action = ACTION_ALIASES.get(action, action)
+    if action not in ACTIONS:
+        raise DecisionParseError(f"未知操作: {data.get('action')!r}")
+
+    properties = DECISION_SCHEMA['properties']
+    defaults = Decision(action=action, confidence=50, reasoning='')
+    fields = {'action': action}
+    for name in ('confidence', 'leverage', 'position_size', 'stop_loss_pct', 'take_profit_pct', 'close_percentage'):
+        spec = properties[name]
+        value = _number(data.get(name), integer=spec['type'] == 'integer')
+        if value is None:
+            value = getattr(defaults, name)
+        fields[name] = min(max(value, spec.get('minimum', value)), spec.get('maximum', value))
+    reasoning = data.get('reasoning', data.get('narrative', ''))
+    fields['reasoning'] = reasoning if isinstance(reasoning, str) else json.dumps(reasoning, ensure_ascii=False)
+    if isinstance(data.get('narrative'), str):
+        fields['narrative'] = data['narrative']
+    return Decision(**fields)
+
+
+class DecisionParseMetrics:
+    """决策解析统计：严格解析成功、修复后成功、失败的次数和失败率"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.strict = 0
+        self.repaired = 0
+        self.failed = 0
+
+    def record(self, outcome: str):
+        """outcome: 'strict' / 'repaired' / 'failed'"""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    @property
+    def total(self) -> int:
+        return self.strict + self.repaired + self.failed
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failed / self.total if self.total else 0.0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'total': self.total,
+                'strict': self.strict,
+                'repaired': self.repaired,
+                'failed': self.failed,
+                'failure_rate': round(self.failure_rate, 4),
+            }
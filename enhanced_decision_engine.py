@@ -130,13 +130,16 @@ CURRENT MARKET STATE FOR ALL COINS
 
 """
 
+        # 全部交易对的市场上下文一次批量计算
+        logger.info(f"正在生成 {len(symbols)} 个交易对的市场数据...")
+        contexts, errors = self.market_analyzer.get_comprehensive_market_contexts(symbols)
+
         # 为每个交易对生成数据
         for symbol in symbols:
             try:
-                logger.info(f"正在生成 {symbol} 的市场数据...")
-
-                # 获取完整市场上下文
-                market_context = self.market_analyzer.get_comprehensive_market_context(symbol)
+                if symbol in errors:
+                    raise errors[symbol]
+                market_context = contexts[symbol]
 
                 snapshot = market_context['current_snapshot']
                 intraday = market_context['intraday_series']
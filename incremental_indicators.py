@@ -0,0 +1,201 @@
+"""
+流式技术指标
+每个 (交易对, 周期) 保存各指标的递推状态（EMA 值、滚动窗口和/平方和、上一根收盘价），
+K线收盘时 O(1) 提交，未收盘 K线的每个 tick 在已提交状态上 O(1) 预览而不修改状态。
+数值与 MarketAnalyzer 中 pandas 版本的 calculate_* 在相同输入序列上一致（SMA 型 RSI/ATR、
+adjust=False 的 EMA、ddof=1 的布林带标准差），计算量与回看长度无关
+"""
+
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+
+NAN = float('nan')
+
+
+class _Ema:
+    """pandas ewm(span=period, adjust=False)：y0 = x0，yt = yt-1 + α(xt - yt-1)"""
+
+    def __init__(self, period: int):
+        self.alpha = 2 / (period + 1)
+        self.value: Optional[float] = None
+
+    def peek(self, x: float) -> float:
+        if self.value is None:
+            return x
+        return self.value + self.alpha * (x - self.value)
+
+    def push(self, x: float) -> float:
+        self.value = self.peek(x)
+        return self.value
+
+
+class _Rolling:
+    """
+    固定窗口的滚动均值/样本标准差（窗口未满时为 NaN，与 pandas rolling 的 min_periods 一致）
+
+    和与平方和减去首个样本值以降低相消误差，并定期按窗口重新求和，避免浮点误差累积
+    """
+
+    RESUM_EVERY = 1000
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window: deque = deque()
+        self.shift: Optional[float] = None
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._pushes = 0
+
+    def _with(self, x: float) -> Tuple[float, float, int, float]:
+        shift = x if self.shift is None else self.shift
+        d = x - shift
+        total, total_sq, n = self.sum + d, self.sumsq + d * d, len(self.window) + 1
+        if n > self.period:
+            old = self.window[0]
+            total -= old
+            total_sq -= old * old
+            n -= 1
+        return total, total_sq, n, shift
+
+    def _stats(self, total: float, total_sq: float, n: int, shift: float) -> Tuple[float, float]:
+        if n < self.period:
+            return NAN, NAN
+        mean = shift + total / n
+        if n < 2:
+            return mean, NAN
+        var = (total_sq - total * total / n) / (n - 1)
+        return mean, math.sqrt(var) if var > 0 else 0.0
+
+    def peek(self, x: float) -> Tuple[float, float]:
+        """(均值, 标准差)"""
+        return self._stats(*self._with(x))
+
+    def push(self, x: float) -> Tuple[float, float]:
+        total, total_sq, n, shift = self._with(x)
+        self.shift = shift
+        self.window.append(x - shift)
+        if len(self.window) > self.period:
+            self.window.popleft()
+        self._pushes += 1
+        if self._pushes % self.RESUM_EVERY == 0:
+            total = math.fsum(self.window)
+            total_sq = math.fsum(d * d for d in self.window)
+        self.sum, self.sumsq = total, total_sq
+        return self._stats(total, total_sq, n, shift)
+
+
+def _rsi(gain: float, loss: float) -> float:
+    """100 - 100 / (1 + gain/loss)，除零规则与 pandas 相同"""
+    if math.isnan(gain) or math.isnan(loss):
+        return NAN
+    if loss == 0:
+        return 100.0 if gain > 0 else NAN
+    return 100 - 100 / (1 + gain / loss)
+
+
+class IncrementalIndicators:
+    """单个 (交易对, 周期) 的流式指标"""
+
+    def __init__(self, sma_periods: Iterable[int] = (20, 50), ema_periods: Iterable[int] = (12, 20, 26, 50),
+                 rsi_periods: Iterable[int] = (7, 14), atr_periods: Iterable[int] = (3, 14),
+                 macd: Tuple[int, int, int] = (12, 26, 9), bollinger: Tuple[int, float] = (20, 2)):
+        self.sma_periods = tuple(sma_periods)
+        self.ema_periods = tuple(ema_periods)
+        self.rsi_periods = tuple(rsi_periods)
+        self.atr_periods = tuple(atr_periods)
+        self.macd_periods = macd
+        self.bollinger = bollinger
+        self.reset()
+
+    def reset(self):
+        """清空全部递推状态"""
+        self._sma = {p: _Rolling(p) for p in self.sma_periods}
+        self._ema = {p: _Ema(p) for p in self.ema_periods}
+        self._gain = {p: _Rolling(p) for p in self.rsi_periods}
+        self._loss = {p: _Rolling(p) for p in self.rsi_periods}
+        self._atr = {p: _Rolling(p) for p in self.atr_periods}
+        fast, slow, signal = self.macd_periods
+        self._macd_fast, self._macd_slow, self._macd_signal = _Ema(fast), _Ema(slow), _Ema(signal)
+        self._bands = _Rolling(self.bollinger[0])
+        self._prev_close: Optional[float] = None
+        self._histogram = NAN          # 最近一根已提交 K线的 MACD 柱
+        self.last_open_time: Optional[float] = None
+        self.count = 0
+        self.values: Dict[str, float] = {}
+
+    def update(self, high: float, low: float, close: float, closed: bool = True) -> Dict[str, float]:
+        """
+        推进一根 K线
+
+        Args:
+            closed: True 时提交状态（K线已收盘）；False 时只在已提交状态上计算当前 tick 的指标值
+
+        Returns:
+            当前各指标值
+        """
+        step = 'push' if closed else 'peek'
+        prev_close = self._prev_close
+        values = {'price': close}
+
+        for p, rolling in self._sma.items():
+            values[f'sma_{p}'] = getattr(rolling, step)(close)[0]
+        for p, ema in self._ema.items():
+            values[f'ema_{p}'] = getattr(ema, step)(close)
+
+        # 与 pandas 的 diff().where(...) 一致：第一根 K线的涨跌记为 0
+        delta = close - prev_close if prev_close is not None else 0.0
+        for p in self.rsi_periods:
+            gain = getattr(self._gain[p], step)(max(delta, 0.0))[0]
+            loss = getattr(self._loss[p], step)(max(-delta, 0.0))[0]
+            values[f'rsi_{p}'] = _rsi(gain, loss)
+
+        true_range = high - low
+        if prev_close is not None:
+            true_range = max(true_range, abs(high - prev_close), abs(low - prev_close))
+        for p, rolling in self._atr.items():
+            values[f'atr_{p}'] = getattr(rolling, step)(true_range)[0]
+
+        macd = getattr(self._macd_fast, step)(close) - getattr(self._macd_slow, step)(close)
+        signal = getattr(self._macd_signal, step)(macd)
+        values['macd'] = macd
+        values['macd_signal'] = signal
+        values['macd_histogram'] = macd - signal
+        values['prev_macd_histogram'] = self._histogram
+
+        middle, std = getattr(self._bands, step)(close)
+        width = self.bollinger[1] * std
+        values['bb_upper'] = middle + width
+        values['bb_middle'] = middle
+        values['bb_lower'] = middle - width
+
+        if closed:
+            self._prev_close = close
+            self._histogram = values['macd_histogram']
+            self.count += 1
+        self.values = values
+        return values
+
+    def sync(self, columns, now_ms: float) -> Dict[str, float]:
+        """
+        用 K线列矩阵（kline_store.COLUMNS 顺序）推进状态：已提交之后新收盘的 K线逐根提交，
+        未收盘的最后一根按 tick 预览。窗口与已提交状态没有重叠（断档）时从窗口起点重新计算
+
+        Args:
+            columns: (len(COLUMNS), n) 的 K线列矩阵
+            now_ms: 当前时间（毫秒），收盘时间早于它的 K线视为已收盘
+        """
+        open_time, high, low, close, close_time = columns[0], columns[2], columns[3], columns[4], columns[6]
+        if not len(open_time):
+            return self.values
+        if self.last_open_time is not None and open_time[0] > self.last_open_time:
+            self.reset()
+        for i in range(len(open_time)):
+            if self.last_open_time is not None and open_time[i] <= self.last_open_time:
+                continue
+            closed = close_time[i] < now_ms
+            self.update(float(high[i]), float(low[i]), float(close[i]), closed=closed)
+            if closed:
+                self.last_open_time = open_time[i]
+        return self.values
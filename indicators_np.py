@@ -0,0 +1,123 @@
+"""
+NumPy 技术指标内核
+输入为连续的 float64 数组，整段向量化计算，没有 pandas 对象的构造和对齐开销，
+适合每轮循环对 10~100 根 K线的小窗口反复计算。所有内核沿最后一维计算，
+传入 (交易对 × K线) 的二维矩阵时一次算出全部交易对的指标。数值与 MarketAnalyzer 的 pandas 版本一致：
+EMA 为 adjust=False 递推，RSI/ATR 为简单移动平均型，布林带标准差 ddof=1；窗口未满的位置为 NaN
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_array(x) -> np.ndarray:
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def ewm(x, alpha: float) -> np.ndarray:
+    """
+    y0 = x0，yt = (1-α)·yt-1 + α·xt 的闭式向量化解
+
+    分块内 yt = β^t·(y0 + Σ α·xk·β^-k)（β = 1-α），块长度按 β^-k 不溢出、不失精度选取，
+    块之间传递最后一个值
+    """
+    x = _as_array(x)
+    n = x.shape[-1]
+    out = np.empty(x.shape)
+    if n == 0:
+        return out
+    beta = 1.0 - alpha
+    if beta <= 0:
+        out[...] = x
+        return out
+    block = max(1, min(n, int(100 / -math.log(beta))))
+    powers = beta ** np.arange(1, block + 1)
+    y = x[..., :1]
+    out[..., :1] = y
+    start = 1
+    while start < n:
+        end = min(start + block, n)
+        p = powers[:end - start]
+        out[..., start:end] = p * y + alpha * p * np.cumsum(x[..., start:end] / p, axis=-1)
+        y = out[..., end - 1:end]
+        start = end
+    return out
+
+
+def ema(x, period: int) -> np.ndarray:
+    """指数移动平均（pandas ewm(span=period, adjust=False)）"""
+    return ewm(x, 2.0 / (period + 1))
+
+
+def sma(x, period: int) -> np.ndarray:
+    """简单移动平均（pandas rolling(period).mean()）"""
+    x = _as_array(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        out[..., period - 1:] = sliding_window_view(x, period, axis=-1).mean(axis=-1)
+    return out
+
+
+def rolling_std(x, period: int, ddof: int = 1) -> np.ndarray:
+    """滚动标准差（pandas rolling(period).std()，ddof=1）"""
+    x = _as_array(x)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period and period > ddof:
+        out[..., period - 1:] = sliding_window_view(x, period, axis=-1).std(axis=-1, ddof=ddof)
+    return out
+
+
+def rsi(close, period: int = 14, wilder: bool = False) -> np.ndarray:
+    """
+    RSI
+
+    Args:
+        wilder: False 时为涨跌幅的简单移动平均（与 MarketAnalyzer.calculate_rsi 一致），
+                True 时为 Wilder 平滑（α = 1/period）
+    """
+    close = _as_array(close)
+    delta = np.zeros(close.shape)
+    delta[..., 1:] = np.diff(close, axis=-1)
+    gain = np.maximum(delta, 0.0)
+    loss = np.maximum(-delta, 0.0)
+    if wilder:
+        avg_gain, avg_loss = ewm(gain, 1.0 / period), ewm(loss, 1.0 / period)
+        avg_gain[..., :period - 1] = np.nan
+        avg_loss[..., :period - 1] = np.nan
+    else:
+        avg_gain, avg_loss = sma(gain, period), sma(loss, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(MACD线, 信号线, 柱状图)"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """真实波幅；第一根没有前收盘价，取最高价-最低价"""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    tr = high - low
+    if close.shape[-1] > 1:
+        prev = close[..., :-1]
+        tr[..., 1:] = np.maximum(tr[..., 1:], np.maximum(np.abs(high[..., 1:] - prev),
+                                                         np.abs(low[..., 1:] - prev)))
+    return tr
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """平均真实波幅（真实波幅的简单移动平均，与 MarketAnalyzer.calculate_atr 一致）"""
+    return sma(true_range(high, low, close), period)
+
+
+def bollinger_bands(close, period: int = 20, std_dev: float = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(上轨, 中轨, 下轨)"""
+    middle = sma(close, period)
+    width = rolling_std(close, period) * std_dev
+    return middle + width, middle, middle - width
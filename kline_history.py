@@ -0,0 +1,337 @@
+"""
+K线历史落盘存储
+每个 (交易对, 周期) 一个目录，每个字段一个只追加的 float64 列文件（kline_store.COLUMNS 顺序），
+读取时按列内存映射，只有实际访问的页才会载入内存；meta.json 记录已提交的行数和时间索引
+（连续区段的起始行与起始开盘时间），按时间定位行号只需在区段列表上二分。
+只保存已收盘的 K线：重启时先从磁盘恢复窗口、只补拉停机期间的 K线，回测/研究可直接读取多年数据。
+
+命令行：
+  python kline_history.py backfill --symbols BTCUSDT,ETHUSDT --intervals 1m --days 30
+  python kline_history.py info
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kline_store import COLUMNS, parse_klines
+
+
+_OPEN_TIME, _CLOSE_TIME = COLUMNS.index('open_time'), COLUMNS.index('close_time')
+
+
+class KlineHistory:
+    """按列存储、内存映射读取的 K线历史"""
+
+    META_FILE = 'meta.json'
+    PAGE_LIMIT = 1500       # 回填时单次 K线请求的 limit
+
+    def __init__(self, directory: str = 'kline_history'):
+        """
+        初始化 K线历史存储
+
+        Args:
+            directory: 存储根目录
+        """
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._meta: Dict[Tuple[str, str], Dict] = {}
+        self._maps: Dict[Tuple[str, str], Tuple[int, Dict[str, np.memmap]]] = {}
+
+    # ========== 元数据与时间索引 ==========
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.directory, symbol.upper(), interval)
+
+    def _column_path(self, symbol: str, interval: str, name: str) -> str:
+        return os.path.join(self._dir(symbol, interval), f'{name}.f8')
+
+    def _load_meta(self, symbol: str, interval: str) -> Dict:
+        key = (symbol.upper(), interval)
+        meta = self._meta.get(key)
+        if meta is None:
+            path = os.path.join(self._dir(symbol, interval), self.META_FILE)
+            try:
+                with open(path, 'r') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {'count': 0, 'step_ms': 0, 'segments': []}
+            self._meta[key] = meta
+        return meta
+
+    def _save_meta(self, symbol: str, interval: str, meta: Dict):
+        path = os.path.join(self._dir(symbol, interval), self.META_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+        self._meta[(symbol.upper(), interval)] = meta
+
+    @staticmethod
+    def _segments(open_time: np.ndarray, step_ms: int, first_row: int = 0) -> List[List[int]]:
+        """连续区段 [[起始行, 起始开盘时间], ...]：相邻 K线开盘时间相差不等于一个周期处断开"""
+        if not len(open_time):
+            return []
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(open_time) != step_ms) + 1))
+        return [[first_row + int(i), int(open_time[i])] for i in starts]
+
+    def count(self, symbol: str, interval: str) -> int:
+        """已保存的 K线数量"""
+        with self._lock:
+            return self._load_meta(symbol, interval)['count']
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """最后一根已保存 K线的开盘时间"""
+        with self._lock:
+            meta = self._load_meta(symbol, interval)
+            if not meta['count']:
+                return None
+            row, start = meta['segments'][-1]
+            return start + (meta['count'] - 1 - row) * meta['step_ms']
+
+    def first_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """第一根已保存 K线的开盘时间"""
+        with self._lock:
+            meta = self._load_meta(symbol, interval)
+            return meta['segments'][0][1] if meta['count'] else None
+
+    def locate(self, symbol: str, interval: str, open_time: int) -> int:
+        """开盘时间不早于 open_time 的第一行的行号（与 searchsorted 的 left 语义一致）"""
+        with self._lock:
+            meta = self._load_meta(symbol, interval)
+            segments, step = meta['segments'], meta['step_ms']
+            if not meta['count']:
+                return 0
+            i = bisect.bisect_right([s[1] for s in segments], open_time) - 1
+            if i < 0:
+                return 0
+            row, start = segments[i]
+            end = segments[i + 1][0] if i + 1 < len(segments) else meta['count']
+            return min(row + -(-(open_time - start) // step), end)
+
+    def gaps(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        """已保存范围内缺失的开盘时间区间 [(起, 止), ...]（闭区间）"""
+        with self._lock:
+            meta = self._load_meta(symbol, interval)
+            segments, step = meta['segments'], meta['step_ms']
+            result = []
+            for (row, start), (next_row, next_start) in zip(segments, segments[1:]):
+                last = start + (next_row - 1 - row) * step
+                result.append((last + step, next_start - step))
+            return result
+
+    # ========== 读取 ==========
+
+    def columns(self, symbol: str, interval: str) -> Dict[str, np.ndarray]:
+        """按列名返回全部已保存 K线的只读内存映射（不载入内存）"""
+        key = (symbol.upper(), interval)
+        with self._lock:
+            count = self._load_meta(symbol, interval)['count']
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == count:
+                return cached[1]
+            if not count:
+                maps = {name: np.empty(0) for name in COLUMNS}
+            else:
+                maps = {name: np.memmap(self._column_path(symbol, interval, name), dtype=np.float64,
+                                        mode='r', shape=(count,))
+                        for name in COLUMNS}
+            self._maps[key] = (count, maps)
+            return maps
+
+    def read(self, symbol: str, interval: str, start: int = None, end: int = None,
+             limit: int = None) -> np.ndarray:
+        """
+        读取 K线列矩阵
+
+        Args:
+            start: 起始开盘时间（含），为空时从头开始
+            end: 结束开盘时间（含），为空时到最后一根
+            limit: 只取范围内最后 limit 根
+
+        Returns:
+            (len(COLUMNS), n) 的列矩阵（只拷贝所选范围）
+        """
+        with self._lock:
+            maps = self.columns(symbol, interval)
+            count = len(maps[COLUMNS[0]])
+            lo = self.locate(symbol, interval, start) if start is not None else 0
+            hi = self.locate(symbol, interval, end + 1) if end is not None else count
+            if limit is not None:
+                lo = max(lo, hi - limit)
+            return np.stack([maps[name][lo:hi] for name in COLUMNS]) if hi > lo \
+                else np.empty((len(COLUMNS), 0))
+
+    # ========== 写入 ==========
+
+    def append(self, symbol: str, interval: str, columns: np.ndarray, now_ms: int = None) -> int:
+        """
+        追加已收盘的 K线：只写入比最后一根已保存 K线更新、且收盘时间早于 now_ms 的行，
+        不连续时在时间索引中开始新区段
+
+        Args:
+            columns: (len(COLUMNS), n) 的列矩阵，按开盘时间升序
+            now_ms: 当前时间（毫秒），默认本地时间
+
+        Returns:
+            写入的行数
+        """
+        if not columns.shape[1]:
+            return 0
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock:
+            meta = self._load_meta(symbol, interval)
+            last = self.last_open_time(symbol, interval)
+            open_time = columns[_OPEN_TIME]
+            lo = 0 if last is None else int(np.searchsorted(open_time, last, side='right'))
+            hi = int(np.searchsorted(columns[_CLOSE_TIME], now_ms, side='left'))
+            if hi <= lo:
+                return 0
+            new = np.ascontiguousarray(columns[:, lo:hi])
+            step = meta['step_ms'] or int(new[_CLOSE_TIME, 0] - new[_OPEN_TIME, 0] + 1)
+            os.makedirs(self._dir(symbol, interval), exist_ok=True)
+            for i, name in enumerate(COLUMNS):
+                path = self._column_path(symbol, interval, name)
+                with open(path, 'ab') as f:
+                    # 上次写入中断时列文件可能比已提交的行数长，先截断
+                    f.truncate(meta['count'] * 8)
+                    new[i].tofile(f)
+            segments = [list(s) for s in meta['segments']]
+            added = self._segments(new[_OPEN_TIME], step, meta['count'])
+            if segments and last is not None and added[0][1] == last + step:
+                added = added[1:]
+            # 列文件写完后再提交元数据，中途失败时多写的部分不可见
+            self._save_meta(symbol, interval, {'count': meta['count'] + new.shape[1], 'step_ms': step,
+                                               'segments': segments + added})
+            return new.shape[1]
+
+    def rewrite(self, symbol: str, interval: str, columns: np.ndarray):
+        """用完整的列矩阵替换已保存的数据（回填更早的历史或补齐中间断档时使用）"""
+        with self._lock:
+            order = np.argsort(columns[_OPEN_TIME], kind='stable')
+            columns = columns[:, order]
+            keep = np.concatenate((np.diff(columns[_OPEN_TIME]) != 0, [True])) if columns.shape[1] else []
+            columns = np.ascontiguousarray(columns[:, keep])
+            os.makedirs(self._dir(symbol, interval), exist_ok=True)
+            for i, name in enumerate(COLUMNS):
+                path = self._column_path(symbol, interval, name)
+                columns[i].tofile(path + '.tmp')
+                os.replace(path + '.tmp', path)
+            step = int(columns[_CLOSE_TIME, 0] - columns[_OPEN_TIME, 0] + 1) if columns.shape[1] else 0
+            self._maps.pop((symbol.upper(), interval), None)
+            self._save_meta(symbol, interval, {'count': columns.shape[1], 'step_ms': step,
+                                               'segments': self._segments(columns[_OPEN_TIME], step)})
+
+    # ========== 回填 ==========
+
+    def _fetch_range(self, client, symbol: str, interval: str, start: int, end: int) -> np.ndarray:
+        """按 startTime 向后分页请求 [start, end] 范围内的 K线"""
+        pages = []
+        while start <= end:
+            rows = client.get_futures_klines(symbol, interval, self.PAGE_LIMIT, start_time=start, endTime=end)
+            if not rows:
+                break
+            pages.append(parse_klines(rows))
+            if len(rows) < self.PAGE_LIMIT:
+                break
+            start = int(rows[-1][0]) + 1
+        return np.concatenate(pages, axis=1) if pages else np.empty((len(COLUMNS), 0))
+
+    def backfill(self, client, symbol: str, interval: str, start_ms: int, now_ms: int = None) -> Dict:
+        """
+        从 REST 补齐 [start_ms, 现在] 范围内缺失的已收盘 K线：早于已保存范围的部分、
+        中间的断档和最后一根之后的部分。只缺尾部时直接追加，否则合并后整体重写
+
+        Returns:
+            {'fetched': 下载的 K线数量, 'count': 保存后的总数, 'gaps': 剩余断档数}
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        first, last = self.first_open_time(symbol, interval), self.last_open_time(symbol, interval)
+        ranges = []
+        if first is None:
+            ranges.append((start_ms, now_ms))
+        else:
+            if start_ms < first:
+                ranges.append((start_ms, first - 1))
+            ranges.extend(self.gaps(symbol, interval))
+            ranges.append((last + 1, now_ms))
+        fetched = [self._fetch_range(client, symbol, interval, lo, hi) for lo, hi in ranges]
+        total = sum(c.shape[1] for c in fetched)
+        if len(ranges) == 1:
+            # 新建或只缺尾部
+            self.append(symbol, interval, fetched[0], now_ms)
+        elif total:
+            closed = [c[:, c[_CLOSE_TIME] < now_ms] for c in fetched]
+            self.rewrite(symbol, interval, np.concatenate([self.read(symbol, interval)] + closed, axis=1))
+        return {'fetched': total, 'count': self.count(symbol, interval), 'gaps': len(self.gaps(symbol, interval))}
+
+    def info(self) -> List[Dict]:
+        """所有已保存的 (交易对, 周期) 的概况"""
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for symbol in sorted(os.listdir(self.directory)):
+            symbol_dir = os.path.join(self.directory, symbol)
+            if not os.path.isdir(symbol_dir):
+                continue
+            for interval in sorted(os.listdir(symbol_dir)):
+                count = self.count(symbol, interval)
+                if count:
+                    result.append({'symbol': symbol, 'interval': interval, 'count': count,
+                                   'first': self.first_open_time(symbol, interval),
+                                   'last': self.last_open_time(symbol, interval),
+                                   'gaps': len(self.gaps(symbol, interval))})
+        return result
+
+
+def _format_ms(ms: Optional[int]) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.gmtime(ms / 1000)) if ms is not None else '-'
+
+
+def main():
+    """命令行接口"""
+    import config
+
+    parser = argparse.ArgumentParser(description='K线历史落盘存储')
+    parser.add_argument('command', choices=['backfill', 'info'])
+    parser.add_argument('--symbols', default=','.join(config.Trading.TRADING_SYMBOLS), help='逗号分隔的交易对')
+    parser.add_argument('--intervals', default='1m', help='逗号分隔的周期')
+    parser.add_argument('--days', type=float, default=30, help='回填的天数')
+    parser.add_argument('--directory', default=config.KlineHistory.DIRECTORY, help='存储目录')
+    args = parser.parse_args()
+
+    history = KlineHistory(args.directory)
+    if args.command == 'info':
+        rows = history.info()
+        if not rows:
+            print("没有已保存的K线")
+        for row in rows:
+            print(f"{row['symbol']:<12} {row['interval']:<4} {row['count']:>10} 根  "
+                  f"{_format_ms(row['first'])} ~ {_format_ms(row['last'])}  断档 {row['gaps']}")
+        return
+
+    from binance_client import BinanceClient
+    client = BinanceClient(api_key=config.Binance.API_KEY, api_secret=config.Binance.API_SECRET,
+                           testnet=config.Binance.TESTNET, using_v2ray=config.Binance.USING_V2RAY,
+                           v2ray_port=config.Binance.V2RAY_PORT)
+    start_ms = int((time.time() - args.days * 86400) * 1000)
+    try:
+        for symbol in args.symbols.split(','):
+            for interval in args.intervals.split(','):
+                result = history.backfill(client, symbol.strip().upper(), interval.strip(), start_ms)
+                print(f"✅ {symbol} {interval}: 下载 {result['fetched']} 根，共 {result['count']} 根，"
+                      f"断档 {result['gaps']}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+K线本地重采样
+每个交易对只维护一条 1分钟基础序列（冷启动时用 REST 分页回填，之后由数据流或增量请求推进），
+3m/1h/4h 等更高周期按交易所的周期边界（open_time // 周期 * 周期）在本地聚合 OHLCV。
+所有周期来自同一份基础数据，彼此一致；每轮循环的 K线请求从每个周期一次降为每个交易对一次
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from kline_store import COLUMNS, KlineStore
+
+
+# 各周期的毫秒数
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000,
+}
+
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+_SUMMED = [_COL[name] for name in ('volume', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote')]
+
+
+def resample(columns: np.ndarray, step_ms: int) -> np.ndarray:
+    """
+    把基础周期的列矩阵聚合为 step_ms 周期
+
+    开盘价取首根、收盘价取末根、最高/最低取极值，成交量、成交额、笔数和主动买入量求和，
+    收盘时间为周期结束前 1 毫秒。第一个周期缺少开头部分（在窗口起点之前）时丢弃；
+    最后一个周期可以不完整，即当前未收盘的 K线（与交易所返回的最后一根一致）
+
+    Args:
+        columns: (len(COLUMNS), n) 的基础周期列矩阵，按开盘时间升序
+        step_ms: 目标周期（毫秒）
+
+    Returns:
+        (len(COLUMNS), m) 的新列矩阵
+    """
+    n = columns.shape[1]
+    if not n:
+        return np.empty((len(COLUMNS), 0))
+    open_time = columns[_COL['open_time']]
+    bucket = open_time // step_ms * step_ms
+    starts = np.flatnonzero(np.diff(bucket)) + 1
+    if open_time[0] == bucket[0]:
+        starts = np.concatenate(([0], starts))
+    if not len(starts):
+        return np.empty((len(COLUMNS), 0))
+    ends = np.append(starts[1:], n) - 1
+
+    out = np.empty((len(COLUMNS), len(starts)))
+    out[_COL['open_time']] = bucket[starts]
+    out[_COL['open']] = columns[_COL['open'], starts]
+    out[_COL['high']] = np.maximum.reduceat(columns[_COL['high']], starts)
+    out[_COL['low']] = np.minimum.reduceat(columns[_COL['low']], starts)
+    out[_COL['close']] = columns[_COL['close'], ends]
+    out[_COL['close_time']] = bucket[starts] + step_ms - 1
+    out[_SUMMED] = np.add.reduceat(columns[_SUMMED], starts, axis=1)
+    return out
+
+
+class ResampledKlineStore(KlineStore):
+    """
+    以 1分钟为基础周期的 K线存储
+
+    能由基础序列覆盖的周期（周期是 1分钟的整数倍，且 limit 根所需的 1分钟 K线不超过基础容量）
+    在本地聚合；其他周期仍按 KlineStore 单独请求
+    """
+
+    BASE_INTERVAL = '1m'
+    DEFAULT_BASE_CAPACITY = 100 * 60    # 覆盖 100 根 1小时 K线（综合上下文的最长回看）
+
+    def __init__(self, client, capacity: int = None, base_capacity: int = None, live_source=None,
+                 history=None):
+        """
+        初始化重采样 K线存储
+
+        Args:
+            client: BinanceClient 实例
+            capacity: 非重采样周期每个 (交易对, 周期) 的容量
+            base_capacity: 每个交易对 1分钟基础序列的容量
+            live_source: 实时 K线来源，见 KlineStore
+            history: K线历史落盘存储，见 KlineStore
+        """
+        super().__init__(client, capacity, live_source, history)
+        self.base_capacity = base_capacity or self.DEFAULT_BASE_CAPACITY
+        # (交易对, 周期, limit) -> (基础缓冲区版本, 聚合结果)
+        self._resampled: Dict[Tuple[str, str, int], Tuple[int, np.ndarray]] = {}
+
+    def _capacity(self, interval: str) -> int:
+        return self.base_capacity if interval == self.BASE_INTERVAL else self.capacity
+
+    def _base_rows(self, interval: str, limit: int) -> Optional[int]:
+        """聚合 limit 根该周期 K线需要的 1分钟 K线数量；不能由基础序列覆盖时返回 None"""
+        step, base = INTERVAL_MS.get(interval), INTERVAL_MS[self.BASE_INTERVAL]
+        if step is None or step <= base or step % base:
+            return None
+        rows = limit * (step // base)
+        return rows if rows <= self.base_capacity else None
+
+    def source_interval(self, interval: str, limit: int) -> str:
+        """读取该周期时实际请求的 K线周期"""
+        return self.BASE_INTERVAL if self._base_rows(interval, limit) is not None else interval
+
+    def get(self, symbol: str, interval: str, limit: int = 100) -> np.ndarray:
+        """
+        获取最近 limit 根 K线；可重采样的周期由 1分钟基础序列聚合
+
+        Returns:
+            (len(COLUMNS), n) 的只读列矩阵（新数组，不随之后的刷新改变），基础序列历史不足时 n < limit
+        """
+        rows = self._base_rows(interval, limit)
+        if rows is None:
+            return super().get(symbol, interval, limit)
+        with self._lock:
+            buffer = self._buffer(symbol, self.BASE_INTERVAL)
+            self._refresh(symbol, self.BASE_INTERVAL, buffer)
+            key = (symbol, interval, limit)
+            cached = self._resampled.get(key)
+            if cached is not None and cached[0] == buffer.version:
+                return cached[1]
+            # 最近 limit×倍数 根 1分钟 K线至少包含 limit 个从边界开始的周期
+            data = resample(buffer.view(rows), INTERVAL_MS[interval])[:, -limit:]
+            data.flags.writeable = False
+            self._resampled[key] = (buffer.version, data)
+            return data
@@ -0,0 +1,262 @@
+"""
+K线增量存储
+每个 (交易对, 周期) 一个固定容量的 NumPy 环形缓冲区。首次读取时回填整个窗口，之后只请求
+比已存最后一根更新的 K线，未收盘的那根原地更新；get() 返回读取时刻的只读快照（拷贝），
+之后的刷新不会改变调用方持有的数据。每轮循环的 K线下载量和解析开销只与新增的几根 K线有关
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# 与 REST K线接口行格式一致的列（去掉最后的 ignore 字段）
+COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+           'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote')
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+
+def parse_klines(rows) -> np.ndarray:
+    """REST K线行（字符串字段）一次遍历转换为 (len(COLUMNS), n) 的 float64 列矩阵"""
+    if not rows:
+        return np.empty((len(COLUMNS), 0))
+    k = len(COLUMNS)
+    values = map(float, itertools.chain.from_iterable(row[:k] for row in rows))
+    return np.fromiter(values, dtype=np.float64, count=len(rows) * k).reshape(-1, k).T
+
+
+class KlineBuffer:
+    """
+    单个 (交易对, 周期) 的环形缓冲区
+
+    每行同时写入 i % capacity 和 i % capacity + capacity 两个位置（长度 2×capacity），
+    因此最近的任意 n ≤ capacity 行在内存中总是连续的，读取无需拼接或拷贝
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros((len(COLUMNS), capacity * 2))
+        self.count = 0          # 累计写入的行数（不受容量限制）
+        self.fetched_at = 0     # 最近一次拉取时的本地时间（毫秒）
+        self.version = 0        # 内容每次变化（追加、原地更新、清空）加一，供派生结果判断是否过期
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        self.count = 0
+        self.version += 1
+
+    def _write(self, index: int, column: np.ndarray):
+        pos = index % self.capacity
+        self._data[:, pos] = column
+        self._data[:, pos + self.capacity] = column
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        if not self.count:
+            return None
+        return int(self._data[0, (self.count - 1) % self.capacity])
+
+    @property
+    def last_close_time(self) -> Optional[int]:
+        if not self.count:
+            return None
+        return int(self._data[_COL['close_time'], (self.count - 1) % self.capacity])
+
+    def extend(self, columns: np.ndarray):
+        """按开盘时间合并：与最后一根相同的原地更新，更新的追加，更旧的忽略"""
+        for j in range(columns.shape[1]):
+            open_time = columns[0, j]
+            last = self.last_open_time
+            if last is not None and open_time == last:
+                pos = (self.count - 1) % self.capacity
+                if not np.array_equal(self._data[:, pos], columns[:, j]):
+                    self._write(self.count - 1, columns[:, j])
+                    self.version += 1
+            elif last is None or open_time > last:
+                self._write(self.count, columns[:, j])
+                self.count += 1
+                self.version += 1
+
+    def view(self, limit: int = None) -> np.ndarray:
+        """
+        最近 limit 行的只读零拷贝视图，形状 (len(COLUMNS), n)
+
+        下次写入时内容会原地改变，只在持有存储锁期间使用（如写历史、重采样），不直接返回给调用方
+        """
+        n = len(self) if limit is None else min(limit, len(self))
+        end = (self.count - 1) % self.capacity + 1 + self.capacity if self.count else self.capacity
+        window = self._data[:, end - n:end]
+        window.flags.writeable = False
+        return window
+
+
+class KlineStore:
+    """按 (交易对, 周期) 维护增量更新的 K线缓冲区"""
+
+    DEFAULT_CAPACITY = 200      # 每个 (交易对, 周期) 保留的 K线数量，须不小于最大的读取 limit
+    FETCH_LIMIT = 99            # 增量请求的 limit（<100 时请求权重为 1）
+    MAX_LIMIT = 1500            # 单次 K线请求的最大 limit，回填更长的窗口时分页
+    MIN_REFRESH_MS = 1000       # 距上次拉取不足该时间时直接读缓冲区（同一轮内的重复读取）
+
+    def __init__(self, client, capacity: int = None, live_source=None, history=None):
+        """
+        初始化 K线存储
+
+        Args:
+            client: BinanceClient 实例
+            capacity: 每个 (交易对, 周期) 的容量
+            live_source: 可选的实时 K线来源 (symbol, interval) -> REST 行格式列表或 None
+                         （如数据流中已收到的 K线），与缓冲区衔接时代替增量 REST 请求
+            history: 可选的 KlineHistory，冷启动时先从磁盘恢复窗口，已收盘的 K线随后写回
+        """
+        self.client = client
+        self.capacity = capacity or self.DEFAULT_CAPACITY
+        self.live_source = live_source
+        self.history = history
+        self.logger = logging.getLogger(__name__)
+        self._buffers: Dict[Tuple[str, str], KlineBuffer] = {}
+        self._lock = threading.Lock()
+        self.stats = {'full_fetches': 0, 'incremental_fetches': 0, 'live_updates': 0, 'rows_fetched': 0,
+                      'history_loads': 0}
+
+    def _capacity(self, interval: str) -> int:
+        """该周期缓冲区的容量"""
+        return self.capacity
+
+    def _buffer(self, symbol: str, interval: str) -> KlineBuffer:
+        key = (symbol, interval)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = KlineBuffer(self._capacity(interval))
+        return buffer
+
+    def _fetch(self, symbol: str, interval: str, limit: int, start_time: int = None,
+               end_time: int = None) -> np.ndarray:
+        rows = self.client.get_futures_klines(symbol, interval, limit, start_time=start_time, endTime=end_time)
+        self.stats['rows_fetched'] += len(rows)
+        return parse_klines(rows)
+
+    def _load_history(self, symbol: str, interval: str, buffer: KlineBuffer) -> bool:
+        """
+        从磁盘恢复窗口，并按 startTime 向后分页补拉最后一根已保存 K线之后的部分
+
+        Returns:
+            磁盘上没有足够新的数据（缺口超过缓冲区容量）时返回 False
+        """
+        saved = self.history.read(symbol, interval, limit=buffer.capacity)
+        if not saved.shape[1]:
+            return False
+        step = int(saved[_COL['close_time'], -1] - saved[0, -1] + 1)
+        missing = (int(time.time() * 1000) - int(saved[0, -1])) // step
+        if missing > buffer.capacity:
+            return False
+        buffer.clear()
+        buffer.extend(saved)
+        start = int(saved[0, -1]) + 1
+        while True:
+            columns = self._fetch(symbol, interval, self.MAX_LIMIT, start_time=start)
+            buffer.extend(columns)
+            if columns.shape[1] < self.MAX_LIMIT:
+                break
+            start = int(columns[0, -1]) + 1
+        self.stats['history_loads'] += 1
+        return True
+
+    def _backfill(self, symbol: str, interval: str, buffer: KlineBuffer):
+        """整段回填缓冲区；有磁盘历史时只补拉之后的部分，否则按 endTime 向前分页"""
+        if self.history is not None and self._load_history(symbol, interval, buffer):
+            return
+        pages = []
+        remaining = buffer.capacity
+        end_time = None
+        while remaining > 0:
+            limit = min(remaining, self.MAX_LIMIT)
+            columns = self._fetch(symbol, interval, limit, end_time=end_time)
+            if columns.shape[1]:
+                pages.append(columns)
+            if columns.shape[1] < limit:
+                break       # 没有更早的历史
+            remaining -= limit
+            end_time = int(columns[0, 0]) - 1
+        buffer.clear()
+        for columns in reversed(pages):
+            buffer.extend(columns)
+        self.stats['full_fetches'] += 1
+
+    def _update_live(self, symbol: str, interval: str, buffer: KlineBuffer) -> bool:
+        """用实时来源的 K线推进缓冲区；来源不可用或与缓冲区之间有断档时返回 False"""
+        rows = self.live_source(symbol, interval) if self.live_source else None
+        last = buffer.last_open_time
+        if not rows or last is None or int(rows[0][0]) > last:
+            return False
+        start = len(rows)
+        while start > 0 and int(rows[start - 1][0]) >= last:
+            start -= 1
+        buffer.extend(parse_klines(rows[start:]))
+        self.stats['live_updates'] += 1
+        return True
+
+    def _persist(self, symbol: str, interval: str, buffer: KlineBuffer):
+        """把缓冲区中新收盘的 K线追加到磁盘历史"""
+        if self.history is None:
+            return
+        try:
+            self.history.append(symbol, interval, buffer.view())
+        except OSError as e:
+            self.logger.warning(f"[KLINE] 写入 {symbol} {interval} 历史失败: {e}")
+
+    def _refresh(self, symbol: str, interval: str, buffer: KlineBuffer):
+        version = buffer.version
+        self._fetch_or_update(symbol, interval, buffer)
+        if buffer.version != version:
+            self._persist(symbol, interval, buffer)
+
+    def _fetch_or_update(self, symbol: str, interval: str, buffer: KlineBuffer):
+        if buffer.count and self._update_live(symbol, interval, buffer):
+            return
+        now_ms = int(time.time() * 1000)
+        if buffer.count and now_ms - buffer.fetched_at < self.MIN_REFRESH_MS:
+            return
+        if not buffer.count:
+            self._backfill(symbol, interval, buffer)
+        else:
+            # 上次拉取时已收盘的 K线不会再变，只请求之后的；否则连同未收盘的那根一起刷新
+            last_close = buffer.last_close_time
+            start = last_close + 1 if last_close < buffer.fetched_at else buffer.last_open_time
+            columns = self._fetch(symbol, interval, self.FETCH_LIMIT, start_time=start)
+            if columns.shape[1] >= self.FETCH_LIMIT:
+                # 断档超过一次增量请求能覆盖的范围，整段重新回填
+                self._backfill(symbol, interval, buffer)
+            else:
+                buffer.extend(columns)
+                self.stats['incremental_fetches'] += 1
+        buffer.fetched_at = now_ms
+
+    def get(self, symbol: str, interval: str, limit: int = 100) -> np.ndarray:
+        """
+        获取最近 limit 根 K线（按需增量更新）
+
+        Returns:
+            (len(COLUMNS), n) 的只读列矩阵快照，不随之后的刷新改变
+        """
+        capacity = self._capacity(interval)
+        if limit > capacity:
+            raise ValueError(f"limit {limit} 超过 K线缓冲区容量 {capacity}")
+        with self._lock:
+            buffer = self._buffer(symbol, interval)
+            self._refresh(symbol, interval, buffer)
+            # 环形缓冲区会被下一次刷新原地覆盖，调用方可能跨刷新持有结果（Candles、等待模型时的快照）
+            data = buffer.view(limit).copy()
+        data.flags.writeable = False
+        return data
+
+    def get_columns(self, symbol: str, interval: str, limit: int = 100) -> Dict[str, np.ndarray]:
+        """按列名返回只读列（open_time、open、high、low、close、volume ...）"""
+        data = self.get(symbol, interval, limit)
+        return {name: data[i] for i, name in enumerate(COLUMNS)}
@@ -0,0 +1,153 @@
+"""
+LLM 请求调度器
+固定数量的工作线程（与 Ollama 服务端并行槽位数 OLLAMA_NUM_PARALLEL 一致）按优先级从队列取请求：
+平仓/持仓评估优先于新开仓分析，同级按提交顺序。每个请求带截止时间，开始前已过期的直接丢弃，
+执行时 HTTP 超时不超过剩余时间；同一 key 的新请求会取消队列中尚未开始的旧请求。
+
+调用方在等待结果期间可以让出自己持有的锁（yielding），使多个交易对的其他处理仍然串行，
+只有等待模型生成的时间互相重叠
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Callable, Dict, Hashable
+
+
+class Priority(IntEnum):
+    """请求优先级（数值小的先执行）"""
+    EXIT = 0        # 平仓 / 持仓评估
+    ENTRY = 1       # 新开仓分析
+    BACKGROUND = 2  # 其他
+
+
+class DeadlineExceeded(Exception):
+    """请求在截止时间之前没有开始执行"""
+
+
+class LLMScheduler:
+    """有界并发、按优先级执行的 LLM 请求队列"""
+
+    def __init__(self, max_concurrency: int = 1, default_timeout: float = 150):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrency: 同时执行的请求数（服务端并行槽位数）
+            default_timeout: 未指定截止时间时，从提交起允许的最长时间（秒）
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.default_timeout = default_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._queue = []                        # (优先级, 序号, 请求)
+        self._seq = itertools.count()
+        self._pending: Dict[Hashable, dict] = {}   # key -> 队列中尚未开始的请求
+        self._in_flight = 0
+        self._local = threading.local()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'expired': 0,
+                      'superseded': 0, 'max_in_flight': 0}
+
+        self._workers = [threading.Thread(target=self._worker, name=f'llm-worker-{i}', daemon=True)
+                         for i in range(self.max_concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn: Callable[[float], object], priority: Priority = Priority.ENTRY,
+               deadline: float = None, key: Hashable = None) -> Future:
+        """
+        提交请求
+
+        Args:
+            fn: fn(timeout) 执行请求，timeout 为距截止时间的剩余秒数
+            priority: 优先级
+            deadline: 截止时间（time.time() 时间戳），为空时为提交时间 + default_timeout
+            key: 去重键（如 ('entry', 'BTCUSDT')），队列中同 key 的旧请求会被取消
+
+        Returns:
+            Future；过期时结果为 DeadlineExceeded 异常，被取代时为已取消
+        """
+        future = Future()
+        request = {'fn': fn, 'future': future, 'key': key,
+                   'deadline': deadline if deadline is not None else time.time() + self.default_timeout}
+        with self._cond:
+            if key is not None:
+                stale = self._pending.pop(key, None)
+                if stale is not None and stale['future'].cancel():
+                    self.stats['superseded'] += 1
+                self._pending[key] = request
+            heapq.heappush(self._queue, (int(priority), next(self._seq), request))
+            self.stats['submitted'] += 1
+            self._cond.notify()
+        return future
+
+    def call(self, fn: Callable[[float], object], priority: Priority = Priority.ENTRY,
+             deadline: float = None, key: Hashable = None):
+        """
+        提交请求并等待结果（等待期间让出 yielding 登记的锁）
+
+        Raises:
+            DeadlineExceeded: 请求在截止时间前没有开始
+            CancelledError: 请求被同 key 的新请求取代
+        """
+        future = self.submit(fn, priority, deadline, key)
+        lock = getattr(self._local, 'lock', None)
+        if lock is None:
+            return future.result()
+        lock.release()
+        try:
+            return future.result()
+        finally:
+            lock.acquire()
+
+    @contextmanager
+    def yielding(self, lock):
+        """在 with 块内，本线程通过 call() 等待结果时释放 lock（调用方须已持有且只持有一层）"""
+        previous = getattr(self._local, 'lock', None)
+        self._local.lock = lock
+        try:
+            yield
+        finally:
+            self._local.lock = previous
+
+    def queue_size(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, request = heapq.heappop(self._queue)
+                if self._pending.get(request['key']) is request:
+                    del self._pending[request['key']]
+                future = request['future']
+                if not future.set_running_or_notify_cancel():
+                    continue
+                remaining = request['deadline'] - time.time()
+                if remaining <= 0:
+                    self.stats['expired'] += 1
+                    future.set_exception(DeadlineExceeded(f"请求已过期 {-remaining:.1f} 秒"))
+                    continue
+                self._in_flight += 1
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self._in_flight)
+
+            try:
+                result = request['fn'](remaining)
+            except BaseException as e:
+                with self._cond:
+                    self._in_flight -= 1
+                    self.stats['failed'] += 1
+                future.set_exception(e)
+            else:
+                with self._cond:
+                    self._in_flight -= 1
+                    self.stats['completed'] += 1
+                future.set_result(result)
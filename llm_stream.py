@@ -0,0 +1,178 @@
+"""
+LLM 流式生成读取
+以流式方式接收模型输出（Ollama /api/chat 的 NDJSON 行，也兼容 OpenAI 格式的 SSE "data:" 行），
+逐段扫描，一旦出现完整且可解析的顶层 JSON 对象就立即返回并关闭连接。Ollama 在客户端断开后
+会停止该请求的生成，模型在 JSON 之后继续输出的解释文字不再占用推理时间和并行槽位。
+
+同时记录首个 token 时间（TTFT）和得到完整决策的时间
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+
+from api_metrics import LatencyHistogram
+
+
+class JsonObjectScanner:
+    """增量扫描文本中的第一个完整顶层 JSON 对象（忽略对象之前的文字和字符串内的括号）"""
+
+    def __init__(self):
+        self._reset()
+        self.value: Optional[Dict] = None
+
+    def _reset(self):
+        self._buf = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> Optional[str]:
+        """
+        追加一段文本
+
+        Returns:
+            对象闭合且能解析时返回对象文本（解析结果在 value），否则返回 None；
+            括号平衡但不是合法 JSON 时丢弃，继续寻找下一个对象
+        """
+        for ch in text:
+            if not self._buf:
+                if ch != '{':
+                    continue
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = ''.join(self._buf)
+                    self._reset()
+                    try:
+                        value = json.loads(candidate)
+                    except ValueError:
+                        continue
+                    if isinstance(value, dict):
+                        self.value = value
+                        return candidate
+        return None
+
+
+def parse_chunk(line) -> Tuple[str, bool]:
+    """
+    解析一行流式输出
+
+    Returns:
+        (本段文本, 是否为最后一段)
+    """
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    line = line.strip()
+    if line.startswith('data:'):
+        line = line[5:].strip()
+        if line == '[DONE]':
+            return '', True
+    data = json.loads(line)
+    if data.get('error'):
+        raise requests.exceptions.RequestException(f"模型返回错误: {data['error']}")
+    if 'choices' in data:
+        choice = data['choices'][0] if data['choices'] else {}
+        message = choice.get('delta') or choice.get('message') or {}
+        return message.get('content') or '', choice.get('finish_reason') is not None
+    message = data.get('message') or {}
+    return message.get('content') or data.get('response') or '', bool(data.get('done'))
+
+
+@dataclass
+class StreamResult:
+    """一次流式生成的结果"""
+    text: str                           # 收到的全部文本
+    json_text: Optional[str]            # 第一个完整的 JSON 对象文本（没有时为 None）
+    ttft_ms: Optional[float]            # 从发出请求到首个 token 的时间
+    elapsed_ms: float                   # 从发出请求到返回（得到 JSON 或生成结束）的时间
+    stopped_early: bool                 # 得到 JSON 时模型仍在生成，已断开连接
+
+    @property
+    def content(self) -> str:
+        """用于解析决策的文本：优先取完整的 JSON 对象"""
+        return self.json_text if self.json_text is not None else self.text
+
+
+def read_until_json(lines: Iterable, started: float = None, deadline: float = None) -> StreamResult:
+    """
+    逐行读取流式输出，出现完整 JSON 对象时立即返回
+
+    Args:
+        lines: 流式输出的行（如 response.iter_lines()）
+        started: 发出请求的时间（time.perf_counter()），为空时为调用时刻
+        deadline: 截止时间（time.time() 时间戳），超过后放弃读取
+
+    Raises:
+        requests.exceptions.Timeout: 超过截止时间仍未得到 JSON 且生成未结束
+    """
+    started = started if started is not None else time.perf_counter()
+    scanner = JsonObjectScanner()
+    parts = []
+    ttft_ms = None
+    for line in lines:
+        if not line:
+            continue
+        text, done = parse_chunk(line)
+        if text:
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            parts.append(text)
+            json_text = scanner.feed(text)
+            if json_text is not None:
+                return StreamResult(''.join(parts), json_text, ttft_ms,
+                                    (time.perf_counter() - started) * 1000, stopped_early=not done)
+        if done:
+            break
+        if deadline is not None and time.time() > deadline:
+            raise requests.exceptions.Timeout("流式生成超过截止时间")
+    return StreamResult(''.join(parts), None, ttft_ms, (time.perf_counter() - started) * 1000, stopped_early=False)
+
+
+class StreamMetrics:
+    """流式生成指标：TTFT 和得到决策时间的延迟分布，以及提前结束/未得到 JSON 的次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ttft = LatencyHistogram()
+        self.decision = LatencyHistogram()
+        self.streams = 0
+        self.stopped_early = 0
+        self.without_json = 0
+
+    def record(self, result: StreamResult):
+        with self._lock:
+            self.streams += 1
+            if result.ttft_ms is not None:
+                self.ttft.record(result.ttft_ms)
+            if result.json_text is not None:
+                self.decision.record(result.elapsed_ms)
+            else:
+                self.without_json += 1
+            self.stopped_early += int(result.stopped_early)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'streams': self.streams,
+                'stopped_early': self.stopped_early,
+                'without_json': self.without_json,
+                'ttft': self.ttft.summary(),
+                'time_to_decision': self.decision.summary(),
+            }
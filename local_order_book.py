@@ -0,0 +1,245 @@
+"""
+本地订单簿
+按币安文档的快照 + 增量深度流同步流程维护订单簿：先缓存增量事件，取得 REST 快照后丢弃
+u < lastUpdateId 的事件，第一条事件须满足 U <= lastUpdateId <= u，之后每条事件的 pu
+（现货为 U-1）必须等于上一条的 u，否则判定丢包并重新取快照。
+两侧价位保存在按价格升序的 NumPy 数组中：最优买卖价 O(1)，N 个基点内的深度和失衡 O(log n + k)，
+每个 tick 都能读到新鲜的盘口特征，不再需要每次调用都请求一次完整的 REST 快照
+"""
+
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def _levels(rows) -> Tuple[np.ndarray, np.ndarray]:
+    """[[价格, 数量], ...]（字符串字段）转换为 (价格数组, 数量数组)"""
+    if not rows:
+        return np.empty(0), np.empty(0)
+    data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def _merge(prices: np.ndarray, quantities: np.ndarray, updates) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把增量价位合并进升序价位数组：同一价格以增量为准，数量为 0 的价位删除
+
+    增量排在现有价位之后做稳定排序，每组相同价格取最后一个即为增量的值
+    """
+    new_prices, new_quantities = _levels(updates)
+    if not len(new_prices):
+        return prices, quantities
+    all_prices = np.concatenate((prices, new_prices))
+    all_quantities = np.concatenate((quantities, new_quantities))
+    order = np.argsort(all_prices, kind='stable')
+    all_prices, all_quantities = all_prices[order], all_quantities[order]
+    last = np.append(all_prices[1:] != all_prices[:-1], True)
+    keep = last & (all_quantities > 0)
+    return all_prices[keep], all_quantities[keep]
+
+
+class LocalOrderBook:
+    """单个交易对的本地订单簿"""
+
+    MAX_BUFFERED_EVENTS = 1000      # 等待快照期间最多缓存的增量事件
+
+    def __init__(self, symbol: str):
+        """
+        初始化本地订单簿
+
+        Args:
+            symbol: 交易对
+        """
+        self.symbol = symbol.upper()
+        self._lock = threading.RLock()
+        self._buffer: deque = deque(maxlen=self.MAX_BUFFERED_EVENTS)
+        self.stats = {'events': 0, 'dropped': 0, 'snapshots': 0, 'resyncs': 0}
+        self.reset()
+
+    def reset(self):
+        """清空盘口，等待新的快照（已缓存的增量事件保留）"""
+        with self._lock:
+            # 两侧都按价格升序：买一在买盘数组末尾，卖一在卖盘数组开头
+            self._bid_prices, self._bid_quantities = np.empty(0), np.empty(0)
+            self._ask_prices, self._ask_quantities = np.empty(0), np.empty(0)
+            self.last_update_id: Optional[int] = None
+            self.event_time = 0
+            self._first_event = True
+
+    @property
+    def synced(self) -> bool:
+        """已应用快照且之后的增量连续"""
+        return self.last_update_id is not None
+
+    # ========== 同步 ==========
+
+    def apply_snapshot(self, snapshot: Dict) -> bool:
+        """
+        应用 REST 深度快照，并按顺序重放缓存的增量事件
+
+        Args:
+            snapshot: {'lastUpdateId', 'bids', 'asks'}
+
+        Returns:
+            是否同步成功（缓存的事件与快照衔接不上时返回 False，需要重新取快照）
+        """
+        with self._lock:
+            self.reset()
+            self._bid_prices, self._bid_quantities = _merge(np.empty(0), np.empty(0), snapshot['bids'])
+            self._ask_prices, self._ask_quantities = _merge(np.empty(0), np.empty(0), snapshot['asks'])
+            self.last_update_id = int(snapshot['lastUpdateId'])
+            self.event_time = snapshot.get('E', snapshot.get('T', 0))
+            self.stats['snapshots'] += 1
+            buffered = list(self._buffer)
+            self._buffer.clear()
+            for event in buffered:
+                if not self.apply_event(event):
+                    return False
+            return True
+
+    def apply_event(self, event: Dict) -> bool:
+        """
+        应用一条增量深度事件（depthUpdate）
+
+        Returns:
+            False 表示尚未同步或检测到序号断档，调用方应（重新）获取快照
+        """
+        with self._lock:
+            if self.last_update_id is None:
+                self._buffer.append(event)
+                return False
+            first_id, final_id = int(event['U']), int(event['u'])
+            if final_id < self.last_update_id:
+                # 快照之前的事件
+                self.stats['dropped'] += 1
+                return True
+            if self._first_event:
+                continuous = first_id <= self.last_update_id
+            elif 'pu' in event:
+                continuous = int(event['pu']) == self.last_update_id
+            else:
+                continuous = first_id == self.last_update_id + 1
+            if not continuous:
+                self.stats['resyncs'] += 1
+                self.reset()
+                self._buffer.append(event)
+                return False
+            self._first_event = False
+            self._bid_prices, self._bid_quantities = _merge(self._bid_prices, self._bid_quantities, event['b'])
+            self._ask_prices, self._ask_quantities = _merge(self._ask_prices, self._ask_quantities, event['a'])
+            self.last_update_id = final_id
+            self.event_time = event.get('E', self.event_time)
+            self.stats['events'] += 1
+            return True
+
+    # ========== 盘口特征 ==========
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        with self._lock:
+            return float(self._bid_prices[-1]) if len(self._bid_prices) else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        with self._lock:
+            return float(self._ask_prices[0]) if len(self._ask_prices) else None
+
+    def mid_price(self) -> Optional[float]:
+        with self._lock:
+            bid, ask = self.best_bid, self.best_ask
+            return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def spread(self) -> Tuple[float, float]:
+        """(价差, 价差基点)，任一侧为空时为 (0, 0)"""
+        with self._lock:
+            bid, ask = self.best_bid, self.best_ask
+            if bid is None or ask is None:
+                return 0.0, 0.0
+            return ask - bid, (ask - bid) / ((ask + bid) / 2) * 10000
+
+    def depth_within(self, bps: float) -> Dict[str, float]:
+        """
+        中间价上下 bps 个基点内的挂单量
+
+        Returns:
+            {'bid_quantity', 'ask_quantity', 'bid_notional', 'ask_notional'}
+        """
+        with self._lock:
+            mid = self.mid_price()
+            if mid is None:
+                return {'bid_quantity': 0.0, 'ask_quantity': 0.0, 'bid_notional': 0.0, 'ask_notional': 0.0}
+            lo = np.searchsorted(self._bid_prices, mid * (1 - bps / 10000), side='left')
+            hi = np.searchsorted(self._ask_prices, mid * (1 + bps / 10000), side='right')
+            bid_p, bid_q = self._bid_prices[lo:], self._bid_quantities[lo:]
+            ask_p, ask_q = self._ask_prices[:hi], self._ask_quantities[:hi]
+            return {
+                'bid_quantity': float(bid_q.sum()),
+                'ask_quantity': float(ask_q.sum()),
+                'bid_notional': float(bid_p @ bid_q),
+                'ask_notional': float(ask_p @ ask_q),
+            }
+
+    def imbalance(self, bps: float = 10) -> float:
+        """中间价上下 bps 个基点内按名义价值的买卖失衡：(买 - 卖) / (买 + 卖)，范围 [-1, 1]"""
+        depth = self.depth_within(bps)
+        total = depth['bid_notional'] + depth['ask_notional']
+        return (depth['bid_notional'] - depth['ask_notional']) / total if total else 0.0
+
+    def top(self, levels: int = 20) -> Dict[str, List[List[float]]]:
+        """前 levels 档 {'bids': [[价格, 数量], ...]（从高到低）, 'asks': [...]（从低到高）}"""
+        with self._lock:
+            bids = np.column_stack((self._bid_prices[::-1][:levels], self._bid_quantities[::-1][:levels]))
+            asks = np.column_stack((self._ask_prices[:levels], self._ask_quantities[:levels]))
+            return {'bids': bids.tolist(), 'asks': asks.tolist()}
+
+    def analysis(self, depth: int = 20) -> Dict:
+        """与 MarketAnalyzer.analyze_order_book 相同字段的盘口分析，另含基点深度和失衡"""
+        with self._lock:
+            total_bid_volume = float(self._bid_quantities[-depth:].sum())
+            total_ask_volume = float(self._ask_quantities[:depth].sum())
+            total = total_bid_volume + total_ask_volume
+            buy_pressure = total_bid_volume / total if total else 0.5
+            sell_pressure = total_ask_volume / total if total else 0.5
+            best_bid, best_ask = self.best_bid or 0.0, self.best_ask or 0.0
+            spread = best_ask - best_bid
+            return {
+                'symbol': self.symbol,
+                'best_bid': best_bid,
+                'best_ask': best_ask,
+                'spread': spread,
+                'spread_percent': (spread / best_bid * 100) if best_bid > 0 else 0,
+                'total_bid_volume': total_bid_volume,
+                'total_ask_volume': total_ask_volume,
+                'buy_pressure': buy_pressure,
+                'sell_pressure': sell_pressure,
+                'market_sentiment': 'BULLISH' if buy_pressure > 0.55 else 'BEARISH' if sell_pressure > 0.55 else 'NEUTRAL',
+                'depth_10bps': self.depth_within(10),
+                'imbalance_10bps': self.imbalance(10),
+                'last_update_id': self.last_update_id,
+                'timestamp': datetime.now().isoformat()
+            }
+
+
+def replay_depth(frames: List[str]) -> Dict[str, LocalOrderBook]:
+    """
+    离线重放录制的组合流帧（含录制时写入的 depthSnapshot 帧），重建各交易对的订单簿
+
+    Args:
+        frames: 原始帧文本列表（MarketDataStream 录制文件的每一行）
+    """
+    books: Dict[str, LocalOrderBook] = {}
+    for raw in frames:
+        data = json.loads(raw).get('data', {})
+        event = data.get('e')
+        if event not in ('depthUpdate', 'depthSnapshot'):
+            continue
+        book = books.setdefault(data['s'], LocalOrderBook(data['s']))
+        if event == 'depthSnapshot':
+            book.apply_snapshot(data)
+        else:
+            book.apply_event(data)
+    return books
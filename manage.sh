@@ -99,6 +99,13 @@ with open('performance_data.json', 'r') as f:
         echo "   重新连接: screen -r alpha_arena"
         ;;
 
+    backfill)
+        echo "📥 回填K线历史..."
+        shift
+        python3 kline_history.py backfill "$@"
+        python3 kline_history.py info
+        ;;
+
     help|*)
         echo "╔══════════════════════════════════════════════════╗"
         echo "║        Ollama Model 交易机器人 - 管理脚本          ║"
@@ -115,6 +122,7 @@ with open('performance_data.json', 'r') as f:
         echo "  stop       - 🛑 停止运行中的机器人"
         echo "  restart    - 🔄 重启机器人"
         echo "  screen     - 📺 在 screen 后台启动"
+        echo "  backfill   - 📥 回填K线历史（可加 --symbols/--intervals/--days）"
         echo "  help       - ❓ 显示此帮助信息"
         echo ""
         echo "💡 使用示例:"
@@ -122,6 +130,7 @@ with open('performance_data.json', 'r') as f:
         echo "  ./manage.sh screen     # 后台运行（推荐）"
         echo "  ./manage.sh status     # 查看账户状态和收益"
         echo "  ./manage.sh logs       # 查看日志输出"
+        echo "  ./manage.sh backfill --days 90   # 回填90天1分钟K线"
         echo ""
         echo "🔗 相关命令:"
         echo "  screen -r alpha_arena  # 连接到后台 screen 会话"
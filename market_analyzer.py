@@ -3,32 +3,66 @@
 提供技术指标、价格分析和交易信号
 """
 
+import time
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+import indicators_np
+import price_levels
+from candles import Candles
+from incremental_indicators import IncrementalIndicators
+from kline_resampler import ResampledKlineStore
+from kline_store import parse_klines
+from market_context import MarketContextBuilder
+
 
 class MarketAnalyzer:
     """市场数据分析器"""
 
-    def __init__(self, client):
+    def __init__(self, client, market_stream=None, kline_history=None):
         """
         初始化市场分析器
 
         Args:
             client: BinanceClient实例
+            market_stream: MarketDataStream实例（可选，可用时优先从内存读取行情）
+            kline_history: KlineHistory实例（可选，冷启动时从磁盘恢复 K线，已收盘的 K线写回）
         """
         self.client = client
+        self.market_stream = market_stream
+        # 数据流未直接提供的 K线来源：每个交易对一条 1分钟序列，高周期本地聚合；
+        # 1分钟序列冷启动回填后由数据流推进，数据流不可用时增量请求
+        self.kline_store = ResampledKlineStore(client, live_source=self._live_klines if market_stream else None,
+                                               history=kline_history)
+        # 每个 (交易对, 周期) 的流式指标状态
+        self._indicators: Dict[Tuple[str, str], IncrementalIndicators] = {}
+        # 综合上下文：每个周期一次取数，多交易对矩阵计算
+        self.context_builder = MarketContextBuilder(self)
+        # 本轮循环的全市场行情快照（CycleMarketSnapshot，由主循环每轮设置）
+        self.snapshot = None
+
+    def set_cycle_snapshot(self, snapshot):
+        """设置本轮循环的行情快照，24h行情和资金费率优先从中读取"""
+        self.snapshot = snapshot
 
     def get_current_price(self, symbol: str) -> float:
         """获取当前价格"""
+        if self.market_stream:
+            price = self.market_stream.get_price(symbol)
+            if price is not None:
+                return price
         ticker = self.client.get_ticker_price(symbol)
         return float(ticker['price'])
 
     def get_price_change_24h(self, symbol: str) -> Dict:
         """获取24小时价格变化"""
-        ticker = self.client.get_24h_ticker(symbol)
+        ticker = self.market_stream.get_ticker(symbol) if self.market_stream else None
+        if ticker is None and self.snapshot is not None:
+            ticker = self.snapshot.ticker(symbol)
+        if ticker is None:
+            ticker = self.client.get_24h_ticker(symbol)
         return {
             'symbol': symbol,
             'price': float(ticker['lastPrice']),
@@ -39,45 +73,64 @@ class MarketAnalyzer:
             'quote_volume_24h': float(ticker['quoteVolume'])
         }
 
-    def get_kline_data(self, symbol: str, interval: str = '1h', limit: int = 100) -> pd.DataFrame:
+    def get_candles(self, symbol: str, interval: str = '1h', limit: int = 100) -> Candles:
         """
-        获取K线数据并转换为DataFrame
+        获取K线数据（NumPy 列，不构造 DataFrame）
 
         Args:
             symbol: 交易对
             interval: 时间间隔 ('1m', '5m', '15m', '1h', '4h', '1d')
             limit: 数据数量
 
+        Returns:
+            Candles，需要 DataFrame 时调用 to_frame()
+        """
+        return Candles(self._kline_columns(symbol, interval, limit))
+
+    def get_kline_data(self, symbol: str, interval: str = '1h', limit: int = 100) -> pd.DataFrame:
+        """
+        获取K线数据并转换为DataFrame
+
         Returns:
             包含OHLCV数据的DataFrame
         """
-        klines = self.client.get_klines(symbol, interval, limit)
+        return self.get_candles(symbol, interval, limit).to_frame()
 
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
+    def _live_klines(self, symbol: str, interval: str):
+        """数据流中已收到的 K线（不触发 REST 回填）"""
+        return self.market_stream.get_klines(symbol, interval, self.market_stream.kline_buffer, seed=False)
 
-        # 转换数据类型
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['close'] = df['close'].astype(float)
-        df['volume'] = df['volume'].astype(float)
+    def _kline_columns(self, symbol: str, interval: str, limit: int):
+        """K线列矩阵（kline_store.COLUMNS 顺序），优先读数据流，否则读 K线存储（高周期由 1分钟聚合）"""
+        klines = self.market_stream.get_klines(symbol, interval, limit) if self.market_stream else None
+        if klines is not None:
+            return parse_klines(klines)
+        return self.kline_store.get(symbol, interval, limit)
 
-        return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+    def get_live_indicators(self, symbol: str, interval: str = '1h', limit: int = 100) -> Dict[str, float]:
+        """
+        流式指标的当前值（sma_20/50、ema_12/20/26/50、rsi_7/14、atr_3/14、macd、布林带）
+
+        首次调用用最近 limit 根 K线预热，之后只推进新收盘的 K线和未收盘 K线的最新 tick
+        """
+        columns = self._kline_columns(symbol, interval, limit)
+        key = (symbol, interval)
+        indicators = self._indicators.get(key)
+        if indicators is None:
+            indicators = self._indicators[key] = IncrementalIndicators()
+        return indicators.sync(columns, now_ms=time.time() * 1000)
 
     # ========== 技术指标 ==========
 
+    # 指标计算由 indicators_np 的向量化内核完成，这里只包装为与 df 对齐的 Series（df 也可以是 Candles）
+
     def calculate_sma(self, df: pd.DataFrame, period: int) -> pd.Series:
         """计算简单移动平均线"""
-        return df['close'].rolling(window=period).mean()
+        return pd.Series(indicators_np.sma(np.asarray(df['close'], dtype=float), period), index=df.index)
 
     def calculate_ema(self, df: pd.DataFrame, period: int) -> pd.Series:
         """计算指数移动平均线"""
-        return df['close'].ewm(span=period, adjust=False).mean()
+        return pd.Series(indicators_np.ema(np.asarray(df['close'], dtype=float), period), index=df.index)
 
     def calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
         """
@@ -90,13 +143,7 @@ class MarketAnalyzer:
         Returns:
             RSI值序列
         """
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return pd.Series(indicators_np.rsi(np.asarray(df['close'], dtype=float), period), index=df.index)
 
     def calculate_macd(self, df: pd.DataFrame,
                        fast_period: int = 12,
@@ -108,14 +155,8 @@ class MarketAnalyzer:
         Returns:
             (MACD线, 信号线, 柱状图)
         """
-        ema_fast = self.calculate_ema(df, fast_period)
-        ema_slow = self.calculate_ema(df, slow_period)
-
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
-        histogram = macd_line - signal_line
-
-        return macd_line, signal_line, histogram
+        lines = indicators_np.macd(np.asarray(df['close'], dtype=float), fast_period, slow_period, signal_period)
+        return tuple(pd.Series(line, index=df.index) for line in lines)
 
     def calculate_bollinger_bands(self, df: pd.DataFrame,
                                   period: int = 20,
@@ -126,24 +167,14 @@ class MarketAnalyzer:
         Returns:
             (上轨, 中轨, 下轨)
         """
-        sma = self.calculate_sma(df, period)
-        std = df['close'].rolling(window=period).std()
-
-        upper_band = sma + (std * std_dev)
-        lower_band = sma - (std * std_dev)
-
-        return upper_band, sma, lower_band
+        bands = indicators_np.bollinger_bands(np.asarray(df['close'], dtype=float), period, std_dev)
+        return tuple(pd.Series(band, index=df.index) for band in bands)
 
     def calculate_atr(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
         """计算平均真实波幅（ATR）"""
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
-
-        true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = true_range.rolling(window=period).mean()
-
-        return atr
+        values = indicators_np.atr(np.asarray(df['high'], dtype=float), np.asarray(df['low'], dtype=float),
+                                   np.asarray(df['close'], dtype=float), period)
+        return pd.Series(values, index=df.index)
 
     # ========== 交易信号 ==========
 
@@ -154,17 +185,10 @@ class MarketAnalyzer:
         Returns:
             包含趋势分析的字典
         """
-        df = self.get_kline_data(symbol, interval, 100)
-
-        # 计算移动平均线
-        df['sma_20'] = self.calculate_sma(df, 20)
-        df['sma_50'] = self.calculate_sma(df, 50)
-        df['ema_12'] = self.calculate_ema(df, 12)
-        df['ema_26'] = self.calculate_ema(df, 26)
-
-        current_price = df['close'].iloc[-1]
-        sma_20 = df['sma_20'].iloc[-1]
-        sma_50 = df['sma_50'].iloc[-1]
+        indicators = self.get_live_indicators(symbol, interval)
+        current_price = indicators['price']
+        sma_20 = indicators['sma_20']
+        sma_50 = indicators['sma_50']
 
         # 判断趋势
         if current_price > sma_20 > sma_50:
@@ -195,10 +219,7 @@ class MarketAnalyzer:
         Returns:
             包含RSI分析的字典
         """
-        df = self.get_kline_data(symbol, interval, 100)
-        df['rsi'] = self.calculate_rsi(df, 14)
-
-        current_rsi = df['rsi'].iloc[-1]
+        current_rsi = self.get_live_indicators(symbol, interval)['rsi_14']
 
         # 判断超买超卖
         if current_rsi > 70:
@@ -227,13 +248,11 @@ class MarketAnalyzer:
         Returns:
             包含MACD分析的字典
         """
-        df = self.get_kline_data(symbol, interval, 100)
-        macd_line, signal_line, histogram = self.calculate_macd(df)
-
-        current_macd = macd_line.iloc[-1]
-        current_signal = signal_line.iloc[-1]
-        current_histogram = histogram.iloc[-1]
-        prev_histogram = histogram.iloc[-2]
+        indicators = self.get_live_indicators(symbol, interval)
+        current_macd = indicators['macd']
+        current_signal = indicators['macd_signal']
+        current_histogram = indicators['macd_histogram']
+        prev_histogram = indicators['prev_macd_histogram']
 
         # 判断信号
         if current_macd > current_signal and prev_histogram < 0 < current_histogram:
@@ -315,38 +334,33 @@ class MarketAnalyzer:
     # ========== 支撑阻力 ==========
 
     def find_support_resistance(self, symbol: str, interval: str = '1h',
-                                lookback: int = 50) -> Dict:
+                                lookback: int = 50, extra_intervals: List[str] = None) -> Dict:
         """
         寻找支撑位和阻力位
 
+        Args:
+            symbol: 交易对
+            interval: 主周期
+            lookback: 每个周期的 K线数量
+            extra_intervals: 一并聚类的其他周期（如 ['4h']）
+
         Returns:
-            包含支撑阻力位的字典
+            包含支撑阻力位的字典，*_levels 为离当前价由近到远的价位，*_zones 为带触及次数的区间
         """
-        df = self.get_kline_data(symbol, interval, lookback)
-
-        # 找局部高点和低点
-        df['local_max'] = df['high'].rolling(window=5, center=True).max()
-        df['local_min'] = df['low'].rolling(window=5, center=True).min()
-
-        resistance_levels = df[df['high'] == df['local_max']]['high'].unique()
-        support_levels = df[df['low'] == df['local_min']]['low'].unique()
-
-        # 排序并取最近的几个
-        resistance_levels = sorted(resistance_levels, reverse=True)[:3]
-        support_levels = sorted(support_levels, reverse=True)[:3]
-
-        current_price = df['close'].iloc[-1]
+        frames = {i: self._kline_columns(symbol, i, lookback) for i in [interval] + list(extra_intervals or [])}
+        current_price = float(frames[interval][4, -1])
+        levels = price_levels.find_levels(frames, current_price)
 
         return {
             'symbol': symbol,
             'current_price': current_price,
-            'resistance_levels': [float(r) for r in resistance_levels],
-            'support_levels': [float(s) for s in support_levels],
+            'resistance_levels': [z['price'] for z in levels['resistance']],
+            'support_levels': [z['price'] for z in levels['support']],
+            'resistance_zones': levels['resistance'],
+            'support_zones': levels['support'],
             'timestamp': datetime.now().isoformat()
         }
 
-    # ========== 波动率分析 ==========
-
     def calculate_volatility(self, symbol: str, interval: str = '1h',
                             period: int = 20) -> Dict:
         """
@@ -355,17 +369,16 @@ class MarketAnalyzer:
         Returns:
             波动率分析字典
         """
-        df = self.get_kline_data(symbol, interval, period + 10)
+        candles = self.get_candles(symbol, interval, period + 10)
+        close = candles.close
 
-        # 计算收益率
-        df['returns'] = df['close'].pct_change()
-
-        # 计算波动率（标准差）
-        volatility = df['returns'].std() * np.sqrt(period)
+        # 计算收益率和波动率（标准差）
+        returns = close[1:] / close[:-1] - 1
+        volatility = returns.std(ddof=1) * np.sqrt(period)
 
         # 计算ATR
-        atr = self.calculate_atr(df, 14).iloc[-1]
-        current_price = df['close'].iloc[-1]
+        atr = indicators_np.atr(candles.high, candles.low, close, 14)[-1]
+        current_price = close[-1]
         atr_percent = (atr / current_price) * 100
 
         return {
@@ -383,9 +396,15 @@ class MarketAnalyzer:
         """
         分析订单簿，找出买卖压力
 
+        行情数据流维护着已同步的本地订单簿时直接读取（另含基点深度和失衡），否则请求 REST 快照
+
         Returns:
             订单簿分析字典
         """
+        analysis = self.market_stream.get_order_book_analysis(symbol, depth) if self.market_stream else None
+        if analysis:
+            return analysis
+
         order_book = self.client.get_order_book(symbol, depth)
 
         bids = order_book['bids'][:depth]  # 买单
@@ -456,24 +475,23 @@ class MarketAnalyzer:
         Returns:
             包含价格和指标序列的字典
         """
-        df = self.get_kline_data(symbol, interval, limit)
+        candles = self.get_candles(symbol, interval, limit)
+        close, n = candles.close, len(candles)
 
         # 计算各种指标
-        df['ema20'] = self.calculate_ema(df, 20 if len(df) >= 20 else len(df) // 2)
-        df['rsi7'] = self.calculate_rsi(df, min(7, len(df) - 1))
-        df['rsi14'] = self.calculate_rsi(df, min(14, len(df) - 1))
-
-        macd_line, signal_line, _ = self.calculate_macd(df)
-        df['macd'] = macd_line
+        ema20 = indicators_np.ema(close, 20 if n >= 20 else n // 2)
+        rsi7 = indicators_np.rsi(close, min(7, n - 1))
+        rsi14 = indicators_np.rsi(close, min(14, n - 1))
+        macd_line = indicators_np.macd(close)[0]
 
         # 转换为列表（从旧到新）
         return {
-            'mid_prices': df['close'].tolist(),
-            'ema20_values': df['ema20'].fillna(df['close']).tolist(),
-            'macd_values': df['macd'].fillna(0).tolist(),
-            'rsi7_values': df['rsi7'].fillna(50).tolist(),
-            'rsi14_values': df['rsi14'].fillna(50).tolist(),
-            'timestamps': df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+            'mid_prices': close.tolist(),
+            'ema20_values': np.where(np.isnan(ema20), close, ema20).tolist(),
+            'macd_values': np.nan_to_num(macd_line, nan=0.0).tolist(),
+            'rsi7_values': np.nan_to_num(rsi7, nan=50.0).tolist(),
+            'rsi14_values': np.nan_to_num(rsi14, nan=50.0).tolist(),
+            'timestamps': candles.timestamps()
         }
 
     def get_4h_context(self, symbol: str, limit: int = 10) -> Dict:
@@ -487,34 +505,27 @@ class MarketAnalyzer:
         Returns:
             4小时级别的市场上下文
         """
-        df = self.get_kline_data(symbol, '4h', limit)
-
-        # 计算长期指标
-        df['ema20'] = self.calculate_ema(df, min(20, len(df)))
-        df['ema50'] = self.calculate_ema(df, min(50, len(df)))
-        df['atr3'] = self.calculate_atr(df, min(3, len(df) - 1))
-        df['atr14'] = self.calculate_atr(df, min(14, len(df) - 1))
-        df['rsi14'] = self.calculate_rsi(df, min(14, len(df) - 1))
-
-        macd_line, signal_line, _ = self.calculate_macd(df)
-        df['macd'] = macd_line
-
-        # 最新值
-        latest = df.iloc[-1]
+        candles = self.get_candles(symbol, '4h', limit)
+        high, low, close, n = candles.high, candles.low, candles.close, len(candles)
 
-        # 平均成交量
-        avg_volume = df['volume'].mean()
-
-        return {
-            'ema20': float(latest['ema20']) if not pd.isna(latest['ema20']) else None,
-            'ema50': float(latest['ema50']) if not pd.isna(latest['ema50']) else None,
-            'atr3': float(latest['atr3']) if not pd.isna(latest['atr3']) else None,
-            'atr14': float(latest['atr14']) if not pd.isna(latest['atr14']) else None,
-            'current_volume': float(latest['volume']),
-            'average_volume': float(avg_volume),
-            'macd_series': df['macd'].fillna(0).tolist()[-10:],
-            'rsi14_series': df['rsi14'].fillna(50).tolist()[-10:]
+        # 计算长期指标（取最新值）
+        latest = {
+            'ema20': indicators_np.ema(close, min(20, n))[-1],
+            'ema50': indicators_np.ema(close, min(50, n))[-1],
+            'atr3': indicators_np.atr(high, low, close, min(3, n - 1))[-1],
+            'atr14': indicators_np.atr(high, low, close, min(14, n - 1))[-1],
         }
+        rsi14 = indicators_np.rsi(close, min(14, n - 1))
+        macd_line = indicators_np.macd(close)[0]
+
+        result = {name: float(value) if not np.isnan(value) else None for name, value in latest.items()}
+        result.update({
+            'current_volume': float(candles.volume[-1]),
+            'average_volume': float(candles.volume.mean()),
+            'macd_series': np.nan_to_num(macd_line, nan=0.0).tolist()[-10:],
+            'rsi14_series': np.nan_to_num(rsi14, nan=50.0).tolist()[-10:]
+        })
+        return result
 
     def get_futures_market_data(self, symbol: str) -> Dict:
         """
@@ -527,9 +538,16 @@ class MarketAnalyzer:
             合约市场数据
         """
         try:
-            # 获取当前资金费率
-            funding_rate_data = self.client.get_current_funding_rate(symbol)
-            current_funding_rate = float(funding_rate_data.get('fundingRate', 0))
+            # 获取当前资金费率（数据流的标记价格推送中自带资金费率）
+            mark = self.market_stream.get_mark_price(symbol) if self.market_stream else None
+            snapshot_rate = self.snapshot.funding_rate(symbol) if self.snapshot is not None else None
+            if mark is not None:
+                current_funding_rate = mark['fundingRate']
+            elif snapshot_rate is not None:
+                current_funding_rate = snapshot_rate
+            else:
+                funding_rate_data = self.client.get_current_funding_rate(symbol)
+                current_funding_rate = float(funding_rate_data.get('fundingRate', 0))
 
             # 获取持仓量
             open_interest_data = self.client.get_open_interest(symbol)
@@ -569,79 +587,24 @@ class MarketAnalyzer:
         - 4小时级别上下文
         - 合约市场数据（资金费率、持仓量）
 
+        各周期 K线只请求一次，指标由 MarketContextBuilder 计算
+
         Args:
             symbol: 交易对
 
         Returns:
             完整的市场上下文数据
         """
-        # 获取当前快照
-        df = self.get_kline_data(symbol, '1m', 1)
-        current_price = float(df['close'].iloc[-1])
-
-        # 获取短期技术指标
-        df_short = self.get_kline_data(symbol, '3m', 30)
-        current_ema20 = float(self.calculate_ema(df_short, 20).iloc[-1])
-        current_rsi7 = float(self.calculate_rsi(df_short, 7).iloc[-1])
-
-        macd_line, _, _ = self.calculate_macd(df_short)
-        current_macd = float(macd_line.iloc[-1])
-
-        # 获取日内序列
-        intraday_series = self.get_intraday_series(symbol, '3m', 10)
-
-        # 获取4小时上下文
-        context_4h = self.get_4h_context(symbol, 10)
-
-        # 获取合约数据
-        futures_data = self.get_futures_market_data(symbol)
-
-        # 获取市场概览（用于向后兼容）
-        overview = self.get_market_overview(symbol)
-        price_info = overview.get('price_info', {})
+        return self.context_builder.build(symbol)
 
-        # 计算完整的技术指标（向后兼容）
-        df_1h = self.get_kline_data(symbol, '1h', 100)
-        rsi14 = self.calculate_rsi(df_1h, period=14)
-        macd_line, signal_line, histogram = self.calculate_macd(df_1h)
-        upper_band, middle_band, lower_band = self.calculate_bollinger_bands(df_1h, period=20)
-        sma_20 = self.calculate_sma(df_1h, 20)
-        sma_50 = self.calculate_sma(df_1h, 50)
+    def get_comprehensive_market_contexts(self, symbols: List[str]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        """
+        批量获取多个交易对的市场上下文（全部交易对的指标一次向量化计算）
 
-        return {
-            'symbol': symbol,
-            # 新格式：增强数据
-            'current_snapshot': {
-                'price': current_price,
-                'ema20': current_ema20,
-                'macd': current_macd,
-                'rsi7': current_rsi7
-            },
-            'intraday_series': intraday_series,
-            'long_term_context_4h': context_4h,
-            'futures_market': futures_data,
-            'timestamp': datetime.now().isoformat(),
-
-            # 旧格式：向后兼容字段
-            'current_price': current_price,
-            'price_change_24h': price_info.get('change_percent', 0),
-            'rsi': float(rsi14.iloc[-1]),
-            'macd': float(macd_line.iloc[-1]),
-            'macd_signal': float(signal_line.iloc[-1]),
-            'macd_histogram': float(histogram.iloc[-1]),
-            'bollinger_upper': float(upper_band.iloc[-1]),
-            'bollinger_middle': float(middle_band.iloc[-1]),
-            'bollinger_lower': float(lower_band.iloc[-1]),
-            'sma_20': float(sma_20.iloc[-1]),
-            'sma_50': float(sma_50.iloc[-1]),
-            'volume_24h': price_info.get('volume', 0),
-            'high_24h': price_info.get('high', current_price),
-            'low_24h': price_info.get('low', current_price),
-            'support_levels': [current_price * 0.98, current_price * 0.95],  # 简化
-            'resistance_levels': [current_price * 1.02, current_price * 1.05],  # 简化
-            'trend': 'uptrend' if current_price > float(sma_50.iloc[-1]) else 'downtrend',
-            'atr': context_4h.get('atr14', 0) if context_4h else 0
-        }
+        Returns:
+            ({交易对: 上下文}, {交易对: 异常})
+        """
+        return self.context_builder.build_many(symbols)
 
     @staticmethod
     def calculate_liquidation_price(entry_price: float, leverage: int, side: str) -> float:
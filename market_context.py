@@ -0,0 +1,281 @@
+"""
+市场上下文构建器
+综合上下文原先由多个步骤（快照、3分钟指标、日内序列、4小时上下文、市场概览、1小时指标）
+各自读取 K线并逐个交易对计算。构建器先按周期合并所有步骤需要的回看长度，每个交易对每个周期只读一次
+（K线存储把 3m/1h/4h 都由同一条 1分钟序列聚合，实际每个交易对只有一条序列需要请求）；
+再把全部交易对同一周期的 K线堆叠成 (交易对 × K线) 矩阵，用 indicators_np 的内核一次算出所有交易对的指标，
+最后按交易对取行视图组装成与原来结构相同的上下文。交易对增多时指标计算只增加矩阵行数
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import indicators_np
+import price_levels
+from kline_store import COLUMNS
+
+
+# 综合上下文各步骤读取的 (周期, 回看长度)
+CONTEXT_REQUIREMENTS: List[Tuple[str, int]] = [
+    ('1m', 1),      # 当前快照
+    ('3m', 30),     # 短期指标
+    ('3m', 10),     # 日内序列
+    ('4h', 10),     # 4小时上下文
+    ('1h', 100),    # 趋势信号
+    ('1h', 100),    # RSI 信号
+    ('1h', 100),    # MACD 信号
+    ('1h', 30),     # 波动率
+    ('1h', 100),    # 1小时完整指标
+]
+
+# 原市场概览中除24h行情外的单独请求（订单簿），其结果未进入上下文
+OVERVIEW_EXTRA_CALLS = 1
+
+# 支撑阻力区间使用的周期（复用已读取的 K线）
+LEVEL_INTERVALS = ('1h', '4h')
+
+_OPEN_TIME, _HIGH, _LOW, _CLOSE, _VOLUME = (COLUMNS.index(name) for name in
+                                            ('open_time', 'high', 'low', 'close', 'volume'))
+
+
+def plan_fetches(requirements: List[Tuple[str, int]]) -> Dict[str, int]:
+    """合并需求：每个周期取最大回看长度"""
+    plan: Dict[str, int] = {}
+    for interval, limit in requirements:
+        plan[interval] = max(plan.get(interval, 0), limit)
+    return plan
+
+
+def stack_by_length(columns_by_symbol: Dict[str, np.ndarray]) -> List[Tuple[List[str], np.ndarray]]:
+    """
+    按 K线数量分组，把各交易对的 (字段 × K线) 列矩阵堆叠为 (字段 × 交易对 × K线)
+
+    历史不足的交易对单独成组，保证每个交易对的指标与单独计算时完全一致
+    """
+    groups: Dict[int, List[str]] = {}
+    for symbol, columns in columns_by_symbol.items():
+        groups.setdefault(columns.shape[1], []).append(symbol)
+    return [(symbols, np.stack([columns_by_symbol[s] for s in symbols], axis=1))
+            for symbols in groups.values()]
+
+
+def _last(values: np.ndarray) -> np.ndarray:
+    """每个交易对最后一根 K线的值"""
+    return values[..., -1]
+
+
+def _fill(values: np.ndarray, fill) -> np.ndarray:
+    return np.where(np.isnan(values), fill, values)
+
+
+def _optional(value: float):
+    return None if np.isnan(value) else float(value)
+
+
+def _timestamps(open_time: np.ndarray) -> List[str]:
+    text = np.datetime_as_string(open_time.astype(np.int64).astype('datetime64[ms]'), unit='s')
+    return [t.replace('T', ' ') for t in text]
+
+
+def batch_short_term(data: np.ndarray) -> Dict[str, np.ndarray]:
+    """3分钟窗口：当前快照指标和日内序列（最近10根）"""
+    close = data[_CLOSE]
+    intraday = data[:, :, -10:]
+    n = intraday.shape[-1]
+    intraday_close = intraday[_CLOSE]
+    return {
+        'ema20': _last(indicators_np.ema(close, 20)),
+        'rsi7': _last(indicators_np.rsi(close, 7)),
+        'macd': _last(indicators_np.macd(close)[0]),
+        'mid_prices': intraday_close,
+        'ema20_values': _fill(indicators_np.ema(intraday_close, 20 if n >= 20 else n // 2), intraday_close),
+        'macd_values': _fill(indicators_np.macd(intraday_close)[0], 0),
+        'rsi7_values': _fill(indicators_np.rsi(intraday_close, min(7, n - 1)), 50),
+        'rsi14_values': _fill(indicators_np.rsi(intraday_close, min(14, n - 1)), 50),
+        'open_time': intraday[_OPEN_TIME],
+    }
+
+
+def batch_4h(data: np.ndarray) -> Dict[str, np.ndarray]:
+    """4小时窗口：长期 EMA/ATR/RSI/MACD 和成交量"""
+    high, low, close, volume = data[_HIGH], data[_LOW], data[_CLOSE], data[_VOLUME]
+    n = close.shape[-1]
+    return {
+        'ema20': _last(indicators_np.ema(close, min(20, n))),
+        'ema50': _last(indicators_np.ema(close, min(50, n))),
+        'atr3': _last(indicators_np.atr(high, low, close, min(3, n - 1))),
+        'atr14': _last(indicators_np.atr(high, low, close, min(14, n - 1))),
+        'current_volume': _last(volume),
+        'average_volume': volume.mean(axis=-1),
+        'macd_series': _fill(indicators_np.macd(close)[0], 0)[..., -10:],
+        'rsi14_series': _fill(indicators_np.rsi(close, min(14, n - 1)), 50)[..., -10:],
+    }
+
+
+def batch_1h(data: np.ndarray) -> Dict[str, np.ndarray]:
+    """1小时窗口：RSI、MACD、布林带和均线"""
+    close = data[_CLOSE]
+    macd_line, signal_line, histogram = indicators_np.macd(close)
+    upper, middle, lower = indicators_np.bollinger_bands(close, 20)
+    return {
+        'rsi': _last(indicators_np.rsi(close, 14)),
+        'macd': _last(macd_line),
+        'macd_signal': _last(signal_line),
+        'macd_histogram': _last(histogram),
+        'bollinger_upper': _last(upper),
+        'bollinger_middle': _last(middle),
+        'bollinger_lower': _last(lower),
+        'sma_20': _last(indicators_np.sma(close, 20)),
+        'sma_50': _last(indicators_np.sma(close, 50)),
+    }
+
+
+def batch_indicators(columns_by_symbol: Dict[str, np.ndarray], compute) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    对全部交易对一次向量化计算，返回每个交易对的行视图
+
+    Args:
+        columns_by_symbol: {交易对: (字段 × K线) 列矩阵}
+        compute: 接收 (字段 × 交易对 × K线) 数组、返回 {指标名: 首维为交易对的数组} 的函数
+    """
+    views: Dict[str, Dict[str, np.ndarray]] = {}
+    for symbols, data in stack_by_length(columns_by_symbol):
+        results = compute(data)
+        for row, symbol in enumerate(symbols):
+            views[symbol] = {name: values[row] for name, values in results.items()}
+    return views
+
+
+class MarketContextBuilder:
+    """按周期一次取数、多交易对矩阵计算的综合市场上下文"""
+
+    BATCHES = {'3m': batch_short_term, '4h': batch_4h, '1h': batch_1h}
+
+    def __init__(self, analyzer, requirements: List[Tuple[str, int]] = None):
+        """
+        Args:
+            analyzer: MarketAnalyzer 实例
+            requirements: 各步骤读取的 (周期, 回看长度)
+        """
+        self.analyzer = analyzer
+        self.requirements = requirements or CONTEXT_REQUIREMENTS
+        self.plan = plan_fetches(self.requirements)
+        self.logger = logging.getLogger(__name__)
+        self.last_stats: Dict = {}
+
+    def build(self, symbol: str) -> Dict:
+        """单个交易对的综合上下文，获取失败时抛出异常"""
+        contexts, errors = self.build_many([symbol])
+        if symbol in errors:
+            raise errors[symbol]
+        return contexts[symbol]
+
+    def build_many(self, symbols: List[str]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        """
+        批量构建综合上下文
+
+        Returns:
+            ({交易对: 上下文}, {交易对: 异常})，单个交易对失败不影响其他交易对
+        """
+        klines: Dict[str, Dict[str, np.ndarray]] = {interval: {} for interval in self.plan}
+        extras: Dict[str, Tuple[Dict, Dict]] = {}
+        errors: Dict[str, Exception] = {}
+        for symbol in symbols:
+            try:
+                fetched = {interval: self.analyzer._kline_columns(symbol, interval, limit)
+                           for interval, limit in self.plan.items()}
+                if any(columns.shape[1] == 0 for columns in fetched.values()):
+                    raise ValueError(f"{symbol} K线数据为空")
+                extras[symbol] = (self.analyzer.get_price_change_24h(symbol),
+                                  self.analyzer.get_futures_market_data(symbol))
+            except Exception as e:
+                errors[symbol] = e
+                continue
+            for interval, columns in fetched.items():
+                klines[interval][symbol] = columns
+
+        views = {interval: batch_indicators(klines[interval], compute)
+                 for interval, compute in self.BATCHES.items()}
+        contexts = {}
+        for symbol in extras:
+            current_price = float(klines['1m'][symbol][_CLOSE, -1])
+            levels = price_levels.find_levels({i: klines[i][symbol] for i in LEVEL_INTERVALS}, current_price)
+            contexts[symbol] = self._assemble(symbol, current_price, views['3m'][symbol], views['4h'][symbol],
+                                              views['1h'][symbol], levels, *extras[symbol])
+
+        # K线存储由同一条基础序列聚合的周期只算一次请求
+        sources = {self.analyzer.kline_store.source_interval(interval, limit)
+                   for interval, limit in self.plan.items()}
+        fetches = len(extras) * len(sources)
+        step_reads = len(extras) * (len(self.requirements) + OVERVIEW_EXTRA_CALLS)
+        self.last_stats = {
+            'symbols': len(extras),
+            'kline_fetches': fetches,
+            'calls_saved': step_reads - fetches,
+            'errors': len(errors),
+        }
+        self.logger.debug(f"[CONTEXT] {len(extras)} 个交易对，K线请求 {fetches} 次，"
+                          f"节省 {self.last_stats['calls_saved']} 次")
+        return contexts, errors
+
+    @staticmethod
+    def _assemble(symbol: str, current_price: float, short: Dict, h4: Dict, h1: Dict, levels: Dict,
+                  price_info: Dict, futures_data: Dict) -> Dict:
+        """用单个交易对的指标行视图组装上下文（结构与原 get_comprehensive_market_context 相同）"""
+        sma_50 = float(h1['sma_50'])
+        context_4h = {
+            'ema20': _optional(h4['ema20']),
+            'ema50': _optional(h4['ema50']),
+            'atr3': _optional(h4['atr3']),
+            'atr14': _optional(h4['atr14']),
+            'current_volume': float(h4['current_volume']),
+            'average_volume': float(h4['average_volume']),
+            'macd_series': h4['macd_series'].tolist(),
+            'rsi14_series': h4['rsi14_series'].tolist(),
+        }
+        return {
+            'symbol': symbol,
+            # 新格式：增强数据
+            'current_snapshot': {
+                'price': current_price,
+                'ema20': float(short['ema20']),
+                'macd': float(short['macd']),
+                'rsi7': float(short['rsi7'])
+            },
+            'intraday_series': {
+                'mid_prices': short['mid_prices'].tolist(),
+                'ema20_values': short['ema20_values'].tolist(),
+                'macd_values': short['macd_values'].tolist(),
+                'rsi7_values': short['rsi7_values'].tolist(),
+                'rsi14_values': short['rsi14_values'].tolist(),
+                'timestamps': _timestamps(short['open_time'])
+            },
+            'long_term_context_4h': context_4h,
+            'futures_market': futures_data,
+            'timestamp': datetime.now().isoformat(),
+
+            # 旧格式：向后兼容字段
+            'current_price': current_price,
+            'price_change_24h': price_info.get('change_percent', 0),
+            'rsi': float(h1['rsi']),
+            'macd': float(h1['macd']),
+            'macd_signal': float(h1['macd_signal']),
+            'macd_histogram': float(h1['macd_histogram']),
+            'bollinger_upper': float(h1['bollinger_upper']),
+            'bollinger_middle': float(h1['bollinger_middle']),
+            'bollinger_lower': float(h1['bollinger_lower']),
+            'sma_20': float(h1['sma_20']),
+            'sma_50': sma_50,
+            'volume_24h': price_info.get('volume_24h', 0),
+            'high_24h': price_info.get('high_24h', current_price),
+            'low_24h': price_info.get('low_24h', current_price),
+            'support_levels': [z['price'] for z in levels['support']],
+            'resistance_levels': [z['price'] for z in levels['resistance']],
+            'support_zones': levels['support'],
+            'resistance_zones': levels['resistance'],
+            'trend': 'uptrend' if current_price > sma_50 else 'downtrend',
+            'atr': context_4h.get('atr14', 0)
+        }
@@ -0,0 +1,499 @@
+"""
+WebSocket 行情数据流
+订阅合约 K线（1m/3m/1h/4h）、标记价格和 24h miniTicker 组合流，在内存中维护最新状态，
+供 MarketAnalyzer 直接读取，替代每轮的 REST 轮询。可选订阅增量深度流，按快照 + 增量流程维护本地订单簿
+（快照请求在线程池中执行，录制时同时写入 depthSnapshot 帧）。附带本地回放服务器，可离线回放录制的帧
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import websockets
+
+from local_order_book import LocalOrderBook
+
+
+# 各周期的毫秒数（用于检测K线断档）
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000,
+}
+
+
+class MarketDataStream:
+    """合约行情组合流，在后台线程中维护 K线、标记价格和 24h 行情"""
+
+    BASE_URL = 'wss://fstream.binance.com/stream'
+    TESTNET_URL = 'wss://fstream.binancefuture.com/stream'
+    STALE_SECONDS = 10          # 超过该时间没有收到消息视为数据过期，回退到 REST
+    RECONNECT_DELAY_MAX = 60    # 断线重连最大等待（秒）
+    DEPTH_SNAPSHOT_LIMIT = 1000 # 订单簿快照档数
+
+    def __init__(self, symbols: List[str], intervals: List[str] = None, client=None,
+                 testnet: bool = False, url: str = None, proxy: str = None,
+                 kline_buffer: int = 200, record_file: str = None, depth: bool = False):
+        """
+        初始化行情数据流
+
+        Args:
+            symbols: 订阅的交易对
+            intervals: 订阅的 K线周期（默认 1m/3m/1h/4h，传空列表只订阅价格）
+            client: BinanceClient 实例，用于冷启动时回填历史 K线
+            testnet: 是否使用测试网
+            url: 自定义组合流地址（回放服务器）
+            proxy: 代理地址
+            kline_buffer: 每个交易对每个周期在内存中保留的 K线数量
+            record_file: 录制原始帧的文件路径（为空时不录制）
+            depth: 是否订阅增量深度流并维护本地订单簿
+        """
+        self.symbols = [s.upper() for s in symbols]
+        self.intervals = list(intervals) if intervals is not None else ['1m', '3m', '1h', '4h']
+        self.client = client
+        self.url = url or (self.TESTNET_URL if testnet else self.BASE_URL)
+        self.proxy = proxy
+        self.kline_buffer = kline_buffer
+        self.record_file = record_file
+        self.depth = depth
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._klines: Dict[tuple, deque] = {}
+        self._seeded = set()
+        self._tickers: Dict[str, Dict] = {}
+        self._mark_prices: Dict[str, Dict] = {}
+        self._books: Dict[str, LocalOrderBook] = {}
+        self._snapshot_pending = set()      # 正在请求快照的交易对（只在事件循环线程中读写）
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+        self.connected = False
+        self.last_message_time = 0.0
+        self.message_count = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    # ========== 生命周期 ==========
+
+    def stream_names(self) -> List[str]:
+        """生成组合流名称列表"""
+        names = []
+        for symbol in self.symbols:
+            s = symbol.lower()
+            names.extend(f"{s}@kline_{interval}" for interval in self.intervals)
+            names.append(f"{s}@markPrice@1s")
+            names.append(f"{s}@miniTicker")
+            if self.depth:
+                names.append(f"{s}@depth@100ms")
+        return names
+
+    def start(self):
+        """在后台线程启动数据流"""
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='market-stream', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._consume(), self._loop)
+
+    def stop(self):
+        """停止数据流（取消消费任务并等待连接正常关闭后停止事件循环）"""
+        if not self._running:
+            return
+        self._running = False
+
+        async def _cancel():
+            if self._task is not None:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel(), self._loop).result(timeout=15)
+        except Exception as e:
+            self.logger.warning(f"[STREAM] 关闭行情数据流超时: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def wait_ready(self, timeout: float = 10) -> bool:
+        """等待所有交易对都收到 24h 行情"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if all(s in self._tickers for s in self.symbols):
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def add_listener(self, callback: Callable[[str, Dict], None]):
+        """注册消息回调 callback(stream_name, data)，在数据流线程中调用"""
+        self._listeners.append(callback)
+
+    def is_healthy(self) -> bool:
+        """连接正常且最近收到过消息"""
+        return self.connected and time.time() - self.last_message_time < self.STALE_SECONDS
+
+    async def _consume(self):
+        """连接组合流并持续处理消息，断线后指数退避重连"""
+        self._task = asyncio.current_task()
+        url = f"{self.url}?streams={'/'.join(self.stream_names())}"
+        delay = 1
+        while self._running:
+            try:
+                async with websockets.connect(url, proxy=self.proxy or None,
+                                              max_size=None) as ws:
+                    self.connected = True
+                    delay = 1
+                    self.logger.info(f"[STREAM] 行情数据流已连接（{len(self.stream_names())} 个流）")
+                    async for raw in ws:
+                        self._handle_raw(raw)
+            except Exception as e:
+                self.logger.warning(f"[STREAM] 行情数据流断开: {e}，{delay} 秒后重连")
+
+            self.connected = False
+            # 断线期间可能丢失 K线和深度增量，重连后需要重新回填、重新取快照
+            with self._lock:
+                self._seeded.clear()
+                self._klines.clear()
+                self._books.clear()
+            if not self._running:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+
+    # ========== 消息处理 ==========
+
+    def _handle_raw(self, raw):
+        """处理一条组合流原始消息"""
+        if self.record_file:
+            with open(self.record_file, 'a', encoding='utf-8') as f:
+                f.write(raw if isinstance(raw, str) else raw.decode())
+                f.write('\n')
+
+        message = json.loads(raw)
+        stream = message.get('stream', '')
+        data = message.get('data', {})
+        self.last_message_time = time.time()
+        self.message_count += 1
+
+        event = data.get('e')
+        if event == 'kline':
+            self._on_kline(data)
+        elif event == 'markPriceUpdate':
+            self._on_mark_price(data)
+        elif event == '24hrMiniTicker':
+            self._on_mini_ticker(data)
+        elif event in ('depthUpdate', 'depthSnapshot'):
+            self._on_depth(data)
+
+        for callback in self._listeners:
+            try:
+                callback(stream, data)
+            except Exception as e:
+                self.logger.error(f"[STREAM] 消息回调异常: {e}")
+
+    def _on_kline(self, data: Dict):
+        k = data['k']
+        key = (k['s'], k['i'])
+        # 与 REST K线接口相同的行格式
+        row = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'],
+               k['q'], k['n'], k['V'], k['Q'], '0']
+
+        with self._lock:
+            rows = self._klines.get(key)
+            if rows is None:
+                rows = self._klines[key] = deque(maxlen=self.kline_buffer)
+            if rows and rows[-1][0] == row[0]:
+                rows[-1] = row
+            elif not rows or row[0] > rows[-1][0]:
+                step = INTERVAL_MS.get(k['i'])
+                if rows and step and row[0] - rows[-1][0] > step:
+                    # 出现断档，丢弃旧数据，下次读取时重新回填
+                    rows.clear()
+                    self._seeded.discard(key)
+                rows.append(row)
+
+    def _on_mark_price(self, data: Dict):
+        with self._lock:
+            self._mark_prices[data['s']] = {
+                'markPrice': float(data['p']),
+                'indexPrice': float(data.get('i', 0)),
+                'fundingRate': float(data.get('r') or 0),
+                'nextFundingTime': data.get('T'),
+                'eventTime': data.get('E')
+            }
+
+    def _on_mini_ticker(self, data: Dict):
+        close_price = float(data['c'])
+        open_price = float(data['o'])
+        change = close_price - open_price
+        change_pct = change / open_price * 100 if open_price else 0
+        # 转换为与 REST 24h 行情接口相同的字段
+        with self._lock:
+            self._tickers[data['s']] = {
+                'symbol': data['s'],
+                'lastPrice': data['c'],
+                'openPrice': data['o'],
+                'highPrice': data['h'],
+                'lowPrice': data['l'],
+                'volume': data['v'],
+                'quoteVolume': data['q'],
+                'priceChange': f"{change:.8f}",
+                'priceChangePercent': f"{change_pct:.3f}",
+                'closeTime': data.get('E')
+            }
+
+    def _on_depth(self, data: Dict):
+        symbol = data['s']
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None:
+                book = self._books[symbol] = LocalOrderBook(symbol)
+        if data['e'] == 'depthSnapshot':
+            self._snapshot_pending.discard(symbol)
+            synced = book.apply_snapshot(data)
+        else:
+            synced = book.apply_event(data)
+        if not synced and self.client is not None and symbol not in self._snapshot_pending:
+            # 尚未同步或出现断档：在线程池中请求快照，避免阻塞消息处理
+            self._snapshot_pending.add(symbol)
+            self._loop.run_in_executor(None, self._fetch_depth_snapshot, symbol)
+
+    def _fetch_depth_snapshot(self, symbol: str):
+        """请求订单簿快照，作为 depthSnapshot 帧交回事件循环处理（录制时一并写入，回放时可离线重建）"""
+        try:
+            snapshot = self.client.get_futures_order_book(symbol, limit=self.DEPTH_SNAPSHOT_LIMIT)
+        except Exception as e:
+            self.logger.warning(f"[STREAM] {symbol} 订单簿快照获取失败: {e}")
+            self._loop.call_soon_threadsafe(self._snapshot_pending.discard, symbol)
+            return
+        frame = json.dumps({'stream': f"{symbol.lower()}@depthSnapshot", 'data': {
+            'e': 'depthSnapshot', 'E': snapshot.get('E', int(time.time() * 1000)), 's': symbol,
+            'lastUpdateId': snapshot['lastUpdateId'], 'bids': snapshot['bids'], 'asks': snapshot['asks'],
+        }})
+        self._loop.call_soon_threadsafe(self._handle_raw, frame)
+
+    # ========== 读取接口 ==========
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 100, seed: bool = True) -> Optional[List[list]]:
+        """
+        读取内存中的 K线（REST 行格式，从旧到新）
+
+        Args:
+            symbol: 交易对
+            interval: 周期
+            limit: 数量
+            seed: 尚未回填时是否用 REST 回填历史；False 时只返回数据流已收到的 K线（可能不足 limit 根）
+
+        Returns:
+            K线列表；数据流不可用或该周期未订阅时返回 None，调用方应回退到 REST
+        """
+        symbol = symbol.upper()
+        if interval not in self.intervals or symbol not in self.symbols or limit > self.kline_buffer:
+            return None
+        if not self.is_healthy():
+            return None
+
+        key = (symbol, interval)
+        with self._lock:
+            seeded = key in self._seeded
+            rows = list(self._klines.get(key, ()))
+
+        if not seeded:
+            if not seed:
+                return rows[-limit:]
+            if self.client is None:
+                # 没有 REST 客户端时只能使用数据流自己积累的 K线
+                return rows[-limit:] if len(rows) >= limit else None
+            rows = self._seed_klines(symbol, interval)
+
+        return rows[-limit:]
+
+    def _seed_klines(self, symbol: str, interval: str) -> List[list]:
+        """冷启动时用 REST 回填历史 K线，并与数据流已收到的 K线合并"""
+        history = self.client.get_futures_klines(symbol, interval, limit=self.kline_buffer)
+        key = (symbol, interval)
+        with self._lock:
+            merged = {row[0]: row for row in history}
+            last_rest = history[-1][0] if history else 0
+            for row in self._klines.get(key, ()):
+                # 数据流中同一根或更新的 K线比 REST 结果更新
+                if row[0] >= last_rest:
+                    merged[row[0]] = row
+            rows = deque((merged[t] for t in sorted(merged)), maxlen=self.kline_buffer)
+            self._klines[key] = rows
+            self._seeded.add(key)
+            return list(rows)
+
+    def get_ticker(self, symbol: str) -> Optional[Dict]:
+        """读取 24h 行情（REST 字段格式），不可用时返回 None"""
+        if not self.is_healthy():
+            return None
+        with self._lock:
+            ticker = self._tickers.get(symbol.upper())
+            return dict(ticker) if ticker else None
+
+    def get_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """批量读取 24h 行情，只返回数据流中已有的交易对"""
+        tickers = {}
+        for symbol in symbols:
+            ticker = self.get_ticker(symbol)
+            if ticker:
+                tickers[symbol] = ticker
+        return tickers
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        """读取最新成交价，不可用时返回 None"""
+        ticker = self.get_ticker(symbol)
+        return float(ticker['lastPrice']) if ticker else None
+
+    def get_mark_price(self, symbol: str) -> Optional[Dict]:
+        """读取标记价格和资金费率，不可用时返回 None"""
+        if not self.is_healthy():
+            return None
+        with self._lock:
+            mark = self._mark_prices.get(symbol.upper())
+            return dict(mark) if mark else None
+
+    def get_order_book(self, symbol: str) -> Optional[LocalOrderBook]:
+        """读取本地订单簿，数据流不可用或订单簿尚未同步时返回 None"""
+        if not self.is_healthy():
+            return None
+        with self._lock:
+            book = self._books.get(symbol.upper())
+        return book if book is not None and book.synced else None
+
+    def get_order_book_analysis(self, symbol: str, depth: int = 20) -> Optional[Dict]:
+        """读取订单簿分析（字段同 MarketAnalyzer.analyze_order_book），不可用时返回 None"""
+        book = self.get_order_book(symbol)
+        return book.analysis(depth) if book is not None else None
+
+
+class MarketReplayServer:
+    """本地回放服务器：把录制的组合流帧按原始节奏（或加速）推送给连接的客户端"""
+
+    def __init__(self, frames: List[str], host: str = '127.0.0.1', port: int = 0, speed: float = 0):
+        """
+        初始化回放服务器
+
+        Args:
+            frames: 原始帧列表（每个元素是一条组合流 JSON 文本）
+            host: 监听地址
+            port: 监听端口（0 表示自动分配）
+            speed: 回放倍速（按事件时间 E 计算间隔，0 表示不等待）
+        """
+        self.frames = frames
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.logger = logging.getLogger(__name__)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'MarketReplayServer':
+        """从录制文件（每行一条帧）创建回放服务器"""
+        with open(path, 'r', encoding='utf-8') as f:
+            frames = [line.strip() for line in f if line.strip()]
+        return cls(frames, **kwargs)
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/stream"
+
+    async def _handler(self, ws):
+        last_event_time = None
+        for raw in self.frames:
+            if self.speed > 0:
+                event_time = json.loads(raw).get('data', {}).get('E')
+                if last_event_time is not None and event_time:
+                    await asyncio.sleep(max(0, (event_time - last_event_time) / 1000 / self.speed))
+                last_event_time = event_time or last_event_time
+            await ws.send(raw)
+        # 保持连接，模拟持续在线的行情流
+        await ws.wait_closed()
+
+    def start(self):
+        """在后台线程启动服务器，返回后 url 可用"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='market-replay', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+
+        async def _serve():
+            self._server = await websockets.serve(self._handler, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._ready.set()
+
+        self._loop.run_until_complete(_serve())
+        self._loop.run_forever()
+
+    def stop(self):
+        """停止服务器"""
+        if self._loop is None:
+            return
+
+        async def _close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='录制或回放合约行情组合流')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='录制实时行情帧到文件')
+    rec.add_argument('output')
+    rec.add_argument('--symbols', default='BTCUSDT,ETHUSDT')
+    rec.add_argument('--seconds', type=int, default=60)
+    rec.add_argument('--depth', action='store_true', help='同时录制增量深度流和订单簿快照')
+
+    rep = sub.add_parser('replay', help='启动本地回放服务器')
+    rep.add_argument('input')
+    rep.add_argument('--port', type=int, default=8765)
+    rep.add_argument('--speed', type=float, default=1.0)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'record':
+        client = None
+        if args.depth:
+            import config
+            from binance_client import BinanceClient
+            client = BinanceClient(api_key=config.Binance.API_KEY, api_secret=config.Binance.API_SECRET,
+                                   testnet=config.Binance.TESTNET, using_v2ray=config.Binance.USING_V2RAY,
+                                   v2ray_port=config.Binance.V2RAY_PORT)
+        stream = MarketDataStream(args.symbols.split(','), client=client, record_file=args.output,
+                                  depth=args.depth)
+        stream.start()
+        time.sleep(args.seconds)
+        stream.stop()
+        print(f"已录制 {stream.message_count} 条消息到 {args.output}")
+    else:
+        server = MarketReplayServer.from_file(args.input, port=args.port, speed=args.speed).start()
+        print(f"回放服务器已启动: {server.url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
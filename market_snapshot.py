@@ -0,0 +1,56 @@
+"""
+每轮循环的全市场行情快照
+循环开始时用一次请求取全部交易对的24h行情、一次请求取全部溢价指数（标记价格/资金费率），
+按交易对建索引，本轮各交易对的分析直接读快照，请求数不再随交易对数量增长
+"""
+
+import time
+from typing import Dict, List, Optional
+
+
+class CycleMarketSnapshot:
+    """一轮交易循环内共享的行情快照（REST 字段格式）"""
+
+    def __init__(self, tickers: Dict[str, Dict] = None, premium_index: Dict[str, Dict] = None,
+                 taken_at: float = None):
+        """
+        Args:
+            tickers: {交易对: 24h行情}（/fapi/v1/ticker/24hr 字段）
+            premium_index: {交易对: 溢价指数}（/fapi/v1/premiumIndex 字段，含 markPrice、lastFundingRate）
+            taken_at: 快照时间（秒）
+        """
+        self.tickers = tickers or {}
+        self.premium_index = premium_index or {}
+        self.taken_at = taken_at or time.time()
+
+    @staticmethod
+    def _index(rows: List[Dict]) -> Dict[str, Dict]:
+        return {row['symbol']: row for row in rows or () if row.get('symbol')}
+
+    @classmethod
+    def fetch(cls, client) -> 'CycleMarketSnapshot':
+        """并发请求全市场24h行情和溢价指数（各一次请求）"""
+        tickers, premium = client.gather(
+            client.async_client.get_all_24h_tickers(),
+            client.async_client.get_premium_index()
+        )
+        return cls(cls._index(tickers), cls._index(premium))
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.taken_at
+
+    def ticker(self, symbol: str) -> Optional[Dict]:
+        return self.tickers.get(symbol)
+
+    def premium(self, symbol: str) -> Optional[Dict]:
+        return self.premium_index.get(symbol)
+
+    def funding_rate(self, symbol: str) -> Optional[float]:
+        """当期资金费率，快照中没有该交易对时返回 None"""
+        row = self.premium_index.get(symbol)
+        return float(row['lastFundingRate']) if row else None
+
+    def mark_price(self, symbol: str) -> Optional[float]:
+        row = self.premium_index.get(symbol)
+        return float(row['markPrice']) if row else None
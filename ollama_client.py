@@ -4,23 +4,32 @@ Ollama Model API 客户端
 """
 
 import requests
-import json
+import time
+from concurrent.futures import CancelledError
 from typing import Dict, List
 import logging
 from datetime import datetime
 import pytz
 
+from decision_schema import DECISION_SCHEMA, Decision, DecisionParseError, DecisionParseMetrics, parse_decision, repair_decision
+from llm_scheduler import DeadlineExceeded, LLMScheduler, Priority
+from llm_stream import StreamMetrics, read_until_json
+
 
 class OllamaClient:
     """Ollama Model API 客户端"""
 
     def __init__(self, ollama_api_key: str, ollama_max_tokens, ollama_temperature, ollama_api_timeout, ollama_api_port,
-                 ollama_model_name):
+                 ollama_model_name, parallel_slots: int = 1, scheduler: LLMScheduler = None,
+                 stream: bool = True):
         """
         初始化 Ollama Model 客户端
 
         Args:
             ollama_api_key: Ollama Model API 密钥
+            parallel_slots: 服务端并行槽位数（调度器同时发出的请求数）
+            scheduler: 共用的 LLM 请求调度器（为空时按 parallel_slots 创建）
+            stream: 流式生成，收到完整的决策 JSON 后立即断开、停止生成
         """
         self.api_key = ollama_api_key
         self.timeout = ollama_api_timeout
@@ -34,6 +43,56 @@ class OllamaClient:
             "Content-Type": "application/json"
         }
         self.logger = logging.getLogger(__name__)
+        # 所有模型请求经调度器排队：平仓评估优先，超过截止时间的请求不再发出
+        self.scheduler = scheduler or LLMScheduler(parallel_slots, default_timeout=ollama_api_timeout)
+        self.stream = stream
+        self.stream_metrics = StreamMetrics()
+        self.parse_metrics = DecisionParseMetrics()
+
+    def _generate(self, messages: List[Dict], priority: Priority, deadline: float = None, key=None,
+                  schema: Dict = None) -> str:
+        """
+        经调度器生成一次回复，返回回复文本（流式时为第一个完整的 JSON 对象）
+
+        HTTP 超时不超过距截止时间的剩余时间；流式读取在调度器的工作线程内完成，
+        得到 JSON 后关闭连接，槽位随即让给下一个请求。schema 不为空时作为 format 参数，
+        约束模型按该 JSON Schema 输出
+
+        Raises:
+            requests.HTTPError: 非 200 响应
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": self.stream
+        }
+        if schema is not None:
+            payload["format"] = schema
+
+        def run(remaining):
+            started = time.perf_counter()
+            with requests.post(self.url, headers=self.headers, json=payload,
+                               timeout=min(self.timeout, remaining), stream=self.stream) as response:
+                response.raise_for_status()
+                if not self.stream:
+                    return self._message_content(response.json())
+                result = read_until_json(response.iter_lines(), started, time.time() + remaining)
+            self.stream_metrics.record(result)
+            self.logger.info(f"⚡ 首个token {result.ttft_ms or 0:.0f}ms，"
+                             f"{'决策' if result.json_text is not None else '生成结束'} {result.elapsed_ms:.0f}ms"
+                             f"{'，已提前结束生成' if result.stopped_early else ''}")
+            return result.content
+
+        return self.scheduler.call(run, priority=priority, deadline=deadline, key=key)
+
+    @staticmethod
+    def _message_content(data: Dict) -> str:
+        """非流式响应的回复文本（Ollama 原生格式或 OpenAI 兼容格式）"""
+        if 'choices' in data:
+            return data['choices'][0]['message']['content']
+        return data.get("message", {}).get("content", "")
 
     def get_trading_session(self) -> Dict:
         """获取当前交易时段信息(仅用于日志记录)"""
@@ -62,48 +121,39 @@ class OllamaClient:
             self.logger.error(f"获取交易时段失败: {e}")
             return {'session': '未知', 'volatility': 'unknown', 'recommendation': '谨慎交易', 'aggressive_mode': False, 'beijing_hour': 0, 'utc_hour': 0}
 
-    def chat_completion(self, messages: List[Dict]) -> Dict:
+    def chat_completion(self, messages: List[Dict], priority: Priority = Priority.ENTRY,
+                        deadline: float = None, key=None, schema: Dict = None) -> Dict:
         """Ollama → OpenAI 兼容格式"""
         try:
-            response = requests.post(
-                "http://localhost:11434/api/chat",
-                headers=self.headers,
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens,
-                    "stream": False
-                },
-                timeout=self.timeout
-            )
-
-            if response.status_code == 200:
-                ollama_data = response.json()
-                content = ollama_data.get("message", {}).get("content", "")
-                return {
-                    "choices": [{
-                        "message": {"content": content}
-                    }]
-                }
-            else:
-                return {"error": f"HTTP {response.status_code}"}
+            content = self._generate(messages, priority, deadline, key, schema)
+            return {
+                "choices": [{
+                    "message": {"content": content}
+                }]
+            }
 
+        except requests.HTTPError as e:
+            return {"error": f"HTTP {e.response.status_code}"}
         except Exception as e:
             self.logger.error(f"API调用异常: {e}")
             return {"error": str(e)}
 
-    def reasoning_completion(self, messages: List[Dict]) -> Dict:
+    def reasoning_completion(self, messages: List[Dict], priority: Priority = Priority.ENTRY,
+                             deadline: float = None, key=None, schema: Dict = None) -> Dict:
         """使用Ollama Model推理模型"""
         return self.chat_completion(
-            messages=messages,
+            messages=messages, priority=priority, deadline=deadline, key=key, schema=schema
         )
 
     def analyze_market_and_decide(self, market_data: Dict,
                                   account_info: Dict,
-                                  trade_history: List[Dict] = None) -> Dict:
+                                  trade_history: List[Dict] = None,
+                                  deadline: float = None) -> Dict:
         """
         分析市场并做出交易决策(带重试机制)
+
+        Args:
+            deadline: 截止时间（time.time() 时间戳，含排队和重试），为空时为 API 超时时间之后
         """
         # 构建提示词
         prompt = self._build_trading_prompt(market_data, account_info, trade_history)
@@ -140,44 +190,40 @@ class OllamaClient:
             }
         ]
 
+        deadline = deadline or time.time() + self.timeout
+        key = ('entry', market_data.get('symbol'))
+
         # 重试最多2次
         for attempt in range(2):
             try:
                 self.logger.info(f"API调用尝试 {attempt + 1}/2...")
-                response = requests.post(
-                    self.url,
-                    headers=self.headers,
-                    json={
-                        "model": self.model_name,
-                        "messages": messages,
-                        "temperature": self.temperature,
-                        "max_tokens": self.max_tokens
-                    },
-                    timeout=self.timeout
-                )
-                # self.logger.warning('AI response: '+ result)
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content']
-
-                    # 解析AI返回
-                    decision = self._parse_decision(content)
-                    self.logger.info(f"✅ API调用成功 (尝试{attempt + 1})")
-                    return {
-                        'success': True,
-                        'decision': decision,
-                        'raw_response': content,
-                        'model_used': self.model_name
-                    }
-                else:
-                    self.logger.error(f"API错误 {response.status_code}: {response.text}")
-                    if attempt < 1:  # 如果还有重试机会
-                        continue
-                    return {
-                        'success': False,
-                        'error': f"API错误: {response.status_code}"
-                    }
+                content = self._generate(messages, Priority.ENTRY, deadline, key, DECISION_SCHEMA)
 
+                # 解析AI返回
+                decision = self._parse_decision(content)
+                self.logger.info(f"✅ API调用成功 (尝试{attempt + 1})")
+                return {
+                    'success': True,
+                    'decision': decision,
+                    'raw_response': content,
+                    'model_used': self.model_name
+                }
+
+            except requests.HTTPError as e:
+                self.logger.error(f"API错误 {e}")
+                if attempt < 1:  # 如果还有重试机会
+                    continue
+                return {
+                    'success': False,
+                    'error': f"API错误: {e.response.status_code}"
+                }
+            except (DeadlineExceeded, CancelledError) as e:
+                # 排队期间已过期或被同一交易对的新请求取代，结果不再有意义
+                self.logger.warning(f"⏰ API请求已过期，不再重试: {e or '已被新请求取代'}")
+                return {
+                    'success': False,
+                    'error': 'API请求已过期'
+                }
             except requests.exceptions.Timeout as e:
                 self.logger.error(f"⏰ API超时 (尝试{attempt + 1}/2): {e}")
                 if attempt < 1:  # 如果还有重试机会
@@ -201,8 +247,9 @@ class OllamaClient:
             'error': '所有重试均失败'
         }
 
-    def evaluate_position_for_closing(self, position_info: Dict, market_data: Dict, account_info: Dict, roll_tracker=None) -> Dict:
-        """评估持仓是否应该平仓"""
+    def evaluate_position_for_closing(self, position_info: Dict, market_data: Dict, account_info: Dict, roll_tracker=None,
+                                      deadline: float = None) -> Dict:
+        """评估持仓是否应该平仓（以最高优先级排队）"""
         
         # 获取ROLL状态信息
         symbol = position_info.get('symbol', '')
@@ -255,33 +302,18 @@ class OllamaClient:
         ]
 
         try:
-            response = requests.post(
-                self.url,
-                headers=self.headers,
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                },
-                timeout=self.timeout
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                # self.logger.warning('AI response: '+ result)
-                content = result['choices'][0]['message']['content']
-                decision = self._parse_decision(content)
-                return decision
-            else:
-                return {"action": "HOLD", "confidence": 0, "narrative": "API错误"}
+            content = self._generate(messages, Priority.EXIT, deadline, ('exit', symbol), DECISION_SCHEMA)
+            return self._parse_decision(content)
+        except requests.HTTPError:
+            return {"action": "HOLD", "confidence": 0, "narrative": "API错误"}
         except Exception as e:
             self.logger.error(f"评估持仓异常: {e}")
             return {"action": "HOLD", "confidence": 0, "narrative": f"异常: {str(e)}"}
 
     def analyze_with_reasoning(self, market_data: Dict, account_info: Dict,
                                trade_history: List[Dict] = None,
-                               use_deepthink: bool = False) -> Dict:
+                               use_deepthink: bool = False,
+                               deadline: float = None) -> Dict:
         """使用推理模型分析市场"""
         prompt = self._build_trading_prompt(market_data, account_info, trade_history)
         
@@ -329,7 +361,8 @@ class OllamaClient:
         ]
 
         try:
-            response = self.reasoning_completion(messages)
+            response = self.reasoning_completion(messages, Priority.ENTRY, deadline,
+                                                 ('entry', market_data.get('symbol')), DECISION_SCHEMA)
             # self.logger.warning('AI response: '+ str(response))
             
             if 'error' in response:
@@ -376,33 +409,27 @@ class OllamaClient:
         return prompt
 
     def _parse_decision(self, content: str) -> Dict:
-        """解析AI返回的决策"""
+        """
+        解析AI返回的决策
+
+        先按 DECISION_SCHEMA 严格解析（结构化输出下应当总是成功），失败时才做一次修复解析；
+        两者都失败时返回观望（与正常决策相同的字段），并计入解析失败率
+        """
         try:
-            # 尝试直接解析JSON
-            import re
-            json_match = re.search(r'\{[^{}]*\}', content, re.DOTALL)
-            if json_match:
-                decision = json.loads(json_match.group())
-                return {
-                    "action": decision.get("action", "HOLD"),
-                    "confidence": decision.get("confidence", 50),
-                    "reasoning": decision.get("reasoning", decision.get("narrative", content[:200])),
-                    "leverage": decision.get("leverage", 10),
-                    "position_size": decision.get("position_size", 30),
-                    "stop_loss_pct": decision.get("stop_loss_pct", 3),
-                    "take_profit_pct": decision.get("take_profit_pct", 8),
-                    "narrative": decision.get("narrative", decision.get("reasoning", ""))
-                }
-        except Exception as e:
-            self.logger.error(f"解析AI决策失败: {e}")
+            decision = parse_decision(content)
+            self.parse_metrics.record('strict')
+            return decision.to_dict()
+        except DecisionParseError as e:
+            strict_error = e
+
+        try:
+            decision = repair_decision(content)
+            self.parse_metrics.record('repaired')
+            self.logger.warning(f"AI决策不符合Schema（{strict_error}），已修复解析")
+            return decision.to_dict()
+        except DecisionParseError as e:
+            self.parse_metrics.record('failed')
+            self.logger.error(f"解析AI决策失败: {e}（失败率 {self.parse_metrics.failure_rate:.1%}）")
 
         # 默认返回
-        return {
-            "action": "HOLD",
-            "confidence": 50,
-            "reasoning": content[:200] if content else "无法解析",
-            "leverage": 10,
-            "position_size": 30,
-            "stop_loss_pct": 3,
-            "take_profit_pct": 8
-        }
+        return Decision(action="HOLD", confidence=50, reasoning=content[:200] if content else "无法解析").to_dict()
@@ -0,0 +1,130 @@
+"""
+支撑阻力位检测
+滑动窗口极值用 van Herk/Gil-Werman 分块算法：序列按窗口长度分块，块内前缀最大值和后缀最大值
+各一次累积，任一窗口的极值由两者合并得到，每个元素只处理常数次，整体 O(n) 且全部向量化，
+与窗口大小无关。转折点（局部高低点）经价格聚类合并为带触及次数的价位区间，可合并多个周期
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from kline_store import COLUMNS
+
+
+_HIGH, _LOW = COLUMNS.index('high'), COLUMNS.index('low')
+
+
+def _sliding(x, window: int, ufunc, fill: float) -> np.ndarray:
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    if window < 1 or n < window:
+        return np.empty(x.shape[:-1] + (0,))
+    blocks = -(-n // window)
+    padded = np.full(x.shape[:-1] + (blocks * window,), fill)
+    padded[..., :n] = x
+    shaped = padded.reshape(x.shape[:-1] + (blocks, window))
+    prefix = ufunc.accumulate(shaped, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(shaped[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    # 窗口 [i, i+window) 至多跨越两个块：取前一块的后缀极值和后一块的前缀极值
+    return ufunc(suffix[..., :n - window + 1], prefix[..., window - 1:n])
+
+
+def sliding_max(x, window: int) -> np.ndarray:
+    """out[..., i] = max(x[..., i:i+window])，长度 n-window+1"""
+    return _sliding(x, window, np.maximum, -np.inf)
+
+
+def sliding_min(x, window: int) -> np.ndarray:
+    """out[..., i] = min(x[..., i:i+window])，长度 n-window+1"""
+    return _sliding(x, window, np.minimum, np.inf)
+
+
+def pivots(high, low, window: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    转折点：高点严格高于左侧 window 根、不低于右侧 window 根（低点对称），
+    相同价格的平台只记第一根。首尾各 window 根无法确认，记为 False
+
+    Returns:
+        (是否为高点, 是否为低点) 两个布尔数组
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    n = high.shape[-1]
+    is_high = np.zeros(high.shape, dtype=bool)
+    is_low = np.zeros(low.shape, dtype=bool)
+    if n < 2 * window + 1:
+        return is_high, is_low
+    # 第 i 根的左窗口为 [i-window, i)，右窗口为 (i, i+window]
+    highs, lows = sliding_max(high, window), sliding_min(low, window)
+    middle = slice(window, n - window)
+    is_high[..., middle] = ((high[..., middle] > highs[..., :n - 2 * window])
+                            & (high[..., middle] >= highs[..., window + 1:]))
+    is_low[..., middle] = ((low[..., middle] < lows[..., :n - 2 * window])
+                           & (low[..., middle] <= lows[..., window + 1:]))
+    return is_high, is_low
+
+
+def cluster_levels(prices, tolerance: float = 0.005, labels=None) -> List[Dict]:
+    """
+    把相近的价格合并为区间：按价格升序，超出当前区间下沿 tolerance 的价格开始新区间
+    （限制区间宽度，避免间距都很小的一串价格被链式合并成一个大区间）
+
+    Args:
+        prices: 转折点价格
+        tolerance: 区间的最大相对宽度
+        labels: 与 prices 对应的来源标记（如周期），记录在区间的 timeframes 中
+
+    Returns:
+        [{'price': 均价, 'low': 区间下沿, 'high': 区间上沿, 'touches': 转折点数量, 'timeframes': [...]}]，按价格升序
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    order = np.argsort(prices, kind='stable')
+    sorted_prices = prices[order]
+    starts = []
+    for i, price in enumerate(sorted_prices):
+        if not starts or price > sorted_prices[starts[-1]] * (1 + tolerance):
+            starts.append(i)
+    zones = []
+    for members in np.split(np.arange(len(sorted_prices)), starts[1:]) if starts else []:
+        values = sorted_prices[members]
+        zone = {
+            'price': float(values.mean()),
+            'low': float(values[0]),
+            'high': float(values[-1]),
+            'touches': len(values),
+        }
+        if labels is not None:
+            zone['timeframes'] = sorted({labels[i] for i in order[members]})
+        zones.append(zone)
+    return zones
+
+
+def find_levels(frames: Dict[str, np.ndarray], current_price: float, window: int = 2,
+                tolerance: float = 0.005, max_levels: int = 3) -> Dict[str, List[Dict]]:
+    """
+    多周期支撑阻力区间
+
+    各周期的高点和低点转折点一起聚类（突破后的阻力转为支撑，反之亦然），
+    低于当前价的区间为支撑、高于的为阻力，各取离当前价最近的 max_levels 个
+
+    Args:
+        frames: {周期: (len(COLUMNS), n) K线列矩阵}
+        current_price: 当前价格
+        window: 转折点两侧比较的 K线数量
+        tolerance: 聚类区间的最大相对宽度
+        max_levels: 支撑、阻力各保留的数量
+
+    Returns:
+        {'support': [区间, ...], 'resistance': [区间, ...]}，均按离当前价由近到远排序
+    """
+    prices, labels = [], []
+    for interval, columns in frames.items():
+        is_high, is_low = pivots(columns[_HIGH], columns[_LOW], window)
+        found = np.concatenate((columns[_HIGH][is_high], columns[_LOW][is_low]))
+        prices.append(found)
+        labels.extend([interval] * len(found))
+    zones = cluster_levels(np.concatenate(prices) if prices else [], tolerance, labels)
+    support = [z for z in reversed(zones) if z['price'] < current_price][:max_levels]
+    resistance = [z for z in zones if z['price'] > current_price][:max_levels]
+    return {'support': support, 'resistance': resistance}
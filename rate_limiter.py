@@ -0,0 +1,285 @@
+"""
+Binance 请求权重限流器
+按交易所的每分钟权重预算发放令牌，并用响应头 X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-1M 校准。
+状态保存在带文件锁的小文件里，机器人和仪表盘两个进程共享同一份预算，避免触发 429/418 封禁
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import config
+
+
+# 各接口的请求权重（未列出的按 1 计算），参考 Binance 官方文档
+FUTURES_WEIGHTS = {
+    'futures_account': 5,
+    'futures_position_information': 5,
+    'futures_exchange_info': 1,
+    'futures_ticker': 1,
+    'futures_mark_price': 1,
+    'futures_funding_rate': 1,
+    'futures_get_position_mode': 30,
+    'futures_get_open_orders': 1,
+    'futures_leverage_bracket': 1,
+    'futures_place_batch_order': 5,
+    'futures_create_order': 0,
+}
+
+SPOT_WEIGHTS = {
+    'get_account': 20,
+    'get_ticker': 2,
+    'get_symbol_ticker': 2,
+    'get_klines': 2,
+    'get_order': 4,
+    'get_open_orders': 6,
+}
+
+# 下单类接口，额外计入下单次数
+ORDER_METHODS = {'futures_create_order', 'futures_place_batch_order', 'create_order'}
+
+
+def _klines_weight(limit: Optional[int]) -> int:
+    """K线接口权重随 limit 变化"""
+    limit = limit or 500
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def _depth_weight(limit: Optional[int], futures: bool) -> int:
+    """深度接口权重随 limit 变化"""
+    limit = limit or 100
+    if futures:
+        if limit <= 50:
+            return 2
+        if limit <= 100:
+            return 5
+        if limit <= 500:
+            return 10
+        return 20
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def request_weight(name: str, params: Dict) -> Tuple[str, int, int]:
+    """
+    估算一次请求的权重
+
+    Args:
+        name: AsyncClient 方法名
+        params: 请求参数
+
+    Returns:
+        (限流桶 'futures'/'spot', 请求权重, 下单次数)
+    """
+    futures = name.startswith('futures_')
+    bucket = 'futures' if futures else 'spot'
+    symbol = params.get('symbol')
+
+    if name == 'futures_klines':
+        weight = _klines_weight(params.get('limit'))
+    elif name in ('futures_order_book', 'get_order_book'):
+        weight = _depth_weight(params.get('limit'), futures)
+    elif name == 'futures_ticker' and not symbol:
+        weight = 40
+    elif name == 'futures_mark_price' and not symbol:
+        weight = 10
+    elif name == 'futures_get_open_orders' and not symbol:
+        weight = 40
+    elif name == 'get_ticker' and not symbol:
+        weight = 80
+    elif name == 'get_open_orders' and not symbol:
+        weight = 80
+    else:
+        table = FUTURES_WEIGHTS if futures else SPOT_WEIGHTS
+        weight = table.get(name, 1)
+
+    orders = 0
+    if name in ORDER_METHODS:
+        orders = len(params.get('batchOrders') or []) or 1
+    return bucket, weight, orders
+
+
+class RateLimiter:
+    """跨进程共享的每分钟权重令牌桶"""
+
+    def __init__(self, state_file: str = None):
+        self.state_file = state_file or config.RateLimit.STATE_FILE
+        self.safety_ratio = config.RateLimit.SAFETY_RATIO
+        self.limits = {
+            'futures': (config.RateLimit.FUTURES_WEIGHT_PER_MINUTE,
+                        config.RateLimit.FUTURES_ORDERS_PER_MINUTE),
+            'spot': (config.RateLimit.SPOT_WEIGHT_PER_MINUTE,
+                     config.RateLimit.SPOT_ORDERS_PER_MINUTE),
+        }
+        self.logger = logging.getLogger(__name__)
+
+    # ========== 共享状态 ==========
+
+    @contextmanager
+    def _locked_state(self):
+        """加排他文件锁读取状态，退出时写回"""
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = b''
+            while True:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    break
+                raw += chunk
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+
+            yield state
+
+            data = json.dumps(state).encode()
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def _bucket_state(state: Dict, bucket: str, window: int) -> Dict:
+        """取出当前分钟窗口的桶状态，跨分钟时清零（交易所按自然分钟重置权重）"""
+        b = state.setdefault(bucket, {'window': window, 'weight': 0, 'orders': 0, 'ban_until': 0})
+        if b.get('window') != window:
+            b.update({'window': window, 'weight': 0, 'orders': 0})
+        return b
+
+    # ========== 令牌发放 ==========
+
+    def try_acquire(self, bucket: str, weight: int, orders: int = 0) -> float:
+        """
+        尝试占用权重
+
+        Args:
+            bucket: 限流桶
+            weight: 请求权重
+            orders: 下单次数
+
+        Returns:
+            0 表示已占用成功，否则返回需要等待的秒数
+        """
+        weight_limit, order_limit = self.limits[bucket]
+        now = time.time()
+        window = int(now // 60)
+
+        with self._locked_state() as state:
+            b = self._bucket_state(state, bucket, window)
+
+            if b.get('ban_until', 0) > now:
+                return b['ban_until'] - now
+
+            over_weight = b['weight'] + weight > weight_limit * self.safety_ratio
+            over_orders = orders and b['orders'] + orders > order_limit * self.safety_ratio
+            if over_weight or over_orders:
+                return (window + 1) * 60 - now + 0.05
+
+            b['weight'] += weight
+            b['orders'] += orders
+            return 0
+
+    async def acquire(self, bucket: str, weight: int, orders: int = 0):
+        """
+        异步等待直到权重可用（不阻塞事件循环里的其他请求）
+
+        文件锁和状态读写在线程池中执行：另一个进程持有锁时只占用工作线程，不阻塞事件循环
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = await loop.run_in_executor(None, self.try_acquire, bucket, weight, orders)
+            if delay <= 0:
+                return
+            self.logger.warning(f"[RATE] {bucket} 权重预算已用尽，等待 {delay:.1f} 秒")
+            await asyncio.sleep(delay)
+
+    # ========== 响应头校准 ==========
+
+    def sync_from_response(self, response):
+        """
+        用响应头校准已用权重（头部是交易所按 IP 统计的值，已包含其他进程的请求）
+
+        Args:
+            response: aiohttp 响应对象
+        """
+        if response is None:
+            return
+        headers = response.headers
+        used_weight = headers.get('X-MBX-USED-WEIGHT-1M')
+        order_count = headers.get('X-MBX-ORDER-COUNT-1M')
+        if used_weight is None and order_count is None:
+            return
+
+        bucket = 'futures' if 'fapi' in str(response.url) else 'spot'
+        window = int(time.time() // 60)
+        with self._locked_state() as state:
+            b = self._bucket_state(state, bucket, window)
+            if used_weight is not None:
+                b['weight'] = max(b['weight'], int(used_weight))
+            if order_count is not None:
+                b['orders'] = max(b['orders'], int(order_count))
+
+    def ban(self, response, status_code: int):
+        """
+        收到 429/418 时按 Retry-After 暂停该桶的所有请求
+
+        Args:
+            response: aiohttp 响应对象
+            status_code: HTTP 状态码
+        """
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+        retry_after = float(retry_after) if retry_after else 60.0
+
+        bucket = 'futures' if response is not None and 'fapi' in str(response.url) else 'spot'
+        window = int(time.time() // 60)
+        with self._locked_state() as state:
+            b = self._bucket_state(state, bucket, window)
+            b['ban_until'] = max(b.get('ban_until', 0), time.time() + retry_after)
+
+        self.logger.error(f"[RATE] 收到 {status_code}，{bucket} 请求暂停 {retry_after:.0f} 秒")
+
+    async def record_response(self, response, status_code: int = None):
+        """
+        异步校准：在线程池中用响应头校准已用权重，收到 429/418 时暂停该桶
+
+        Args:
+            response: aiohttp 响应对象
+            status_code: 请求失败时的 HTTP 状态码
+        """
+        def record():
+            self.sync_from_response(response)
+            if status_code in (418, 429):
+                self.ban(response, status_code)
+
+        await asyncio.get_running_loop().run_in_executor(None, record)
+
+    def usage(self) -> Dict:
+        """返回各桶当前分钟的权重使用情况"""
+        window = int(time.time() // 60)
+        with self._locked_state() as state:
+            return {
+                bucket: dict(self._bucket_state(state, bucket, window), limit=self.limits[bucket][0])
+                for bucket in self.limits
+            }
@@ -0,0 +1,130 @@
+"""
+Binance 响应缓存
+按接口设置 TTL 缓存只读请求的结果，并把同时发出的相同请求合并为一次 HTTP 调用（single-flight），
+仪表盘多个页面、推送线程和机器人同时查询时，每个 TTL 窗口只向交易所发一次请求
+"""
+
+import asyncio
+import copy
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+# 各接口的缓存时间（秒），未列出的接口不缓存
+DEFAULT_TTLS = {
+    # 行情
+    'get_symbol_ticker': 1,
+    'get_ticker': 1,
+    'futures_ticker': 1,
+    'futures_mark_price': 1,
+    'futures_funding_rate': 30,
+    # 账户（下单、改杠杆等写操作后立即失效）
+    'get_account': 1,
+    'futures_account': 1,
+    'futures_position_information': 1,
+    'futures_get_open_orders': 1,
+    'futures_get_position_mode': 60,
+    # 交易规则
+    'futures_exchange_info': 3600,
+    'futures_leverage_bracket': 3600,
+}
+
+# 账户写操作后需要失效的接口
+ACCOUNT_ENDPOINTS = {
+    'get_account', 'futures_account', 'futures_position_information',
+    'futures_get_open_orders', 'futures_get_position_mode'
+}
+
+
+class ResponseCache:
+    """按接口 TTL 缓存 + 相同请求合并（只在一个事件循环内使用）"""
+
+    def __init__(self, ttls: Dict[str, float] = None):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # 每次失效递增，失效前发出的请求返回后不再写入缓存
+        self._generation = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(name: str, args: tuple, kwargs: Dict) -> Tuple:
+        return (name, args, tuple(sorted(kwargs.items())))
+
+    def is_cacheable(self, name: str) -> bool:
+        return self.ttls.get(name, 0) > 0
+
+    def _count(self, name: str, field: str):
+        stats = self._stats.setdefault(name, {'hits': 0, 'misses': 0, 'coalesced': 0})
+        stats[field] += 1
+
+    async def get(self, name: str, args: tuple, kwargs: Dict,
+                  fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        读取缓存，未命中时调用 fetch 获取
+
+        Args:
+            name: 接口名（决定 TTL）
+            args: 位置参数（参与缓存键）
+            kwargs: 关键字参数（参与缓存键）
+            fetch: 实际发出请求的协程工厂
+
+        Returns:
+            接口结果（深拷贝，调用方修改不影响缓存）
+        """
+        key = self.make_key(name, args, kwargs)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self._count(name, 'hits')
+            return copy.deepcopy(entry[1])
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._count(name, 'coalesced')
+            return copy.deepcopy(await asyncio.shield(future))
+
+        self._count(name, 'misses')
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            result = await fetch()
+        except BaseException as e:
+            # 失败不缓存，等待中的相同请求一并收到异常
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # 没有等待者时避免 "never retrieved" 警告
+            raise
+        else:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttls[name], result)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, names: Optional[set] = None):
+        """使指定接口（默认全部）的缓存失效"""
+        self._generation += 1
+        if names is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] in names]:
+            del self._entries[key]
+
+    def stats(self) -> Dict:
+        """命中统计：总计和按接口明细"""
+        total = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        for stats in self._stats.values():
+            for field, value in stats.items():
+                total[field] += value
+        requests = sum(total.values())
+        total['hit_rate'] = round((total['hits'] + total['coalesced']) / requests, 4) if requests else 0.0
+        total['entries'] = len(self._entries)
+        total['endpoints'] = {name: dict(stats) for name, stats in self._stats.items()}
+        return total
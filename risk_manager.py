@@ -36,12 +36,13 @@ class PositionRisk:
 class RiskManager:
     """交易风险管理器"""
 
-    def __init__(self, risk_config: Dict):
+    def __init__(self, risk_config: Dict, correlation=None):
         """
         初始化风险管理器
 
         Args:
             risk_config: 风险管理配置
+            correlation: RollingCorrelation 实例（可选，用于限制高相关持仓的合计敞口）
         """
         # 资金风控限制
         self.max_portfolio_risk = risk_config.get('max_portfolio_risk', config.Risk.MAX_PORTFOLIO_RISK)
@@ -61,6 +62,9 @@ class RiskManager:
         # 仓位限制
         self.max_open_positions = risk_config.get('max_open_positions', config.Risk.MAX_POSITIONS)
         self.max_correlation = risk_config.get('max_correlation', config.Risk.MAX_CORRELATION)
+        self.max_correlated_exposure = risk_config.get('max_correlated_exposure',
+                                                       config.Risk.MAX_CORRELATED_EXPOSURE)
+        self.correlation = correlation
 
         # 追踪数据
         self.daily_pnl = 0.0
@@ -293,6 +297,51 @@ class RiskManager:
 
         return True, "订单验证通过"
 
+    def check_correlated_exposure(self, symbol: str, notional: float, positions: List[Dict],
+                                  account_balance: float) -> Tuple[float, str]:
+        """
+        检查新开仓与现有高相关持仓的合计敞口
+
+        与新仓位相关系数绝对值不低于 max_correlation 的持仓（含同一交易对）视为同一方向的押注，
+        按 相关系数 × 名义价值 折算到新仓位方向后与新仓位合计，不得超过 余额 × max_correlated_exposure。
+        负相关的反向持仓计入同向敞口，同向相关的反向持仓（对冲）抵减敞口。
+        没有任何高相关持仓时不限制（单笔仓位大小由 calculate_position_size 等其他检查负责）
+
+        Args:
+            symbol: 交易对
+            notional: 新仓位名义价值（多为正，空为负）
+            positions: 持仓列表（来自Binance API）
+            account_balance: 账户余额
+
+        Returns:
+            (允许的仓位比例 0~1, 原因说明)，0 表示拒绝开仓
+        """
+        correlations = self.correlation.correlations(symbol) if self.correlation is not None else None
+        if correlations is None or notional == 0:
+            return 1.0, "无相关性数据"
+
+        direction = 1 if notional > 0 else -1
+        existing = 0.0
+        correlated = []
+        for pos in positions:
+            rho = correlations.get(pos.get('symbol'))
+            amount = float(pos.get('positionAmt', 0))
+            if rho is None or amount == 0 or abs(rho) < self.max_correlation:
+                continue
+            pos_notional = float(pos.get('notional') or amount * float(pos.get('markPrice', 0)))
+            existing += rho * pos_notional * direction
+            correlated.append(f"{pos['symbol']}({rho:+.2f})")
+        if not correlated:
+            return 1.0, "无高相关持仓"
+
+        limit = account_balance * self.max_correlated_exposure
+        room = limit - existing
+        if room <= 0:
+            return 0.0, f"高相关持仓敞口已达上限: {existing:,.0f} / {limit:,.0f} USDT {' '.join(correlated)}"
+        if abs(notional) <= room:
+            return 1.0, "相关性敞口检查通过"
+        return room / abs(notional), f"高相关持仓敞口接近上限，仓位缩减至 {room:,.0f} USDT {' '.join(correlated)}"
+
     def get_portfolio_risk_summary(self, positions: List[Dict],
                                    account_balance: float) -> Dict:
         """
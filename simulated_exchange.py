@@ -0,0 +1,1051 @@
+"""
+本地模拟合约交易所
+用录制或合成的1分钟K线驱动撮合，实现机器人用到的 BinanceClient 接口：市价/限价/止损/止盈/追踪止损单、
+杠杆、全仓/逐仓、双向持仓、maker/taker 手续费、资金费结算和按标记价格强平。
+时钟可以按倍速运行或手动推进，机器人、回归测试和吞吐量压测无需连接币安即可离线运行
+"""
+
+import itertools
+import json
+import logging
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from async_binance_client import AsyncBinanceClient
+from binance_client import BinanceClient
+from response_cache import ResponseCache
+
+
+MINUTE_MS = 60_000
+FUNDING_INTERVAL_MS = 8 * 3600_000      # 每8小时结算一次资金费
+
+INTERVAL_MS = {
+    '1m': MINUTE_MS, '3m': 3 * MINUTE_MS, '5m': 5 * MINUTE_MS, '15m': 15 * MINUTE_MS,
+    '30m': 30 * MINUTE_MS, '1h': 60 * MINUTE_MS, '2h': 120 * MINUTE_MS, '4h': 240 * MINUTE_MS,
+    '6h': 360 * MINUTE_MS, '8h': 480 * MINUTE_MS, '12h': 720 * MINUTE_MS, '1d': 1440 * MINUTE_MS,
+}
+
+ORDER_TYPES = {'MARKET', 'LIMIT', 'STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET',
+               'TRAILING_STOP_MARKET'}
+STOP_TYPES = {'STOP', 'STOP_MARKET'}
+TAKE_PROFIT_TYPES = {'TAKE_PROFIT', 'TAKE_PROFIT_MARKET'}
+
+
+# ========== K线数据 ==========
+
+def synthetic_klines(start_price: float, count: int, start_time: int = None,
+                     volatility: float = 0.002, drift: float = 0.0, seed: int = None) -> List[list]:
+    """
+    生成几何随机游走的1分钟K线（格式与 REST K线接口一致）
+
+    Args:
+        start_price: 起始价格
+        count: K线数量
+        start_time: 第一根K线开盘时间（毫秒），默认对齐到 count 分钟之前
+        volatility: 每分钟收益率标准差
+        drift: 每分钟收益率均值
+        seed: 随机种子（相同种子生成相同行情，便于回归测试）
+    """
+    rng = random.Random(seed)
+    if start_time is None:
+        start_time = (int(time.time() * 1000) // MINUTE_MS - count) * MINUTE_MS
+
+    rows = []
+    price = start_price
+    for i in range(count):
+        open_time = start_time + i * MINUTE_MS
+        close = price * math.exp(rng.gauss(drift, volatility))
+        high = max(price, close) * (1 + abs(rng.gauss(0, volatility / 2)))
+        low = min(price, close) * (1 - abs(rng.gauss(0, volatility / 2)))
+        volume = abs(rng.gauss(100, 30)) + 1
+        rows.append([open_time, _fmt(price), _fmt(high), _fmt(low), _fmt(close), _fmt(volume),
+                     open_time + MINUTE_MS - 1, _fmt(volume * close), rng.randint(50, 500),
+                     _fmt(volume / 2), _fmt(volume * close / 2), '0'])
+        price = close
+    return rows
+
+
+def load_recorded_klines(path: str) -> Dict[str, List[list]]:
+    """读取录制的1分钟K线文件：{symbol: [REST K线行, ...]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_depth_frames(symbol: str, mid_price: float, count: int, tick: float = 0.1, levels: int = 50,
+                           start_time: int = None, snapshot_at: int = 5, snapshot_delay: int = 3,
+                           seed: int = None) -> List[str]:
+    """
+    生成合约增量深度流的组合流帧（格式与 MarketDataStream 录制文件一致），用于离线回放订单簿
+
+    每条 depthUpdate 的 pu 等于上一条的 u；中间插入一条录制时写入的 depthSnapshot 帧，
+    其 lastUpdateId 为第 snapshot_at 条增量的 u，出现在该增量之后 snapshot_delay 条（模拟快照请求延迟）
+
+    Args:
+        symbol: 交易对
+        mid_price: 初始中间价
+        count: 增量事件数量
+        tick: 价格步长
+        levels: 中间价两侧各维护的档位数
+        start_time: 第一条事件时间（毫秒），默认当前时间
+        snapshot_at: 快照对应的增量序号
+        snapshot_delay: 快照帧晚于该增量的条数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    event_time = start_time if start_time is not None else int(time.time() * 1000)
+    stream = f"{symbol.lower()}@depth@100ms"
+    mid = round(mid_price / tick)
+    bids = {mid - i: rng.uniform(1, 20) for i in range(1, levels + 1)}
+    asks = {mid + i: rng.uniform(1, 20) for i in range(1, levels + 1)}
+
+    frames = []
+    snapshot = None
+    update_id = rng.randint(1_000_000, 2_000_000)
+    previous = update_id
+    for n in range(count):
+        mid += rng.choice((-1, 0, 0, 1))
+        b, a = {}, {}
+        # 越过中间价的档位撤掉，再在两侧随机改几档
+        for side, book, crossed in ((b, bids, lambda p: p >= mid), (a, asks, lambda p: p <= mid)):
+            for price in [p for p in book if crossed(p)]:
+                side[price] = 0.0
+        for _ in range(rng.randint(1, 6)):
+            offset = rng.randint(1, levels)
+            quantity = 0.0 if rng.random() < 0.25 else rng.uniform(1, 20)
+            if rng.random() < 0.5:
+                b[mid - offset] = quantity
+            else:
+                a[mid + offset] = quantity
+        for side, book in ((b, bids), (a, asks)):
+            for price, quantity in side.items():
+                if quantity:
+                    book[price] = quantity
+                else:
+                    book.pop(price, None)
+
+        first = previous + 1
+        update_id = first + rng.randint(0, 4)
+        event_time += 100
+        frames.append(json.dumps({'stream': stream, 'data': {
+            'e': 'depthUpdate', 'E': event_time, 'T': event_time - 5, 's': symbol,
+            'U': first, 'u': update_id, 'pu': previous,
+            'b': [[_fmt(p * tick), _fmt(q)] for p, q in sorted(b.items(), reverse=True)],
+            'a': [[_fmt(p * tick), _fmt(q)] for p, q in sorted(a.items())],
+        }}))
+        previous = update_id
+
+        if n == snapshot_at:
+            snapshot = {'e': 'depthSnapshot', 'E': event_time, 'T': event_time - 5, 's': symbol,
+                        'lastUpdateId': update_id,
+                        'bids': [[_fmt(p * tick), _fmt(q)] for p, q in sorted(bids.items(), reverse=True)],
+                        'asks': [[_fmt(p * tick), _fmt(q)] for p, q in sorted(asks.items())]}
+        if n == snapshot_at + snapshot_delay:
+            frames.append(json.dumps({'stream': f"{symbol.lower()}@depthSnapshot", 'data': snapshot}))
+    return frames
+
+
+def _fmt(value: float, decimals: int = 8) -> str:
+    return f"{value:.{decimals}f}"
+
+
+def _step_str(step: float) -> str:
+    text = f"{step:.10f}".rstrip('0').rstrip('.')
+    return text or '0'
+
+
+class SimulatedAPIError(Exception):
+    """模拟交易所拒单，错误信息格式与 AsyncBinanceClient 包装后的 API 错误一致"""
+
+    def __init__(self, code: int, msg: str):
+        self.code = code
+        self.message = msg
+        super().__init__(f"API错误: {code} - {msg}")
+
+
+# ========== 时钟 ==========
+
+class SimulatedClock:
+    """模拟时钟：按 speed 倍速跟随真实时间，speed=0 时只能手动推进"""
+
+    def __init__(self, start_ms: int, speed: float = 1.0):
+        self.start_ms = start_ms
+        self.speed = speed
+        self._offset_ms = 0
+        self._real_start = time.monotonic()
+
+    def now_ms(self) -> int:
+        elapsed = (time.monotonic() - self._real_start) * 1000 * self.speed
+        return int(self.start_ms + self._offset_ms + elapsed)
+
+    def advance(self, seconds: float):
+        self._offset_ms += int(seconds * 1000)
+
+
+class _NullRateLimiter:
+    """模拟交易所不消耗真实的请求权重"""
+
+    async def acquire(self, bucket: str, weight: int, orders: int = 0):
+        return None
+
+    def sync_from_response(self, response):
+        return None
+
+    def ban(self, response, status_code: int):
+        return None
+
+    async def record_response(self, response, status_code: int = None):
+        return None
+
+    def usage(self) -> Dict:
+        return {}
+
+
+# ========== 撮合引擎 ==========
+
+class SimulatedFuturesBackend:
+    """
+    模拟 python-binance AsyncClient 的合约接口
+
+    方法名、参数和返回字段与官方 SDK 一致，AsyncBinanceClient 直接把它当作底层客户端使用。
+    每次调用先把行情推进到当前模拟时间：逐根处理新收盘的1分钟K线，按最高/最低价触发挂单，
+    再结算资金费并按收盘价（标记价格）检查强平
+    """
+
+    response = None     # 没有 HTTP 响应头，限流器跳过校准
+
+    def __init__(self, klines: Dict[str, List[list]], clock: SimulatedClock,
+                 initial_balance: float = 10000.0, maker_fee: float = 0.0002,
+                 taker_fee: float = 0.0005, funding_rate: float = 0.0001,
+                 maintenance_margin_rate: float = 0.004, dual_side: bool = True,
+                 default_leverage: int = 20, max_leverage: int = 125):
+        self.clock = clock
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.funding_rate = funding_rate
+        self.maintenance_margin_rate = maintenance_margin_rate
+        self.dual_side = dual_side
+        self.default_leverage = default_leverage
+        self.max_leverage = max_leverage
+        self.logger = logging.getLogger(__name__)
+
+        self._rows = {s: sorted(rows, key=lambda r: int(r[0])) for s, rows in klines.items() if rows}
+        self._bars = {s: [(int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]),
+                           float(r[5]), int(r[6]), float(r[7]), int(r[8])) for r in rows]
+                      for s, rows in self._rows.items()}
+        self._next = {s: 0 for s in self._bars}
+        self._mark = {s: bars[0][1] for s, bars in self._bars.items()}
+
+        self.wallet_balance = float(initial_balance)
+        self._leverage = {s: default_leverage for s in self._bars}
+        self._margin_type = {s: 'CROSSED' for s in self._bars}
+        self._positions: Dict[Tuple[str, str], Dict] = {}
+        self._orders: Dict[int, Dict] = {}
+        self._trailing: Dict[int, Dict] = {}
+        self._history: Dict[int, Dict] = {}
+        self._order_ids = itertools.count(1)
+
+        self.trades: List[Dict] = []
+        self.income: List[Dict] = []
+        self.funding_history: Dict[str, List[Dict]] = {s: [] for s in self._bars}
+        self.liquidations = 0
+
+        start = clock.now_ms()
+        self._next_funding = (start // FUNDING_INTERVAL_MS + 1) * FUNDING_INTERVAL_MS
+        self._filters = {s: self._derive_filters(bars[0][1]) for s, bars in self._bars.items()}
+        self._sync()
+
+    # ========== 行情推进 ==========
+
+    @property
+    def exhausted(self) -> bool:
+        """所有交易对的K线都已处理完"""
+        return all(self._next[s] >= len(bars) for s, bars in self._bars.items())
+
+    def _sync(self):
+        """处理模拟时间之前已收盘的所有K线（各交易对按时间对齐推进）"""
+        now = self.clock.now_ms()
+        while True:
+            pending = [bars[self._next[s]][0] for s, bars in self._bars.items()
+                       if self._next[s] < len(bars) and bars[self._next[s]][6] < now]
+            if not pending:
+                return
+            open_time = min(pending)
+            close_time = open_time
+            for symbol, bars in self._bars.items():
+                i = self._next[symbol]
+                if i < len(bars) and bars[i][0] == open_time:
+                    self._process_bar(symbol, bars[i])
+                    self._next[symbol] = i + 1
+                    close_time = bars[i][6]
+            while close_time + 1 >= self._next_funding:
+                self._settle_funding(self._next_funding)
+                self._next_funding += FUNDING_INTERVAL_MS
+            self._check_liquidations(close_time)
+
+    def _process_bar(self, symbol: str, bar: tuple):
+        """用一根K线的开/高/低价撮合该交易对的挂单，收盘价作为新的标记价格"""
+        _, o, h, l, c = bar[:5]
+        for order_id in sorted(self._orders):
+            order = self._orders.get(order_id)
+            if order is None or order['symbol'] != symbol or order['status'] != 'NEW':
+                continue
+            fill = self._trigger_price(order, o, h, l)
+            if fill is not None:
+                price, maker = fill
+                self._fill(order, price, maker, bar[6])
+        self._mark[symbol] = c
+
+    def _trigger_price(self, order: Dict, o: float, h: float, l: float) -> Optional[Tuple[float, bool]]:
+        """判断挂单在这根K线内是否成交，返回 (成交价, 是否 maker)"""
+        side, order_type = order['side'], order['type']
+        if order_type == 'LIMIT':
+            price = float(order['price'])
+            if (side == 'BUY' and l <= price) or (side == 'SELL' and h >= price):
+                return price, True
+            return None
+
+        if order_type == 'TRAILING_STOP_MARKET':
+            state = self._trailing[order['orderId']]
+            rate = float(order['priceRate']) / 100
+            if not state['activated']:
+                activate = state['activation_price']
+                if (side == 'SELL' and h >= activate) or (side == 'BUY' and l <= activate):
+                    state['activated'] = True
+                    state['extreme'] = activate
+                return None
+            # 先用已有极值判断回撤，再用本根K线更新极值（保守估计）
+            if side == 'SELL':
+                trigger = state['extreme'] * (1 - rate)
+                if l <= trigger:
+                    return min(trigger, o), False
+                state['extreme'] = max(state['extreme'], h)
+            else:
+                trigger = state['extreme'] * (1 + rate)
+                if h >= trigger:
+                    return max(trigger, o), False
+                state['extreme'] = min(state['extreme'], l)
+            return None
+
+        stop = float(order['stopPrice'])
+        rising = (order_type in STOP_TYPES) == (side == 'BUY')
+        if rising and h >= stop:
+            fill = max(stop, o)
+        elif not rising and l <= stop:
+            fill = min(stop, o)
+        else:
+            return None
+        if order_type in ('STOP', 'TAKE_PROFIT'):
+            fill = float(order['price'])
+        return fill, False
+
+    def _immediately_triggers(self, order: Dict, price: float) -> bool:
+        if order['type'] not in STOP_TYPES | TAKE_PROFIT_TYPES:
+            return False
+        stop = float(order['stopPrice'])
+        rising = (order['type'] in STOP_TYPES) == (order['side'] == 'BUY')
+        return price >= stop if rising else price <= stop
+
+    # ========== 持仓与保证金 ==========
+
+    def _position(self, symbol: str, position_side: str) -> Dict:
+        key = (symbol, position_side)
+        if key not in self._positions:
+            self._positions[key] = {'amt': 0.0, 'entry': 0.0, 'margin': 0.0, 'update_time': 0}
+        return self._positions[key]
+
+    def _unrealized(self, symbol: str, pos: Dict) -> float:
+        return pos['amt'] * (self._mark[symbol] - pos['entry'])
+
+    def _notional(self, symbol: str, pos: Dict) -> float:
+        return abs(pos['amt']) * self._mark[symbol]
+
+    def _cross_equity(self) -> float:
+        """全仓权益 = 钱包余额 - 逐仓占用保证金 + 全仓未实现盈亏"""
+        equity = self.wallet_balance
+        for (symbol, _), pos in self._positions.items():
+            if pos['amt'] == 0:
+                continue
+            if self._margin_type[symbol] == 'ISOLATED':
+                equity -= pos['margin']
+            else:
+                equity += self._unrealized(symbol, pos)
+        return equity
+
+    def _initial_margin(self) -> float:
+        return sum(self._notional(s, p) / self._leverage[s]
+                   for (s, _), p in self._positions.items()
+                   if p['amt'] != 0 and self._margin_type[s] == 'CROSSED')
+
+    def _available_balance(self) -> float:
+        return max(0.0, self._cross_equity() - self._initial_margin())
+
+    def _liquidation_price(self, symbol: str, pos: Dict) -> float:
+        amt = pos['amt']
+        if amt == 0:
+            return 0.0
+        if self._margin_type[symbol] == 'ISOLATED':
+            margin = pos['margin']
+        else:
+            margin = self._cross_equity() - self._unrealized(symbol, pos)
+        price = (amt * pos['entry'] - margin) / (amt - abs(amt) * self.maintenance_margin_rate)
+        return max(0.0, price)
+
+    def _position_key(self, symbol: str, position_side: str) -> str:
+        if self.dual_side:
+            if position_side not in ('LONG', 'SHORT'):
+                raise SimulatedAPIError(-4061, "Order's position side does not match user's setting.")
+            return position_side
+        if position_side not in (None, 'BOTH'):
+            raise SimulatedAPIError(-4061, "Order's position side does not match user's setting.")
+        return 'BOTH'
+
+    def _is_closing(self, order: Dict, pos: Dict) -> bool:
+        delta = 1 if order['side'] == 'BUY' else -1
+        return pos['amt'] != 0 and (pos['amt'] > 0) != (delta > 0)
+
+    def _fill(self, order: Dict, price: float, maker: bool, fill_time: int):
+        """按价格成交一笔订单，更新持仓、钱包余额、手续费和成交记录"""
+        symbol = order['symbol']
+        pos = self._position(symbol, order['positionSide'])
+        qty = float(order['origQty'])
+        closing = self._is_closing(order, pos)
+
+        if self._is_reduce_only(order):
+            # 只减仓的订单（双向持仓的平仓方向同样如此）不能超过当前持仓
+            if not closing:
+                self._finish(order, 'EXPIRED', fill_time)
+                return
+            qty = abs(pos['amt']) if order['closePosition'] else min(qty, abs(pos['amt']))
+
+        fee_rate = self.maker_fee if maker else self.taker_fee
+        if not closing:
+            required = qty * price / self._leverage[symbol] + qty * price * fee_rate
+            if required > self._available_balance() + 1e-9:
+                self._finish(order, 'EXPIRED', fill_time)
+                self.logger.warning(f"[SIM] {symbol} 保证金不足，订单 {order['orderId']} 过期")
+                return
+
+        delta = qty if order['side'] == 'BUY' else -qty
+        realized = 0.0
+        if closing:
+            close_qty = min(qty, abs(pos['amt']))
+            realized = close_qty * (price - pos['entry']) * (1 if pos['amt'] > 0 else -1)
+            if self._margin_type[symbol] == 'ISOLATED':
+                pos['margin'] -= pos['margin'] * close_qty / abs(pos['amt'])
+            new_amt = pos['amt'] + delta
+            if abs(new_amt) < 1e-12:
+                pos.update(amt=0.0, entry=0.0, margin=0.0)
+            elif (new_amt > 0) != (pos['amt'] > 0):
+                # 单向持仓模式下反手：剩余部分按成交价开新仓
+                pos.update(amt=new_amt, entry=price)
+                if self._margin_type[symbol] == 'ISOLATED':
+                    pos['margin'] = abs(new_amt) * price / self._leverage[symbol]
+            else:
+                pos['amt'] = new_amt
+        else:
+            total = abs(pos['amt']) + qty
+            pos['entry'] = (abs(pos['amt']) * pos['entry'] + qty * price) / total
+            pos['amt'] += delta
+            if self._margin_type[symbol] == 'ISOLATED':
+                pos['margin'] += qty * price / self._leverage[symbol]
+        pos['update_time'] = fill_time
+
+        commission = qty * price * fee_rate
+        self.wallet_balance += realized - commission
+        if realized:
+            self._record_income('REALIZED_PNL', realized, symbol, fill_time)
+        self._record_income('COMMISSION', -commission, symbol, fill_time)
+        self.trades.append({
+            'symbol': symbol, 'orderId': order['orderId'], 'side': order['side'],
+            'positionSide': order['positionSide'], 'price': price, 'qty': qty,
+            'realizedPnl': realized, 'commission': commission, 'maker': maker, 'time': fill_time
+        })
+
+        order.update(status='FILLED', executedQty=_fmt(qty, 8), avgPrice=_fmt(price),
+                     cumQuote=_fmt(qty * price), updateTime=fill_time)
+        self._orders.pop(order['orderId'], None)
+        self._trailing.pop(order['orderId'], None)
+        self._history[order['orderId']] = order
+
+    @staticmethod
+    def _is_reduce_only(order: Dict) -> bool:
+        closes_hedge_side = ((order['positionSide'] == 'LONG' and order['side'] == 'SELL')
+                             or (order['positionSide'] == 'SHORT' and order['side'] == 'BUY'))
+        return order['reduceOnly'] or order['closePosition'] or closes_hedge_side
+
+    def _finish(self, order: Dict, status: str, update_time: int):
+        order.update(status=status, updateTime=update_time)
+        self._orders.pop(order['orderId'], None)
+        self._trailing.pop(order['orderId'], None)
+        self._history[order['orderId']] = order
+
+    def _record_income(self, income_type: str, amount: float, symbol: str, ts: int):
+        self.income.append({'incomeType': income_type, 'income': amount, 'symbol': symbol,
+                            'asset': 'USDT', 'time': ts})
+
+    def _settle_funding(self, funding_time: int):
+        """资金费结算：费率为正时多头付给空头"""
+        for symbol in self._bars:
+            mark = self._mark[symbol]
+            self.funding_history[symbol].append({
+                'symbol': symbol, 'fundingRate': _fmt(self.funding_rate),
+                'fundingTime': funding_time, 'markPrice': _fmt(mark)
+            })
+        for (symbol, _), pos in self._positions.items():
+            if pos['amt'] == 0:
+                continue
+            payment = -pos['amt'] * self._mark[symbol] * self.funding_rate
+            self.wallet_balance += payment
+            if self._margin_type[symbol] == 'ISOLATED':
+                pos['margin'] += payment
+            self._record_income('FUNDING_FEE', payment, symbol, funding_time)
+
+    def _check_liquidations(self, ts: int):
+        """按标记价格检查强平：逐仓看单个仓位，全仓看整体权益"""
+        mmr = self.maintenance_margin_rate
+        for (symbol, side), pos in list(self._positions.items()):
+            if pos['amt'] != 0 and self._margin_type[symbol] == 'ISOLATED':
+                if pos['margin'] + self._unrealized(symbol, pos) <= self._notional(symbol, pos) * mmr:
+                    self._liquidate(symbol, side, pos, ts)
+
+        cross = [(s, side, p) for (s, side), p in self._positions.items()
+                 if p['amt'] != 0 and self._margin_type[s] == 'CROSSED']
+        if cross and self._cross_equity() <= sum(self._notional(s, p) * mmr for s, _, p in cross):
+            for symbol, side, pos in cross:
+                self._liquidate(symbol, side, pos, ts)
+
+    def _liquidate(self, symbol: str, position_side: str, pos: Dict, ts: int):
+        """强平：按标记价格市价平仓，撤销该持仓方向的挂单"""
+        self.liquidations += 1
+        self.logger.warning(f"[SIM] {symbol} {position_side} 仓位被强平 @ {self._mark[symbol]}")
+        for order in list(self._orders.values()):
+            if order['symbol'] == symbol and order['positionSide'] == position_side:
+                self._finish(order, 'CANCELED', ts)
+        order = self._new_order({
+            'symbol': symbol, 'side': 'SELL' if pos['amt'] > 0 else 'BUY', 'type': 'MARKET',
+            'quantity': abs(pos['amt']), 'positionSide': position_side, 'reduceOnly': 'true',
+            'newClientOrderId': f"autoclose-{ts}"
+        }, ts)
+        self._fill(order, self._mark[symbol], False, ts)
+        if self.wallet_balance < 0:
+            self._record_income('INSURANCE_CLEAR', -self.wallet_balance, symbol, ts)
+            self.wallet_balance = 0.0
+
+    # ========== 订单 ==========
+
+    def _new_order(self, params: Dict, ts: int) -> Dict:
+        order_id = next(self._order_ids)
+        price = params.get('price')
+        stop_price = params.get('stopPrice')
+        return {
+            'orderId': order_id,
+            'symbol': params['symbol'],
+            'status': 'NEW',
+            'clientOrderId': params.get('newClientOrderId') or f"sim_{order_id}",
+            'price': _fmt(float(price)) if price is not None else '0',
+            'avgPrice': '0',
+            'origQty': _fmt(float(params.get('quantity') or 0)),
+            'executedQty': '0',
+            'cumQuote': '0',
+            'timeInForce': params.get('timeInForce') or 'GTC',
+            'type': params['type'],
+            'origType': params['type'],
+            'reduceOnly': str(params.get('reduceOnly', 'false')).lower() == 'true',
+            'closePosition': str(params.get('closePosition', 'false')).lower() == 'true',
+            'side': params['side'],
+            'positionSide': params.get('positionSide') or 'BOTH',
+            'stopPrice': _fmt(float(stop_price)) if stop_price is not None else '0',
+            'workingType': params.get('workingType') or 'CONTRACT_PRICE',
+            'priceRate': str(params['callbackRate']) if params.get('callbackRate') is not None else None,
+            'activatePrice': _fmt(float(params['activationPrice'])) if params.get('activationPrice') else None,
+            'updateTime': ts,
+        }
+
+    def _place_order(self, params: Dict) -> Dict:
+        symbol = params.get('symbol')
+        if symbol not in self._bars:
+            raise SimulatedAPIError(-1121, 'Invalid symbol.')
+        order_type = params.get('type')
+        if order_type not in ORDER_TYPES:
+            raise SimulatedAPIError(-1116, 'Invalid orderType.')
+        if params.get('side') not in ('BUY', 'SELL'):
+            raise SimulatedAPIError(-1117, 'Invalid side.')
+        params = dict(params, positionSide=self._position_key(symbol, params.get('positionSide')))
+        if self.dual_side and str(params.get('reduceOnly', 'false')).lower() == 'true':
+            # 双向持仓下由 positionSide 决定平仓方向，交易所不接受 reduceOnly
+            raise SimulatedAPIError(-1106, "Parameter 'reduceonly' sent when not required.")
+
+        close_position = str(params.get('closePosition', 'false')).lower() == 'true'
+        if not close_position and float(params.get('quantity') or 0) <= 0:
+            raise SimulatedAPIError(-4003, 'Quantity less than or equal to zero.')
+        if order_type in ('LIMIT', 'STOP', 'TAKE_PROFIT') and params.get('price') is None:
+            raise SimulatedAPIError(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if order_type in STOP_TYPES | TAKE_PROFIT_TYPES and params.get('stopPrice') is None:
+            raise SimulatedAPIError(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+        if order_type == 'TRAILING_STOP_MARKET':
+            rate = float(params.get('callbackRate') or 0)
+            if not 0.1 <= rate <= 5:
+                raise SimulatedAPIError(-2007, 'Invalid callBack rate.')
+
+        ts = self.clock.now_ms()
+        mark = self._mark[symbol]
+        order = self._new_order(params, ts)
+
+        if self._immediately_triggers(order, mark):
+            raise SimulatedAPIError(-2021, 'Order would immediately trigger.')
+
+        pos = self._position(symbol, order['positionSide'])
+        if order_type == 'MARKET' and self._is_reduce_only(order) and not self._is_closing(order, pos):
+            raise SimulatedAPIError(-2022, 'ReduceOnly Order is rejected.')
+
+        if order_type == 'MARKET':
+            self._history[order['orderId']] = order
+            self._fill(order, mark, False, ts)
+            if order['status'] == 'EXPIRED':
+                raise SimulatedAPIError(-2019, 'Margin is insufficient.')
+            return dict(order)
+
+        if order_type == 'LIMIT':
+            marketable = (order['side'] == 'BUY' and float(order['price']) >= mark) or \
+                         (order['side'] == 'SELL' and float(order['price']) <= mark)
+            if marketable:
+                if order['timeInForce'] == 'GTX':
+                    raise SimulatedAPIError(-5022, 'Due to the order could not be executed as maker, '
+                                                   'the Post Only order will be rejected.')
+                self._history[order['orderId']] = order
+                self._fill(order, mark, False, ts)
+                if order['status'] == 'EXPIRED':
+                    raise SimulatedAPIError(-2019, 'Margin is insufficient.')
+                return dict(order)
+
+        if order_type == 'TRAILING_STOP_MARKET':
+            activation = float(params.get('activationPrice') or 0)
+            self._trailing[order['orderId']] = {
+                'activated': not activation,
+                'activation_price': activation,
+                'extreme': mark,
+            }
+
+        self._orders[order['orderId']] = order
+        self._history[order['orderId']] = order
+        return dict(order)
+
+    def _find_order(self, symbol: str, order_id: int = None, client_order_id: str = None) -> Dict:
+        for order in self._history.values():
+            if order['symbol'] != symbol:
+                continue
+            if (order_id is not None and order['orderId'] == int(order_id)) or \
+                    (client_order_id is not None and order['clientOrderId'] == client_order_id):
+                return order
+        raise SimulatedAPIError(-2011, 'Unknown order sent.')
+
+    # ========== python-binance AsyncClient 接口 ==========
+
+    async def close_connection(self):
+        return None
+
+    async def futures_time(self) -> Dict:
+        return {'serverTime': self.clock.now_ms()}
+
+    async def futures_create_order(self, **params) -> Dict:
+        self._sync()
+        return self._place_order(params)
+
+    async def futures_place_batch_order(self, batchOrders: List[Dict]) -> List[Dict]:
+        self._sync()
+        results = []
+        for params in batchOrders:
+            try:
+                results.append(self._place_order(params))
+            except SimulatedAPIError as e:
+                results.append({'code': e.code, 'msg': e.message})
+        return results
+
+    async def futures_cancel_order(self, symbol: str, orderId: int = None,
+                                   origClientOrderId: str = None) -> Dict:
+        self._sync()
+        order = self._find_order(symbol, orderId, origClientOrderId)
+        if order['status'] != 'NEW':
+            raise SimulatedAPIError(-2011, 'Unknown order sent.')
+        self._finish(order, 'CANCELED', self.clock.now_ms())
+        return dict(order)
+
+    async def futures_cancel_all_open_orders(self, symbol: str) -> Dict:
+        self._sync()
+        for order in [o for o in self._orders.values() if o['symbol'] == symbol]:
+            self._finish(order, 'CANCELED', self.clock.now_ms())
+        return {'code': 200, 'msg': 'The operation of cancel all open order is done.'}
+
+    async def futures_get_order(self, symbol: str, orderId: int = None,
+                                origClientOrderId: str = None) -> Dict:
+        self._sync()
+        return dict(self._find_order(symbol, orderId, origClientOrderId))
+
+    async def futures_get_open_orders(self, symbol: str = None) -> List[Dict]:
+        self._sync()
+        return [dict(o) for o in self._orders.values() if symbol is None or o['symbol'] == symbol]
+
+    async def futures_change_leverage(self, symbol: str, leverage: int) -> Dict:
+        self._sync()
+        if symbol not in self._bars:
+            raise SimulatedAPIError(-1121, 'Invalid symbol.')
+        leverage = int(leverage)
+        if not 1 <= leverage <= self.max_leverage:
+            raise SimulatedAPIError(-4028, f'Leverage {leverage} is not valid')
+        self._leverage[symbol] = leverage
+        return {'symbol': symbol, 'leverage': leverage, 'maxNotionalValue': '50000000'}
+
+    async def futures_change_margin_type(self, symbol: str, marginType: str) -> Dict:
+        self._sync()
+        margin_type = marginType.upper()
+        if self._margin_type.get(symbol) == margin_type:
+            raise SimulatedAPIError(-4046, 'No need to change margin type.')
+        if any(p['amt'] != 0 for (s, _), p in self._positions.items() if s == symbol):
+            raise SimulatedAPIError(-4048, 'Margin type cannot be changed if there exists position.')
+        self._margin_type[symbol] = margin_type
+        return {'code': 200, 'msg': 'success'}
+
+    async def futures_get_position_mode(self) -> Dict:
+        return {'dualSidePosition': self.dual_side}
+
+    async def futures_change_position_mode(self, dualSidePosition) -> Dict:
+        self._sync()
+        dual_side = str(dualSidePosition).lower() == 'true'
+        if dual_side == self.dual_side:
+            raise SimulatedAPIError(-4059, 'No need to change position side.')
+        if self._orders or any(p['amt'] != 0 for p in self._positions.values()):
+            raise SimulatedAPIError(-4068, 'Position side cannot be changed if there exists position.')
+        self.dual_side = dual_side
+        return {'code': 200, 'msg': 'success'}
+
+    async def futures_account(self) -> Dict:
+        self._sync()
+        unrealized = sum(self._unrealized(s, p) for (s, _), p in self._positions.items() if p['amt'])
+        initial = self._initial_margin() + sum(p['margin'] for (s, _), p in self._positions.items()
+                                               if p['amt'] and self._margin_type[s] == 'ISOLATED')
+        maint = sum(self._notional(s, p) * self.maintenance_margin_rate
+                    for (s, _), p in self._positions.items() if p['amt'])
+        available = self._available_balance()
+        positions = [{
+            'symbol': s, 'positionSide': side, 'positionAmt': _fmt(p['amt']),
+            'entryPrice': _fmt(p['entry']), 'unrealizedProfit': _fmt(self._unrealized(s, p)),
+            'leverage': str(self._leverage[s]), 'isolated': self._margin_type[s] == 'ISOLATED',
+            'initialMargin': _fmt(self._notional(s, p) / self._leverage[s]),
+            'maintMargin': _fmt(self._notional(s, p) * self.maintenance_margin_rate),
+            'notional': _fmt(p['amt'] * self._mark[s]), 'updateTime': p['update_time']
+        } for (s, side), p in self._positions.items() if p['amt']]
+        return {
+            'totalWalletBalance': _fmt(self.wallet_balance),
+            'totalUnrealizedProfit': _fmt(unrealized),
+            'totalMarginBalance': _fmt(self.wallet_balance + unrealized),
+            'totalInitialMargin': _fmt(initial),
+            'totalMaintMargin': _fmt(maint),
+            'availableBalance': _fmt(available),
+            'maxWithdrawAmount': _fmt(available),
+            'assets': [{
+                'asset': 'USDT', 'walletBalance': _fmt(self.wallet_balance),
+                'unrealizedProfit': _fmt(unrealized),
+                'marginBalance': _fmt(self.wallet_balance + unrealized),
+                'initialMargin': _fmt(initial), 'maintMargin': _fmt(maint),
+                'availableBalance': _fmt(available), 'maxWithdrawAmount': _fmt(available)
+            }],
+            'positions': positions,
+            'updateTime': self.clock.now_ms()
+        }
+
+    async def futures_position_information(self, symbol: str = None) -> List[Dict]:
+        self._sync()
+        sides = ('LONG', 'SHORT') if self.dual_side else ('BOTH',)
+        result = []
+        for s in self._bars:
+            if symbol is not None and s != symbol:
+                continue
+            for side in sides:
+                p = self._positions.get((s, side)) or {'amt': 0.0, 'entry': 0.0, 'margin': 0.0,
+                                                       'update_time': 0}
+                isolated = self._margin_type[s] == 'ISOLATED'
+                result.append({
+                    'symbol': s, 'positionSide': side,
+                    'positionAmt': _fmt(p['amt']), 'entryPrice': _fmt(p['entry']),
+                    'markPrice': _fmt(self._mark[s]),
+                    'unRealizedProfit': _fmt(self._unrealized(s, p)),
+                    'liquidationPrice': _fmt(self._liquidation_price(s, p)),
+                    'leverage': str(self._leverage[s]), 'maxNotionalValue': '50000000',
+                    'marginType': 'isolated' if isolated else 'cross',
+                    'isolatedMargin': _fmt(p['margin'] + self._unrealized(s, p) if isolated else 0),
+                    'isolatedWallet': _fmt(p['margin'] if isolated else 0),
+                    'isAutoAddMargin': 'false',
+                    'notional': _fmt(p['amt'] * self._mark[s]),
+                    'updateTime': p['update_time']
+                })
+        return result
+
+    async def get_account(self) -> Dict:
+        self._sync()
+        return {'balances': [{'asset': 'USDT', 'free': _fmt(self._available_balance()), 'locked': '0'}]}
+
+    # ========== 行情接口 ==========
+
+    def _closed_bars(self, symbol: str) -> List[tuple]:
+        if symbol not in self._bars:
+            raise SimulatedAPIError(-1121, 'Invalid symbol.')
+        return self._bars[symbol][:self._next[symbol]]
+
+    async def futures_klines(self, symbol: str, interval: str, limit: int = 500,
+                             startTime: int = None, endTime: int = None) -> List[list]:
+        """已收盘的K线；大于1分钟的周期由1分钟K线聚合（只返回完整的周期）"""
+        self._sync()
+        if interval not in INTERVAL_MS:
+            raise SimulatedAPIError(-1120, 'Invalid interval.')
+        bars = self._closed_bars(symbol)
+        step = INTERVAL_MS[interval]
+        rows = []
+        if step == MINUTE_MS:
+            rows = [list(r) for r in self._rows[symbol][:len(bars)]]
+        else:
+            group: List[tuple] = []
+            for bar in bars:
+                bucket = bar[0] // step * step
+                if group and group[0][0] // step * step != bucket:
+                    rows.append(self._aggregate(group, step))
+                    group = []
+                group.append(bar)
+            if group and len(group) == step // MINUTE_MS:
+                rows.append(self._aggregate(group, step))
+        if startTime is not None:
+            rows = [r for r in rows if int(r[0]) >= int(startTime)]
+        if endTime is not None:
+            rows = [r for r in rows if int(r[0]) <= int(endTime)]
+        limit = int(limit or 500)
+        return rows[:limit] if startTime is not None else rows[-limit:]
+
+    get_klines = futures_klines
+
+    @staticmethod
+    def _aggregate(group: List[tuple], step: int) -> list:
+        open_time = group[0][0] // step * step
+        volume = sum(b[5] for b in group)
+        quote_volume = sum(b[7] for b in group)
+        return [open_time, _fmt(group[0][1]), _fmt(max(b[2] for b in group)),
+                _fmt(min(b[3] for b in group)), _fmt(group[-1][4]), _fmt(volume),
+                open_time + step - 1, _fmt(quote_volume), sum(b[8] for b in group),
+                _fmt(volume / 2), _fmt(quote_volume / 2), '0']
+
+    def _ticker_24h(self, symbol: str) -> Dict:
+        bars = self._closed_bars(symbol)[-1440:]
+        last = self._mark[symbol]
+        open_price = bars[0][1] if bars else last
+        change = last - open_price
+        return {
+            'symbol': symbol,
+            'priceChange': _fmt(change),
+            'priceChangePercent': _fmt(change / open_price * 100 if open_price else 0, 3),
+            'weightedAvgPrice': _fmt(last),
+            'lastPrice': _fmt(last),
+            'openPrice': _fmt(open_price),
+            'highPrice': _fmt(max((b[2] for b in bars), default=last)),
+            'lowPrice': _fmt(min((b[3] for b in bars), default=last)),
+            'volume': _fmt(sum(b[5] for b in bars)),
+            'quoteVolume': _fmt(sum(b[7] for b in bars)),
+            'openTime': bars[0][0] if bars else self.clock.now_ms(),
+            'closeTime': bars[-1][6] if bars else self.clock.now_ms(),
+            'count': sum(b[8] for b in bars),
+        }
+
+    async def get_ticker(self, symbol: str = None):
+        self._sync()
+        if symbol is None:
+            return [self._ticker_24h(s) for s in self._bars]
+        return self._ticker_24h(symbol)
+
+    futures_ticker = get_ticker
+
+    async def get_symbol_ticker(self, symbol: str = None):
+        self._sync()
+        if symbol is None:
+            return [{'symbol': s, 'price': _fmt(self._mark[s])} for s in self._bars]
+        if symbol not in self._bars:
+            raise SimulatedAPIError(-1121, 'Invalid symbol.')
+        return {'symbol': symbol, 'price': _fmt(self._mark[symbol])}
+
+    futures_symbol_ticker = get_symbol_ticker
+
+    async def futures_mark_price(self, symbol: str = None):
+        self._sync()
+
+        def item(s):
+            return {'symbol': s, 'markPrice': _fmt(self._mark[s]), 'indexPrice': _fmt(self._mark[s]),
+                    'lastFundingRate': _fmt(self.funding_rate), 'nextFundingTime': self._next_funding,
+                    'time': self.clock.now_ms()}
+        return item(symbol) if symbol else [item(s) for s in self._bars]
+
+    async def futures_funding_rate(self, symbol: str, limit: int = 100, **kwargs) -> List[Dict]:
+        self._sync()
+        history = self.funding_history.get(symbol, [])
+        if not history:
+            return [{'symbol': symbol, 'fundingRate': _fmt(self.funding_rate),
+                     'fundingTime': self._next_funding, 'markPrice': _fmt(self._mark[symbol])}]
+        return history[-int(limit or 100):]
+
+    async def futures_open_interest(self, symbol: str) -> Dict:
+        """合成持仓量：最近一小时成交量"""
+        self._sync()
+        bars = self._closed_bars(symbol)[-60:]
+        return {'symbol': symbol, 'openInterest': _fmt(sum(b[5] for b in bars)), 'time': self.clock.now_ms()}
+
+    async def futures_open_interest_hist(self, symbol: str, period: str = '5m', limit: int = 30,
+                                         **kwargs) -> List[Dict]:
+        """合成持仓量历史：按 period 分段的滚动一小时成交量"""
+        self._sync()
+        bars = self._closed_bars(symbol)
+        step = INTERVAL_MS[period] // MINUTE_MS
+        rows = []
+        for end in range(len(bars), 0, -step)[:int(limit)]:
+            window = bars[max(0, end - 60):end]
+            amount = sum(b[5] for b in window)
+            rows.append({'symbol': symbol, 'sumOpenInterest': _fmt(amount),
+                         'sumOpenInterestValue': _fmt(amount * window[-1][4]),
+                         'timestamp': window[-1][6] + 1})
+        return rows[::-1]
+
+    async def get_order_book(self, symbol: str, limit: int = 100) -> Dict:
+        """以标记价格为中心、按价格步长展开的合成盘口"""
+        self._sync()
+        mark = self._mark[symbol]
+        tick = self._filters[symbol]['tick']
+        depth = min(int(limit or 100), 100)
+        return {
+            'lastUpdateId': self.clock.now_ms(),
+            'bids': [[_fmt(mark - tick * (i + 1)), _fmt(10.0 / (i + 1))] for i in range(depth)],
+            'asks': [[_fmt(mark + tick * (i + 1)), _fmt(10.0 / (i + 1))] for i in range(depth)],
+        }
+
+    futures_order_book = get_order_book
+
+    # ========== 交易规则 ==========
+
+    @staticmethod
+    def _derive_filters(price: float) -> Dict:
+        """按价格数量级推算价格步长和数量步长"""
+        magnitude = math.floor(math.log10(price)) if price > 0 else 0
+        return {
+            'tick': 10.0 ** (magnitude - 6) if magnitude >= 1 else 10.0 ** (magnitude - 4),
+            'step': min(1.0, 10.0 ** math.floor(math.log10(10.0 / price))) if price > 0 else 1.0,
+        }
+
+    async def futures_exchange_info(self) -> Dict:
+        symbols = []
+        for s, f in self._filters.items():
+            tick, step = _step_str(f['tick']), _step_str(f['step'])
+            symbols.append({
+                'symbol': s, 'status': 'TRADING', 'contractType': 'PERPETUAL',
+                'baseAsset': s[:-4] if s.endswith('USDT') else s, 'quoteAsset': 'USDT',
+                'pricePrecision': max(0, -int(math.floor(math.log10(f['tick'])))),
+                'quantityPrecision': max(0, -int(math.floor(math.log10(f['step'])))),
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'tickSize': tick, 'minPrice': tick, 'maxPrice': '10000000'},
+                    {'filterType': 'LOT_SIZE', 'stepSize': step, 'minQty': step, 'maxQty': '10000000'},
+                    {'filterType': 'MARKET_LOT_SIZE', 'stepSize': step, 'minQty': step, 'maxQty': '1000000'},
+                    {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+                ]
+            })
+        return {'timezone': 'UTC', 'serverTime': self.clock.now_ms(), 'symbols': symbols}
+
+    async def futures_leverage_bracket(self, symbol: str = None) -> List[Dict]:
+        tiers = [(self.max_leverage, 50_000), (min(self.max_leverage, 50), 500_000),
+                 (min(self.max_leverage, 20), 10_000_000), (min(self.max_leverage, 10), 100_000_000)]
+        brackets = []
+        floor = 0
+        for i, (leverage, cap) in enumerate(tiers, 1):
+            brackets.append({'bracket': i, 'initialLeverage': leverage, 'notionalCap': cap,
+                             'notionalFloor': floor, 'maintMarginRatio': self.maintenance_margin_rate,
+                             'cum': 0.0})
+            floor = cap
+        return [{'symbol': s, 'brackets': brackets} for s in self._bars if symbol is None or s == symbol]
+
+    # ========== 用户数据流 ==========
+
+    async def futures_stream_get_listen_key(self):
+        raise SimulatedAPIError(-1000, '模拟交易所不提供用户数据流')
+
+
+class SimulatedExchange(BinanceClient):
+    """
+    BinanceClient 的本地模拟实现
+
+    复用 BinanceClient / AsyncBinanceClient 的全部方法，只把底层 AsyncClient 换成 SimulatedFuturesBackend，
+    不限流、不缓存（模拟时钟可能比真实时间快很多）
+    """
+
+    def __init__(self, klines: Dict[str, List[list]], initial_balance: float = 10000.0,
+                 speed: float = 1.0, start_time: int = None, warmup_candles: int = 2 * 1440,
+                 **backend_kwargs):
+        """
+        初始化模拟交易所
+
+        Args:
+            klines: {symbol: 1分钟K线行列表}（录制数据或 synthetic_klines 生成）
+            initial_balance: 初始 USDT 余额
+            speed: 模拟时间相对真实时间的倍速，0 表示只通过 advance() 手动推进
+            start_time: 模拟开始时间（毫秒），默认在第一根K线之后 warmup_candles 分钟，
+                        保证指标计算有足够的历史K线
+            warmup_candles: 默认开始时间之前预留的K线数量（最多占数据的一半）
+            **backend_kwargs: 手续费、资金费率、维持保证金率、持仓模式等撮合参数
+        """
+        if start_time is None:
+            first = min(int(rows[0][0]) for rows in klines.values() if rows)
+            shortest = min(len(rows) for rows in klines.values() if rows)
+            start_time = first + min(warmup_candles, shortest // 2) * MINUTE_MS
+        self.clock = SimulatedClock(start_time, speed)
+        self.backend = SimulatedFuturesBackend(klines, self.clock, initial_balance=initial_balance,
+                                               **backend_kwargs)
+
+        async_client = AsyncBinanceClient('simulated', 'simulated')
+        async_client.client = self.backend
+        async_client.rate_limiter = _NullRateLimiter()
+        async_client.response_cache = ResponseCache({})
+        super().__init__('simulated', 'simulated', async_client=async_client)
+
+    @classmethod
+    def from_config(cls, symbols: List[str], sim_config) -> 'SimulatedExchange':
+        """按 config.Simulation 创建：有录制文件时回放，否则为每个交易对生成合成K线"""
+        if sim_config.KLINES_FILE:
+            klines = load_recorded_klines(sim_config.KLINES_FILE)
+        else:
+            klines = {s: synthetic_klines(100.0 * (i + 1), sim_config.SYNTHETIC_CANDLES, seed=i)
+                      for i, s in enumerate(symbols)}
+        return cls(klines, initial_balance=sim_config.INITIAL_BALANCE, speed=sim_config.SPEED)
+
+    def advance(self, seconds: float):
+        """手动推进模拟时钟，并处理期间收盘的K线"""
+        async def _advance():
+            self.clock.advance(seconds)
+            self.backend._sync()
+        self._call(_advance())
+
+    def now_ms(self) -> int:
+        return self.clock.now_ms()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.backend.exhausted
+
+    def summary(self) -> Dict:
+        """模拟账户统计：余额、成交笔数、手续费、资金费和强平次数"""
+        async def _summary():
+            account = await self.backend.futures_account()
+            by_type: Dict[str, float] = {}
+            for item in self.backend.income:
+                by_type[item['incomeType']] = by_type.get(item['incomeType'], 0.0) + item['income']
+            return {
+                'wallet_balance': float(account['totalWalletBalance']),
+                'margin_balance': float(account['totalMarginBalance']),
+                'trades': len(self.backend.trades),
+                'realized_pnl': by_type.get('REALIZED_PNL', 0.0),
+                'commission': abs(by_type.get('COMMISSION', 0.0)),
+                'funding': by_type.get('FUNDING_FEE', 0.0),
+                'liquidations': self.backend.liquidations,
+            }
+        return self._call(_summary())
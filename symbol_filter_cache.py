@@ -0,0 +1,268 @@
+"""
+交易对过滤器缓存
+一次性加载合约 exchangeInfo 和杠杆分层，按交易对建立 LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL 索引，
+落盘缓存（带过期时间），并提供向量化的数量/价格取整和下单前校验，避免发出必然被拒绝的订单
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field, asdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+def _decimals(step: str) -> int:
+    """步长对应的小数位数，例如 '0.0010' -> 3，'1' -> 0"""
+    exponent = Decimal(step).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+@dataclass
+class SymbolFilters:
+    """单个交易对的下单约束"""
+    symbol: str
+    step_size: float                # LOT_SIZE 数量步长
+    min_qty: float                  # LOT_SIZE 最小数量
+    max_qty: float                  # LOT_SIZE 最大数量
+    market_step_size: float         # MARKET_LOT_SIZE 数量步长（市价单）
+    market_min_qty: float
+    market_max_qty: float
+    tick_size: float                # PRICE_FILTER 价格步长
+    min_price: float
+    max_price: float
+    min_notional: float             # MIN_NOTIONAL 最小名义价值
+    quantity_precision: int
+    price_precision: int
+    # 杠杆分层：[(名义价值上限, 最大杠杆), ...]，按上限从小到大排列
+    brackets: List[Tuple[float, int]] = field(default_factory=list)
+
+
+class SymbolFilterCache:
+    """合约交易对过滤器缓存"""
+
+    REFRESH_RETRY_SECONDS = 60      # 过期后刷新失败时，继续使用旧数据并在这段时间后重试
+
+    def __init__(self, client, cache_file: str = 'symbol_filters.json', ttl_seconds: int = 24 * 3600):
+        """
+        初始化过滤器缓存
+
+        Args:
+            client: BinanceClient 实例
+            cache_file: 磁盘缓存文件
+            ttl_seconds: 缓存有效期（秒），过期后重新从交易所加载
+        """
+        self.client = client
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._loaded_at = 0.0
+
+    # ========== 加载与缓存 ==========
+
+    def _ensure_loaded(self):
+        if self._filters and time.time() - self._loaded_at < self.ttl_seconds:
+            return
+        if not self._filters and self._load_from_disk():
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            if not self._filters:
+                raise
+            # 过滤器很少变化，一次刷新失败不应阻止下单和仓位管理
+            self._loaded_at = time.time() - self.ttl_seconds + self.REFRESH_RETRY_SECONDS
+            self.logger.warning(f"刷新交易对过滤器失败，继续使用过期数据，{self.REFRESH_RETRY_SECONDS} 秒后重试: {e}")
+
+    def _load_from_disk(self) -> bool:
+        """读取未过期的磁盘缓存"""
+        if not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if time.time() - data['loaded_at'] >= self.ttl_seconds:
+                return False
+            self._filters = {
+                s: SymbolFilters(**dict(item, brackets=[tuple(b) for b in item['brackets']]))
+                for s, item in data['symbols'].items()
+            }
+            self._loaded_at = data['loaded_at']
+            return True
+        except Exception as e:
+            self.logger.warning(f"读取交易对过滤器缓存失败: {e}")
+            return False
+
+    def refresh(self):
+        """从交易所重新加载 exchangeInfo 和杠杆分层，并写入磁盘缓存"""
+        info = self.client.get_futures_exchange_info()
+        try:
+            brackets = self.client.get_leverage_brackets()
+        except Exception as e:
+            self.logger.warning(f"获取杠杆分层失败，跳过杠杆校验: {e}")
+            brackets = []
+
+        bracket_index = {
+            item['symbol']: sorted((float(b['notionalCap']), int(b['initialLeverage']))
+                                   for b in item.get('brackets', []))
+            for item in brackets
+        }
+
+        filters = {}
+        for s in info.get('symbols', []):
+            by_type = {f['filterType']: f for f in s.get('filters', [])}
+            lot = by_type.get('LOT_SIZE')
+            price = by_type.get('PRICE_FILTER')
+            if not lot or not price:
+                continue
+            market_lot = by_type.get('MARKET_LOT_SIZE', lot)
+            notional = by_type.get('MIN_NOTIONAL', {})
+            filters[s['symbol']] = SymbolFilters(
+                symbol=s['symbol'],
+                step_size=float(lot['stepSize']),
+                min_qty=float(lot['minQty']),
+                max_qty=float(lot['maxQty']),
+                market_step_size=float(market_lot['stepSize']),
+                market_min_qty=float(market_lot['minQty']),
+                market_max_qty=float(market_lot['maxQty']),
+                tick_size=float(price['tickSize']),
+                min_price=float(price['minPrice']),
+                max_price=float(price['maxPrice']),
+                min_notional=float(notional.get('notional', notional.get('minNotional', 0))),
+                quantity_precision=_decimals(lot['stepSize']),
+                price_precision=_decimals(price['tickSize']),
+                brackets=bracket_index.get(s['symbol'], [])
+            )
+
+        self._filters = filters
+        self._loaded_at = time.time()
+        self.logger.info(f"[OK] 交易对过滤器已加载: {len(filters)} 个交易对")
+
+        try:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'loaded_at': self._loaded_at,
+                           'symbols': {s: asdict(v) for s, v in filters.items()}}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            self.logger.warning(f"写入交易对过滤器缓存失败: {e}")
+
+    def get(self, symbol: str) -> SymbolFilters:
+        """
+        获取交易对过滤器
+
+        Raises:
+            KeyError: 交易所没有该交易对
+        """
+        self._ensure_loaded()
+        if symbol not in self._filters:
+            raise KeyError(f"未知交易对: {symbol}")
+        return self._filters[symbol]
+
+    # ========== 取整（向量化）==========
+
+    def quantize_quantities(self, symbol: str, quantities: Union[np.ndarray, List[float]],
+                            market: bool = True) -> np.ndarray:
+        """
+        按数量步长向下取整（向下取整保证不超过可用资金）
+
+        Args:
+            symbol: 交易对
+            quantities: 数量数组
+            market: 是否为市价单（使用 MARKET_LOT_SIZE）
+
+        Returns:
+            取整后的数量数组
+        """
+        f = self.get(symbol)
+        step = f.market_step_size if market else f.step_size
+        q = np.asarray(quantities, dtype=float)
+        # 加一个极小量，避免 0.3/0.1=2.9999999 这类浮点误差被向下取整
+        steps = np.floor(q / step + 1e-9)
+        return np.round(steps * step, _decimals(repr(step)))
+
+    def quantize_prices(self, symbol: str, prices: Union[np.ndarray, List[float]]) -> np.ndarray:
+        """按价格步长四舍五入"""
+        f = self.get(symbol)
+        p = np.asarray(prices, dtype=float)
+        return np.round(np.round(p / f.tick_size) * f.tick_size, f.price_precision)
+
+    def quantize_quantity(self, symbol: str, quantity: float, market: bool = True) -> float:
+        return float(self.quantize_quantities(symbol, [quantity], market)[0])
+
+    def quantize_price(self, symbol: str, price: float) -> float:
+        return float(self.quantize_prices(symbol, [price])[0])
+
+    # ========== 校验 ==========
+
+    def min_order_quantity(self, symbol: str, price: float, market: bool = True) -> float:
+        """满足最小数量和最小名义价值的最小下单数量"""
+        f = self.get(symbol)
+        step = f.market_step_size if market else f.step_size
+        min_qty = f.market_min_qty if market else f.min_qty
+        if f.min_notional and price > 0:
+            notional_qty = np.ceil(f.min_notional / price / step - 1e-9) * step
+            min_qty = max(min_qty, float(notional_qty))
+        return float(np.round(min_qty, _decimals(repr(step))))
+
+    def max_leverage(self, symbol: str, notional: float) -> Optional[int]:
+        """该名义价值所在分层允许的最大杠杆，没有分层数据时返回 None"""
+        f = self.get(symbol)
+        for cap, leverage in f.brackets:
+            if notional <= cap:
+                return leverage
+        return f.brackets[-1][1] if f.brackets else None
+
+    def validate_orders(self, symbol: str, quantities: Union[np.ndarray, List[float]],
+                        prices: Union[np.ndarray, List[float]], market: bool = True,
+                        reduce_only: bool = False) -> np.ndarray:
+        """
+        批量校验订单是否满足交易所过滤器
+
+        Returns:
+            布尔数组，True 表示可以下单
+        """
+        f = self.get(symbol)
+        q = np.asarray(quantities, dtype=float)
+        p = np.asarray(prices, dtype=float)
+        min_qty = f.market_min_qty if market else f.min_qty
+        max_qty = f.market_max_qty if market else f.max_qty
+
+        ok = (q >= min_qty - 1e-12) & (q <= max_qty) & (p > 0)
+        # 只减仓订单不受最小名义价值限制
+        if f.min_notional and not reduce_only:
+            ok &= q * p >= f.min_notional - 1e-9
+        return ok
+
+    def validate_order(self, symbol: str, quantity: float, price: float, leverage: int = None,
+                       market: bool = True, reduce_only: bool = False) -> Tuple[bool, str]:
+        """
+        校验单个订单
+
+        Returns:
+            (是否通过, 不通过的原因)
+        """
+        try:
+            f = self.get(symbol)
+        except KeyError as e:
+            return False, str(e)
+
+        min_qty = f.market_min_qty if market else f.min_qty
+        max_qty = f.market_max_qty if market else f.max_qty
+        if quantity < min_qty - 1e-12:
+            return False, f"数量 {quantity} 小于最小数量 {min_qty}"
+        if quantity > max_qty:
+            return False, f"数量 {quantity} 超过最大数量 {max_qty}"
+        notional = quantity * price
+        if f.min_notional and not reduce_only and notional < f.min_notional - 1e-9:
+            return False, f"名义价值 {notional:.2f} 小于最小名义价值 {f.min_notional}"
+        if leverage:
+            max_leverage = self.max_leverage(symbol, notional)
+            if max_leverage and leverage > max_leverage:
+                return False, f"杠杆 {leverage}x 超过名义价值 {notional:.2f} 所在分层上限 {max_leverage}x"
+        return True, ''
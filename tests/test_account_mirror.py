@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试账户镜像
+用假的 AsyncClient 模拟交易所账户，离线验证写操作与 REST 校准的先后顺序（下单期间完成的校准
+不能解除过期状态），以及 ACCOUNT_UPDATE / ORDER_TRADE_UPDATE 事件对本地持仓、余额和挂单的更新
+"""
+
+import asyncio
+import copy
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from account_mirror import AccountMirror
+from async_binance_client import AsyncBinanceClient
+from rate_limiter import RateLimiter
+
+
+class FakeExchange:
+    """只实现账户查询和市价下单：查询耗时 READ_DELAY，下单等到 fill 事件被设置后才生效"""
+
+    READ_DELAY = 0.01
+
+    def __init__(self):
+        self.response = None
+        self.fill = None
+        self.account = {'totalWalletBalance': '1000.00000000',
+                        'assets': [{'asset': 'USDT', 'walletBalance': '1000', 'crossWalletBalance': '1000'}]}
+        self.positions = [{'symbol': 'ETHUSDT', 'positionSide': 'BOTH', 'positionAmt': '0', 'entryPrice': '0',
+                           'markPrice': '3000', 'unRealizedProfit': '0', 'leverage': '10'}]
+        self.open_orders = []
+
+    async def _read(self, value):
+        await asyncio.sleep(self.READ_DELAY)
+        return copy.deepcopy(value)
+
+    async def futures_account(self):
+        return await self._read(self.account)
+
+    async def futures_position_information(self):
+        return await self._read(self.positions)
+
+    async def futures_get_open_orders(self):
+        return await self._read(self.open_orders)
+
+    async def futures_create_order(self, symbol, side, type, quantity):
+        if self.fill is not None:
+            await self.fill.wait()
+        amount = quantity if side == 'BUY' else -quantity
+        self.positions.append({'symbol': symbol, 'positionSide': 'BOTH', 'positionAmt': str(amount),
+                               'entryPrice': '100', 'markPrice': '100', 'unRealizedProfit': '0', 'leverage': '5'})
+        return {'orderId': 1, 'symbol': symbol, 'status': 'FILLED'}
+
+
+def _mirror():
+    client = AsyncBinanceClient('key', 'secret')
+    client.rate_limiter = RateLimiter(state_file=os.path.join(tempfile.mkdtemp(), 'rate_limit.json'))
+    client.client = FakeExchange()
+    mirror = AccountMirror(SimpleNamespace(async_client=client), reconcile_seconds=60)
+    mirror.connected = True
+    client.account_mirror = mirror
+    return client, mirror
+
+
+def test_write_ordering():
+    """测试下单期间完成的校准不会解除过期状态"""
+    print("\n" + "=" * 60)
+    print("🔁 测试1: 写操作与校准顺序")
+    print("=" * 60)
+
+    async def scenario():
+        client, mirror = _mirror()
+        await mirror.reconcile()
+        assert mirror.is_ready() and mirror.get_active_positions() == []
+
+        client.client.fill = asyncio.Event()
+        write = asyncio.ensure_future(client._call('futures_create_order', symbol='BTCUSDT', side='BUY',
+                                                   type='MARKET', quantity=2))
+        # 下单发出前安排的校准在订单生效前就已返回
+        for _ in range(100):
+            if mirror.reconcile_count == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert mirror.reconcile_count == 2 and not write.done()
+
+        client.client.fill.set()
+        await write
+        assert not mirror.is_ready(), "下单完成后，下单前开始的校准结果不能使镜像就绪"
+
+        for _ in range(100):
+            if mirror.is_ready():
+                break
+            await asyncio.sleep(0.01)
+        assert mirror.is_ready()
+        positions = mirror.get_active_positions()
+        assert [(p['symbol'], p['positionAmt']) for p in positions] == [('BTCUSDT', '2')]
+        return mirror.reconcile_count
+
+    count = asyncio.run(scenario())
+    print(f"✅ 下单完成后重新校准（共校准 {count} 次），镜像包含新持仓")
+
+    return True
+
+
+def test_stream_events():
+    """测试用户数据流事件更新本地状态"""
+    print("\n" + "=" * 60)
+    print("📨 测试2: 账户与订单事件")
+    print("=" * 60)
+
+    async def scenario():
+        _, mirror = _mirror()
+        await mirror.reconcile()
+
+        mirror._handle_event({'e': 'ACCOUNT_UPDATE', 'a': {
+            'B': [{'a': 'USDT', 'wb': '990', 'cw': '985'}],
+            'P': [{'s': 'ETHUSDT', 'pa': '0.5', 'ep': '3000', 'up': '5', 'mt': 'cross', 'iw': '0', 'ps': 'BOTH'},
+                  {'s': 'SOLUSDT', 'pa': '-3', 'ep': '150', 'up': '-1', 'mt': 'cross', 'iw': '0', 'ps': 'BOTH'}],
+        }})
+        account = mirror.get_account_info()
+        assert account['totalWalletBalance'] == '990.00000000'
+        assert account['assets'][0]['crossWalletBalance'] == '985'
+        positions = {p['symbol']: p for p in mirror.get_active_positions()}
+        assert positions['ETHUSDT']['positionAmt'] == '0.5' and positions['ETHUSDT']['leverage'] == '10'
+        assert positions['SOLUSDT']['positionAmt'] == '-3' and positions['SOLUSDT']['entryPrice'] == '150'
+        assert account['totalUnrealizedProfit'] == '4.00000000'
+        print(f"✅ ACCOUNT_UPDATE: 余额 {account['totalWalletBalance']}，持仓 {sorted(positions)}")
+
+        order = {'s': 'ETHUSDT', 'i': 42, 'c': 'tp-1', 'S': 'SELL', 'o': 'TAKE_PROFIT_MARKET', 'f': 'GTE_GTC',
+                 'q': '0.5', 'p': '0', 'ap': '0', 'sp': '3300', 'X': 'NEW', 'z': '0', 'ps': 'BOTH',
+                 'R': True, 'cp': False, 'T': 1}
+        mirror._handle_event({'e': 'ORDER_TRADE_UPDATE', 'o': order})
+        orders = mirror.get_open_orders('ETHUSDT')
+        assert len(orders) == 1 and orders[0]['orderId'] == 42 and orders[0]['stopPrice'] == '3300'
+        assert orders[0]['type'] == 'TAKE_PROFIT_MARKET' and orders[0]['reduceOnly'] is True
+        assert mirror.get_open_orders('BTCUSDT') == []
+
+        mirror._handle_event({'e': 'ORDER_TRADE_UPDATE', 'o': dict(order, X='FILLED', z='0.5')})
+        assert mirror.get_open_orders() == []
+        print("✅ ORDER_TRADE_UPDATE: 新挂单按 REST 格式加入，成交后移除")
+
+        assert mirror._handle_event({'e': 'listenKeyExpired'}) is True
+        assert mirror.event_count == 4
+
+    asyncio.run(scenario())
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '写操作与校准顺序': test_write_ordering(),
+        '账户与订单事件': test_stream_events(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试高级仓位管理的止盈止损挂单
+在双向持仓模式的本地模拟交易所上，验证分批止盈和追踪止损按持仓方向（positionSide）一次批量提交、
+不带 reduceOnly，并能按价格触发减仓
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from advanced_position_manager import AdvancedPositionManager
+from market_analyzer import MarketAnalyzer
+from simulated_exchange import SimulatedExchange, MINUTE_MS
+from symbol_filter_cache import SymbolFilterCache
+
+
+START = 1_700_006_400_000
+
+
+def _exchange(prices):
+    """每个元素是 (开, 高, 低, 收)；第一根K线作为历史，时钟停在它收盘之后"""
+    rows = []
+    for i, (o, h, l, c) in enumerate(prices):
+        t = START + i * MINUTE_MS
+        rows.append([t, str(o), str(h), str(l), str(c), '10', t + MINUTE_MS - 1, str(10 * c), 5, '5', '0', '0'])
+    return SimulatedExchange({'BTCUSDT': rows}, initial_balance=10000.0, speed=0,
+                             start_time=START + MINUTE_MS, dual_side=True)
+
+
+def _manager(ex):
+    filters = SymbolFilterCache(ex, cache_file=os.path.join(tempfile.mkdtemp(), 'symbol_filters.json'))
+    return AdvancedPositionManager(ex, MarketAnalyzer(ex), symbol_filters=filters)
+
+
+def test_full_management_hedge_mode():
+    """测试双向持仓下一次设置分批止盈和追踪止损"""
+    print("\n" + "=" * 60)
+    print("🎯 测试1: 双向持仓下的完整仓位管理")
+    print("=" * 60)
+
+    ex = _exchange([(100, 100, 100, 100), (100, 101, 99, 100), (100, 104, 100, 103), (103, 103, 103, 103)])
+    try:
+        ex.set_leverage('BTCUSDT', 10)
+        ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=2, position_side='LONG')
+        manager = _manager(ex)
+
+        # 原来的写法（positionSide=BOTH + reduceOnly）在双向持仓下会被拒绝
+        rejected = ex.create_futures_batch_orders([
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'TAKE_PROFIT_MARKET', 'quantity': 1,
+             'reduce_only': True, 'stopPrice': 103}])
+        assert rejected[0]['code'] == -4061, rejected
+
+        result = manager.setup_full_position_management(
+            'BTCUSDT', 100, 2, 'LONG',
+            take_profit_targets=[{'profit_pct': 3, 'close_pct': 50}, {'profit_pct': 6, 'close_pct': 50}],
+            trailing_stop_config={'callback_rate_pct': 5.0})
+        assert result['success'], result
+        assert result['take_profit_result']['count'] == 2 and result['take_profit_result']['targets'] == [103, 106]
+        assert result['trailing_stop_result']['success']
+
+        orders = ex.get_futures_open_orders('BTCUSDT')
+        assert len(orders) == 3
+        assert all(o['positionSide'] == 'LONG' and o['side'] == 'SELL' and not o['reduceOnly'] for o in orders)
+        assert sorted(o['type'] for o in orders) == ['TAKE_PROFIT_MARKET', 'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET']
+        print(f"✅ 3 笔挂单一次提交: {[(o['type'], o['positionSide']) for o in orders]}")
+
+        # 第三根K线最高 104 触发 103 的第一档止盈，平掉一半
+        ex.advance(60)
+        ex.advance(60)
+        position = ex.get_active_positions()[0]
+        assert float(position['positionAmt']) == 1 and position['positionSide'] == 'LONG'
+        print(f"✅ 第一档止盈触发后剩余 {position['positionAmt']}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_short_side_orders():
+    """测试空单的止盈和追踪止损对应 SHORT 持仓"""
+    print("\n" + "=" * 60)
+    print("📉 测试2: 空单止盈止损方向")
+    print("=" * 60)
+
+    ex = _exchange([(100, 100, 100, 100), (100, 101, 99, 100), (100, 100, 96, 97)])
+    try:
+        ex.set_leverage('BTCUSDT', 10)
+        ex.create_futures_order('BTCUSDT', 'SELL', 'MARKET', quantity=1, position_side='SHORT')
+        manager = _manager(ex)
+
+        tp = manager.setup_scale_out_take_profits('BTCUSDT', 100, 1, 'SHORT', [{'profit_pct': 2, 'close_pct': 100}])
+        trailing = manager.setup_trailing_stop('BTCUSDT', 1, 'SHORT', callback_rate_pct=1.5)
+        assert tp['success'] and trailing['success'], (tp, trailing)
+        orders = ex.get_futures_open_orders('BTCUSDT')
+        assert all(o['positionSide'] == 'SHORT' and o['side'] == 'BUY' for o in orders) and len(orders) == 2
+
+        ex.advance(60)
+        ex.advance(60)
+        assert ex.get_active_positions() == []
+        print("✅ 空单止盈以 BUY/SHORT 提交并在 98 触发平仓")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_min_order_quantity_legs():
+    """测试低于交易所最小下单量的止盈档位不提交"""
+    print("\n" + "=" * 60)
+    print("🔢 测试3: 止盈档位的最小下单量")
+    print("=" * 60)
+
+    # 价格 1 附近数量步长为 1，MIN_NOTIONAL 5 要求每笔至少 5 个
+    ex = _exchange([(1, 1, 1, 1), (1, 1.01, 0.99, 1)])
+    try:
+        ex.set_leverage('BTCUSDT', 10)
+        ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=10, position_side='LONG')
+        manager = _manager(ex)
+        assert manager.filters.min_order_quantity('BTCUSDT', 1.1) == 5
+
+        # 第一档平 20% = 2 个，名义价值 2.2 不足 5，跳过；剩余仓位由最后一档全部平掉
+        tp = manager.setup_scale_out_take_profits(
+            'BTCUSDT', 1, 10, 'LONG', [{'profit_pct': 10, 'close_pct': 20}, {'profit_pct': 20, 'close_pct': 80}])
+        assert tp['success'] and tp['count'] == 1 and tp['targets'] == [1.2], tp
+        orders = ex.get_futures_open_orders('BTCUSDT')
+        assert [(float(o['origQty']), float(o['stopPrice'])) for o in orders] == [(10, 1.2)]
+        print(f"✅ 只提交满足最小下单量的档位: {[(o['origQty'], o['stopPrice']) for o in orders]}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '双向持仓下的完整仓位管理': test_full_management_hedge_mode(),
+        '空单止盈止损方向': test_short_side_orders(),
+        '止盈档位的最小下单量': test_min_order_quantity_legs(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
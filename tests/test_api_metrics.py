@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 Binance 接口调用指标
+验证延迟直方图分位数精度，以及调用方标签能否从调用线程传到后台事件循环
+"""
+
+import os
+import sys
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_metrics import ApiMetrics, LatencyHistogram, api_caller
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+def test_histogram_percentiles():
+    """测试直方图分位数误差"""
+    print("\n" + "=" * 60)
+    print("⏱️  测试1: 延迟直方图")
+    print("=" * 60)
+
+    hist = LatencyHistogram()
+    for i in range(1, 10001):
+        hist.record(i / 10)     # 0.1ms ~ 1000ms 均匀分布
+
+    for pct, expected in ((50, 500.0), (90, 900.0), (99, 990.0)):
+        value = hist.percentile(pct)
+        assert abs(value - expected) / expected < 0.02, f"p{pct}={value}"
+    summary = hist.summary()
+    assert summary['count'] == 10000 and summary['max_ms'] == 1000.0
+    print(f"✅ p50={summary['p50_ms']} p90={summary['p90_ms']} p99={summary['p99_ms']}")
+
+    return True
+
+
+def test_caller_tagging():
+    """测试按调用方和周期统计"""
+    print("\n" + "=" * 60)
+    print("🏷️  测试2: 调用方标签与周期统计")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 600, seed=3)}, speed=0)
+    metrics = ApiMetrics()
+    ex.async_client.metrics = metrics
+    try:
+        ex.get_ticker_price('BTCUSDT')
+        with api_caller('engine'):
+            ex.get_futures_klines('BTCUSDT', '1m', 50)
+            ex.get_futures_account_info()
+        with api_caller('position_manager'):
+            try:
+                ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=0, position_side='LONG')
+            except Exception:
+                pass
+    finally:
+        ex.close()
+
+    cycle = metrics.start_cycle()
+    callers = cycle['callers']
+    assert callers['engine']['calls'] == 2
+    assert callers['position_manager']['endpoints'] == {'futures_create_order': {'calls': 1, 'weight': 0}}
+    assert sum(c['calls'] for c in callers.values()) == 4
+    assert metrics.start_cycle()['calls'] == 0, "新周期应从零开始"
+
+    snapshot = metrics.snapshot()
+    assert snapshot['endpoints']['futures_create_order']['errors'] == 1
+    assert snapshot['endpoints']['futures_account']['weight'] == 5
+    assert snapshot['callers']['engine']['weight'] == 6
+
+    text = metrics.render_prometheus()
+    assert 'binance_api_latency_ms_count{endpoint="futures_klines"} 1' in text
+    assert 'binance_api_caller_calls_total{caller="engine"} 2' in text
+    print(f"✅ 调用方: {sorted(callers)}")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '延迟直方图': test_histogram_percentiles(),
+        '调用方标签与周期统计': test_caller_tagging(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合约批量下单
+用假的 AsyncClient 记录 batchOrders 请求，离线验证分组、参数格式和逐笔结果对应
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_binance_client import AsyncBinanceClient
+from rate_limiter import RateLimiter
+
+
+class FakeAsyncClient:
+    """只实现 futures_place_batch_order：数量为 0 的订单返回错误，其余返回订单ID"""
+
+    def __init__(self):
+        self.response = None
+        self.batches = []
+
+    async def futures_place_batch_order(self, batchOrders):
+        self.batches.append(batchOrders)
+        results = []
+        for order in batchOrders:
+            if float(order['quantity']) == 0:
+                results.append({'code': -4003, 'msg': 'Quantity less than or equal to zero.'})
+            else:
+                results.append({'orderId': len(results) + 1, 'symbol': order['symbol']})
+        return results
+
+
+def _client():
+    client = AsyncBinanceClient('key', 'secret')
+    client.rate_limiter = RateLimiter(state_file=os.path.join(tempfile.mkdtemp(), 'rate_limit.json'))
+    client.client = FakeAsyncClient()
+    return client
+
+
+def test_batch_orders_chunked_and_mapped():
+    """测试超过5笔时分组发送，结果按原顺序逐笔对应"""
+    print("\n" + "=" * 60)
+    print("📦 测试1: 批量下单分组与结果对应")
+    print("=" * 60)
+
+    client = _client()
+    orders = [
+        {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'TAKE_PROFIT_MARKET',
+         'quantity': 0.001 * i, 'reduce_only': True, 'stopPrice': 50000.0 + i}
+        for i in range(7)
+    ]
+    results = asyncio.run(client.create_futures_batch_orders(orders))
+
+    batches = client.client.batches
+    assert [len(b) for b in batches] == [5, 2], "应按每组5笔分组"
+    assert len(results) == len(orders)
+    assert results[0]['code'] == -4003, "失败的订单应保留错误信息"
+    assert all(r.get('orderId') for r in results[1:])
+    print(f"✅ 分组: {[len(b) for b in batches]}，成功 {len(results) - 1} 笔，失败 1 笔")
+
+    # batchOrders 字段全部为字符串，浮点数不使用科学计数法
+    first = batches[0][1]
+    assert first['quantity'] == '0.001' and first['reduceOnly'] == 'true'
+    assert first['type'] == 'TAKE_PROFIT_MARKET' and first['stopPrice'] == '50001.0'
+    print(f"✅ 参数格式: {first}")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '批量下单分组与结果对应': test_batch_orders_chunked_and_mapped(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
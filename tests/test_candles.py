@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试紧凑 K线序列
+验证 Candles 与原 12 列字符串 DataFrame 解析结果一致、按需转换的 DataFrame 与原 get_kline_data 相同，
+日内序列/4小时上下文/波动率与原 DataFrame 实现一致，并输出解析和读取耗时供参考
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from candles import Candles
+from market_analyzer import MarketAnalyzer
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+def _legacy_frame(rows):
+    """原 get_kline_data：12 列字符串 DataFrame，转换时间和五个数值列后丢弃其余列"""
+    df = pd.DataFrame(rows, columns=[
+        'timestamp', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
+    ])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+
+def _legacy_intraday(analyzer, df):
+    """原 get_intraday_series 的 DataFrame 实现"""
+    df['ema20'] = analyzer.calculate_ema(df, 20 if len(df) >= 20 else len(df) // 2)
+    df['rsi7'] = analyzer.calculate_rsi(df, min(7, len(df) - 1))
+    df['rsi14'] = analyzer.calculate_rsi(df, min(14, len(df) - 1))
+    df['macd'] = analyzer.calculate_macd(df)[0]
+    return {
+        'mid_prices': df['close'].tolist(),
+        'ema20_values': df['ema20'].fillna(df['close']).tolist(),
+        'macd_values': df['macd'].fillna(0).tolist(),
+        'rsi7_values': df['rsi7'].fillna(50).tolist(),
+        'rsi14_values': df['rsi14'].fillna(50).tolist(),
+        'timestamps': df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    }
+
+
+def _legacy_4h(analyzer, df):
+    """原 get_4h_context 的 DataFrame 实现"""
+    df['ema20'] = analyzer.calculate_ema(df, min(20, len(df)))
+    df['ema50'] = analyzer.calculate_ema(df, min(50, len(df)))
+    df['atr3'] = analyzer.calculate_atr(df, min(3, len(df) - 1))
+    df['atr14'] = analyzer.calculate_atr(df, min(14, len(df) - 1))
+    df['rsi14'] = analyzer.calculate_rsi(df, min(14, len(df) - 1))
+    df['macd'] = analyzer.calculate_macd(df)[0]
+    latest = df.iloc[-1]
+    return {
+        'ema20': float(latest['ema20']) if not pd.isna(latest['ema20']) else None,
+        'ema50': float(latest['ema50']) if not pd.isna(latest['ema50']) else None,
+        'atr3': float(latest['atr3']) if not pd.isna(latest['atr3']) else None,
+        'atr14': float(latest['atr14']) if not pd.isna(latest['atr14']) else None,
+        'current_volume': float(latest['volume']),
+        'average_volume': float(df['volume'].mean()),
+        'macd_series': df['macd'].fillna(0).tolist()[-10:],
+        'rsi14_series': df['rsi14'].fillna(50).tolist()[-10:]
+    }
+
+
+def _same(a, b):
+    """字典/列表逐值比较（浮点容差，None 与 None 相等）"""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and b is not None:
+        return bool(np.isclose(a, b, rtol=1e-9, atol=1e-12))
+    return a == b
+
+
+def test_parse():
+    """测试解析结果与原 DataFrame 一致"""
+    print("\n" + "=" * 60)
+    print("🕯️  测试1: 解析与按需转换")
+    print("=" * 60)
+
+    rows = synthetic_klines(100, 500, seed=1)
+    candles = Candles.from_klines(rows)
+    legacy = _legacy_frame(rows)
+    assert len(candles) == 500
+    assert candles.open_time.dtype == np.int64 and candles.close.dtype == np.float64
+    assert candles.open_time.tolist() == [row[0] for row in rows]
+    for name in Candles.PRICE_FIELDS:
+        assert np.array_equal(candles[name], legacy[name].to_numpy())
+    pd.testing.assert_frame_equal(candles.to_frame(), legacy.reset_index(drop=True))
+    assert candles.timestamps() == legacy['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    print("✅ 列、时间戳和 DataFrame 与原实现一致")
+
+    return True
+
+
+def test_analyzer_parity():
+    """测试日内序列、4小时上下文和波动率与原 DataFrame 实现一致"""
+    print("\n" + "=" * 60)
+    print("📐 测试2: 分析器结果一致")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 6 * 24 * 60, seed=2)}, speed=0)
+    try:
+        analyzer = MarketAnalyzer(ex)
+        for limit in (10, 30):
+            expected = _legacy_intraday(analyzer, analyzer.get_kline_data('BTCUSDT', '3m', limit))
+            assert _same(analyzer.get_intraday_series('BTCUSDT', '3m', limit), expected)
+            expected = _legacy_4h(analyzer, analyzer.get_kline_data('BTCUSDT', '4h', limit))
+            assert _same(analyzer.get_4h_context('BTCUSDT', limit), expected)
+        print("✅ 日内序列和 4小时上下文一致")
+
+        df = analyzer.get_kline_data('BTCUSDT', '1h', 30)
+        volatility = analyzer.calculate_volatility('BTCUSDT', '1h', 20)
+        assert np.isclose(volatility['volatility'], df['close'].pct_change().std() * np.sqrt(20))
+        assert np.isclose(volatility['atr'], analyzer.calculate_atr(df, 14).iloc[-1])
+        print(f"✅ 波动率 {volatility['volatility']:.5f}，ATR {volatility['atr']:.4f}")
+
+        # 指标函数可直接接受 Candles
+        candles = analyzer.get_candles('BTCUSDT', '1h', 100)
+        assert analyzer.calculate_rsi(candles).equals(analyzer.calculate_rsi(candles.to_frame()))
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_read_speed():
+    """输出解析和读取耗时（只供参考，不作断言）"""
+    print("\n" + "=" * 60)
+    print("⏱️  测试3: 读取耗时")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 3000, seed=3)}, speed=0)
+    try:
+        analyzer = MarketAnalyzer(ex)
+        rows = ex.get_futures_klines('BTCUSDT', '1m', 1000)
+        assert np.array_equal(analyzer.get_candles('BTCUSDT', '1m', 1000).close, _legacy_frame(rows)['close'])
+
+        assert np.array_equal(Candles.from_klines(rows).close, _legacy_frame(rows)['close'])
+
+        def per_call_ms(fn):
+            started = time.perf_counter()
+            for _ in range(20):
+                fn()
+            return (time.perf_counter() - started) * 50
+
+        legacy_ms = per_call_ms(lambda: _legacy_frame(rows))
+        parse_ms = per_call_ms(lambda: Candles.from_klines(rows))
+        read_ms = per_call_ms(lambda: analyzer.get_candles('BTCUSDT', '1m', 1000))
+        # 前两项都是解析同一批原始行，可以直接比较；读取 Candles 走 K线存储的已解析数组，
+        # 不重新解析，与前两项不是同类操作。耗时受机器负载影响，不作断言
+        print(f"  1000 根: 解析 DataFrame {legacy_ms:.3f}ms  解析 Candles {parse_ms:.3f}ms"
+              f"  从存储读取 Candles {read_ms:.3f}ms")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '解析与按需转换': test_parse(),
+        '分析器结果一致': test_analyzer_parity(),
+        '读取耗时': test_read_speed(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
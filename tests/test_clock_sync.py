@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试服务器时钟同步
+用可控的本地时钟和模拟的服务器时钟（固定偏移+漂移+非对称延迟），离线验证偏移和漂移估计
+"""
+
+import asyncio
+import os
+import sys
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clock_sync import ClockSync
+
+
+class FakeClocks:
+    """本地时钟（秒）+ 服务器时钟：server = local * (1 + drift) + offset"""
+
+    def __init__(self, offset_ms, drift_ppm, start=1_700_000_000.0):
+        self.local = start
+        self.start = start
+        self.offset_ms = offset_ms
+        self.drift = drift_ppm / 1e6
+        self.delays = []    # 每次请求的 (去程, 回程) 延迟（秒）
+
+    def server_ms(self):
+        return self.local * 1000 + self.offset_ms + (self.local - self.start) * 1000 * self.drift
+
+    def time(self):
+        return self.local
+
+    async def futures_time(self):
+        outbound, inbound = self.delays.pop(0) if self.delays else (0.02, 0.02)
+        self.local += outbound
+        server = self.server_ms()
+        self.local += inbound
+        return {'serverTime': int(server)}
+
+
+def test_offset_with_rtt_compensation():
+    """测试往返延迟补偿和取最小延迟样本"""
+    print("\n" + "=" * 60)
+    print("🕒 测试1: 偏移估计")
+    print("=" * 60)
+
+    clocks = FakeClocks(offset_ms=-1500, drift_ppm=0)
+    # 第一次采样延迟很大且不对称，应取第二次的低延迟样本
+    clocks.delays = [(0.5, 0.05), (0.01, 0.01), (0.2, 0.2)]
+    sync = ClockSync(clocks.futures_time, local_time=clocks.time)
+    asyncio.run(sync.sync())
+
+    assert sync.synced and abs(sync.offset_ms() + 1500) <= 1, sync.offset_ms()
+    assert abs(sync.server_time_ms() - clocks.server_ms()) <= 1
+    assert abs(sync.status()['rtt_ms'] - 20) < 1e-6
+    print(f"✅ 偏移 {sync.offset_ms()}ms，往返延迟 {sync.status()['rtt_ms']}ms")
+
+    return True
+
+
+def test_drift_estimation():
+    """测试长时间运行时的漂移估计和外推"""
+    print("\n" + "=" * 60)
+    print("📈 测试2: 漂移估计")
+    print("=" * 60)
+
+    clocks = FakeClocks(offset_ms=300, drift_ppm=50)
+    sync = ClockSync(clocks.futures_time, local_time=clocks.time)
+
+    async def run():
+        for _ in range(12):
+            await sync.sync()
+            clocks.local += ClockSync.INTERVAL_SECONDS
+
+    asyncio.run(run())
+    status = sync.status()
+    assert abs(status['drift_ppm'] - 50) < 1, status
+
+    # 一小时不同步，外推的服务器时间误差仍在几毫秒以内
+    clocks.local += 3600
+    error = abs(sync.server_time_ms() - clocks.server_ms())
+    assert error <= 2, error
+    print(f"✅ 漂移 {status['drift_ppm']}ppm，1小时外推误差 {error:.1f}ms")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '偏移估计': test_offset_with_rtt_compensation(),
+        '漂移估计': test_drift_estimation(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
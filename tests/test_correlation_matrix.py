@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试跨交易对滚动相关性矩阵和相关敞口限制
+验证增量更新的相关性矩阵与按窗口重新计算的 np.corrcoef 一致、按 K线列矩阵对齐推进，
+以及 RiskManager 对高相关持仓合计敞口的拒绝、缩减和对冲抵减，并比较增量更新与重新计算的耗时
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from correlation_matrix import RollingCorrelation
+from kline_store import parse_klines
+from risk_manager import RiskManager
+from simulated_exchange import synthetic_klines
+
+
+def _correlated_prices(n, k, seed):
+    """前两个交易对高度相关、第三个与第一个负相关、其余独立的价格序列"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, size=(n, k))
+    returns[:, 1] = returns[:, 0] * 0.9 + returns[:, 1] * 0.2
+    returns[:, 2] = -returns[:, 0] * 0.9 + returns[:, 2] * 0.2
+    return 100 * np.exp(np.cumsum(returns, axis=0))
+
+
+def test_incremental_parity():
+    """测试增量更新与按窗口重新计算一致"""
+    print("\n" + "=" * 60)
+    print("🔗 测试1: 增量相关性矩阵")
+    print("=" * 60)
+
+    prices = _correlated_prices(400, 5, seed=1)
+    corr = RollingCorrelation([f"S{i}USDT" for i in range(5)], window=50)
+    for t, row in enumerate(prices):
+        corr.push(row, t)
+        n = min(t, corr.window)
+        if n < RollingCorrelation.MIN_OBSERVATIONS:
+            assert corr.matrix() is None
+        elif t % 37 == 0 or t == len(prices) - 1:
+            returns = np.diff(np.log(prices[t - n:t + 1]), axis=0)
+            assert np.allclose(corr.matrix(), np.corrcoef(returns.T), atol=1e-10), t
+    assert corr.correlations('S0USDT')['S1USDT'] > 0.9 and corr.correlations('S0USDT')['S2USDT'] < -0.9
+    assert corr.correlations('XRPUSDT') is None
+    print(f"✅ 与 np.corrcoef 一致，ρ(S0,S1)={corr.correlations('S0USDT')['S1USDT']:+.3f}")
+
+    # 收益率恒为 0 的交易对与其他交易对的相关性为 0
+    flat = RollingCorrelation(['A', 'B'], window=30)
+    for p in prices[:40, 0]:
+        flat.push([p, 10.0])
+    assert flat.matrix()[0, 1] == 0 and flat.matrix()[1, 1] == 1
+
+    return True
+
+
+def test_sync_frames():
+    """测试按 K线列矩阵对齐推进"""
+    print("\n" + "=" * 60)
+    print("🧮 测试2: 从 K线推进")
+    print("=" * 60)
+
+    start = 1_700_000_040_000
+    symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+    frames = {s: parse_klines(synthetic_klines(100, 300, start_time=start, seed=i)) for i, s in enumerate(symbols)}
+    # ETHUSDT 缺一根 K线，只使用三者都有的时间
+    frames['ETHUSDT'] = np.delete(frames['ETHUSDT'], 250, axis=1)
+
+    corr = RollingCorrelation(symbols, interval='1m', window=60)
+    now_ms = int(frames['BTCUSDT'][6, 279]) + 1        # 第 280 根之后的 K线未收盘
+    assert corr.sync({s: f[:, :290] for s, f in frames.items()}, now_ms) == 61
+    assert corr.last_time == int(frames['BTCUSDT'][0, 279])
+
+    now_ms = int(frames['BTCUSDT'][6, -1]) + 1
+    assert corr.sync(frames, now_ms) == 20
+    assert corr.sync(frames, now_ms) == 0
+
+    times = np.delete(frames['BTCUSDT'][0], 250)[-61:]
+    closes = np.column_stack([frames[s][4, np.searchsorted(frames[s][0], times)] for s in symbols])
+    assert np.allclose(corr.matrix(), np.corrcoef(np.diff(np.log(closes), axis=0).T), atol=1e-10)
+    print("✅ 首次推入 window+1 根，之后只推入新收盘的 K线，跳过缺失的时间")
+
+    return True
+
+
+def test_exposure_limit():
+    """测试 RiskManager 的高相关敞口限制"""
+    print("\n" + "=" * 60)
+    print("🛡️  测试3: 相关敞口限制")
+    print("=" * 60)
+
+    symbols = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT']
+    corr = RollingCorrelation(symbols, window=100)
+    for row in _correlated_prices(150, 4, seed=2):
+        corr.push(row)
+    risk = RiskManager({'max_correlation': 0.7, 'max_correlated_exposure': 3.0}, correlation=corr)
+
+    def position(symbol, notional):
+        return {'symbol': symbol, 'positionAmt': str(notional / 100), 'notional': str(notional), 'markPrice': '100'}
+
+    # 没有持仓时直接允许
+    assert risk.check_correlated_exposure('BTCUSDT', 5000, [], 10000)[0] == 1.0
+
+    # 已有 ETH 多 2 万：BTC 多单只剩约 1 万的空间
+    positions = [position('ETHUSDT', 20000), position('SOLUSDT', 20000)]
+    scale, reason = risk.check_correlated_exposure('BTCUSDT', 20000, positions, 10000)
+    rho = corr.correlations('BTCUSDT')['ETHUSDT']
+    assert np.isclose(scale, (30000 - rho * 20000) / 20000), reason
+    print(f"✅ 缩减: {reason}（比例 {scale:.2f}）")
+
+    # BNB 空单与 BTC 负相关，等同于同向押注
+    positions.append(position('BNBUSDT', -15000))
+    scale, reason = risk.check_correlated_exposure('BTCUSDT', 5000, positions, 10000)
+    assert scale == 0, reason
+    print(f"✅ 拒绝: {reason}")
+
+    # 反向开 BTC 空单是对冲，不受限制；独立的 SOL 不计入
+    assert risk.check_correlated_exposure('BTCUSDT', -20000, positions, 10000)[0] == 1.0
+    assert risk.check_correlated_exposure('SOLUSDT', 5000, positions[:1], 10000)[0] == 1.0
+    # 没有高相关持仓时不是全局名义价值上限：超过 余额 × 上限 的新仓位也不缩减
+    assert risk.check_correlated_exposure('SOLUSDT', 50000, positions[:1], 10000) == (1.0, "无高相关持仓")
+    assert risk.check_correlated_exposure('BTCUSDT', 50000, [], 10000)[0] == 1.0
+
+    # 未提供相关性矩阵时不限制
+    assert RiskManager({}).check_correlated_exposure('BTCUSDT', 1e9, positions, 10000)[0] == 1.0
+
+    return True
+
+
+def test_update_speed():
+    """比较增量更新与每根 K线重新计算的耗时"""
+    print("\n" + "=" * 60)
+    print("⏱️  测试4: 更新耗时")
+    print("=" * 60)
+
+    k, window = 30, 500
+    prices = _correlated_prices(window + 300, k, seed=3)
+    corr = RollingCorrelation([f"S{i}" for i in range(k)], window=window)
+    for row in prices[:window + 1]:
+        corr.push(row)
+
+    started = time.perf_counter()
+    for row in prices[window + 1:]:
+        corr.push(row)
+        corr.matrix()
+    incremental_ms = (time.perf_counter() - started) * 1000 / 299
+    returns = np.diff(np.log(prices), axis=0)
+    started = time.perf_counter()
+    for t in range(window, window + 299):
+        np.corrcoef(returns[t - window:t].T)
+    rebuild_ms = (time.perf_counter() - started) * 1000 / 299
+    # 耗时受机器负载影响，只输出供参考，不作断言
+    print(f"  {k} 个交易对、窗口 {window}: 增量 {incremental_ms:.3f}ms  重新计算 {rebuild_ms:.3f}ms")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '增量相关性矩阵': test_incremental_parity(),
+        '从 K线推进': test_sync_frames(),
+        '相关敞口限制': test_exposure_limit(),
+        '更新耗时': test_update_speed(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
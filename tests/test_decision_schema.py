@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试结构化决策输出
+验证按 JSON Schema 严格解析 Decision 及各类不合规回复被拒绝、修复解析从说明文字/代码块/嵌套对象中
+提取并规范化决策，以及 OllamaClient 以 format 约束请求、只在严格解析失败时修复并统计解析失败率
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from decision_schema import DECISION_SCHEMA, Decision, DecisionParseError, parse_decision, repair_decision
+from ollama_client import OllamaClient
+
+
+VALID = {'action': 'OPEN_SHORT', 'confidence': 78, 'reasoning': '跌破支撑 {96000}',
+         'leverage': 15, 'position_size': 25.5, 'stop_loss_pct': 1.5, 'levels': {'support': [96000, 95200]}}
+
+
+def test_strict_parse():
+    """测试严格解析与拒绝不合规的回复"""
+    print("\n" + "=" * 60)
+    print("📜 测试1: 严格解析")
+    print("=" * 60)
+
+    decision = parse_decision(json.dumps(VALID, ensure_ascii=False))
+    assert isinstance(decision, Decision)
+    assert (decision.action, decision.confidence, decision.leverage, decision.position_size) == ('OPEN_SHORT', 78, 15, 25.5)
+    assert decision.stop_loss_pct == 1.5 and decision.take_profit_pct == 8 and decision.close_percentage == 100
+    data = decision.to_dict()
+    assert data['narrative'] == data['reasoning'] == VALID['reasoning']
+    print("✅ 嵌套对象和字符串内的括号不影响解析，可选字段取默认值")
+
+    invalid = [
+        '好的：' + json.dumps(VALID),                     # 前面有文字
+        json.dumps(dict(VALID, action='BUY')),              # 未知操作
+        json.dumps(dict(VALID, confidence='78')),           # 类型错误
+        json.dumps(dict(VALID, confidence=78.0)),           # 整数字段为小数
+        json.dumps(dict(VALID, leverage=0)),                # 越界
+        json.dumps(dict(VALID, leverage=True)),             # 布尔不是数值
+        json.dumps({k: v for k, v in VALID.items() if k != 'position_size'}),
+        '[1, 2]',
+        '',
+    ]
+    for text in invalid:
+        try:
+            parse_decision(text)
+            assert False, f"应拒绝: {text}"
+        except DecisionParseError as e:
+            print(f"  拒绝: {e}")
+    print(f"✅ {len(invalid)} 种不合规回复均被拒绝")
+
+    return True
+
+
+def test_repair():
+    """测试修复解析"""
+    print("\n" + "=" * 60)
+    print("🔧 测试2: 修复解析")
+    print("=" * 60)
+
+    text = ('分析如下：\n```json\n{"Action": "long", "confidence": "72.6%", "narrative": "放量 {突破}", '
+            '"leverage": "200x", "position_size": 130, "meta": {"tf": ["3m", "4h"]}}\n```\n以上仅供参考')
+    decision = repair_decision(text)
+    assert decision.action == 'OPEN_LONG' and decision.confidence == 73
+    assert decision.leverage == DECISION_SCHEMA['properties']['leverage']['maximum'] and decision.position_size == 100
+    assert decision.reasoning == decision.narrative == '放量 {突破}'
+    print(f"✅ 修复: {decision}")
+
+    assert repair_decision('{"action": "close short", "confidence": 60}').action == 'CLOSE_SHORT'
+    # 滚仓由机器人的 ROLL 分支执行
+    assert parse_decision(json.dumps(dict(VALID, action='ROLL'))).action == 'ROLL'
+    assert repair_decision('{"action": "roll"}').action == 'ROLL'
+    for text in ('完全没有 JSON', '{"action": "MOON", "confidence": 99}', '{"confidence": 80'):
+        try:
+            repair_decision(text)
+            assert False, f"应无法修复: {text}"
+        except DecisionParseError:
+            pass
+    print("✅ 没有 JSON 对象、无法识别操作时仍然失败")
+
+    return True
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    """模拟 Ollama 的非流式 /api/chat：依次返回 REPLIES 中的回复"""
+
+    REPLIES = []
+    payloads = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        _FakeOllama.payloads.append(body)
+        content = _FakeOllama.REPLIES.pop(0)
+        payload = json.dumps({'message': {'role': 'assistant', 'content': content}, 'done': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client():
+    """测试 OllamaClient 结构化请求与解析失败率"""
+    print("\n" + "=" * 60)
+    print("🤖 测试3: 结构化请求与解析统计")
+    print("=" * 60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = OllamaClient('key', 512, 0.3, 10, server.server_address[1], 'test-model', stream=False)
+        account = {'balance': 1000, 'available_balance': 800}
+        _FakeOllama.REPLIES = [
+            json.dumps(VALID, ensure_ascii=False),
+            '决策：{"action": "HOLD", "confidence": 55, "reasoning": "震荡", "detail": {"range": [1, 2]}}',
+            '我认为现在应该观望。',
+        ]
+        results = [client.analyze_market_and_decide({'symbol': 'BTCUSDT', 'current_price': 1}, account)
+                   for _ in range(3)]
+        assert all(p['format'] == DECISION_SCHEMA for p in _FakeOllama.payloads)
+        assert len(_FakeOllama.payloads) == 3
+        print("✅ 请求带 format JSON Schema，每次决策只生成一次")
+
+        decisions = [r['decision'] for r in results]
+        assert decisions[0]['action'] == 'OPEN_SHORT' and decisions[0]['leverage'] == 15
+        assert decisions[1]['action'] == 'HOLD' and decisions[1]['confidence'] == 55
+        assert decisions[2]['action'] == 'HOLD' and decisions[2]['reasoning'] == '我认为现在应该观望。'
+        assert decisions[2].keys() == decisions[0].keys() == decisions[1].keys()
+        metrics = client.parse_metrics.snapshot()
+        assert metrics == {'total': 3, 'strict': 1, 'repaired': 1, 'failed': 1, 'failure_rate': round(1 / 3, 4)}
+        print(f"✅ 解析统计: {metrics}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '严格解析': test_strict_parse(),
+        '修复解析': test_repair(),
+        '结构化请求与解析统计': test_client(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式技术指标
+逐根推进 K线，每一步都与 MarketAnalyzer 中 pandas 版本在同一序列上的结果对比，
+并验证未收盘 K线的 tick 预览不修改已提交状态
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from incremental_indicators import IncrementalIndicators
+from kline_store import parse_klines
+from market_analyzer import MarketAnalyzer
+from simulated_exchange import synthetic_klines
+
+
+def _frame(columns):
+    return pd.DataFrame({'high': columns[2], 'low': columns[3], 'close': columns[4]})
+
+
+def _reference(df):
+    """pandas 版本在整段序列上的指标"""
+    analyzer = MarketAnalyzer(client=None)
+    macd, signal, histogram = analyzer.calculate_macd(df)
+    upper, middle, lower = analyzer.calculate_bollinger_bands(df, period=20)
+    return {
+        'sma_20': analyzer.calculate_sma(df, 20), 'sma_50': analyzer.calculate_sma(df, 50),
+        'ema_12': analyzer.calculate_ema(df, 12), 'ema_50': analyzer.calculate_ema(df, 50),
+        'rsi_7': analyzer.calculate_rsi(df, 7), 'rsi_14': analyzer.calculate_rsi(df, 14),
+        'atr_3': analyzer.calculate_atr(df, 3), 'atr_14': analyzer.calculate_atr(df, 14),
+        'macd': macd, 'macd_signal': signal, 'macd_histogram': histogram,
+        'bb_upper': upper, 'bb_middle': middle, 'bb_lower': lower,
+    }
+
+
+def _assert_close(values, reference, index):
+    for name, series in reference.items():
+        expected = series.iloc[index]
+        assert np.isclose(values[name], expected, rtol=1e-9, atol=1e-9, equal_nan=True), \
+            f"{name}[{index}]: {values[name]} != {expected}"
+
+
+def test_parity_with_pandas():
+    """测试逐根推进与 pandas 结果一致"""
+    print("\n" + "=" * 60)
+    print("📐 测试1: 与 pandas 指标一致")
+    print("=" * 60)
+
+    columns = parse_klines(synthetic_klines(30000, 300, seed=11))
+    reference = _reference(_frame(columns))
+    indicators = IncrementalIndicators()
+    for i in range(columns.shape[1]):
+        values = indicators.update(columns[2, i], columns[3, i], columns[4, i])
+        _assert_close(values, reference, i)
+        if i:
+            assert np.isclose(values['prev_macd_histogram'], reference['macd_histogram'].iloc[i - 1])
+    print(f"✅ {columns.shape[1]} 根 K线逐根一致")
+
+    return True
+
+
+def test_tick_preview():
+    """测试未收盘 K线的 tick 预览"""
+    print("\n" + "=" * 60)
+    print("⏳ 测试2: tick 预览")
+    print("=" * 60)
+
+    columns = np.array(parse_klines(synthetic_klines(100, 120, seed=5)))
+    indicators = IncrementalIndicators()
+    for i in range(119):
+        indicators.update(columns[2, i], columns[3, i], columns[4, i])
+
+    # 同一根未收盘 K线的多个 tick，最后一次与把该价格作为最后一根的 pandas 结果一致
+    for close in (99.0, 101.5, 100.25):
+        columns[4, 119] = close
+        columns[2, 119] = max(columns[2, 119], close)
+        columns[3, 119] = min(columns[3, 119], close)
+        values = indicators.update(columns[2, 119], columns[3, 119], close, closed=False)
+        _assert_close(values, _reference(_frame(columns)), 119)
+    assert indicators.count == 119, "tick 不应提交状态"
+    print("✅ tick 预览与 pandas 一致且不提交")
+
+    # sync：K线列矩阵中已收盘的提交，未收盘的预览；窗口断档时重新计算
+    indicators = IncrementalIndicators()
+    close_time = columns[6]
+    indicators.sync(columns[:, :100], now_ms=close_time[98] + 1)
+    assert indicators.count == 99
+    values = indicators.sync(columns[:, 20:120], now_ms=close_time[-1] + 1)
+    assert indicators.count == 120
+    _assert_close(values, _reference(_frame(columns)), 119)
+    indicators.sync(columns[:, -10:], now_ms=close_time[-1] + 1)
+    assert indicators.count == 120, "没有新 K线时不推进"
+    print("✅ sync 增量推进")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '与 pandas 指标一致': test_parity_with_pandas(),
+        'tick 预览': test_tick_preview(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
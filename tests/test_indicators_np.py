@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 NumPy 技术指标内核
+与原 pandas 实现逐点对比（包括窗口未满的 NaN 位置和长序列下 EMA 分块递推的精度），
+并对 10~100 根 K线的小窗口做单次调用耗时的微基准
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators_np
+from kline_store import parse_klines
+from simulated_exchange import synthetic_klines
+
+
+# ========== 原 pandas 实现（参照） ==========
+
+def pd_ema(close, period):
+    return close.ewm(span=period, adjust=False).mean()
+
+
+def pd_rsi(close, period):
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+def pd_macd(close, fast=12, slow=26, signal=9):
+    line = pd_ema(close, fast) - pd_ema(close, slow)
+    signal_line = line.ewm(span=signal, adjust=False).mean()
+    return line, signal_line, line - signal_line
+
+
+def pd_atr(df, period):
+    high_low = df['high'] - df['low']
+    high_close = np.abs(df['high'] - df['close'].shift())
+    low_close = np.abs(df['low'] - df['close'].shift())
+    true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    return true_range.rolling(window=period).mean()
+
+
+def pd_bollinger(close, period=20, std_dev=2):
+    sma = close.rolling(window=period).mean()
+    std = close.rolling(window=period).std()
+    return sma + std * std_dev, sma, sma - std * std_dev
+
+
+def _frame(n, seed):
+    columns = parse_klines(synthetic_klines(30000, n, seed=seed))
+    return pd.DataFrame({'high': columns[2], 'low': columns[3], 'close': columns[4]})
+
+
+def _assert_close(actual, expected, name):
+    assert np.allclose(actual, np.asarray(expected), rtol=1e-9, atol=1e-9, equal_nan=True), name
+
+
+def test_parity():
+    """测试与 pandas 实现一致"""
+    print("\n" + "=" * 60)
+    print("📐 测试1: 与 pandas 实现一致")
+    print("=" * 60)
+
+    for n in (1, 5, 30, 100, 5000):
+        df = _frame(n, seed=n)
+        close, high, low = df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy()
+        for period in (3, 7, 12, 14, 20, 26, 50):
+            _assert_close(indicators_np.ema(close, period), pd_ema(df['close'], period), f"ema{period} n={n}")
+            _assert_close(indicators_np.sma(close, period), df['close'].rolling(period).mean(), f"sma{period}")
+            _assert_close(indicators_np.rsi(close, period), pd_rsi(df['close'], period), f"rsi{period}")
+            _assert_close(indicators_np.atr(high, low, close, period), pd_atr(df, period), f"atr{period}")
+        for actual, expected in zip(indicators_np.macd(close), pd_macd(df['close'])):
+            _assert_close(actual, expected, f"macd n={n}")
+        for actual, expected in zip(indicators_np.bollinger_bands(close), pd_bollinger(df['close'])):
+            _assert_close(actual, expected, f"bollinger n={n}")
+
+        wilder = df['close'].diff().clip(lower=0).fillna(0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+        wilder_loss = (-df['close'].diff()).clip(lower=0).fillna(0).ewm(alpha=1 / 14, adjust=False,
+                                                                        min_periods=14).mean()
+        _assert_close(indicators_np.rsi(close, 14, wilder=True), 100 - 100 / (1 + wilder / wilder_loss),
+                      f"wilder n={n}")
+    print("✅ EMA/SMA/RSI/MACD/ATR/布林带 在 1~5000 根K线上一致")
+
+    return True
+
+
+def benchmark(rows=(10, 30, 100), number=300):
+    """单次调用耗时（微秒）：pandas 实现 vs NumPy 内核"""
+    results = []
+    for n in rows:
+        df = _frame(n, seed=1)
+        close, high, low = df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy()
+        cases = {
+            'ema20': (lambda: pd_ema(df['close'], 20), lambda: indicators_np.ema(close, 20)),
+            'rsi14': (lambda: pd_rsi(df['close'], 14), lambda: indicators_np.rsi(close, 14)),
+            'macd': (lambda: pd_macd(df['close']), lambda: indicators_np.macd(close)),
+            'atr14': (lambda: pd_atr(df, 14), lambda: indicators_np.atr(high, low, close, 14)),
+            'bollinger': (lambda: pd_bollinger(df['close']), lambda: indicators_np.bollinger_bands(close)),
+        }
+        for name, (pandas_fn, numpy_fn) in cases.items():
+            pandas_us = min(timeit.repeat(pandas_fn, number=number, repeat=3)) / number * 1e6
+            numpy_us = min(timeit.repeat(numpy_fn, number=number, repeat=3)) / number * 1e6
+            results.append((n, name, pandas_us, numpy_us))
+    return results
+
+
+def test_benchmark():
+    """微基准：10/30/100 根K线的单次调用耗时"""
+    print("\n" + "=" * 60)
+    print("⏱️  测试2: 微基准")
+    print("=" * 60)
+
+    results = benchmark(number=50)
+    for n, name, pandas_us, numpy_us in results:
+        print(f"  n={n:<4} {name:<10} pandas {pandas_us:8.1f}us   numpy {numpy_us:7.1f}us   "
+              f"x{pandas_us / numpy_us:.1f}")
+    assert sum(r[3] for r in results) < sum(r[2] for r in results)
+    print("✅ 微基准完成")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '与 pandas 实现一致': test_parity(),
+        '微基准': test_benchmark(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
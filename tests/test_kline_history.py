@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 K线历史落盘存储
+验证列文件追加/内存映射读取/时间索引、写入中断后的恢复、从 REST 补齐断档，
+以及重启时 K线存储从磁盘恢复窗口、只补拉停机期间的 K线
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kline_history import KlineHistory
+from kline_store import KlineStore, parse_klines
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+MINUTE_MS = 60_000
+
+
+def test_append_and_read():
+    """测试追加、内存映射读取和时间索引"""
+    print("\n" + "=" * 60)
+    print("💾 测试1: 追加与读取")
+    print("=" * 60)
+
+    columns = parse_klines(synthetic_klines(100, 1000, seed=1))
+    now_ms = int(columns[6, -1]) + 1
+    with tempfile.TemporaryDirectory() as directory:
+        history = KlineHistory(directory)
+        # 中间缺 100 根，最后一根未收盘不写入
+        assert history.append('BTCUSDT', '1m', columns[:, :400], now_ms) == 400
+        assert history.append('BTCUSDT', '1m', columns[:, 350:450], now_ms) == 50
+        assert history.append('BTCUSDT', '1m', columns[:, 550:], now_ms - MINUTE_MS) == 449
+        assert history.count('BTCUSDT', '1m') == 899
+
+        open_time = columns[0]
+        assert history.gaps('BTCUSDT', '1m') == [(int(open_time[450]), int(open_time[549]))]
+        for t in (open_time[0], open_time[123], open_time[500], open_time[550], open_time[998], open_time[-1] + 1):
+            expected = int(np.searchsorted(history.columns('BTCUSDT', '1m')['open_time'], t))
+            assert history.locate('BTCUSDT', '1m', int(t)) == expected
+
+        data = history.read('BTCUSDT', '1m', start=int(open_time[440]), end=int(open_time[560]))
+        assert np.array_equal(data, np.concatenate((columns[:, 440:450], columns[:, 550:561]), axis=1))
+        assert np.array_equal(history.read('BTCUSDT', '1m', limit=5), columns[:, -6:-1])
+        assert isinstance(history.columns('BTCUSDT', '1m')['close'], np.memmap)
+        print(f"✅ {history.count('BTCUSDT', '1m')} 根，1 处断档，按时间定位与 searchsorted 一致")
+
+        # 写入中断：列文件比已提交的行数长，新实例只看到已提交的部分，下次追加时截断
+        with open(os.path.join(directory, 'BTCUSDT', '1m', 'close.f8'), 'ab') as f:
+            f.write(b'\0' * 80)
+        reopened = KlineHistory(directory)
+        assert reopened.count('BTCUSDT', '1m') == 899
+        assert reopened.append('BTCUSDT', '1m', columns, now_ms) == 1
+        assert np.array_equal(reopened.read('BTCUSDT', '1m', limit=3), columns[:, -3:])
+        print("✅ 写入中断后恢复")
+
+    return True
+
+
+def test_backfill():
+    """测试从 REST 补齐更早的历史和中间断档"""
+    print("\n" + "=" * 60)
+    print("📥 测试2: 回填")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 6000, seed=2)}, speed=0, warmup_candles=3000)
+    try:
+        now_ms = ex.now_ms()
+        expected = parse_klines(ex.get_futures_klines('BTCUSDT', '1m', 1500, start_time=now_ms - 2000 * MINUTE_MS))
+        expected = np.concatenate((expected, parse_klines(ex.get_futures_klines(
+            'BTCUSDT', '1m', 1500, start_time=int(expected[0, -1]) + 1))), axis=1)
+        with tempfile.TemporaryDirectory() as directory:
+            history = KlineHistory(directory)
+            history.append('BTCUSDT', '1m', expected[:, 800:1200], now_ms)
+            history.append('BTCUSDT', '1m', expected[:, 1500:1700], now_ms)
+            result = history.backfill(ex, 'BTCUSDT', '1m', int(expected[0, 0]), now_ms)
+            assert result['gaps'] == 0 and result['count'] == expected.shape[1]
+            assert result['fetched'] == expected.shape[1] - 600
+            assert np.array_equal(history.read('BTCUSDT', '1m'), expected)
+            print(f"✅ 补齐 {result['fetched']} 根，共 {result['count']} 根，无断档")
+
+            ex.advance(90 * 60)
+            result = history.backfill(ex, 'BTCUSDT', '1m', int(expected[0, 0]), ex.now_ms())
+            assert result['fetched'] == 90 and result['count'] == expected.shape[1] + 90
+            print("✅ 只缺尾部时直接追加")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_warm_start():
+    """测试重启时从磁盘恢复窗口，只补拉停机期间的 K线"""
+    print("\n" + "=" * 60)
+    print("🔥 测试3: 热启动")
+    print("=" * 60)
+
+    # 模拟时钟比本地时间早 2 小时，K线存储按本地时间判断收盘
+    start = int(time.time() * 1000) // MINUTE_MS * MINUTE_MS - 120 * MINUTE_MS
+    klines = synthetic_klines(100, 4000, start_time=start - 3000 * MINUTE_MS, seed=3)
+    ex = SimulatedExchange({'BTCUSDT': klines}, speed=0, start_time=start)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cold = KlineStore(ex, capacity=1000, history=KlineHistory(directory))
+            cold.get('BTCUSDT', '1m', 1000)
+            assert cold.stats['full_fetches'] == 1 and cold.stats['rows_fetched'] == 1000
+            assert KlineHistory(directory).count('BTCUSDT', '1m') == 1000
+
+            # 停机 30 分钟后重启
+            ex.advance(30 * 60)
+            warm = KlineStore(ex, capacity=1000, history=KlineHistory(directory))
+            data = warm.get('BTCUSDT', '1m', 1000)
+            assert np.array_equal(data, parse_klines(ex.get_futures_klines('BTCUSDT', '1m', 1000)))
+            assert warm.stats['history_loads'] == 1 and warm.stats['full_fetches'] == 0
+            assert warm.stats['rows_fetched'] == 30
+            assert KlineHistory(directory).count('BTCUSDT', '1m') == 1030
+            print(f"✅ 热启动从磁盘恢复 1000 根，只下载 {warm.stats['rows_fetched']} 根")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '追加与读取': test_append_and_read(),
+        '回填': test_backfill(),
+        '热启动': test_warm_start(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 K线本地重采样
+验证 1分钟序列聚合出的 3m/1h/4h 与交易所同周期 K线一致、冷启动分页回填，
+以及回填后由实时来源推进时不再发出 K线请求
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kline_resampler import ResampledKlineStore, resample
+from kline_store import parse_klines
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+def _assert_matches_exchange(ex, data, interval):
+    """已收盘的聚合 K线与交易所同周期 K线逐根一致"""
+    expected = parse_klines(ex.get_futures_klines('BTCUSDT', interval, 1500))
+    closed = data[:, data[6] < ex.clock.now_ms()]
+    assert closed.shape[1] > 0
+    index = np.searchsorted(expected[0], closed[0])
+    assert np.array_equal(expected[0, index], closed[0]), interval
+    assert np.allclose(expected[:, index], closed, rtol=1e-12, atol=1e-6), interval
+
+
+def test_resample_parity():
+    """测试聚合结果与交易所周期边界和 OHLCV 一致"""
+    print("\n" + "=" * 60)
+    print("🧮 测试1: 聚合结果与交易所一致")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 12 * 1440, seed=3)},
+                           speed=0, warmup_candles=5 * 1440 + 17)
+    try:
+        store = ResampledKlineStore(ex)
+        for interval, limit in (('3m', 30), ('1h', 100), ('4h', 10)):
+            data = store.get('BTCUSDT', interval, limit)
+            assert data.shape[1] == limit
+            _assert_matches_exchange(ex, data, interval)
+        # 冷启动只回填一条 1分钟序列：6000 根分 4 页
+        assert store.stats['full_fetches'] == 1 and store.stats['rows_fetched'] == 6000
+        assert store.source_interval('1h', 100) == '1m' and store.source_interval('4h', 100) == '4h'
+        print("✅ 3m/1h/4h 与交易所 K线一致，冷启动 4 次请求")
+
+        # 窗口起点不在周期边界时丢弃不完整的第一个周期，最后一个周期是未收盘 K线
+        base = store.get('BTCUSDT', '1m', 150)
+        hourly = resample(base, 3_600_000)
+        assert hourly[0, 0] % 3_600_000 == 0 and hourly[0, 0] >= base[0, 0]
+        assert hourly[6, -1] >= ex.clock.now_ms()
+        print("✅ 边界对齐，保留当前未收盘周期")
+
+        started = time.perf_counter()
+        for _ in range(100):
+            resample(store.get('BTCUSDT', '1m', 6000), 3_600_000)
+        print(f"  6000 根 1分钟 → 1小时: {(time.perf_counter() - started) * 10:.3f}ms/次")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_live_updates():
+    """测试回填后由实时来源推进，各周期保持一致"""
+    print("\n" + "=" * 60)
+    print("📡 测试2: 实时来源推进")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 12 * 1440, seed=5)},
+                           speed=0, warmup_candles=5 * 1440)
+    live = {'enabled': True}
+
+    def live_source(symbol, interval):
+        # 模拟数据流：只保留最近 200 根
+        return ex.get_futures_klines(symbol, interval, 200) if live['enabled'] else None
+
+    try:
+        store = ResampledKlineStore(ex, live_source=live_source)
+        store.get('BTCUSDT', '1h', 100)
+        rest_rows = store.stats['rows_fetched']
+        for _ in range(5):
+            ex.advance(7 * 60)
+            for interval, limit in (('3m', 30), ('1h', 100), ('4h', 10)):
+                _assert_matches_exchange(ex, store.get('BTCUSDT', interval, limit), interval)
+        assert store.stats['rows_fetched'] == rest_rows and store.stats['incremental_fetches'] == 0
+        # 每轮 3 个周期的读取都由实时来源推进同一条 1分钟序列
+        assert store.stats['live_updates'] == 5 * 3
+        print(f"✅ 5 轮推进，实时更新 {store.stats['live_updates']} 次，没有 REST K线请求")
+
+        # 同一版本的基础序列重复读取返回缓存的聚合结果
+        assert store.get('BTCUSDT', '1h', 100) is store.get('BTCUSDT', '1h', 100)
+
+        # 实时来源中断期间回退到增量请求
+        live['enabled'] = False
+        store.MIN_REFRESH_MS = 0
+        ex.advance(30 * 60)
+        _assert_matches_exchange(ex, store.get('BTCUSDT', '1h', 100), '1h')
+        assert store.stats['incremental_fetches'] == 1
+        print("✅ 实时来源不可用时增量请求")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '聚合结果与交易所一致': test_resample_parity(),
+        '实时来源推进': test_live_updates(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 K线增量存储
+验证环形缓冲区回绕后的零拷贝视图、未收盘 K线原地更新、增量拉取与整段拉取结果一致，
+以及 get() 返回的快照不随之后的刷新改变
+"""
+
+import os
+import sys
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kline_store import KlineBuffer, KlineStore, parse_klines
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+def test_ring_buffer():
+    """测试环形缓冲区回绕和原地更新"""
+    print("\n" + "=" * 60)
+    print("🔁 测试1: 环形缓冲区")
+    print("=" * 60)
+
+    rows = synthetic_klines(100, 500, seed=7)
+    expected = parse_klines(rows)
+    buffer = KlineBuffer(64)
+    for start in range(0, 500, 37):
+        buffer.extend(parse_klines(rows[start:start + 37]))
+
+    assert len(buffer) == 64
+    for n in (1, 10, 64):
+        assert np.array_equal(buffer.view(n), expected[:, -n:])
+    assert np.shares_memory(buffer.view(), buffer._data), "读取应为零拷贝视图"
+    assert not buffer.view().flags.writeable
+
+    # 同一开盘时间的 K线原地更新，旧 K线被忽略
+    latest = [list(r) for r in rows[-2:]]
+    latest[-1][4] = '123.45'
+    buffer.extend(parse_klines(latest))
+    assert len(buffer) == 64 and buffer.view(1)[4, 0] == 123.45
+    print("✅ 回绕、零拷贝视图、原地更新")
+
+    return True
+
+
+def test_incremental_fetch():
+    """测试增量拉取与整段拉取一致，且下载量大幅减少"""
+    print("\n" + "=" * 60)
+    print("📥 测试2: 增量拉取")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 1200, seed=2)}, speed=0)
+    try:
+        store = KlineStore(ex)
+        store.MIN_REFRESH_MS = 0
+        store.get('BTCUSDT', '1m', 100)
+        assert store.stats == {'full_fetches': 1, 'incremental_fetches': 0, 'live_updates': 0, 'rows_fetched': 200,
+                               'history_loads': 0}
+
+        for _ in range(10):
+            ex.advance(120)
+            data = store.get('BTCUSDT', '1m', 100)
+            assert np.array_equal(data, parse_klines(ex.get_futures_klines('BTCUSDT', '1m', 100)))
+        assert store.stats['incremental_fetches'] == 10
+        assert store.stats['rows_fetched'] == 200 + 10 * 2
+        print(f"✅ 10 次刷新共下载 {store.stats['rows_fetched'] - 200} 根（整段拉取需 1000 根）")
+
+        # 断档太长时整段重新回填
+        ex.advance(200 * 60)
+        data = store.get('BTCUSDT', '1m', 100)
+        assert np.array_equal(data, parse_klines(ex.get_futures_klines('BTCUSDT', '1m', 100)))
+        assert store.stats['full_fetches'] == 2
+        print("✅ 长时间断档后重新回填")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_snapshot_isolation():
+    """测试 get() 的结果不随之后的刷新改变"""
+    print("\n" + "=" * 60)
+    print("📸 测试3: 读取结果是快照")
+    print("=" * 60)
+
+    ex = SimulatedExchange({'BTCUSDT': synthetic_klines(100, 300, seed=4)}, speed=0)
+    try:
+        store = KlineStore(ex, capacity=50)
+        store.MIN_REFRESH_MS = 0
+        held = store.get('BTCUSDT', '1m', 50)
+        expected = held.copy()
+        buffer = store._buffers[('BTCUSDT', '1m')]
+        assert not np.shares_memory(held, buffer._data) and not held.flags.writeable
+
+        # 多次刷新：未收盘 K线原地更新、新 K线写入并回绕覆盖旧位置
+        for _ in range(30):
+            ex.advance(90)
+            latest = store.get('BTCUSDT', '1m', 50)
+        assert buffer.count > 50 + 30
+        assert np.array_equal(held, expected), "已返回的结果被之后的刷新修改"
+        assert np.array_equal(latest, parse_klines(ex.get_futures_klines('BTCUSDT', '1m', 50)))
+        print(f"✅ 刷新 30 次（写入 {buffer.count} 根）后，先前读取的结果保持不变")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '环形缓冲区': test_ring_buffer(),
+        '增量拉取': test_incremental_fetch(),
+        '读取结果是快照': test_snapshot_isolation(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 LLM 请求调度器
+验证有界并发和优先级顺序（平仓评估先于开仓分析）、截止时间与同 key 请求取代、
+等待期间让出锁，以及 OllamaClient 经本地模拟服务并发请求
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_scheduler import DeadlineExceeded, LLMScheduler, Priority
+from ollama_client import OllamaClient
+
+
+def _blocked(scheduler):
+    """占满所有工作线程，返回放行事件"""
+    gate = threading.Event()
+    started = threading.Barrier(scheduler.max_concurrency + 1)
+
+    def hold(timeout):
+        started.wait()
+        gate.wait()
+    for _ in range(scheduler.max_concurrency):
+        scheduler.submit(hold, Priority.BACKGROUND)
+    started.wait()
+    return gate
+
+
+def test_priority_and_concurrency():
+    """测试有界并发和优先级顺序"""
+    print("\n" + "=" * 60)
+    print("🚦 测试1: 优先级与并发上限")
+    print("=" * 60)
+
+    scheduler = LLMScheduler(max_concurrency=2)
+    gate = _blocked(scheduler)
+    order = []
+
+    def job(name):
+        def run(timeout):
+            order.append(name)
+            time.sleep(0.01)
+            return name
+        return run
+
+    futures = [scheduler.submit(job(f"entry-{i}"), Priority.ENTRY) for i in range(3)]
+    futures += [scheduler.submit(job(f"exit-{i}"), Priority.EXIT) for i in range(2)]
+    assert scheduler.queue_size() == 5
+    gate.set()
+    assert [f.result(5) for f in futures] == ['entry-0', 'entry-1', 'entry-2', 'exit-0', 'exit-1']
+    assert order[:2] == ['exit-0', 'exit-1'] and set(order[2:]) == {'entry-0', 'entry-1', 'entry-2'}
+    assert scheduler.stats['max_in_flight'] == 2
+    print(f"✅ 执行顺序: {order}，同时执行最多 {scheduler.stats['max_in_flight']} 个")
+
+    return True
+
+
+def test_deadline_and_supersede():
+    """测试截止时间和同 key 请求取代"""
+    print("\n" + "=" * 60)
+    print("⏰ 测试2: 截止时间与取代")
+    print("=" * 60)
+
+    scheduler = LLMScheduler(max_concurrency=1)
+    gate = _blocked(scheduler)
+    expired = scheduler.submit(lambda timeout: 'late', deadline=time.time() + 0.05)
+    old = scheduler.submit(lambda timeout: 'old', key=('entry', 'BTCUSDT'))
+    new = scheduler.submit(lambda timeout: timeout, deadline=time.time() + 30, key=('entry', 'BTCUSDT'))
+    time.sleep(0.1)
+    gate.set()
+
+    try:
+        expired.result(5)
+        assert False, "过期请求不应执行"
+    except DeadlineExceeded as e:
+        print(f"✅ 过期请求未发出: {e}")
+    try:
+        old.result(5)
+        assert False, "被取代的请求不应执行"
+    except CancelledError:
+        pass
+    remaining = new.result(5)
+    assert 0 < remaining <= 30
+    assert scheduler.stats['expired'] == 1 and scheduler.stats['superseded'] == 1
+    print(f"✅ 同一交易对的旧请求被取代，新请求剩余时间 {remaining:.1f} 秒")
+
+    return True
+
+
+def test_yielding_lock():
+    """测试等待结果时让出锁：处理串行、推理重叠"""
+    print("\n" + "=" * 60)
+    print("🔓 测试3: 等待期间让出锁")
+    print("=" * 60)
+
+    scheduler = LLMScheduler(max_concurrency=3)
+    lock = threading.Lock()
+    # 3 个请求必须同时在执行才能通过屏障；等待期间不让出锁时屏障超时
+    overlap = threading.Barrier(3, timeout=5)
+    holding = []
+    done = []
+
+    def process(i):
+        with lock, scheduler.yielding(lock):
+            holding.append(i)
+            assert lock.locked()
+            scheduler.call(lambda timeout: overlap.wait())
+            assert lock.locked()
+            done.append(i)
+
+    threads = [threading.Thread(target=process, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(holding) == sorted(done) == [0, 1, 2] and not lock.locked()
+    assert scheduler.stats['max_in_flight'] == 3
+    print(f"✅ 3 个持锁调用的请求同时执行（最多 {scheduler.stats['max_in_flight']} 个），锁在返回后重新持有")
+
+    return True
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    """模拟 Ollama 的 /api/chat：设置 barrier 时等到约定数量的请求同时到达才返回"""
+
+    barrier = None
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        _FakeOllama.requests.append(body['messages'][-1]['content'][:40])
+        if _FakeOllama.barrier is not None:
+            _FakeOllama.barrier.wait()
+        content = json.dumps({'action': 'HOLD', 'confidence': 60, 'reasoning': 'test'})
+        payload = json.dumps({'choices': [{'message': {'content': content}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_ollama_client():
+    """测试 OllamaClient 经调度器并发请求"""
+    print("\n" + "=" * 60)
+    print("🤖 测试4: OllamaClient 并发请求")
+    print("=" * 60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = OllamaClient('key', 512, 0.3, 10, server.server_address[1], 'test-model', parallel_slots=4)
+        account = {'balance': 1000, 'available_balance': 800}
+        symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT']
+        results = {}
+
+        def analyze(symbol):
+            results[symbol] = client.analyze_market_and_decide({'symbol': symbol, 'current_price': 1}, account)
+
+        # 4 个请求全部同时到达服务端才会返回
+        _FakeOllama.barrier = threading.Barrier(len(symbols), timeout=5)
+        threads = [threading.Thread(target=analyze, args=(s,)) for s in symbols]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        _FakeOllama.barrier = None
+        assert len(results) == len(symbols)
+        assert all(r['success'] and r['decision']['action'] == 'HOLD' for r in results.values()), results
+        assert client.scheduler.stats['max_in_flight'] == len(symbols)
+        print(f"✅ {len(symbols)} 个交易对的请求同时发出（最多 {client.scheduler.stats['max_in_flight']} 个）")
+
+        position = {'symbol': 'BTCUSDT', 'side': 'LONG', 'entry_price': 1, 'current_price': 1,
+                    'unrealized_pnl_pct': 0.5, 'leverage': 5, 'holding_time': '1h'}
+        decision = client.evaluate_position_for_closing(position, {'rsi': 50}, account)
+        assert decision['action'] == 'HOLD'
+
+        # 已过期的截止时间：不发出请求
+        count = len(_FakeOllama.requests)
+        result = client.analyze_market_and_decide({'symbol': 'BTCUSDT'}, account, deadline=time.time() - 1)
+        assert not result['success'] and len(_FakeOllama.requests) == count
+        print("✅ 持仓评估正常返回，过期请求不发出")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '优先级与并发上限': test_priority_and_concurrency(),
+        '截止时间与取代': test_deadline_and_supersede(),
+        '等待期间让出锁': test_yielding_lock(),
+        'OllamaClient 并发请求': test_ollama_client(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
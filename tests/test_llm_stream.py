@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 LLM 流式生成读取
+验证按任意切分的 token 流增量识别完整的顶层 JSON 对象、解析 Ollama/OpenAI 两种流式格式，
+以及 OllamaClient 经本地模拟的流式服务在决策 JSON 完整后立即返回、断开连接使服务端停止生成
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_stream import JsonObjectScanner, parse_chunk, read_until_json
+from ollama_client import OllamaClient
+
+
+DECISION = {'action': 'OPEN_LONG', 'confidence': 85, 'reasoning': '突破 {阻力} 位，"放量"',
+            'leverage': 20, 'position_size': 30, 'extra': {'levels': [1, 2]}}
+FLAT_DECISION = {'action': 'OPEN_LONG', 'confidence': 85, 'reasoning': '放量突破', 'leverage': 20, 'position_size': 30}
+
+
+def _tokens(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_scanner():
+    """测试增量识别完整 JSON 对象"""
+    print("\n" + "=" * 60)
+    print("🧩 测试1: 增量识别 JSON")
+    print("=" * 60)
+
+    text = '好的，决策如下：\n```json\n' + json.dumps(DECISION, ensure_ascii=False) + '\n```\n理由是……'
+    for size in (1, 3, 7, 50):
+        scanner = JsonObjectScanner()
+        found = [r for r in (scanner.feed(t) for t in _tokens(text, size)) if r is not None]
+        assert len(found) == 1 and json.loads(found[0]) == DECISION and scanner.value == DECISION, size
+    print("✅ 任意切分、前后有文字、字符串内含括号和引号、嵌套对象均可识别")
+
+    # 不合法的平衡片段被跳过，继续寻找下一个对象
+    scanner = JsonObjectScanner()
+    assert scanner.feed('格式 {action} 之后：') is None
+    assert scanner.feed('{"action": "HOLD", "note": "a\\"}b"}') == '{"action": "HOLD", "note": "a\\"}b"}'
+    assert scanner.value == {'action': 'HOLD', 'note': 'a"}b'}
+    print("✅ 跳过非 JSON 的括号片段")
+
+    return True
+
+
+def test_parse_chunk():
+    """测试流式格式解析"""
+    print("\n" + "=" * 60)
+    print("📦 测试2: 流式格式")
+    print("=" * 60)
+
+    assert parse_chunk(b'{"message": {"role": "assistant", "content": "{\\"a"}, "done": false}') == ('{"a', False)
+    assert parse_chunk('{"message": {"role": "assistant", "content": ""}, "done": true}') == ('', True)
+    assert parse_chunk('data: {"choices": [{"delta": {"content": "x"}, "finish_reason": null}]}') == ('x', False)
+    assert parse_chunk('data: [DONE]') == ('', True)
+    try:
+        parse_chunk('{"error": "model not found"}')
+        assert False, "错误行应抛出异常"
+    except Exception as e:
+        assert 'model not found' in str(e)
+
+    lines = [json.dumps({'message': {'content': t}, 'done': False}) for t in ['先说', '明', '{"a": ', '1}', '后面']]
+    result = read_until_json(iter(lines))
+    assert result.json_text == '{"a": 1}' and result.text == '先说明{"a": 1}' and result.stopped_early
+    result = read_until_json(iter(lines[:2] + [json.dumps({'done': True})]))
+    assert result.json_text is None and result.content == '先说明' and not result.stopped_early
+    print("✅ Ollama NDJSON、OpenAI SSE、错误行和生成结束均正确处理")
+
+    return True
+
+
+class _StreamingOllama(BaseHTTPRequestHandler):
+    """模拟 Ollama 的流式 /api/chat：每 TOKEN_DELAY 秒输出一个 token，JSON 之后继续长篇解释"""
+
+    protocol_version = 'HTTP/1.1'
+    TOKEN_DELAY = 0.01
+    TOKENS = _tokens(json.dumps(FLAT_DECISION, ensure_ascii=False)) + ['以上决策的理由如下：'] * 100
+    sent = []               # 每个流式请求实际输出的 token 数（客户端断开后停止）
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if body['model'] == 'missing':
+            self._reply(404, {'error': "model 'missing' not found"})
+            return
+        if not body.get('stream', True):
+            time.sleep(self.TOKEN_DELAY * len(self.TOKENS))
+            self._reply(200, {'message': {'role': 'assistant', 'content': ''.join(self.TOKENS)}, 'done': True})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        count = 0
+        try:
+            for token in self.TOKENS:
+                time.sleep(self.TOKEN_DELAY)
+                self._chunk({'message': {'role': 'assistant', 'content': token}, 'done': False})
+                count += 1
+            self._chunk({'message': {'role': 'assistant', 'content': ''}, 'done': True})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            _StreamingOllama.sent.append(count)
+
+    def _chunk(self, data):
+        line = (json.dumps(data) + '\n').encode()
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def _reply(self, status, data):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_early_stop():
+    """测试 OllamaClient 流式生成在决策完整后立即返回并停止生成"""
+    print("\n" + "=" * 60)
+    print("⚡ 测试3: 流式决策提前结束")
+    print("=" * 60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StreamingOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    account = {'balance': 1000, 'available_balance': 800}
+    try:
+        client = OllamaClient('key', 512, 0.3, 10, port, 'test-model', stream=True)
+        started = time.perf_counter()
+        result = client.analyze_market_and_decide({'symbol': 'BTCUSDT', 'current_price': 1}, account)
+        stream_s = time.perf_counter() - started
+        assert result['success'] and result['decision']['action'] == 'OPEN_LONG'
+        assert json.loads(result['raw_response']) == FLAT_DECISION
+
+        deadline = time.time() + 2
+        while not _StreamingOllama.sent and time.time() < deadline:
+            time.sleep(0.01)
+        json_tokens = len(_tokens(json.dumps(FLAT_DECISION, ensure_ascii=False)))
+        assert json_tokens <= _StreamingOllama.sent[0] < json_tokens + 10, _StreamingOllama.sent
+        print(f"✅ 服务端输出 {_StreamingOllama.sent[0]}/{len(_StreamingOllama.TOKENS)} 个 token 后停止生成")
+
+        metrics = client.stream_metrics.snapshot()
+        assert metrics['streams'] == 1 and metrics['stopped_early'] == 1 and metrics['without_json'] == 0
+        assert 0 < metrics['ttft']['max_ms'] <= metrics['time_to_decision']['max_ms']
+        print(f"✅ 首个token {metrics['ttft']['max_ms']:.0f}ms，决策 {metrics['time_to_decision']['max_ms']:.0f}ms")
+
+        blocking = OllamaClient('key', 512, 0.3, 10, port, 'test-model', stream=False)
+        started = time.perf_counter()
+        result = blocking.analyze_market_and_decide({'symbol': 'BTCUSDT', 'current_price': 1}, account)
+        blocking_s = time.perf_counter() - started
+        assert result['success'] and result['decision']['action'] == 'OPEN_LONG'
+        # 提前结束已由服务端输出的 token 数验证；耗时受机器负载影响，只输出供参考
+        print(f"  决策耗时: 流式 {stream_s:.2f} 秒  非流式 {blocking_s:.2f} 秒")
+
+        # 非 200 响应：返回失败而不是默认决策
+        missing = OllamaClient('key', 512, 0.3, 10, port, 'missing', stream=True)
+        result = missing.analyze_market_and_decide({'symbol': 'BTCUSDT'}, account)
+        assert not result['success'] and result['error'] == 'API错误: 404'
+        assert missing.evaluate_position_for_closing(
+            {'symbol': 'BTCUSDT', 'side': 'LONG', 'entry_price': 1, 'current_price': 1, 'unrealized_pnl_pct': 0,
+             'leverage': 5, 'holding_time': '1h'}, {}, account)['narrative'] == 'API错误'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '增量识别 JSON': test_scanner(),
+        '流式格式': test_parse_chunk(),
+        '流式决策提前结束': test_client_early_stop(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地订单簿
+验证快照 + 增量同步后的盘口与逐条字典合并一致、序号断档检测和重新同步，
+以及通过回放服务器离线重建订单簿（录制的快照帧）和 MarketAnalyzer 读取
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from local_order_book import LocalOrderBook, replay_depth
+from market_analyzer import MarketAnalyzer
+from market_data_stream import MarketDataStream, MarketReplayServer
+from simulated_exchange import synthetic_depth_frames
+
+
+def _naive_book(frames):
+    """从快照帧开始逐条用字典合并之后的增量"""
+    messages = [json.loads(raw)['data'] for raw in frames]
+    snapshot = next(m for m in messages if m['e'] == 'depthSnapshot')
+    bids = {float(p): float(q) for p, q in snapshot['bids']}
+    asks = {float(p): float(q) for p, q in snapshot['asks']}
+    for m in messages:
+        if m['e'] != 'depthUpdate' or m['u'] < snapshot['lastUpdateId']:
+            continue
+        for book, updates in ((bids, m['b']), (asks, m['a'])):
+            for p, q in updates:
+                if float(q):
+                    book[float(p)] = float(q)
+                else:
+                    book.pop(float(p), None)
+    return bids, asks
+
+
+def _assert_same(book, bids, asks):
+    top = book.top(len(bids) + len(asks))
+    assert top['bids'] == [[p, bids[p]] for p in sorted(bids, reverse=True)]
+    assert top['asks'] == [[p, asks[p]] for p in sorted(asks)]
+
+
+def _wait_messages(stream, count, timeout=5):
+    deadline = time.time() + timeout
+    while stream.message_count < count and time.time() < deadline:
+        time.sleep(0.02)
+
+
+class _SnapshotClient:
+    """只提供订单簿快照的 REST 客户端：返回录制帧中的快照"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.calls = 0
+
+    def get_futures_order_book(self, symbol, limit=1000):
+        self.calls += 1
+        return {k: self.snapshot[k] for k in ('lastUpdateId', 'E', 'bids', 'asks')}
+
+
+def test_sync_parity():
+    """测试同步后的盘口和特征与字典合并一致"""
+    print("\n" + "=" * 60)
+    print("📚 测试1: 快照 + 增量同步")
+    print("=" * 60)
+
+    frames = synthetic_depth_frames('BTCUSDT', 50000, 500, snapshot_at=20, snapshot_delay=4, seed=1)
+    book = replay_depth(frames)['BTCUSDT']
+    bids, asks = _naive_book(frames)
+    assert book.synced and book.stats['resyncs'] == 0
+    assert book.stats['dropped'] == 20 and book.stats['events'] == 480
+    _assert_same(book, bids, asks)
+    print(f"✅ {book.stats['events']} 条增量，丢弃快照前 {book.stats['dropped']} 条，与字典合并一致")
+
+    best_bid, best_ask = max(bids), min(asks)
+    assert book.best_bid == best_bid and book.best_ask == best_ask
+    mid = (best_bid + best_ask) / 2
+    spread, spread_bps = book.spread()
+    assert np.isclose(spread, best_ask - best_bid) and np.isclose(spread_bps, spread / mid * 10000)
+    depth = book.depth_within(10)
+    lo, hi = mid * (1 - 10 / 10000), mid * (1 + 10 / 10000)
+    bid_notional = sum(p * q for p, q in bids.items() if p >= lo)
+    ask_notional = sum(p * q for p, q in asks.items() if p <= hi)
+    assert np.isclose(depth['bid_notional'], bid_notional) and np.isclose(depth['ask_notional'], ask_notional)
+    assert np.isclose(book.imbalance(10), (bid_notional - ask_notional) / (bid_notional + ask_notional))
+    print(f"✅ 买一 {best_bid} 卖一 {best_ask}，10bps 失衡 {book.imbalance(10):+.3f}")
+
+    # 与 REST 快照路径的分析结果一致
+    class _RestClient:
+        def get_order_book(self, symbol, limit):
+            top = book.top(limit)
+            return {side: [[str(p), str(q)] for p, q in rows] for side, rows in top.items()}
+
+    rest = MarketAnalyzer(client=_RestClient()).analyze_order_book('BTCUSDT')
+    local = book.analysis()
+    for key in ('best_bid', 'best_ask', 'spread', 'total_bid_volume', 'total_ask_volume', 'market_sentiment'):
+        assert np.isclose(rest[key], local[key]) if key != 'market_sentiment' else rest[key] == local[key], key
+    print("✅ 分析字段与 REST 快照路径一致")
+
+    return True
+
+
+def test_gap_resync():
+    """测试序号断档检测和重新同步"""
+    print("\n" + "=" * 60)
+    print("🕳️  测试2: 断档检测")
+    print("=" * 60)
+
+    frames = synthetic_depth_frames('BTCUSDT', 50000, 60, snapshot_at=5, snapshot_delay=2, seed=2)
+    messages = [json.loads(raw)['data'] for raw in frames]
+    snapshot = next(m for m in messages if m['e'] == 'depthSnapshot')
+    updates = [m for m in messages if m['e'] == 'depthUpdate']
+
+    book = LocalOrderBook('BTCUSDT')
+    assert not book.apply_event(updates[0]) and not book.synced
+    assert book.apply_snapshot(snapshot) and book.synced
+    for update in updates[1:30]:
+        assert book.apply_event(update)
+    # 丢掉一条增量
+    assert not book.apply_event(updates[31])
+    assert not book.synced and book.stats['resyncs'] == 1
+    print("✅ pu 与上一条 u 不连续时判定断档并清空盘口")
+
+    # 早于缓存事件的快照衔接不上，需要再次取快照
+    assert not book.apply_snapshot(snapshot)
+    assert book.stats['resyncs'] == 2
+
+    # 新快照覆盖到第 40 条增量，之前缓存的事件被丢弃
+    bids, asks = _naive_book([json.dumps({'data': snapshot})] + [json.dumps({'data': u}) for u in updates[:41]])
+    fresh = {'lastUpdateId': updates[40]['u'],
+             'bids': [[str(p), str(q)] for p, q in bids.items()],
+             'asks': [[str(p), str(q)] for p, q in asks.items()]}
+    assert book.apply_snapshot(fresh)
+    for update in updates[32:]:
+        assert book.apply_event(update)
+    _assert_same(book, *_naive_book([json.dumps({'data': snapshot})] + [json.dumps({'data': u}) for u in updates]))
+    print(f"✅ 重新同步后与字典合并一致（快照 {book.stats['snapshots']} 次）")
+
+    return True
+
+
+def test_stream_replay():
+    """测试行情数据流维护订单簿：回放录制帧离线重建，以及实时取快照并录制"""
+    print("\n" + "=" * 60)
+    print("📼 测试3: 数据流订单簿")
+    print("=" * 60)
+
+    frames = synthetic_depth_frames('ETHUSDT', 3000, 300, tick=0.01, snapshot_at=10, seed=3)
+    expected = replay_depth(frames)['ETHUSDT']
+
+    # 回放带快照帧的录制文件，不需要 REST 客户端
+    server = MarketReplayServer(frames).start()
+    stream = MarketDataStream(['ETHUSDT'], intervals=[], url=server.url, depth=True)
+    stream.start()
+    try:
+        _wait_messages(stream, len(frames))
+        book = stream.get_order_book('ETHUSDT')
+        assert book is not None and book.top(500) == expected.top(500)
+        assert stream.get_order_book('BTCUSDT') is None
+        analysis = MarketAnalyzer(client=None, market_stream=stream).analyze_order_book('ETHUSDT')
+        assert analysis['best_bid'] == expected.best_bid and 'imbalance_10bps' in analysis
+        print(f"✅ 回放重建订单簿，买一 {analysis['best_bid']} 卖一 {analysis['best_ask']}")
+    finally:
+        stream.stop()
+        server.stop()
+
+    # 实时流没有快照帧：收到增量后向 REST 请求快照，并把快照写入录制文件
+    snapshot = next(json.loads(raw)['data'] for raw in frames if '@depthSnapshot' in raw)
+    live_frames = [raw for raw in frames if '@depthSnapshot' not in raw]
+    client = _SnapshotClient(snapshot)
+    with tempfile.TemporaryDirectory() as directory:
+        record_file = os.path.join(directory, 'depth.jsonl')
+        server = MarketReplayServer(live_frames).start()
+        stream = MarketDataStream(['ETHUSDT'], intervals=[], client=client, url=server.url,
+                                  record_file=record_file, depth=True)
+        stream.start()
+        try:
+            _wait_messages(stream, len(frames))
+            book = stream.get_order_book('ETHUSDT')
+            assert client.calls == 1
+            assert book is not None and book.top(500) == expected.top(500)
+        finally:
+            stream.stop()
+            server.stop()
+
+        with open(record_file, 'r', encoding='utf-8') as f:
+            recorded = [line.strip() for line in f if line.strip()]
+        assert sum('@depthSnapshot' in raw for raw in recorded) == 1
+        assert replay_depth(recorded)['ETHUSDT'].top(500) == expected.top(500)
+        print("✅ 实时请求快照 1 次，录制文件可离线重放出相同订单簿")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '快照 + 增量同步': test_sync_parity(),
+        '断档检测': test_gap_resync(),
+        '数据流订单簿': test_stream_replay(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
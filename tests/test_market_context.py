@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试市场上下文构建器
+验证每个周期只请求一次 K线、多交易对矩阵计算的结果与原先逐步骤逐交易对计算完全一致，
+并输出交易对数量增加时批量计算与逐个计算的耗时供参考
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_metrics import ApiMetrics
+from kline_store import parse_klines
+from market_analyzer import MarketAnalyzer
+from market_context import batch_1h, batch_indicators
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+
+
+def _reference_context(analyzer, symbol):
+    """原 get_comprehensive_market_context 的逐步骤实现（每个步骤单独读取 K线）"""
+    current_price = float(analyzer.get_kline_data(symbol, '1m', 1)['close'].iloc[-1])
+    df_short = analyzer.get_kline_data(symbol, '3m', 30)
+    context_4h = analyzer.get_4h_context(symbol, 10)
+    df_1h = analyzer.get_kline_data(symbol, '1h', 100)
+    macd_line, signal_line, histogram = analyzer.calculate_macd(df_1h)
+    upper_band, middle_band, lower_band = analyzer.calculate_bollinger_bands(df_1h, period=20)
+    return {
+        'current_snapshot': {
+            'price': current_price,
+            'ema20': float(analyzer.calculate_ema(df_short, 20).iloc[-1]),
+            'macd': float(analyzer.calculate_macd(df_short)[0].iloc[-1]),
+            'rsi7': float(analyzer.calculate_rsi(df_short, 7).iloc[-1]),
+        },
+        'intraday_series': analyzer.get_intraday_series(symbol, '3m', 10),
+        'long_term_context_4h': context_4h,
+        'rsi': float(analyzer.calculate_rsi(df_1h, period=14).iloc[-1]),
+        'macd': float(macd_line.iloc[-1]),
+        'macd_signal': float(signal_line.iloc[-1]),
+        'macd_histogram': float(histogram.iloc[-1]),
+        'bollinger_upper': float(upper_band.iloc[-1]),
+        'bollinger_lower': float(lower_band.iloc[-1]),
+        'sma_50': float(analyzer.calculate_sma(df_1h, 50).iloc[-1]),
+        'atr': context_4h['atr14'],
+    }
+
+
+def _kline_calls(metrics):
+    endpoints = metrics.start_cycle()['callers'].get('unknown', {}).get('endpoints', {})
+    return endpoints.get('futures_klines', {}).get('calls', 0)
+
+
+def test_batch_context():
+    """测试按周期合并请求、批量计算与逐步骤结果一致"""
+    print("\n" + "=" * 60)
+    print("🧩 测试1: 批量综合上下文")
+    print("=" * 60)
+
+    klines = {s: synthetic_klines(100 * (i + 1), 30 * 1440, seed=i) for i, s in enumerate(SYMBOLS)}
+    ex = SimulatedExchange(klines, speed=0, warmup_candles=15 * 1440)
+    metrics = ApiMetrics()
+    ex.async_client.metrics = metrics
+    try:
+        analyzer = MarketAnalyzer(ex)
+        contexts, errors = analyzer.get_comprehensive_market_contexts(SYMBOLS + ['XRPUSDT'])
+        # 每个交易对只回填一条 1分钟序列（6000 根分 4 页），无效交易对第一次请求失败后跳过
+        assert _kline_calls(metrics) == 4 * len(SYMBOLS) + 1
+        assert set(contexts) == set(SYMBOLS) and set(errors) == {'XRPUSDT'}
+        stats = analyzer.context_builder.last_stats
+        assert stats['kline_fetches'] == 3 and stats['calls_saved'] == 3 * (10 - 1)
+
+        reference = MarketAnalyzer(ex)
+        for symbol in SYMBOLS:
+            expected = _reference_context(reference, symbol)
+            for key, value in expected.items():
+                assert contexts[symbol][key] == value, (symbol, key)
+            # 支撑阻力由已读取的 1h/4h K线计算，不再是按当前价的固定比例
+            price = contexts[symbol]['current_price']
+            assert all(level < price for level in contexts[symbol]['support_levels'])
+            assert all(level > price for level in contexts[symbol]['resistance_levels'])
+        single = analyzer.get_comprehensive_market_context('ETHUSDT')
+        assert set(single) == set(contexts['ETHUSDT'])
+        print(f"✅ {len(SYMBOLS)} 个交易对 K线请求 {stats['kline_fetches']} 次，与逐步骤计算一致")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_batch_scaling():
+    """测试不同长度分组，以及交易对数量增加时的计算耗时"""
+    print("\n" + "=" * 60)
+    print("📊 测试2: 多交易对矩阵计算")
+    print("=" * 60)
+
+    columns = {f'S{i}': parse_klines(synthetic_klines(100 + i, 100, seed=i)) for i in range(60)}
+    columns['SHORT'] = parse_klines(synthetic_klines(50, 40, seed=99))
+    views = batch_indicators(columns, batch_1h)
+    for symbol in ('S0', 'S37', 'SHORT'):
+        single = batch_indicators({symbol: columns[symbol]}, batch_1h)[symbol]
+        for name, value in single.items():
+            assert np.array_equal(views[symbol][name], value, equal_nan=True), (symbol, name)
+    print("✅ 批量结果与单独计算一致（含历史不足的交易对）")
+
+    # 耗时受机器负载影响，只输出供参考，不作断言
+    for count in (6, 50):
+        subset = {s: columns[s] for s in list(columns)[:count]}
+        started = time.perf_counter()
+        for _ in range(20):
+            batch_indicators(subset, batch_1h)
+        batch_ms = (time.perf_counter() - started) / 20 * 1000
+        started = time.perf_counter()
+        for _ in range(20):
+            for symbol, data in subset.items():
+                batch_indicators({symbol: data}, batch_1h)
+        loop_ms = (time.perf_counter() - started) / 20 * 1000
+        print(f"  {count:>2} 个交易对: 批量 {batch_ms:.2f}ms  逐个 {loop_ms:.2f}ms")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '批量综合上下文': test_batch_context(),
+        '多交易对矩阵计算': test_batch_scaling(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 WebSocket 行情数据流
+使用本地回放服务器推送录制格式的帧，离线验证内存行情状态和 MarketAnalyzer 读取
+"""
+
+import os
+import sys
+import json
+import time
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_data_stream import MarketDataStream, MarketReplayServer
+from market_analyzer import MarketAnalyzer
+
+
+BASE_TIME = 1_700_000_040_000  # 对齐到分钟的毫秒时间戳
+
+
+def _kline_frame(symbol, index, close, closed=True):
+    open_time = BASE_TIME + index * 60_000
+    return json.dumps({
+        'stream': f"{symbol.lower()}@kline_1m",
+        'data': {
+            'e': 'kline', 'E': open_time + 59_000, 's': symbol,
+            'k': {
+                't': open_time, 'T': open_time + 59_999, 's': symbol, 'i': '1m',
+                'o': str(close - 1), 'c': str(close), 'h': str(close + 2), 'l': str(close - 2),
+                'v': '10', 'n': 5, 'x': closed, 'q': '1000', 'V': '4', 'Q': '400'
+            }
+        }
+    })
+
+
+def _build_frames():
+    frames = []
+    for i in range(5):
+        frames.append(_kline_frame('BTCUSDT', i, 100 + i))
+    # 最后一根K线的盘中更新应覆盖而不是追加
+    frames.append(_kline_frame('BTCUSDT', 4, 110, closed=False))
+    for symbol, open_price, close_price in (('BTCUSDT', 100, 110), ('ETHUSDT', 50, 45)):
+        frames.append(json.dumps({
+            'stream': f"{symbol.lower()}@miniTicker",
+            'data': {'e': '24hrMiniTicker', 'E': BASE_TIME + 300_000, 's': symbol,
+                     'c': str(close_price), 'o': str(open_price), 'h': '120', 'l': '40',
+                     'v': '1000', 'q': '100000'}
+        }))
+    frames.append(json.dumps({
+        'stream': 'btcusdt@markPrice@1s',
+        'data': {'e': 'markPriceUpdate', 'E': BASE_TIME + 300_000, 's': 'BTCUSDT',
+                 'p': '109.5', 'i': '109.4', 'r': '0.00010000', 'T': BASE_TIME + 8 * 3600_000}
+    }))
+    return frames
+
+
+def _start(frames):
+    server = MarketReplayServer(frames).start()
+    stream = MarketDataStream(['BTCUSDT', 'ETHUSDT'], url=server.url)
+    stream.start()
+    assert stream.wait_ready(5), "回放数据未到达"
+    deadline = time.time() + 5
+    while stream.message_count < len(frames) and time.time() < deadline:
+        time.sleep(0.02)
+    return server, stream
+
+
+def test_stream_state():
+    """测试数据流内存状态"""
+    print("\n" + "=" * 60)
+    print("📡 测试1: 行情数据流内存状态")
+    print("=" * 60)
+
+    frames = _build_frames()
+    server, stream = _start(frames)
+    try:
+        klines = stream.get_klines('BTCUSDT', '1m', 5)
+        assert klines is not None and len(klines) == 5
+        assert klines[-1][4] == '110', "盘中更新未覆盖最后一根K线"
+        assert [row[0] for row in klines] == sorted(row[0] for row in klines)
+        print(f"✅ K线数量: {len(klines)}，最新收盘: {klines[-1][4]}")
+
+        # 数量不足或周期未订阅时返回 None，由调用方回退到 REST
+        assert stream.get_klines('BTCUSDT', '1m', 50) is None
+        assert stream.get_klines('BTCUSDT', '15m', 5) is None
+
+        ticker = stream.get_ticker('ETHUSDT')
+        assert abs(float(ticker['priceChangePercent']) - (-10.0)) < 1e-6
+        print(f"✅ ETHUSDT 24h涨跌: {ticker['priceChangePercent']}%")
+
+        mark = stream.get_mark_price('BTCUSDT')
+        assert mark['markPrice'] == 109.5 and mark['fundingRate'] == 0.0001
+        print(f"✅ 标记价格: {mark['markPrice']}，资金费率: {mark['fundingRate']}")
+    finally:
+        stream.stop()
+        server.stop()
+
+    return True
+
+
+def test_analyzer_reads_stream():
+    """测试 MarketAnalyzer 从数据流读取（无 REST 客户端）"""
+    print("\n" + "=" * 60)
+    print("📈 测试2: MarketAnalyzer 读取数据流")
+    print("=" * 60)
+
+    frames = _build_frames()
+    server, stream = _start(frames)
+    try:
+        analyzer = MarketAnalyzer(client=None, market_stream=stream)
+
+        assert analyzer.get_current_price('BTCUSDT') == 110.0
+        change = analyzer.get_price_change_24h('BTCUSDT')
+        assert abs(change['change_percent'] - 10.0) < 1e-6
+
+        df = analyzer.get_kline_data('BTCUSDT', '1m', 5)
+        assert len(df) == 5
+        assert list(df['close']) == [100.0, 101.0, 102.0, 103.0, 110.0]
+        print(f"✅ DataFrame 行数: {len(df)}，收盘价: {list(df['close'])}")
+    finally:
+        stream.stop()
+        server.stop()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '行情数据流内存状态': test_stream_state(),
+        'MarketAnalyzer 读取数据流': test_analyzer_reads_stream(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
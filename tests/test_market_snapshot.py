@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试每轮循环的全市场行情快照
+验证快照只发两次请求，且各交易对读取24h行情和资金费率时不再单独请求
+"""
+
+import os
+import sys
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_metrics import ApiMetrics
+from market_analyzer import MarketAnalyzer
+from market_snapshot import CycleMarketSnapshot
+from simulated_exchange import SimulatedExchange, synthetic_klines
+
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT']
+
+
+def test_snapshot_request_count():
+    """测试请求数与交易对数量无关"""
+    print("\n" + "=" * 60)
+    print("📸 测试1: 全市场行情快照")
+    print("=" * 60)
+
+    klines = {s: synthetic_klines(100 * (i + 1), 600, seed=i) for i, s in enumerate(SYMBOLS)}
+    ex = SimulatedExchange(klines, speed=0, funding_rate=0.0003)
+    metrics = ApiMetrics()
+    ex.async_client.metrics = metrics
+    try:
+        snapshot = CycleMarketSnapshot.fetch(ex)
+        assert sorted(snapshot.tickers) == sorted(SYMBOLS)
+        assert abs(snapshot.funding_rate('ETHUSDT') - 0.0003) < 1e-12
+        assert snapshot.mark_price('BTCUSDT') > 0
+        assert metrics.start_cycle()['calls'] == 2
+
+        analyzer = MarketAnalyzer(ex)
+        analyzer.set_cycle_snapshot(snapshot)
+        for symbol in SYMBOLS:
+            info = analyzer.get_price_change_24h(symbol)
+            assert info['price'] == float(snapshot.ticker(symbol)['lastPrice'])
+            assert analyzer.get_futures_market_data(symbol)['funding_rate'] == 0.0003
+
+        # 只剩持仓量（没有全市场接口）的请求
+        endpoints = metrics.start_cycle()['callers']['unknown']['endpoints']
+        assert set(endpoints) == {'futures_open_interest', 'futures_open_interest_hist'}, endpoints
+        print(f"✅ 快照 2 次请求覆盖 {len(SYMBOLS)} 个交易对")
+
+        # 快照中没有的交易对回退到单独请求
+        analyzer.set_cycle_snapshot(CycleMarketSnapshot())
+        analyzer.get_price_change_24h('BTCUSDT')
+        assert 'get_ticker' in metrics.start_cycle()['callers']['unknown']['endpoints']
+        print("✅ 快照缺失时回退到单独请求")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '全市场行情快照': test_snapshot_request_count(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试支撑阻力位检测
+验证 O(n) 滑动窗口极值与逐窗口计算一致、转折点和价位聚类结果，
+以及 AITradingEngine 的支撑/阻力位与原逐点切片实现一致，并输出两者耗时供参考
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import price_levels
+from ai_trading_engine import AITradingEngine
+from kline_store import parse_klines
+from simulated_exchange import synthetic_klines
+
+
+def _slicing_levels(closes, pick):
+    """原 _find_support_levels / _find_resistance_levels 的逐点切片实现"""
+    levels = []
+    for i in range(10, len(closes) - 10):
+        if closes[i] == pick(closes[i - 10:i + 10]):
+            levels.append(closes[i])
+    return sorted(levels)[-3:] if levels else []
+
+
+def test_sliding_extremes():
+    """测试滑动窗口极值和转折点"""
+    print("\n" + "=" * 60)
+    print("📏 测试1: 滑动窗口极值")
+    print("=" * 60)
+
+    rng = np.random.default_rng(4)
+    x = np.round(rng.normal(size=(3, 257)), 1)     # 保留一位小数，制造相同价格的平台
+    for window in (1, 2, 5, 20, 64, 257):
+        expected_max = np.array([[row[i:i + window].max() for i in range(257 - window + 1)] for row in x])
+        expected_min = np.array([[row[i:i + window].min() for i in range(257 - window + 1)] for row in x])
+        assert np.array_equal(price_levels.sliding_max(x, window), expected_max), window
+        assert np.array_equal(price_levels.sliding_min(x, window), expected_min), window
+    assert price_levels.sliding_max(x, 300).shape == (3, 0)
+    print("✅ 与逐窗口计算一致（含二维输入和平台）")
+
+    high, low = x[0] + 1, x[0] - 1
+    is_high, is_low = price_levels.pivots(high, low, window=3)
+    for i in range(len(high)):
+        expected = 3 <= i < len(high) - 3 and high[i] > high[i - 3:i].max() and high[i] >= high[i + 1:i + 4].max()
+        assert is_high[i] == expected, i
+        expected = 3 <= i < len(low) - 3 and low[i] < low[i - 3:i].min() and low[i] <= low[i + 1:i + 4].min()
+        assert is_low[i] == expected, i
+    print(f"✅ 转折点：{is_high.sum()} 个高点，{is_low.sum()} 个低点")
+
+    return True
+
+
+def test_levels():
+    """测试价位聚类和多周期支撑阻力"""
+    print("\n" + "=" * 60)
+    print("🧱 测试2: 价位聚类")
+    print("=" * 60)
+
+    zones = price_levels.cluster_levels([100.0, 100.2, 105.0, 99.9, 104.9, 110.0], tolerance=0.005,
+                                        labels=['1h', '4h', '1h', '1h', '4h', '1h'])
+    assert [z['touches'] for z in zones] == [3, 2, 1]
+    assert zones[0]['low'] == 99.9 and zones[0]['high'] == 100.2 and zones[0]['timeframes'] == ['1h', '4h']
+    print(f"✅ 6 个转折点合并为 {len(zones)} 个区间")
+
+    frames = {'1h': parse_klines(synthetic_klines(100, 100, seed=8)),
+              '4h': parse_klines(synthetic_klines(100, 60, seed=9))}
+    price = float(np.median(frames['1h'][4]))
+    levels = price_levels.find_levels(frames, price, max_levels=3)
+    assert levels['support'] and levels['resistance']
+    assert all(z['price'] < price for z in levels['support'])
+    assert all(z['price'] > price for z in levels['resistance'])
+    supports = [z['price'] for z in levels['support']]
+    resistances = [z['price'] for z in levels['resistance']]
+    assert supports == sorted(supports, reverse=True) and resistances == sorted(resistances)
+    print(f"✅ 当前价 {price:.2f}，支撑 {[round(p, 2) for p in supports]}，阻力 {[round(p, 2) for p in resistances]}")
+
+    return True
+
+
+def test_engine_levels():
+    """测试 AITradingEngine 支撑阻力位与原实现一致，并输出耗时"""
+    print("\n" + "=" * 60)
+    print("⏱️  测试3: 交易引擎支撑阻力位")
+    print("=" * 60)
+
+    engine = AITradingEngine.__new__(AITradingEngine)
+    for n in (0, 20, 21, 100, 1000):
+        closes = parse_klines(synthetic_klines(100, n, seed=n))[4].round(1).tolist()
+        assert engine._find_support_levels(closes) == _slicing_levels(closes, min)
+        assert engine._find_resistance_levels(closes) == _slicing_levels(closes, max)
+    print("✅ 与原实现一致")
+
+    closes = parse_klines(synthetic_klines(100, 5000, seed=1))[4].tolist()
+    started = time.perf_counter()
+    for _ in range(10):
+        engine._find_support_levels(closes)
+    fast_ms = (time.perf_counter() - started) * 100
+    started = time.perf_counter()
+    for _ in range(10):
+        _slicing_levels(closes, min)
+    slow_ms = (time.perf_counter() - started) * 100
+    # 耗时受机器负载影响，只输出供参考，不作断言
+    print(f"  5000 根: 滑动窗口 {fast_ms:.3f}ms  逐点切片 {slow_ms:.3f}ms")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '滑动窗口极值': test_sliding_extremes(),
+        '价位聚类': test_levels(),
+        '交易引擎支撑阻力位': test_engine_levels(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 Binance 请求权重限流器
+验证各接口的权重估算、按自然分钟重置的权重窗口、用响应头校准已用权重、收到 429/418 后暂停该桶，
+并发请求各自用本次响应校准，以及另一个进程持有状态文件锁时 acquire 不阻塞事件循环
+"""
+
+import asyncio
+import fcntl
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from binance.exceptions import BinanceAPIException
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rate_limiter
+from async_binance_client import AsyncBinanceClient
+from rate_limiter import RateLimiter, request_weight
+
+
+FUTURES_URL = 'https://fapi.binance.com/fapi/v1/order'
+SPOT_URL = 'https://api.binance.com/api/v3/account'
+
+
+class FakeClock:
+    """替换 rate_limiter 模块里的 time，手动推进时间"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def _limiter(weight_limit: int = 100, order_limit: int = 10):
+    limiter = RateLimiter(state_file=os.path.join(tempfile.mkdtemp(), 'rate_limit.json'))
+    limiter.limits = {'futures': (weight_limit, order_limit), 'spot': (weight_limit, order_limit)}
+    return limiter
+
+
+def _response(url: str, **headers):
+    return SimpleNamespace(url=url, headers=headers, text='')
+
+
+def test_request_weight():
+    """测试权重表"""
+    print("\n" + "=" * 60)
+    print("⚖️  测试1: 请求权重")
+    print("=" * 60)
+
+    cases = [
+        (('futures_klines', {'limit': 99}), ('futures', 1, 0)),
+        (('futures_klines', {'limit': 499}), ('futures', 2, 0)),
+        (('futures_klines', {}), ('futures', 5, 0)),
+        (('futures_klines', {'limit': 1500}), ('futures', 10, 0)),
+        (('futures_order_book', {'limit': 50}), ('futures', 2, 0)),
+        (('futures_order_book', {'limit': 1000}), ('futures', 20, 0)),
+        (('get_order_book', {'limit': 5000}), ('spot', 250, 0)),
+        (('futures_ticker', {'symbol': 'BTCUSDT'}), ('futures', 1, 0)),
+        (('futures_ticker', {}), ('futures', 40, 0)),
+        (('futures_mark_price', {}), ('futures', 10, 0)),
+        (('futures_get_open_orders', {}), ('futures', 40, 0)),
+        (('futures_get_open_orders', {'symbol': 'BTCUSDT'}), ('futures', 1, 0)),
+        (('futures_account', {}), ('futures', 5, 0)),
+        (('futures_get_position_mode', {}), ('futures', 30, 0)),
+        (('futures_create_order', {'symbol': 'BTCUSDT'}), ('futures', 0, 1)),
+        (('futures_place_batch_order', {'batchOrders': [{}, {}, {}]}), ('futures', 5, 3)),
+        (('futures_cancel_order', {'symbol': 'BTCUSDT'}), ('futures', 1, 0)),
+        (('get_account', {}), ('spot', 20, 0)),
+        (('get_ticker', {}), ('spot', 80, 0)),
+        (('create_order', {'symbol': 'BTCUSDT'}), ('spot', 1, 1)),
+    ]
+    for (name, params), expected in cases:
+        assert request_weight(name, params) == expected, (name, params, request_weight(name, params))
+    print(f"✅ {len(cases)} 个接口/参数组合的权重与下单次数正确")
+
+    return True
+
+
+def test_window_rollover():
+    """测试权重预算用尽后等待到下一分钟"""
+    print("\n" + "=" * 60)
+    print("🕐 测试2: 分钟窗口")
+    print("=" * 60)
+
+    clock = FakeClock(6_000_000.0 + 20)
+    original = rate_limiter.time
+    rate_limiter.time = clock
+    try:
+        limiter = _limiter()
+        # 只使用 90%：100 × 0.9 = 90
+        assert limiter.try_acquire('futures', 60) == 0
+        assert limiter.try_acquire('futures', 30) == 0
+        delay = limiter.try_acquire('futures', 1)
+        assert abs(delay - 40.05) < 1e-6, delay
+        assert limiter.try_acquire('spot', 50) == 0, "现货桶单独计算"
+        print(f"✅ 合约桶用满 90 后需等待 {delay:.2f} 秒，现货桶不受影响")
+
+        # 下单次数：10 × 0.9 = 9
+        assert limiter.try_acquire('spot', 0, orders=9) == 0
+        assert limiter.try_acquire('spot', 0, orders=1) > 0
+
+        clock.now += delay
+        assert limiter.try_acquire('futures', 1) == 0
+        usage = limiter.usage()
+        assert usage['futures']['weight'] == 1 and usage['futures']['limit'] == 100
+        assert usage['spot']['weight'] == 0 and usage['spot']['orders'] == 0
+        print(f"✅ 进入下一分钟后清零: {usage['futures']}")
+    finally:
+        rate_limiter.time = original
+
+    return True
+
+
+def test_sync_and_ban():
+    """测试响应头校准与 429/418 封禁"""
+    print("\n" + "=" * 60)
+    print("📡 测试3: 响应头校准与封禁")
+    print("=" * 60)
+
+    clock = FakeClock(6_000_000.0)
+    original = rate_limiter.time
+    rate_limiter.time = clock
+    try:
+        limiter = _limiter()
+        limiter.try_acquire('futures', 10, orders=1)
+
+        # 响应头是交易所统计的值（含其他进程），只向上校准
+        limiter.sync_from_response(_response(FUTURES_URL, **{'X-MBX-USED-WEIGHT-1M': '70',
+                                                              'X-MBX-ORDER-COUNT-1M': '4'}))
+        limiter.sync_from_response(_response(FUTURES_URL, **{'X-MBX-USED-WEIGHT-1M': '50'}))
+        limiter.sync_from_response(_response(SPOT_URL, **{'X-MBX-USED-WEIGHT-1M': '33'}))
+        limiter.sync_from_response(_response(FUTURES_URL))
+        limiter.sync_from_response(None)
+        usage = limiter.usage()
+        assert (usage['futures']['weight'], usage['futures']['orders']) == (70, 4)
+        assert usage['spot']['weight'] == 33
+        assert limiter.try_acquire('futures', 21) > 0 and limiter.try_acquire('futures', 20) == 0
+        print(f"✅ 校准后合约已用 {usage['futures']['weight']}，现货已用 {usage['spot']['weight']}")
+
+        async def ban():
+            await limiter.record_response(_response(FUTURES_URL, **{'Retry-After': '30'}), 429)
+            await limiter.record_response(_response(SPOT_URL), 418)
+            await limiter.record_response(_response(SPOT_URL, **{'Retry-After': '5'}), 400)
+        asyncio.run(ban())
+        assert limiter.try_acquire('futures', 1) == 30
+        assert limiter.try_acquire('spot', 1) == 60, "没有 Retry-After 时暂停 60 秒，400 不缩短封禁"
+
+        # 合约封禁到期后回到权重预算限制（本分钟已用满），现货封禁仍在
+        clock.now += 45
+        assert abs(limiter.try_acquire('futures', 1) - 15.05) < 1e-6
+        assert limiter.try_acquire('spot', 1) == 15
+        # 封禁跨分钟保持，到期后恢复
+        clock.now += 15
+        assert limiter.try_acquire('futures', 1) == 0 and limiter.try_acquire('spot', 1) == 0
+        print("✅ 429 按 Retry-After 暂停合约桶，418 默认暂停 60 秒，到期后恢复")
+    finally:
+        rate_limiter.time = original
+
+    return True
+
+
+class _BannedClient:
+    """每次请求都返回 429"""
+
+    def __init__(self):
+        self.response = None
+        self.calls = 0
+
+    async def futures_account(self):
+        self.calls += 1
+        response = _response(FUTURES_URL, **{'Retry-After': '120', 'X-MBX-USED-WEIGHT-1M': '2400'})
+        raise BinanceAPIException(response, 429, '{"code": -1003, "msg": "Too many requests"}')
+
+
+def test_client_ban():
+    """测试 AsyncBinanceClient 收到 429 后暂停后续请求"""
+    print("\n" + "=" * 60)
+    print("🚫 测试4: 客户端收到 429")
+    print("=" * 60)
+
+    async def scenario():
+        client = AsyncBinanceClient('key', 'secret')
+        client.rate_limiter = _limiter(2400, 1200)
+        client.client = _BannedClient()
+        try:
+            await client._request('futures_account')
+            assert False, "应抛出 API 错误"
+        except Exception as e:
+            assert '-1003' in str(e), e
+        usage = client.rate_limiter.usage()['futures']
+        assert usage['weight'] == 2400 and usage['ban_until'] > rate_limiter.time.time() + 100
+        try:
+            await asyncio.wait_for(client._request('futures_account'), 0.2)
+            assert False, "封禁期间不应发出请求"
+        except asyncio.TimeoutError:
+            pass
+        assert client.client.calls == 1
+
+    asyncio.run(scenario())
+    print("✅ 封禁写入共享状态，后续请求在本地等待而不发出")
+
+    return True
+
+
+class _SharedResponseClient:
+    """模拟 AsyncClient：每次请求先写共用的 response 属性，再经 _handle_response 返回结果"""
+
+    def __init__(self):
+        self.response = None
+        self.spot_done = asyncio.Event()
+
+    async def _handle_response(self, response):
+        return {'url': response.url}
+
+    async def futures_account(self):
+        self.response = _response(FUTURES_URL, **{'X-MBX-USED-WEIGHT-1M': '70'})
+        response = self.response
+        # 等现货请求完成后才返回，此时共用属性已被现货响应覆盖
+        await self.spot_done.wait()
+        return await self._handle_response(response)
+
+    async def get_account(self):
+        self.response = _response(SPOT_URL, **{'X-MBX-USED-WEIGHT-1M': '33'})
+        try:
+            return await self._handle_response(self.response)
+        finally:
+            self.spot_done.set()
+
+
+def test_concurrent_responses():
+    """测试并发请求各自用本次响应的头部校准"""
+    print("\n" + "=" * 60)
+    print("🔀 测试5: 并发请求的响应头")
+    print("=" * 60)
+
+    async def scenario():
+        client = AsyncBinanceClient('key', 'secret')
+        client.rate_limiter = _limiter(2400, 1200)
+        client.client = _SharedResponseClient()
+        client._capture_responses(client.client)
+        results = await asyncio.gather(client._request('futures_account'), client._request('get_account'))
+        assert [r['url'] for r in results] == [FUTURES_URL, SPOT_URL]
+        assert client.client.response.url == SPOT_URL
+        return client.rate_limiter.usage()
+
+    usage = asyncio.run(scenario())
+    assert usage['futures']['weight'] == 70 and usage['spot']['weight'] == 33, usage
+    print(f"✅ 合约已用 {usage['futures']['weight']}，现货已用 {usage['spot']['weight']}（未取到对方的响应头）")
+
+    return True
+
+
+def test_acquire_does_not_block_loop():
+    """测试另一个进程持有状态文件锁时事件循环仍可运行"""
+    print("\n" + "=" * 60)
+    print("🔒 测试6: 等待文件锁不阻塞事件循环")
+    print("=" * 60)
+
+    limiter = _limiter()
+
+    async def scenario():
+        # 另外打开的文件描述符与限流器的锁互斥，相当于另一个进程持有锁
+        fd = os.open(limiter.state_file, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            acquire = asyncio.ensure_future(limiter.acquire('futures', 5))
+            ticks = 0
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+                ticks += 1
+            assert not acquire.done() and ticks == 10
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        await asyncio.wait_for(acquire, 5)
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    assert limiter.usage()['futures']['weight'] == 5
+    print(f"✅ 持锁期间事件循环继续运行 {ticks} 次，释放后 acquire 完成")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '请求权重': test_request_weight(),
+        '分钟窗口': test_window_rollover(),
+        '响应头校准与封禁': test_sync_and_ban(),
+        '客户端收到 429': test_client_ban(),
+        '并发请求的响应头': test_concurrent_responses(),
+        '等待文件锁不阻塞事件循环': test_acquire_does_not_block_loop(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
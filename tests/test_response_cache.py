@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 Binance 响应缓存
+离线验证 TTL 命中、并发相同请求合并、写操作失效和失败不缓存
+"""
+
+import os
+import sys
+import asyncio
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_cache import ResponseCache, ACCOUNT_ENDPOINTS
+
+
+class CountingFetch:
+    """记录调用次数的假请求，每次等待一小段时间模拟网络延迟"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise Exception("API错误: -1003 - Too many requests")
+        return {'totalWalletBalance': '100', 'call': self.calls}
+
+
+def test_single_flight_and_ttl():
+    """测试并发请求合并与 TTL 命中"""
+    print("\n" + "=" * 60)
+    print("🗄️  测试1: 并发合并与 TTL 缓存")
+    print("=" * 60)
+
+    cache = ResponseCache({'futures_account': 0.2})
+    fetch = CountingFetch()
+
+    async def run():
+        # 10 个同时发出的相同请求只发一次
+        results = await asyncio.gather(*(cache.get('futures_account', (), {}, fetch) for _ in range(10)))
+        assert fetch.calls == 1 and all(r['call'] == 1 for r in results)
+
+        # TTL 内命中缓存，返回的是副本
+        cached = await cache.get('futures_account', (), {}, fetch)
+        cached['totalWalletBalance'] = '0'
+        assert (await cache.get('futures_account', (), {}, fetch))['totalWalletBalance'] == '100'
+        assert fetch.calls == 1
+
+        # TTL 过期后重新请求
+        await asyncio.sleep(0.25)
+        await cache.get('futures_account', (), {}, fetch)
+        assert fetch.calls == 2
+
+    asyncio.run(run())
+
+    stats = cache.stats()
+    assert stats['misses'] == 2 and stats['coalesced'] == 9 and stats['hits'] == 2
+    print(f"✅ 上游请求 {fetch.calls} 次，命中统计: {stats['hits']}/{stats['coalesced']}/{stats['misses']}")
+
+    return True
+
+
+def test_invalidate_and_errors():
+    """测试写操作失效与失败不缓存"""
+    print("\n" + "=" * 60)
+    print("🧹 测试2: 失效与错误处理")
+    print("=" * 60)
+
+    cache = ResponseCache({'futures_account': 60, 'futures_exchange_info': 60})
+    account = CountingFetch()
+    info = CountingFetch()
+
+    async def run():
+        await cache.get('futures_account', (), {}, account)
+        await cache.get('futures_exchange_info', (), {}, info)
+        cache.invalidate(ACCOUNT_ENDPOINTS)
+        await cache.get('futures_account', (), {}, account)
+        await cache.get('futures_exchange_info', (), {}, info)
+        assert account.calls == 2, "账户接口应在写操作后失效"
+        assert info.calls == 1, "交易规则不受账户写操作影响"
+
+        # 失效前发出、失效后返回的请求不写入缓存
+        pending = asyncio.ensure_future(cache.get('futures_account', ('late',), {}, account))
+        await asyncio.sleep(0.01)
+        cache.invalidate(ACCOUNT_ENDPOINTS)
+        await pending
+        await cache.get('futures_account', ('late',), {}, account)
+        assert account.calls == 4
+
+        # 失败不缓存，并发等待者一并收到异常
+        failing = CountingFetch(fail=True)
+        results = await asyncio.gather(*(cache.get('futures_account', ('x',), {}, failing) for _ in range(3)),
+                                       return_exceptions=True)
+        assert failing.calls == 1 and all(isinstance(r, Exception) for r in results)
+        await asyncio.gather(cache.get('futures_account', ('x',), {}, failing), return_exceptions=True)
+        assert failing.calls == 2
+
+    asyncio.run(run())
+    print("✅ 写操作失效、迟到结果丢弃、失败不缓存")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '并发合并与 TTL 缓存': test_single_flight_and_ttl(),
+        '失效与错误处理': test_invalidate_and_errors(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地模拟交易所
+用手工构造的1分钟K线和手动推进的时钟，离线验证下单、条件单触发、手续费、资金费和强平
+"""
+
+import os
+import sys
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulated_exchange import SimulatedExchange, synthetic_klines, MINUTE_MS
+
+
+START = 1_700_006_400_000   # 8小时整点（资金费结算时刻）之后的整分钟
+
+
+def _klines(prices):
+    """每个元素是 (开, 高, 低, 收)"""
+    rows = []
+    for i, (o, h, l, c) in enumerate(prices):
+        t = START + i * MINUTE_MS
+        rows.append([t, str(o), str(h), str(l), str(c), '10', t + MINUTE_MS - 1, str(10 * c), 5, '5', '0', '0'])
+    return rows
+
+
+def _exchange(prices, **kwargs):
+    # 第一根K线作为历史，时钟停在它收盘之后
+    return SimulatedExchange({'BTCUSDT': _klines(prices)}, initial_balance=1000.0, speed=0,
+                             start_time=START + MINUTE_MS, **kwargs)
+
+
+def test_orders_and_fees():
+    """测试市价开仓、批量止损止盈、止盈触发和手续费"""
+    print("\n" + "=" * 60)
+    print("🧪 测试1: 下单、条件单和手续费")
+    print("=" * 60)
+
+    ex = _exchange([(100, 100, 100, 100), (100, 101, 99, 100), (100, 106, 100, 105), (105, 105, 105, 105)])
+    try:
+        ex.set_leverage('BTCUSDT', 10)
+        ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=1, position_side='LONG')
+        results = ex.create_futures_batch_orders([
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'STOP_MARKET', 'quantity': 1,
+             'position_side': 'LONG', 'stopPrice': 95},
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'TAKE_PROFIT_MARKET', 'quantity': 1,
+             'position_side': 'LONG', 'stopPrice': 104},
+            # 立即触发的止损会被拒绝，且不影响同批其他订单
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'order_type': 'STOP_MARKET', 'quantity': 1,
+             'position_side': 'LONG', 'stopPrice': 101},
+        ])
+        assert results[0].get('orderId') and results[1].get('orderId')
+        assert results[2]['code'] == -2021
+        assert len(ex.get_futures_open_orders('BTCUSDT')) == 2
+
+        position = ex.get_active_positions()[0]
+        assert float(position['positionAmt']) == 1 and position['positionSide'] == 'LONG'
+
+        # 第二根K线未触发，第三根K线最高106触发104的止盈
+        ex.advance(60)
+        assert len(ex.get_active_positions()) == 1
+        ex.advance(60)
+        assert ex.get_active_positions() == []
+
+        summary = ex.summary()
+        expected = 1000 + 4 - (100 + 104) * 0.0005
+        assert abs(summary['wallet_balance'] - expected) < 1e-6
+        assert summary['trades'] == 2
+        print(f"✅ 止盈成交，余额 {summary['wallet_balance']:.4f}，手续费 {summary['commission']:.4f}")
+
+        # 双向持仓模式下 BOTH 方向被拒绝
+        try:
+            ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=1)
+            assert False, "双向持仓模式应拒绝 BOTH"
+        except Exception as e:
+            assert '-4061' in str(e)
+        print("✅ 持仓方向校验")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_trailing_funding_liquidation():
+    """测试追踪止损、资金费结算和强平"""
+    print("\n" + "=" * 60)
+    print("🧪 测试2: 追踪止损、资金费和强平")
+    print("=" * 60)
+
+    prices = [(100, 100, 100, 100), (100, 110, 100, 110), (110, 110, 107, 108), (108, 108, 108, 108)]
+    ex = _exchange(prices)
+    try:
+        ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=1, position_side='LONG')
+        ex.create_futures_order('BTCUSDT', 'SELL', 'TRAILING_STOP_MARKET', quantity=1,
+                                position_side='LONG', callbackRate=2)
+        ex.advance(120)
+        assert ex.get_active_positions() == []
+        trade = ex.async_client.client.trades[-1]
+        assert abs(trade['price'] - 107.8) < 1e-9, "应在最高价110回撤2%处成交"
+        print(f"✅ 追踪止损成交 @ {trade['price']:.2f}")
+    finally:
+        ex.close()
+
+    # 资金费：空头在正费率时收取资金费
+    rows = synthetic_klines(100, 8 * 60 + 10, start_time=START - MINUTE_MS, volatility=0, seed=1)
+    ex = SimulatedExchange({'BTCUSDT': rows}, initial_balance=1000.0, speed=0, start_time=START,
+                           funding_rate=0.001)
+    try:
+        ex.create_futures_order('BTCUSDT', 'SELL', 'MARKET', quantity=1, position_side='SHORT')
+        ex.advance(8 * 3600)
+        assert abs(ex.summary()['funding'] - 0.1) < 1e-6
+        print("✅ 资金费结算")
+    finally:
+        ex.close()
+
+    # 强平：50倍杠杆多仓，价格下跌3%
+    ex = _exchange([(100, 100, 100, 100), (100, 100, 97, 97)], max_leverage=125)
+    try:
+        ex.set_leverage('BTCUSDT', 50)
+        ex.set_margin_type('BTCUSDT', 'ISOLATED')
+        ex.create_futures_order('BTCUSDT', 'BUY', 'MARKET', quantity=1, position_side='LONG')
+        liq = float(ex.get_futures_positions()[0]['liquidationPrice'])
+        assert 97 < liq < 100
+        ex.advance(60)
+        assert ex.get_active_positions() == [] and ex.summary()['liquidations'] == 1
+        print(f"✅ 逐仓强平（强平价 {liq:.2f}）")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '下单、条件单和手续费': test_orders_and_fees(),
+        '追踪止损、资金费和强平': test_trailing_funding_liquidation(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试交易对过滤器缓存
+用固定的 exchangeInfo / 杠杆分层数据，离线验证 LOT_SIZE / MARKET_LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL
+对应的数量和价格取整、最小下单数量、批量与单笔下单校验、磁盘缓存的读取和过期，
+以及过期后刷新失败时继续使用旧数据
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from symbol_filter_cache import SymbolFilterCache
+
+
+EXCHANGE_INFO = {'symbols': [
+    {'symbol': 'BTCUSDT', 'filters': [
+        {'filterType': 'PRICE_FILTER', 'tickSize': '0.10', 'minPrice': '556.80', 'maxPrice': '4529764'},
+        {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'},
+        {'filterType': 'MARKET_LOT_SIZE', 'stepSize': '0.01', 'minQty': '0.01', 'maxQty': '120'},
+        {'filterType': 'MIN_NOTIONAL', 'notional': '100'},
+    ]},
+    # 没有 MARKET_LOT_SIZE 时市价单沿用 LOT_SIZE
+    {'symbol': 'DOGEUSDT', 'filters': [
+        {'filterType': 'PRICE_FILTER', 'tickSize': '0.000010', 'minPrice': '0.002440', 'maxPrice': '30'},
+        {'filterType': 'LOT_SIZE', 'stepSize': '1', 'minQty': '1', 'maxQty': '50000000'},
+        {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+    ]},
+    # 缺少 PRICE_FILTER 的交易对不可下单，跳过
+    {'symbol': 'BADUSDT', 'filters': [
+        {'filterType': 'LOT_SIZE', 'stepSize': '1', 'minQty': '1', 'maxQty': '100'},
+    ]},
+]}
+
+BRACKETS = [{'symbol': 'BTCUSDT', 'brackets': [
+    {'bracket': 2, 'initialLeverage': 100, 'notionalCap': 250000},
+    {'bracket': 1, 'initialLeverage': 125, 'notionalCap': 50000},
+    {'bracket': 3, 'initialLeverage': 50, 'notionalCap': 3000000},
+]}]
+
+
+class FakeClient:
+    """返回固定的 exchangeInfo 和杠杆分层，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def get_futures_exchange_info(self):
+        self.calls += 1
+        if self.fail:
+            raise Exception("API错误: -1001 - Internal error")
+        return EXCHANGE_INFO
+
+    def get_leverage_brackets(self):
+        return BRACKETS
+
+
+def _cache(client=None, cache_file=None, ttl_seconds=24 * 3600):
+    cache_file = cache_file or os.path.join(tempfile.mkdtemp(), 'symbol_filters.json')
+    return SymbolFilterCache(client or FakeClient(), cache_file=cache_file, ttl_seconds=ttl_seconds)
+
+
+def test_quantize():
+    """测试数量和价格取整"""
+    print("\n" + "=" * 60)
+    print("📏 测试1: 数量与价格取整")
+    print("=" * 60)
+
+    cache = _cache()
+    btc = cache.get('BTCUSDT')
+    assert (btc.step_size, btc.market_step_size, btc.tick_size, btc.min_notional) == (0.001, 0.01, 0.1, 100)
+    assert (btc.quantity_precision, btc.price_precision) == (3, 1)
+    assert cache.get('DOGEUSDT').market_step_size == 1 and cache.get('DOGEUSDT').price_precision == 5
+    try:
+        cache.get('BADUSDT')
+        assert False, "缺少 PRICE_FILTER 的交易对应被跳过"
+    except KeyError:
+        pass
+
+    quantities = [0.0019, 0.3, 1.23456, 0.0009, 0.7]
+    # 限价单按 LOT_SIZE 0.001、市价单按 MARKET_LOT_SIZE 0.01 向下取整；0.3、0.7 不因浮点误差少一个步长
+    assert np.array_equal(cache.quantize_quantities('BTCUSDT', quantities, market=False),
+                          [0.001, 0.3, 1.234, 0.0, 0.7])
+    assert np.array_equal(cache.quantize_quantities('BTCUSDT', quantities), [0.0, 0.3, 1.23, 0.0, 0.7])
+    assert np.array_equal(cache.quantize_quantities('DOGEUSDT', [99.99, 100, 1e6 + 0.5]), [99, 100, 1e6])
+    assert cache.quantize_quantity('BTCUSDT', 0.129, market=False) == 0.129
+    print("✅ 数量按对应步长向下取整")
+
+    assert np.array_equal(cache.quantize_prices('BTCUSDT', [65432.123, 65432.16, 65432.04]),
+                          [65432.1, 65432.2, 65432.0])
+    assert np.array_equal(cache.quantize_prices('DOGEUSDT', [0.1234567, 0.123444]), [0.12346, 0.12344])
+    assert cache.quantize_price('BTCUSDT', 100.05 + 1e-9) == 100.1
+    print("✅ 价格按 tickSize 四舍五入并保留对应小数位")
+
+    return True
+
+
+def test_min_order_quantity():
+    """测试满足最小数量和最小名义价值的最小下单数量"""
+    print("\n" + "=" * 60)
+    print("🔢 测试2: 最小下单数量")
+    print("=" * 60)
+
+    cache = _cache()
+    # 100 / 65000 = 0.00154：限价单向上取到 0.002，市价单向上取到 0.01
+    assert cache.min_order_quantity('BTCUSDT', 65000, market=False) == 0.002
+    assert cache.min_order_quantity('BTCUSDT', 65000) == 0.01
+    # 价格很高时最小数量由 LOT_SIZE 决定
+    assert cache.min_order_quantity('BTCUSDT', 200000, market=False) == 0.001
+    assert cache.min_order_quantity('BTCUSDT', 0, market=False) == 0.001
+    # 5 / 0.1 = 50 正好整除；5 / 0.12 = 41.67 向上取到 42
+    assert cache.min_order_quantity('DOGEUSDT', 0.1) == 50
+    assert cache.min_order_quantity('DOGEUSDT', 0.12) == 42
+    for symbol, price in (('BTCUSDT', 65000), ('DOGEUSDT', 0.12)):
+        qty = cache.min_order_quantity(symbol, price)
+        assert cache.validate_order(symbol, qty, price)[0]
+    print("✅ 最小下单数量满足 LOT_SIZE 和 MIN_NOTIONAL，且能通过校验")
+
+    return True
+
+
+def test_validate_orders():
+    """测试批量与单笔下单校验"""
+    print("\n" + "=" * 60)
+    print("🛂 测试3: 下单校验")
+    print("=" * 60)
+
+    cache = _cache()
+    quantities = [0.01, 0.005, 121, 0.01, 0.01]
+    prices = [65000, 65000, 65000, 0, 5000]
+    # 低于 MARKET_LOT_SIZE 最小数量、超过最大数量、价格为 0、名义价值 50 < 100
+    assert cache.validate_orders('BTCUSDT', quantities, prices).tolist() == [True, False, False, False, False]
+    # 限价单按 LOT_SIZE：0.005 和 121 都合法
+    assert cache.validate_orders('BTCUSDT', quantities, prices, market=False).tolist() == \
+        [True, True, True, False, False]
+    # 只减仓订单不受最小名义价值限制
+    assert cache.validate_orders('BTCUSDT', quantities, prices, reduce_only=True).tolist() == \
+        [True, False, False, False, True]
+    assert cache.validate_orders('DOGEUSDT', [49, 50, 50000001], [0.1, 0.1, 0.1]).tolist() == [False, True, False]
+    print("✅ 批量校验覆盖最小/最大数量、价格和最小名义价值")
+
+    assert cache.validate_order('BTCUSDT', 0.5, 65000, leverage=125) == (True, '')
+    ok, reason = cache.validate_order('BTCUSDT', 1, 65000, leverage=110)
+    assert not ok and '100x' in reason, reason
+    assert cache.validate_order('BTCUSDT', 40, 65000, leverage=50)[0]
+    assert cache.max_leverage('BTCUSDT', 5e6) == 50 and cache.max_leverage('DOGEUSDT', 100) is None
+    ok, reason = cache.validate_order('BTCUSDT', 0.01, 5000)
+    assert not ok and '最小名义价值' in reason
+    ok, reason = cache.validate_order('ETHUSDT', 1, 3000)
+    assert not ok and 'ETHUSDT' in reason
+    print(f"✅ 单笔校验按名义价值所在分层限制杠杆: {cache.get('BTCUSDT').brackets}")
+
+    return True
+
+
+def test_disk_cache():
+    """测试磁盘缓存读取与过期"""
+    print("\n" + "=" * 60)
+    print("💾 测试4: 磁盘缓存")
+    print("=" * 60)
+
+    cache_file = os.path.join(tempfile.mkdtemp(), 'symbol_filters.json')
+    first = FakeClient()
+    _cache(first, cache_file).get('BTCUSDT')
+    assert first.calls == 1 and os.path.exists(cache_file) and not os.path.exists(cache_file + '.tmp')
+
+    second = FakeClient()
+    cache = _cache(second, cache_file)
+    assert cache.get('BTCUSDT').brackets == [(50000.0, 125), (250000.0, 100), (3000000.0, 50)]
+    assert cache.min_order_quantity('BTCUSDT', 65000) == 0.01
+    assert second.calls == 0
+    print("✅ 未过期时从磁盘缓存恢复，不请求交易所")
+
+    expired = FakeClient()
+    _cache(expired, cache_file, ttl_seconds=0).get('DOGEUSDT')
+    assert expired.calls == 1
+    print("✅ 缓存过期后重新加载")
+
+    return True
+
+
+def test_refresh_failure():
+    """测试缓存过期后刷新失败时继续使用旧数据"""
+    print("\n" + "=" * 60)
+    print("🛟 测试5: 刷新失败")
+    print("=" * 60)
+
+    client = FakeClient()
+    cache = _cache(client, ttl_seconds=3600)
+    assert cache.quantize_quantity('BTCUSDT', 0.1234) == 0.12
+
+    client.fail = True
+    cache._loaded_at -= 3600
+    assert cache.quantize_quantity('BTCUSDT', 0.1234) == 0.12
+    assert cache.validate_order('BTCUSDT', 0.01, 65000) == (True, '')
+    assert client.calls == 2, "重试间隔内不再请求交易所"
+    print("✅ 刷新失败时继续使用过期的过滤器，重试间隔内不重复请求")
+
+    cache._loaded_at -= cache.REFRESH_RETRY_SECONDS
+    client.fail = False
+    cache.get('BTCUSDT')
+    cache.get('DOGEUSDT')
+    assert client.calls == 3, "刷新成功后按完整有效期缓存"
+    print("✅ 重试间隔后重新刷新成功")
+
+    failing = FakeClient()
+    failing.fail = True
+    try:
+        _cache(failing).get('BTCUSDT')
+        assert False, "从未加载过时应抛出异常"
+    except Exception as e:
+        assert '-1001' in str(e), e
+    print("✅ 从未加载成功时仍然抛出异常")
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '数量与价格取整': test_quantize(),
+        '最小下单数量': test_min_order_quantity(),
+        '下单校验': test_validate_orders(),
+        '磁盘缓存': test_disk_cache(),
+        '刷新失败': test_refresh_failure(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试交易引擎开仓后的止损止盈挂单
+在双向持仓模式的本地模拟交易所上，验证开仓后止损和止盈一次批量提交；止损挂单失败时重试一次，
+仍然失败则撤掉止盈、市价平仓并返回失败；只有止盈失败时返回结果中带有错误说明；
+等待模型决策期间持仓发生变化时按重新读取的持仓下单
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到导入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_trading_engine import AITradingEngine
+from market_analyzer import MarketAnalyzer
+from risk_manager import RiskManager
+from simulated_exchange import SimulatedExchange, MINUTE_MS, synthetic_klines
+from symbol_filter_cache import SymbolFilterCache
+
+
+def _engine():
+    rows = synthetic_klines(100, 50, seed=1)
+    ex = SimulatedExchange({'BTCUSDT': rows}, initial_balance=10000.0, speed=0,
+                           start_time=rows[-1][0] + MINUTE_MS, dual_side=True)
+    filters = SymbolFilterCache(ex, cache_file=os.path.join(tempfile.mkdtemp(), 'symbol_filters.json'))
+    engine = AITradingEngine('key', ex, MarketAnalyzer(ex), RiskManager({}),
+                             enable_enhanced_features=False, symbol_filters=filters)
+    return ex, engine
+
+
+def _fail_batch_leg(ex, leg: int):
+    """让批量下单中的第 leg 笔返回错误，其余照常提交"""
+    place = ex.create_futures_batch_orders
+
+    def batch(orders):
+        results = place([o for i, o in enumerate(orders) if i != leg])
+        results.insert(leg, {'code': -2021, 'msg': 'Order would immediately trigger.'})
+        return results
+    ex.create_futures_batch_orders = batch
+
+
+def _order_types(ex):
+    return sorted((o['type'], o['positionSide']) for o in ex.get_futures_open_orders('BTCUSDT'))
+
+
+def test_bracket_placed():
+    """测试正常开仓时止损止盈都挂上"""
+    print("\n" + "=" * 60)
+    print("🛡️  测试1: 开仓后挂止损止盈")
+    print("=" * 60)
+
+    ex, engine = _engine()
+    try:
+        result = engine._open_long_position('BTCUSDT', 100, 10, 0.02, 0.05)
+        assert result['success'] and result['take_profit_error'] == '', result
+        assert _order_types(ex) == [('STOP_MARKET', 'LONG'), ('TAKE_PROFIT_MARKET', 'LONG')]
+        result = engine._open_short_position('BTCUSDT', 100, 10, 0.02, 0.05)
+        assert result['success'], result
+        assert ('STOP_MARKET', 'SHORT') in _order_types(ex) and len(_order_types(ex)) == 4
+        print(f"✅ 多空两笔仓位各有止损和止盈: {_order_types(ex)}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_stop_loss_retry():
+    """测试止损挂单失败后重试成功"""
+    print("\n" + "=" * 60)
+    print("🔁 测试2: 止损重试")
+    print("=" * 60)
+
+    ex, engine = _engine()
+    try:
+        _fail_batch_leg(ex, 0)
+        result = engine._open_long_position('BTCUSDT', 100, 10, 0.02, 0.05)
+        assert result['success'], result
+        assert _order_types(ex) == [('STOP_MARKET', 'LONG'), ('TAKE_PROFIT_MARKET', 'LONG')]
+        print("✅ 批量提交中止损失败，单独重试后挂上")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_stop_loss_failure_flattens():
+    """测试止损重试仍失败时平仓并返回失败"""
+    print("\n" + "=" * 60)
+    print("🚨 测试3: 止损无法挂上")
+    print("=" * 60)
+
+    ex, engine = _engine()
+    try:
+        _fail_batch_leg(ex, 0)
+        create = ex.create_futures_order
+
+        def create_order(symbol, side, order_type, **kwargs):
+            if order_type == 'STOP_MARKET':
+                raise Exception("API错误: -2021 - Order would immediately trigger.")
+            return create(symbol, side, order_type, **kwargs)
+        ex.create_futures_order = create_order
+
+        result = engine._open_short_position('BTCUSDT', 100, 10, 0.02, 0.05)
+        assert not result['success'] and result['flattened'], result
+        assert '止损' in result['error'] and '-2021' in result['error']
+        assert ex.get_active_positions() == [] and ex.get_futures_open_orders('BTCUSDT') == []
+        print(f"✅ 返回失败并已平仓、撤掉止盈: {result['error']}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_take_profit_failure_reported():
+    """测试只有止盈失败时在结果中报告"""
+    print("\n" + "=" * 60)
+    print("⚠️  测试4: 止盈挂单失败")
+    print("=" * 60)
+
+    ex, engine = _engine()
+    try:
+        _fail_batch_leg(ex, 1)
+        result = engine._open_long_position('BTCUSDT', 100, 10, 0.02, 0.05)
+        assert result['success'] and '-2021' in result['take_profit_error'], result
+        assert _order_types(ex) == [('STOP_MARKET', 'LONG')]
+        assert len(ex.get_active_positions()) == 1
+        print(f"✅ 仓位保留止损，结果带有止盈错误: {result['take_profit_error']}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def test_positions_reread_after_decision():
+    """测试等待模型期间已开仓时不再重复开仓"""
+    print("\n" + "=" * 60)
+    print("⏳ 测试5: 决策期间持仓变化")
+    print("=" * 60)
+
+    ex, engine = _engine()
+    opened = []
+    try:
+        def decide(symbol, market_data, account_info):
+            # 决策时还没有持仓；模型等待期间（周期锁已释放）仓位被开出
+            assert account_info['positions'] == []
+            opened.append(engine._open_long_position(symbol, 100, 10, 0.02, 0.05)['quantity'])
+            decision = {'action': 'OPEN_LONG', 'confidence': 80, 'reasoning': 'test',
+                        'leverage': 10, 'position_size': 5, 'stop_loss_pct': 0.02, 'take_profit_pct': 0.05}
+            return {'success': True, 'decision': decision}
+        engine._get_ai_decision = decide
+        # 模拟行情只有 100 根 1 分钟 K线，不足以计算 1 小时指标，这里不关心行情数据
+        engine._get_market_data = lambda symbol: {'symbol': symbol}
+
+        result = engine.analyze_and_trade('BTCUSDT')
+        trade = result['trade_result']
+        assert not trade['success'] and '已有持仓' in trade['error'], result
+        positions = ex.get_active_positions()
+        assert len(positions) == 1 and float(positions[0]['positionAmt']) == opened[0], (positions, opened)
+        print(f"✅ 下单前重新读取持仓，跳过重复开仓: {trade['error']}")
+    finally:
+        ex.close()
+
+    return True
+
+
+def main():
+    """运行所有测试"""
+    results = {
+        '开仓后挂止损止盈': test_bracket_placed(),
+        '止损重试': test_stop_loss_retry(),
+        '止损无法挂上': test_stop_loss_failure_flattens(),
+        '止盈挂单失败': test_take_profit_failure_reported(),
+        '决策期间持仓变化': test_positions_reread_after_decision(),
+    }
+
+    print("\n" + "=" * 60)
+    for name, passed in results.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
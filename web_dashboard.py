@@ -4,7 +4,7 @@ Alpha Arena Web 仪表板
 实时查看交易表现 - 直接从 Binance API 获取实时数据
 """
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, Response
 from flask_socketio import SocketIO, emit
 import json
 import os
@@ -15,8 +15,11 @@ import time
 
 # 导入 Binance 客户端
 from binance_client import BinanceClient
+from market_data_stream import MarketDataStream
+from account_mirror import AccountMirror
 from performance_tracker import PerformanceTracker
 from risk_manager import RiskManager
+from api_metrics import api_caller, set_default_caller, registry as api_metrics
 import config
 
 # 加载环境变量
@@ -28,6 +31,9 @@ app.config['SECRET_KEY'] = 'alpha-arena-secret-key-2025'
 # 初始化 SocketIO（支持 WebSocket 实时推送）
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
+# 本进程的 Binance 请求默认记到仪表盘名下（推送线程单独标记）
+set_default_caller('dashboard')
+
 # 初始化 Binance 客户端（全局单例）
 binance_client = None
 performance_tracker = None
@@ -48,6 +54,19 @@ def init_clients():
             testnet=testnet
         )
 
+        # 账户镜像 + 标记价格流：后台推送直接读本地快照，不再每500ms请求 REST
+        if config.AccountMirror.ENABLED:
+            try:
+                market_stream = MarketDataStream(config.Trading.TRADING_SYMBOLS, intervals=[],
+                                                 client=binance_client, testnet=testnet)
+                market_stream.start()
+                account_mirror = AccountMirror(binance_client, testnet=testnet,
+                                               reconcile_seconds=config.AccountMirror.RECONCILE_SECONDS,
+                                               mark_price_source=market_stream.get_mark_price)
+                account_mirror.start()
+            except Exception as e:
+                print(f"[WARNING] 账户镜像启动失败，继续使用 REST: {e}")
+
     if performance_tracker is None:
         # [NEW] 从Binance API获取实际余额，替代配置文件
         try:
@@ -225,7 +244,9 @@ def get_system_status():
                 'ai_calls': runtime_state.get('total_ai_calls', 0),
                 'trading_loops': runtime_state.get('total_trading_loops', 0),
                 'session_start': runtime_state.get('session_start_time', ''),
-                'last_update': runtime_state.get('last_update_timestamp', datetime.now().isoformat())
+                'last_update': runtime_state.get('last_update_timestamp', datetime.now().isoformat()),
+                'api_cache': binance_client.cache_stats() if binance_client else None,
+                'clock_sync': binance_client.clock_status() if binance_client else None
             }
         })
 
@@ -401,6 +422,14 @@ def get_liquidation_warnings():
         })
 
 
+@app.route('/metrics')
+def get_metrics():
+    """Binance 接口调用指标（Prometheus 文本格式，?format=json 返回 JSON）"""
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'data': api_metrics.snapshot()})
+    return Response(api_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 # ==================== WebSocket 事件处理 ====================
 
 @socketio.on('connect')
@@ -424,7 +453,8 @@ def background_push_thread():
             init_clients()
 
             # 直接从Binance获取合约账户信息
-            account_info = binance_client.get_futures_account_info()
+            with api_caller('dashboard_push'):
+                account_info = binance_client.get_futures_account_info()
 
             # 获取合约账户总资产
             total_wallet_balance = float(account_info.get('totalWalletBalance', 0))  # 钱包余额（实际资金）
@@ -434,8 +464,10 @@ def background_push_thread():
             # 账户价值 = 保证金余额（钱包余额 + 未实现盈亏）= 真实总价值
             account_value = total_margin_balance
 
-            # 实时获取持仓
-            positions = binance_client.get_active_positions()
+            # 实时获取持仓（一次请求同时用于指标计算和持仓推送，节省请求权重）
+            with api_caller('dashboard_push'):
+                raw_positions = binance_client.get_futures_positions()
+            positions = [p for p in raw_positions if float(p.get('positionAmt', 0)) != 0]
 
             # 计算性能指标
             metrics = performance_tracker.calculate_metrics(total_wallet_balance, positions)
@@ -459,7 +491,6 @@ def background_push_thread():
             })
 
             # 推送持仓数据
-            raw_positions = binance_client.get_futures_positions()
             positions_list = []
 
             for pos in raw_positions: